@@ -0,0 +1,19 @@
+-- Migration 009: Unicidad de dbo.Ejecuciones por (DeploymentId, UserId)
+-- Con el despliegue agrupado (LANZADOR_DEPLOY_AGRUPADO) una sola llamada v4 lanza el robot en varios
+-- usuarios y A360 devuelve un único deploymentId; cada equipo tiene su propia fila en Ejecuciones.
+IF EXISTS (SELECT * FROM sys.indexes WHERE object_id = OBJECT_ID(N'[dbo].[Ejecuciones]') AND name = N'UQ_Ejecuciones_DeploymentId')
+BEGIN
+    DROP INDEX [UQ_Ejecuciones_DeploymentId] ON [dbo].[Ejecuciones];
+    PRINT 'Index UQ_Ejecuciones_DeploymentId dropped';
+END
+GO
+IF NOT EXISTS (SELECT * FROM sys.indexes WHERE object_id = OBJECT_ID(N'[dbo].[Ejecuciones]') AND name = N'UQ_Ejecuciones_DeploymentId_UserId')
+BEGIN
+    CREATE UNIQUE NONCLUSTERED INDEX [UQ_Ejecuciones_DeploymentId_UserId] ON [dbo].[Ejecuciones]
+    (
+        [DeploymentId] ASC,
+        [UserId] ASC
+    );
+    PRINT 'Index UQ_Ejecuciones_DeploymentId_UserId created';
+END
+GO
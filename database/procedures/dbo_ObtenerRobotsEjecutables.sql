@@ -222,7 +222,9 @@ BEGIN
         Eq.Equipo,
         Ord.UserId,
         Eq.UserName,
-        Ord.Hora
+        Ord.Hora,
+        Ord.EsProgramado,
+        Ord.PrioridadBalanceo  -- El Lanzador atiende la cola de despliegues por prioridad
     FROM (
         SELECT
             RobotId,
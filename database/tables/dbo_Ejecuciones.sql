@@ -71,9 +71,10 @@ CREATE NONCLUSTERED INDEX [IX_Ejecuciones_RobotId] ON [dbo].[Ejecuciones]
 )WITH (PAD_INDEX = OFF, STATISTICS_NORECOMPUTE = OFF, SORT_IN_TEMPDB = OFF, DROP_EXISTING = OFF, ONLINE = OFF, ALLOW_ROW_LOCKS = ON, ALLOW_PAGE_LOCKS = ON, OPTIMIZE_FOR_SEQUENTIAL_KEY = OFF) ON [PRIMARY]
 SET ANSI_PADDING ON
 
-IF NOT EXISTS (SELECT * FROM sys.indexes WHERE object_id = OBJECT_ID(N'[dbo].[Ejecuciones]') AND name = N'UQ_Ejecuciones_DeploymentId')
-CREATE UNIQUE NONCLUSTERED INDEX [UQ_Ejecuciones_DeploymentId] ON [dbo].[Ejecuciones]
+IF NOT EXISTS (SELECT * FROM sys.indexes WHERE object_id = OBJECT_ID(N'[dbo].[Ejecuciones]') AND name = N'UQ_Ejecuciones_DeploymentId_UserId')
+CREATE UNIQUE NONCLUSTERED INDEX [UQ_Ejecuciones_DeploymentId_UserId] ON [dbo].[Ejecuciones]
 (
-	[DeploymentId] ASC
+	[DeploymentId] ASC,
+	[UserId] ASC
 )WITH (PAD_INDEX = OFF, STATISTICS_NORECOMPUTE = OFF, SORT_IN_TEMPDB = OFF, IGNORE_DUP_KEY = OFF, DROP_EXISTING = OFF, ONLINE = OFF, ALLOW_ROW_LOCKS = ON, ALLOW_PAGE_LOCKS = ON, OPTIMIZE_FOR_SEQUENTIAL_KEY = OFF) ON [PRIMARY]
 GO
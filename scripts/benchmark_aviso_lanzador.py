@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Benchmark del aviso de equipos liberados (LANZADOR_AVISO_HABILITAR): tiempo ocioso de los equipos
+entre el fin de una ejecución y el siguiente despliegue.
+
+Ejecuta el ciclo de lanzamiento real de `LanzadorService` con un desplegador simulado: `--equipos`
+equipos con un robot cíclico cuyas ejecuciones duran entre `--duracion-min-seg` y `--duracion-max-seg`.
+Sin aviso, un equipo liberado espera al siguiente ciclo (`--intervalo-seg`); con aviso, cada fin de
+ejecución se envía por UDP local con `EmisorAvisos`, como hace el Callback, y el Lanzador relanza tras
+`--debounce-ms`. No necesita A360 ni base de datos.
+
+Uso:
+    python scripts/benchmark_aviso_lanzador.py
+    python scripts/benchmark_aviso_lanzador.py --equipos 20 --intervalo-seg 5 --segundos 60
+"""
+
+import argparse
+import asyncio
+import logging
+import random
+import sys
+import time
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Dict, List, Optional, Set
+
+# Añadir src al path
+src_path = str(Path(__file__).resolve().parent.parent / "src")
+sys.path.insert(0, src_path)
+
+from sam.common.aviso_lanzador import EmisorAvisos, ReceptorAvisos  # noqa: E402
+from sam.lanzador.service.main import LanzadorService  # noqa: E402
+from sam.lanzador.service.planificador_despliegues import resumen_latencias  # noqa: E402
+
+
+class DesplegadorSimulado:
+    """Un robot cíclico por equipo: cada despliegue corre un rato y al terminar avisa (si hay emisor)."""
+
+    def __init__(self, equipos: int, duracion: tuple, emisor: Optional[EmisorAvisos]):
+        self._aa_client = SimpleNamespace(set_auth_callbacks=lambda **kwargs: None)
+        self._duracion = duracion
+        self._emisor = emisor
+        self._libre_desde: Dict[int, Optional[float]] = {equipo: time.monotonic() for equipo in range(equipos)}
+        self._tareas: Set[asyncio.Task] = set()
+        self.ocioso: List[float] = []
+
+    async def desplegar_robots_pendientes(self, equipos: Optional[Set[int]] = None):
+        ahora = time.monotonic()
+        resultados = []
+        for equipo, libre_desde in self._libre_desde.items():
+            if libre_desde is None or (equipos is not None and equipo not in equipos):
+                continue
+            self.ocioso.append(ahora - libre_desde)
+            self._libre_desde[equipo] = None
+            tarea = asyncio.create_task(self._ejecutar(equipo))
+            self._tareas.add(tarea)
+            tarea.add_done_callback(self._tareas.discard)
+            resultados.append({"status": "exitoso", "equipo_id": equipo})
+        return resultados
+
+    async def desplegar_equipos_liberados(self, avisos):
+        return await self.desplegar_robots_pendientes({int(deployment_id) for deployment_id, _, _ in avisos})
+
+    async def _ejecutar(self, equipo: int):
+        await asyncio.sleep(random.uniform(*self._duracion))
+        self._libre_desde[equipo] = time.monotonic()
+        if self._emisor:
+            self._emisor.avisar(str(equipo))
+
+    def detener(self):
+        for tarea in self._tareas:
+            tarea.cancel()
+
+
+async def simular(args, con_aviso: bool) -> dict:
+    receptor = emisor = None
+    if con_aviso:
+        receptor = ReceptorAvisos()
+        await receptor.iniciar("127.0.0.1", args.puerto)
+        emisor = EmisorAvisos("127.0.0.1", args.puerto)
+    desplegador = DesplegadorSimulado(args.equipos, (args.duracion_min_seg, args.duracion_max_seg), emisor)
+    sin_uso = SimpleNamespace(_aa_client=SimpleNamespace(cr_user=None, cr_url=None))
+    servicio = LanzadorService(
+        sin_uso,
+        desplegador,
+        sin_uso,
+        notificador=None,
+        cfg_lanzador={"intervalo_lanzamiento": 0, "intervalo_sincronizacion": 0, "intervalo_conciliacion": 0},
+        sync_enabled=False,
+        receptor_avisos=receptor,
+        debounce_avisos_seg=args.debounce_ms / 1000,
+    )
+    ciclo = asyncio.create_task(servicio._run_launcher_cycle(args.intervalo_seg))
+    await asyncio.sleep(args.segundos)
+    servicio.stop()
+    await ciclo
+    desplegador.detener()
+    if receptor:
+        receptor.cerrar()
+        emisor.cerrar()
+    # El primer despliegue de cada equipo no sigue a una ejecución: no cuenta como tiempo ocioso.
+    ocioso = desplegador.ocioso[args.equipos :]
+    return {
+        "despliegues": len(desplegador.ocioso),
+        "ocioso_medio": sum(ocioso) / len(ocioso) if ocioso else 0.0,
+        **resumen_latencias(ocioso),
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--equipos", type=int, default=10)
+    parser.add_argument("--intervalo-seg", type=float, default=3)
+    parser.add_argument("--duracion-min-seg", type=float, default=0.5)
+    parser.add_argument("--duracion-max-seg", type=float, default=2)
+    parser.add_argument("--debounce-ms", type=float, default=100)
+    parser.add_argument("--segundos", type=float, default=20)
+    parser.add_argument("--puerto", type=int, default=18009)
+    parser.add_argument("--semilla", type=int, default=7)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    print(
+        f"{args.equipos} equipos, ejecuciones de {args.duracion_min_seg}-{args.duracion_max_seg}s, "
+        f"ciclo cada {args.intervalo_seg}s, {args.segundos}s simulados"
+    )
+    for nombre, con_aviso in (("Solo ciclo periódico", False), ("Con aviso del Callback", True)):
+        random.seed(args.semilla)
+        r = await simular(args, con_aviso)
+        print(
+            f"  {nombre:<23} {r['despliegues']:4d} despliegues  ocioso medio {r['ocioso_medio']:5.2f}s  "
+            f"p50 {r['p50']}s  p95 {r['p95']}s  máx {r['max']}s"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
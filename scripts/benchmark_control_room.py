@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+Benchmark de carga de SAM contra el Control Room falso (scripts/control_room_falso.py).
+
+Levanta el Control Room falso y un receptor de callbacks locales, y ejecuta con el
+`AutomationAnywhereClient` real la misma carga que generan los servicios:
+  - Lanzador: N deploys v4 con `--concurrencia` deploys simultáneos (como LANZADOR_MAX_WORKERS).
+  - Conciliador: cada `--intervalo-conciliador-seg` consulta el estado de los deployments pendientes.
+  - Sincronización: una ronda de devices, usuarios y robots.
+Informa deploys/seg, latencia de la llamada de deploy, latencia extremo a extremo (deploy -> callback
+y deploy -> estado final visto por el conciliador), duración de la sincronización y cantidad de
+llamadas a la API por endpoint.
+
+Para medir los servicios completos (lanzador, conciliador, callback con su BD), se levanta el Control
+Room falso por separado, se configura `AA_CR_URL=http://localhost:8900` y
+`AA_CALLBACK_URL=http://localhost:8008/api/callback` en el .env, y se leen las llamadas en
+GET /_falso/metricas. Con `--cr-url` este benchmark usa ese Control Room en lugar de levantar uno.
+
+Uso:
+    python scripts/benchmark_control_room.py --deploys 500 --concurrencia 20 --latencia lognormal:120:0.5
+    python scripts/benchmark_control_room.py --deploys 200 --prob-412 0.05 --prob-5xx 0.02 --duracion uniforme:500:3000
+"""
+
+import argparse
+import asyncio
+import logging
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+import uvicorn
+from fastapi import FastAPI, Request
+
+# Añadir src y scripts al path
+src_path = str(Path(__file__).resolve().parent.parent / "src")
+sys.path.insert(0, src_path)
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from control_room_falso import ESTADOS_FINALES, agregar_argumentos, config_desde_argumentos, crear_app  # noqa: E402
+
+from sam.common.a360_client import AutomationAnywhereClient  # noqa: E402
+
+CALLBACK_TOKEN = "benchmark"
+
+
+def percentiles(valores: List[float]) -> str:
+    if not valores:
+        return "sin datos"
+    ordenados = sorted(valores)
+    p = lambda q: ordenados[min(len(ordenados) - 1, int(q * len(ordenados)))]  # noqa: E731
+    return f"p50 {p(0.50):.3f}s | p95 {p(0.95):.3f}s | p99 {p(0.99):.3f}s | max {ordenados[-1]:.3f}s"
+
+
+async def iniciar_servidor(app: FastAPI, puerto: int) -> Tuple[uvicorn.Server, asyncio.Task]:
+    servidor = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=puerto, log_level="warning"))
+    tarea = asyncio.create_task(servidor.serve())
+    while not servidor.started:
+        if tarea.done():
+            tarea.result()
+        await asyncio.sleep(0.05)
+    return servidor, tarea
+
+
+async def detener_servidor(servidor: Optional[Tuple[uvicorn.Server, asyncio.Task]]):
+    if servidor is not None:
+        servidor[0].should_exit = True
+        await servidor[1]
+
+
+def crear_receptor_callbacks(llegadas: Dict[str, float]) -> FastAPI:
+    """Receptor mínimo de callbacks: registra cuándo llega el de cada deployment."""
+    app = FastAPI()
+
+    @app.post("/api/callback")
+    async def recibir(request: Request):
+        cuerpo = await request.json()
+        llegadas.setdefault(cuerpo.get("deploymentId"), time.monotonic())
+        return {"status": "OK", "message": "Callback recibido"}
+
+    return app
+
+
+async def ejecutar(args: argparse.Namespace):
+    llegadas_callback: Dict[str, float] = {}
+    servidor_cr = servidor_callbacks = None
+    cr_url = args.cr_url
+    if not cr_url:
+        # Un Control Room externo no se reinicia: puede estar atendiendo también a los servicios.
+        servidor_cr = await iniciar_servidor(crear_app(config_desde_argumentos(args)), args.puerto_cr)
+        cr_url = f"http://127.0.0.1:{args.puerto_cr}"
+    callback_url = args.callback_url_sam
+    if not callback_url:
+        servidor_callbacks = await iniciar_servidor(crear_receptor_callbacks(llegadas_callback), args.puerto_callback)
+        callback_url = f"http://127.0.0.1:{args.puerto_callback}/api/callback"
+
+    aa_client = AutomationAnywhereClient(
+        cr_url=cr_url,
+        cr_user="benchmark",
+        cr_api_key="benchmark",
+        cr_api_timeout=args.timeout_api_seg,
+        callback_url_deploy=callback_url,
+        list_cache_ttl=args.cache_listados_ttl,
+    )
+    lanzados: Dict[str, float] = {}
+    finales_conciliador: Dict[str, float] = {}
+    latencias_deploy: List[float] = []
+    fallidos: Counter = Counter()
+    try:
+        # --- Sincronización ---
+        inicio = time.perf_counter()
+        devices, usuarios, robots = await asyncio.gather(
+            aa_client.obtener_devices(), aa_client.obtener_usuarios_detallados(), aa_client.obtener_robots()
+        )
+        duracion_sync = time.perf_counter() - inicio
+        user_ids = [u["id"] for u in usuarios] or [1]
+        robot_ids = [r["RobotId"] for r in robots] or [1]
+
+        # --- Lanzador + Conciliador ---
+        semaforo = asyncio.Semaphore(args.concurrencia)
+        fin_deploys = asyncio.Event()
+
+        async def desplegar(i: int):
+            async with semaforo:
+                inicio_deploy = time.monotonic()
+                try:
+                    resultado = await aa_client.desplegar_bot_v4(
+                        robot_ids[i % len(robot_ids)],
+                        [user_ids[i % len(user_ids)]],
+                        callback_auth_headers={"X-Authorization": CALLBACK_TOKEN},
+                    )
+                except httpx.HTTPStatusError as e:
+                    fallidos[f"HTTP {e.response.status_code}"] += 1
+                    return
+                except httpx.HTTPError as e:
+                    fallidos[type(e).__name__] += 1
+                    return
+                latencias_deploy.append(time.monotonic() - inicio_deploy)
+                lanzados[resultado["deploymentId"]] = inicio_deploy
+
+        async def conciliar():
+            limite = None
+            while True:
+                pendientes = [d for d in lanzados if d not in finales_conciliador]
+                if pendientes:
+                    detalles = await aa_client.obtener_detalles_por_deployment_ids(pendientes)
+                    ahora = time.monotonic()
+                    for detalle in detalles:
+                        if detalle.get("status") in ESTADOS_FINALES:
+                            finales_conciliador.setdefault(detalle["deploymentId"], ahora)
+                if fin_deploys.is_set():
+                    limite = limite or time.monotonic() + args.espera_max_seg
+                    if len(finales_conciliador) >= len(lanzados) or time.monotonic() >= limite:
+                        return
+                await asyncio.sleep(args.intervalo_conciliador_seg)
+
+        tarea_conciliador = asyncio.create_task(conciliar())
+        inicio = time.perf_counter()
+        await asyncio.gather(*(desplegar(i) for i in range(args.deploys)))
+        duracion_deploys = time.perf_counter() - inicio
+        fin_deploys.set()
+        await tarea_conciliador
+        # Margen para los callbacks que llegan después del último ciclo del conciliador
+        limite = time.monotonic() + min(args.espera_max_seg, 5)
+        while servidor_callbacks and len(llegadas_callback) < len(lanzados) and time.monotonic() < limite:
+            await asyncio.sleep(0.1)
+
+        async with httpx.AsyncClient(base_url=cr_url) as cliente_metricas:
+            metricas_cr = (await cliente_metricas.get("/_falso/metricas")).json()
+    finally:
+        await aa_client.close()
+        await detener_servidor(servidor_callbacks)
+        await detener_servidor(servidor_cr)
+
+    e2e_callback = [llegadas_callback[d] - t for d, t in lanzados.items() if d in llegadas_callback]
+    e2e_conciliador = [finales_conciliador[d] - t for d, t in lanzados.items() if d in finales_conciliador]
+    print(
+        f"\nSincronización: {len(devices)} devices, {len(usuarios)} usuarios, {len(robots)} robots en {duracion_sync:.2f}s"
+    )
+    print(f"Deploys: {len(lanzados)} OK, {sum(fallidos.values())} fallidos {dict(fallidos) or ''}")
+    print(
+        f"  {len(lanzados) / duracion_deploys:.1f} deploys/seg ({duracion_deploys:.2f}s, concurrencia {args.concurrencia})"
+    )
+    print(f"  Llamada de deploy:            {percentiles(latencias_deploy)}")
+    if servidor_callbacks:
+        print(f"  Deploy -> callback ({len(e2e_callback):>5}):   {percentiles(e2e_callback)}")
+    print(f"  Deploy -> conciliador ({len(e2e_conciliador):>5}): {percentiles(e2e_conciliador)}")
+    print("\nLlamadas a la API por endpoint:")
+    for endpoint, cantidad in sorted(metricas_cr["llamadas"].items()):
+        print(f"  {endpoint:<58} {cantidad:>7}")
+    respuestas_error = {k: v for k, v in metricas_cr["status"].items() if not k.endswith(" 200")}
+    if respuestas_error:
+        print(f"Respuestas con error: {respuestas_error}")
+    print(f"Callbacks enviados por el Control Room: {metricas_cr['callbacks']}")
+    print(f"Concurrencia del cliente: {aa_client.obtener_metricas_concurrencia()}")
+    print(f"Listados del cliente: {aa_client.obtener_metricas_listados()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--deploys", type=int, default=200)
+    parser.add_argument("--concurrencia", type=int, default=10, help="Deploys simultáneos")
+    parser.add_argument("--intervalo-conciliador-seg", type=float, default=2.0)
+    parser.add_argument("--espera-max-seg", type=float, default=60, help="Espera máxima de estados finales")
+    parser.add_argument("--timeout-api-seg", type=float, default=30)
+    parser.add_argument("--cache-listados-ttl", type=float, default=0)
+    parser.add_argument("--cr-url", default=None, help="Usar un Control Room falso ya levantado")
+    parser.add_argument("--puerto-cr", type=int, default=8900)
+    parser.add_argument("--puerto-callback", type=int, default=8909)
+    parser.add_argument(
+        "--callback-url-sam",
+        default=None,
+        help="Enviar los callbacks al servicio de callback de SAM en lugar del receptor local",
+    )
+    agregar_argumentos(parser)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+    asyncio.run(ejecutar(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Benchmark del despliegue agrupado del Lanzador (LANZADOR_DEPLOY_AGRUPADO) contra el Control Room falso.
+
+Ejecuta el `Desplegador` real con el `AutomationAnywhereClient` real contra scripts/control_room_falso.py
+y una BD en memoria (sin SQL Server) que devuelve `--robots-desplegar` robots asignados a `--equipos-por-robot`
+equipos cada uno. Compara un ciclo con despliegue individual (una llamada v4 por equipo) y otro con
+despliegue agrupado (una llamada por robot): llamadas a /v4/automations/deploy, duración del ciclo y
+ejecuciones registradas. Con `--prob-412` se ve el fallback: un grupo que falla se despliega de a uno.
+
+Uso:
+    python scripts/benchmark_despliegue_agrupado.py
+    python scripts/benchmark_despliegue_agrupado.py --robots-desplegar 20 --equipos-por-robot 20 --latencia lognormal:300:0.5
+"""
+
+import argparse
+import asyncio
+import logging
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+import httpx
+
+# Añadir src y scripts al path
+src_path = str(Path(__file__).resolve().parent.parent / "src")
+sys.path.insert(0, src_path)
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from control_room_falso import agregar_argumentos, config_desde_argumentos, crear_app  # noqa: E402
+
+from sam.common.a360_client import AutomationAnywhereClient  # noqa: E402
+from sam.lanzador.service.desplegador import Desplegador  # noqa: E402
+
+ENDPOINT_DEPLOY = "POST /v4/automations/deploy"
+
+
+class BDEnMemoria:
+    """Lo mínimo de DatabaseConnector que usa el Desplegador, con la unicidad (DeploymentId, UserId)."""
+
+    _pool_max_size = 10
+
+    def __init__(self, filas: List[Dict[str, Any]]):
+        self.filas = filas
+        self.ejecuciones: Dict[tuple, Dict[str, Any]] = {}
+
+    def obtener_robots_ejecutables(self):
+        return list(self.filas)
+
+    def ejecutar_consulta(self, *args, **kwargs):
+        return []
+
+    def insertar_registro_ejecucion(self, id_despliegue, db_robot_id, db_equipo_id, a360_user_id, **kwargs):
+        clave = (id_despliegue, a360_user_id)
+        if clave in self.ejecuciones:
+            raise ValueError(f"Violación de UQ_Ejecuciones_DeploymentId_UserId: {clave}")
+        self.ejecuciones[clave] = {"RobotId": db_robot_id, "EquipoId": db_equipo_id, **kwargs}
+
+
+class GatewayFalso:
+    async def get_auth_header(self):
+        return {"Authorization": "Bearer benchmark"}
+
+
+class NotificadorSilencioso:
+    def send_alert_v2(self, context):
+        return True
+
+
+async def ciclo(args: argparse.Namespace, agrupado: bool) -> Dict[str, Any]:
+    app = crear_app(config_desde_argumentos(args))
+    aa_client = AutomationAnywhereClient(
+        cr_url="http://control-room-falso", cr_user="benchmark", cr_api_key="benchmark", cr_api_timeout=60
+    )
+    # El cliente real habla con el Control Room falso en proceso, sin sockets
+    await aa_client._client.aclose()
+    aa_client._client = httpx.AsyncClient(base_url="http://control-room-falso", transport=httpx.ASGITransport(app=app))
+
+    filas = [
+        {
+            "RobotId": 3000 + r,
+            "Robot": f"ROBOT_{r}",
+            "EquipoId": 1000 + u,
+            "Equipo": f"EQUIPO-{u:04d}",
+            "UserId": 2000 + u,
+        }
+        for r in range(args.robots_desplegar)
+        for u in range(r * args.equipos_por_robot, (r + 1) * args.equipos_por_robot)
+    ]
+    bd = BDEnMemoria(filas)
+    desplegador = Desplegador(
+        db_connector=bd,
+        aa_client=aa_client,
+        api_gateway_client=GatewayFalso(),
+        notificador=NotificadorSilencioso(),
+        cfg_lanzador={
+            "max_workers_lanzador": args.workers,
+            "max_reintentos_deploy": 2,
+            "delay_reintentos_deploy_seg": 0,
+            "deploy_timeout_seg": 0,
+            "deploy_agrupado": agrupado,
+            "repeticiones": 1,
+            "pausa_lanzamiento": (None, None),
+        },
+        callback_token="benchmark",
+    )
+    inicio = time.perf_counter()
+    resultados = await desplegador.desplegar_robots_pendientes()
+    duracion = time.perf_counter() - inicio
+    metricas = app.state.control_room.metricas()
+    await aa_client.close()
+    await app.state.control_room.cerrar()
+    return {
+        "duracion": duracion,
+        "llamadas_deploy": metricas["llamadas"].get(ENDPOINT_DEPLOY, 0),
+        "exitosos": sum(1 for r in resultados if r.get("status") == "exitoso"),
+        "registradas": len(bd.ejecuciones),
+        "ejecuciones_cr": metricas["ejecuciones"],
+        "estadisticas": desplegador.obtener_estadisticas_ciclo(),
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--robots-desplegar", type=int, default=10, help="Robots distintos del ciclo")
+    parser.add_argument("--equipos-por-robot", type=int, default=20)
+    parser.add_argument("--workers", type=int, default=10, help="LANZADOR_MAX_WORKERS")
+    agregar_argumentos(parser)
+    args = parser.parse_args()
+    args.devices = args.usuarios = max(args.devices, args.robots_desplegar * args.equipos_por_robot)
+    logging.basicConfig(level=logging.WARNING)
+
+    print(
+        f"{args.robots_desplegar} robots x {args.equipos_por_robot} equipos, {args.workers} workers, latencia {args.latencia}"
+    )
+    for nombre, agrupado in (("Individual", False), ("Agrupado", True)):
+        r = await ciclo(args, agrupado)
+        print(
+            f"  {nombre:<11} {r['llamadas_deploy']:>5} llamadas de deploy  {r['duracion']:6.2f}s  "
+            f"{r['exitosos']} exitosos, {r['registradas']} ejecuciones registradas, "
+            f"{r['ejecuciones_cr']} en el Control Room"
+        )
+        if agrupado:
+            print(f"  {'':<11} {r['estadisticas'].get('agrupado')}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
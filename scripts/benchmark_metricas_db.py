@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Benchmark del costo de las métricas por sentencia de DatabaseConnector (`sam.common.metricas_db`).
+
+Mide el costo por consulta de la instrumentación completa (`MedicionConsulta` con sus marcas de fase
+y `registrar()`: normalización de la sentencia, histogramas y chequeo de consulta lenta) sobre un
+conjunto de sentencias como las del Lanzador, y lo compara con la duración de una ida y vuelta a
+SQL Server (`--ida-vuelta-ms`). No necesita conexión a la base de datos.
+
+Uso:
+    python scripts/benchmark_metricas_db.py
+    python scripts/benchmark_metricas_db.py --consultas 200000 --ida-vuelta-ms 0.5 1 5
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+# Añadir src al path
+src_path = str(Path(__file__).resolve().parent.parent / "src")
+sys.path.insert(0, src_path)
+
+from sam.common.metricas_db import MedicionConsulta, MetricasConsultas  # noqa: E402
+
+SENTENCIAS = [
+    ("{CALL dbo.ObtenerRobotsEjecutables}", None),
+    ("SELECT DeploymentId, UserId, EquipoId FROM dbo.Ejecuciones WHERE DeploymentId IN (?, ?, ?)", ("a", "b", "c")),
+    ("UPDATE dbo.Ejecuciones SET Estado = ?, FechaActualizacion = GETDATE() WHERE DeploymentId = ?", ("RUN", "d")),
+    (
+        "INSERT INTO dbo.Ejecuciones (DeploymentId, RobotId, EquipoId, UserId, Hora, Estado) VALUES (?, ?, ?, ?, ?, ?)",
+        ("dep-1", 1, 2, 3, None, "DEPLOYED"),
+    ),
+]
+
+
+def medir(consultas: int) -> float:
+    """Segundos por consulta de la instrumentación completa."""
+    metricas = MetricasConsultas()
+    inicio = time.perf_counter()
+    for i in range(consultas):
+        query, params = SENTENCIAS[i % len(SENTENCIAS)]
+        medicion = MedicionConsulta("SQL_SAM", query, params, umbral_lenta_ms=500, metricas=metricas)
+        medicion.marcar_conexion()
+        medicion.marcar_ejecucion()
+        medicion.marcar_lectura(1)
+        medicion.registrar()
+    return (time.perf_counter() - inicio) / consultas
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--consultas", type=int, default=100_000)
+    parser.add_argument("--ida-vuelta-ms", type=float, nargs="+", default=[0.5, 1.0, 5.0])
+    parser.add_argument("--repeticiones", type=int, default=5)
+    args = parser.parse_args()
+
+    costo = min(medir(args.consultas) for _ in range(args.repeticiones))
+    print(f"Instrumentación: {costo * 1e6:.1f} µs por consulta (mejor de {args.repeticiones} x {args.consultas})")
+    for ida_vuelta_ms in args.ida_vuelta_ms:
+        print(f"  Ida y vuelta de {ida_vuelta_ms:4.1f} ms: {costo * 1000 / ida_vuelta_ms:6.2%} de sobrecosto")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Benchmark de la paginación de AutomationAnywhereClient contra un Control Room falso.
+
+El Control Room falso responde cada página de `/v2/usermanagement/users/list` después de una
+latencia fija, así que el tiempo total depende solo de cuántas páginas se piden en serie.
+Compara la paginación en serie (A360 sin total informado) con la concurrente para
+distintas cantidades de páginas. No necesita conexión a A360.
+
+Uso:
+    python scripts/benchmark_paginacion_a360.py
+    python scripts/benchmark_paginacion_a360.py --paginas 10 30 --latencia-ms 150 --concurrencia 4 8
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+# Añadir src al path
+src_path = str(Path(__file__).resolve().parent.parent / "src")
+sys.path.insert(0, src_path)
+
+from sam.common.a360_client import AutomationAnywhereClient  # noqa: E402
+
+TAMANO_PAGINA = 100
+
+
+def crear_control_room(cantidad: int, latencia: float, informar_total: bool):
+    """Handler de httpx.MockTransport que simula el listado paginado de usuarios."""
+    usuarios = [{"id": i, "username": f"usuario_{i:05d}"} for i in range(cantidad)]
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(latencia)
+        page = json.loads(request.content)["page"]
+        cuerpo = {"list": usuarios[page["offset"] : page["offset"] + page["length"]]}
+        if informar_total:
+            cuerpo["page"] = {"offset": page["offset"], "total": cantidad, "totalFilter": cantidad}
+        return httpx.Response(200, json=cuerpo)
+
+    return handler
+
+
+async def medir(paginas: int, latencia: float, concurrencia: int, informar_total: bool) -> float:
+    cantidad = paginas * TAMANO_PAGINA
+    aa_client = AutomationAnywhereClient(
+        cr_url="https://cr-falso",
+        cr_user="benchmark",
+        cr_api_key="benchmark",
+        default_page_size=TAMANO_PAGINA,
+        pagination_concurrency=concurrencia,
+    )
+    aa_client._client = httpx.AsyncClient(
+        base_url="https://cr-falso",
+        transport=httpx.MockTransport(crear_control_room(cantidad, latencia, informar_total)),
+    )
+    aa_client._token = "benchmark"
+    try:
+        inicio = time.perf_counter()
+        usuarios = await aa_client.obtener_usuarios_detallados()
+        duracion = time.perf_counter() - inicio
+    finally:
+        await aa_client.close()
+    assert len(usuarios) == cantidad
+    return duracion
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--paginas", type=int, nargs="+", default=[5, 10, 30, 60])
+    parser.add_argument("--latencia-ms", type=float, default=100)
+    parser.add_argument("--concurrencia", type=int, nargs="+", default=[4, 8])
+    args = parser.parse_args()
+    latencia = args.latencia_ms / 1000
+
+    columnas = ["serie"] + [f"conc={c}" for c in args.concurrencia]
+    print(f"Latencia por página: {args.latencia_ms:.0f} ms, {TAMANO_PAGINA} entidades por página")
+    print(f"{'Páginas':>8} | " + " | ".join(f"{c:>10}" for c in columnas) + " | (segundos)")
+    print("-" * (13 + 13 * len(columnas)))
+    for paginas in args.paginas:
+        tiempos = [await medir(paginas, latencia, 1, informar_total=False)]
+        for concurrencia in args.concurrencia:
+            tiempos.append(await medir(paginas, latencia, concurrencia, informar_total=True))
+        print(f"{paginas:>8} | " + " | ".join(f"{t:>10.2f}" for t in tiempos))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Benchmark del planificador de despliegues del Lanzador con latencias sesgadas.
+
+Compara cuatro esquemas con el mismo límite `--workers`:
+  - Anterior: todas las tareas creadas de entrada y esperadas en tandas con `asyncio.gather`. El límite
+    no se cumple (todas corren a la vez), por eso aparece como la más rápida.
+  - Tandas acotadas: lo que el esquema anterior pretendía; cada tanda espera a su despliegue más lento.
+  - `PlanificadorDespliegues`: cola + `--workers` workers, sin bloqueo por el más lento.
+  - `PlanificadorDespliegues` con reintentos diferidos: los lentos devuelven `ReintentoProgramado` y
+    esperan su demora fuera del pool, como los reintentos 412 del Desplegador.
+Cada despliegue tarda `--latencia-ms`, salvo una fracción `--fraccion-lentos` que simula equipos
+offline con reintentos 412 y tarda `--latencia-lentos-ms`. No necesita A360 ni base de datos.
+
+Uso:
+    python scripts/benchmark_planificador_despliegues.py
+    python scripts/benchmark_planificador_despliegues.py --robots 300 --workers 10 --fraccion-lentos 0.05
+"""
+
+import argparse
+import asyncio
+import random
+import sys
+import time
+from pathlib import Path
+
+# Añadir src al path
+src_path = str(Path(__file__).resolve().parent.parent / "src")
+sys.path.insert(0, src_path)
+
+from sam.lanzador.service.planificador_despliegues import PlanificadorDespliegues, ReintentoProgramado  # noqa: E402
+
+
+async def por_tandas(latencias, max_workers: int) -> dict:
+    """Esquema anterior: tareas creadas de entrada (sin límite real) y esperadas por tandas."""
+    en_curso = maximo = 0
+
+    async def desplegar(latencia):
+        nonlocal en_curso, maximo
+        en_curso += 1
+        maximo = max(maximo, en_curso)
+        await asyncio.sleep(latencia)
+        en_curso -= 1
+
+    inicio = time.perf_counter()
+    tareas = [asyncio.create_task(desplegar(latencia)) for latencia in latencias]
+    for i in range(0, len(tareas), max_workers):
+        await asyncio.gather(*tareas[i : i + max_workers])
+    return {"duracion": time.perf_counter() - inicio, "max_en_curso": maximo}
+
+
+async def tandas_acotadas(latencias, max_workers: int) -> dict:
+    """Tandas de `max_workers` creadas recién al terminar la anterior: respetan el límite."""
+    inicio = time.perf_counter()
+    for i in range(0, len(latencias), max_workers):
+        await asyncio.gather(*(asyncio.sleep(latencia) for latencia in latencias[i : i + max_workers]))
+    return {"duracion": time.perf_counter() - inicio, "max_en_curso": max_workers}
+
+
+async def con_planificador(latencias, max_workers: int, latencia_intento: float = 0) -> dict:
+    """Con `latencia_intento`, los despliegues más lentos se reintentan en diferido en lugar de dormir."""
+    en_curso = maximo = 0
+
+    async def desplegar(latencia, reintento):
+        nonlocal en_curso, maximo
+        en_curso += 1
+        maximo = max(maximo, en_curso)
+        try:
+            if latencia_intento and reintento is None and latencia > latencia_intento:
+                await asyncio.sleep(latencia_intento)
+                return ReintentoProgramado(latencia - 2 * latencia_intento, "412")
+            await asyncio.sleep(latencia_intento or latencia)
+        finally:
+            en_curso -= 1
+
+    inicio = time.perf_counter()
+    planificador = PlanificadorDespliegues(max_workers)
+    async for _ in planificador.procesar(latencias, desplegar, lambda latencia: None):
+        pass
+    return {"duracion": time.perf_counter() - inicio, "max_en_curso": maximo, **planificador.estadisticas()}
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--robots", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=10)
+    parser.add_argument("--latencia-ms", type=float, default=50)
+    parser.add_argument("--latencia-lentos-ms", type=float, default=1000)
+    parser.add_argument("--fraccion-lentos", type=float, default=0.05)
+    parser.add_argument("--semilla", type=int, default=7)
+    args = parser.parse_args()
+
+    random.seed(args.semilla)
+    latencias = [
+        (args.latencia_lentos_ms if random.random() < args.fraccion_lentos else args.latencia_ms) / 1000
+        for _ in range(args.robots)
+    ]
+    print(
+        f"{args.robots} despliegues, {args.workers} workers, {args.fraccion_lentos:.0%} lentos "
+        f"({args.latencia_lentos_ms:.0f} ms) y el resto de {args.latencia_ms:.0f} ms"
+    )
+    cola = await con_planificador(latencias, args.workers)
+    for nombre, resultado in (
+        ("Anterior (sin límite real)", await por_tandas(latencias, args.workers)),
+        ("Tandas acotadas", await tandas_acotadas(latencias, args.workers)),
+        ("Planificador", cola),
+        ("Planificador + reintentos", await con_planificador(latencias, args.workers, args.latencia_ms / 1000)),
+    ):
+        print(
+            f"  {nombre:<27} {resultado['duracion']:6.2f}s  "
+            f"({args.robots / resultado['duracion']:6.1f} deploys/s, máx. en curso {resultado['max_en_curso']})"
+        )
+    print(f"  Espera en cola: {cola['espera_cola_seg']}  Latencia: {cola['latencia_seg']}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Benchmark de la cola de despliegues por prioridad del Lanzador bajo saturación.
+
+Simula un ciclo con más despliegues que workers, en el orden que devuelve ObtenerRobotsEjecutables
+(programados primero, luego por PrioridadBalanceo y hora). Una fracción `--fraccion-offline` de los
+despliegues recibe un 412 en el primer intento y vuelve a la cola tras `--demora-reintento-ms`, como
+los reintentos del Desplegador. Entre los de menor prioridad, un robot concentra `--fraccion-pesado`
+de las filas (un robot con muchos equipos asignados).
+
+Compara, con el mismo límite `--workers`:
+  - FIFO: la cola anterior, por orden de llegada. Un reintento de prioridad alta vuelve al final.
+  - Prioridad: `prioridad` = (programado, PrioridadBalanceo) y turnos por robot (`grupo`).
+Para cada carga (`--cargas`, cantidad de despliegues) muestra la espera en cola p50/p95 de la
+prioridad alta (incluida la de sus reintentos) y, entre los robots de prioridad baja, la espera
+máxima hasta su primer despliegue (cuánto demora el robot pesado a los demás). No necesita A360 ni BD.
+
+Uso:
+    python scripts/benchmark_prioridad_despliegues.py
+    python scripts/benchmark_prioridad_despliegues.py --cargas 100 400 1600 --workers 10 --fraccion-alta 0.1
+"""
+
+import argparse
+import asyncio
+import random
+import sys
+import time
+from pathlib import Path
+
+# Añadir src al path
+src_path = str(Path(__file__).resolve().parent.parent / "src")
+sys.path.insert(0, src_path)
+
+from sam.lanzador.service.planificador_despliegues import (  # noqa: E402
+    PlanificadorDespliegues,
+    ReintentoProgramado,
+    resumen_latencias,
+)
+
+
+def generar_filas(cantidad: int, args) -> list:
+    """Filas con (prioridad, robot, offline), ordenadas como las devuelve el SP."""
+    filas = []
+    for i in range(cantidad):
+        if random.random() < args.fraccion_alta:
+            prioridad, robot = (0, 1), f"alta-{random.randrange(5)}"
+        elif random.random() < args.fraccion_pesado:
+            prioridad, robot = (1, 100), "pesado"
+        else:
+            prioridad, robot = (1, 100), f"baja-{random.randrange(20)}"
+        filas.append({"prioridad": prioridad, "robot": robot, "offline": random.random() < args.fraccion_offline})
+    # El robot pesado tiene las horas más tempranas: en FIFO ocupa el pool antes que los demás de su prioridad
+    return sorted(filas, key=lambda fila: (fila["prioridad"], fila["robot"] != "pesado"))
+
+
+async def ejecutar(filas: list, args, con_prioridad: bool) -> dict:
+    latencia, demora = args.latencia_ms / 1000, args.demora_reintento_ms / 1000
+    esperas_alta, primer_despliegue = [], {}
+    inicio = time.monotonic()
+
+    async def desplegar(fila, reintento):
+        if fila["prioridad"][0] == 0:
+            esperas_alta.append(time.monotonic() - fila["encolado_en"])
+        await asyncio.sleep(latencia)
+        if fila["offline"] and reintento is None:
+            fila["encolado_en"] = time.monotonic() + demora
+            return ReintentoProgramado(demora, "412")
+        primer_despliegue.setdefault(fila["robot"], time.monotonic() - inicio)
+
+    for fila in filas:
+        fila["encolado_en"] = inicio
+    planificador = PlanificadorDespliegues(args.workers)
+    opciones = {"prioridad": lambda f: f["prioridad"], "grupo": lambda f: f["robot"]} if con_prioridad else {}
+    async for _ in planificador.procesar(filas, desplegar, lambda fila: None, **opciones):
+        pass
+    baja = [t for robot, t in primer_despliegue.items() if not robot.startswith("alta")]
+    return {
+        "duracion": time.monotonic() - inicio,
+        "espera_alta": resumen_latencias(esperas_alta),
+        "primer_despliegue_baja_max": max(baja) if baja else 0.0,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cargas", type=int, nargs="+", default=[100, 300, 900])
+    parser.add_argument("--workers", type=int, default=10)
+    parser.add_argument("--latencia-ms", type=float, default=20)
+    parser.add_argument("--demora-reintento-ms", type=float, default=100)
+    parser.add_argument("--fraccion-alta", type=float, default=0.1)
+    parser.add_argument("--fraccion-pesado", type=float, default=0.6)
+    parser.add_argument("--fraccion-offline", type=float, default=0.1)
+    parser.add_argument("--semilla", type=int, default=7)
+    args = parser.parse_args()
+
+    print(
+        f"{args.workers} workers, despliegues de {args.latencia_ms:.0f} ms, {args.fraccion_alta:.0%} de prioridad "
+        f"alta, {args.fraccion_offline:.0%} con reintento 412 a los {args.demora_reintento_ms:.0f} ms"
+    )
+    print(f"  {'Carga':>6} {'Cola':<10} {'Duración':>9} {'Alta p50':>9} {'Alta p95':>9} {'1.º baja máx':>13}")
+    for carga in args.cargas:
+        random.seed(args.semilla)
+        filas = generar_filas(carga, args)
+        for nombre, con_prioridad in (("FIFO", False), ("Prioridad", True)):
+            resultado = await ejecutar([dict(fila) for fila in filas], args, con_prioridad)
+            print(
+                f"  {carga:>6} {nombre:<10} {resultado['duracion']:8.2f}s "
+                f"{resultado['espera_alta']['p50'] or 0:8.3f}s {resultado['espera_alta']['p95'] or 0:8.3f}s "
+                f"{resultado['primer_despliegue_baja_max']:12.2f}s"
+            )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
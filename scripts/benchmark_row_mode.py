@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Benchmark de los formatos de fila (`RowMode`) de DatabaseConnector.
+
+Mide tiempo y memoria de materializar N filas sintéticas (con la forma típica de un
+result set de Ejecuciones) en cada formato. No necesita conexión a la base de datos.
+
+Uso:
+    python scripts/benchmark_row_mode.py
+    python scripts/benchmark_row_mode.py --filas 10000 100000
+"""
+
+import argparse
+import gc
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Añadir src al path
+src_path = str(Path(__file__).resolve().parent.parent / "src")
+sys.path.insert(0, src_path)
+
+from sam.common.database import RowMode, materializar_filas  # noqa: E402
+
+COLUMNAS = ["EjecucionId", "DeploymentId", "Robot", "Equipo", "Estado", "FechaInicio", "DuracionMinutos"]
+ESTADOS = ["COMPLETED", "RUN_FAILED", "RUNNING", "DEPLOYED", "QUEUED"]
+
+
+def generar_filas(cantidad: int) -> list:
+    """
+    Genera filas como las que devuelve pyodbc. Se usan listas (no tuplas) para que, igual que con
+    pyodbc.Row, el modo TUPLE tenga que copiar cada fila.
+    """
+    base = datetime(2026, 1, 1)
+    return [
+        [
+            i,
+            f"dep-{i:08d}",
+            f"Robot_{i % 50}",
+            f"EQUIPO-{i % 200:03d}",
+            ESTADOS[i % len(ESTADOS)],
+            base + timedelta(minutes=i),
+            (i % 90) * 1.5,
+        ]
+        for i in range(cantidad)
+    ]
+
+
+def medir(filas: list, row_mode: RowMode):
+    """Devuelve (segundos, bytes retenidos). El tiempo se mide sin tracemalloc para no distorsionarlo."""
+    gc.collect()
+    inicio = time.perf_counter()
+    resultado = materializar_filas(COLUMNAS, filas, row_mode)
+    duracion = time.perf_counter() - inicio
+    del resultado
+
+    gc.collect()
+    tracemalloc.start()
+    resultado = materializar_filas(COLUMNAS, filas, row_mode)
+    memoria, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del resultado
+    return duracion, memoria
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--filas", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    args = parser.parse_args()
+
+    print(f"{'Filas':>10} | {'Modo':<8} | {'Tiempo (ms)':>12} | {'Memoria (MB)':>12} | {'vs dict':>8}")
+    print("-" * 64)
+    for cantidad in args.filas:
+        filas = generar_filas(cantidad)
+        memoria_dict = None
+        for row_mode in RowMode:
+            duracion, memoria = medir(filas, row_mode)
+            if row_mode is RowMode.DICT:
+                memoria_dict = memoria
+            relacion = f"{memoria / memoria_dict:.2f}x" if memoria_dict else "-"
+            print(
+                f"{cantidad:>10,} | {row_mode.value:<8} | {duracion * 1000:>12.1f} | "
+                f"{memoria / 1024 / 1024:>12.1f} | {relacion:>8}"
+            )
+        print("-" * 64)
+
+
+if __name__ == "__main__":
+    main()
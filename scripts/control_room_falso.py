@@ -0,0 +1,482 @@
+#!/usr/bin/env python3
+"""
+Control Room de A360 falso para pruebas de carga y latencia de SAM, sin tocar el Control Room real.
+
+Implementa los endpoints que usa `AutomationAnywhereClient`:
+    POST /v2/authentication                              token con vida útil configurable
+    POST /v3/activity/list                               ejecuciones (filtros eq/or/and/substring, paginado)
+    POST /v3/automations/deploy, /v4/automations/deploy  crea un deployment y programa su callback
+    POST /v3/activity/manage                             stop_executions
+    POST /v2/devices/list, /v2/usermanagement/users/list, /v2/repository/workspaces/public/files/list
+    POST /v2/devices/reset, PUT /v1/activity/auditunknown
+
+Cada deployment pasa por DEPLOYED -> RUNNING -> COMPLETED/RUN_FAILED según los tiempos configurados y,
+al terminar, se envía el callback a la URL de `callbackInfo` del deploy (con sus headers), como A360.
+
+Latencias: `fija:MS`, `uniforme:MIN_MS:MAX_MS` o `lognormal:MEDIANA_MS:SIGMA`, global o por endpoint
+(`--latencia-endpoint /v4/automations/deploy=lognormal:400:0.6`).
+Errores inyectados (probabilidad por petición): 401 por token expirado, 412 en deploys, 5xx y
+timeouts (la respuesta se demora `--timeout-seg`).
+
+Métricas: GET /_falso/metricas (llamadas por endpoint y status, ejecuciones por estado, callbacks).
+Un deploy con varios `runAsUserIds` crea un deployment con una ejecución y un callback por usuario.
+Reinicio del estado: POST /_falso/reiniciar.
+
+Uso:
+    python scripts/control_room_falso.py --puerto 8900 --latencia lognormal:80:0.5 --prob-412 0.02
+    # y en el .env de los servicios: AA_CR_URL=http://localhost:8900
+"""
+
+import argparse
+import asyncio
+import math
+import random
+import time
+import uuid
+from collections import Counter
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+import httpx
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+ESTADOS_FINALES = {"COMPLETED", "RUN_FAILED", "RUN_ABORTED"}
+
+
+class DistribucionLatencia:
+    """Muestra latencias (en segundos) a partir de una especificación `tipo:parámetros` en milisegundos."""
+
+    def __init__(self, especificacion: str = "fija:0"):
+        tipo, _, parametros = especificacion.partition(":")
+        valores = [float(v) for v in parametros.split(":") if v]
+        if tipo == "fija" and len(valores) == 1:
+            self._muestra = lambda: valores[0]
+        elif tipo == "uniforme" and len(valores) == 2:
+            self._muestra = lambda: random.uniform(valores[0], valores[1])
+        elif tipo == "lognormal" and len(valores) == 2:
+            self._muestra = lambda: random.lognormvariate(math.log(max(valores[0], 0.001)), valores[1])
+        else:
+            raise ValueError(f"Distribución de latencia inválida: '{especificacion}'.")
+        self.especificacion = especificacion
+
+    def muestra(self) -> float:
+        return max(0.0, self._muestra()) / 1000
+
+
+@dataclass
+class ConfigControlRoomFalso:
+    latencia: DistribucionLatencia = field(default_factory=DistribucionLatencia)
+    latencias_endpoint: Dict[str, DistribucionLatencia] = field(default_factory=dict)
+    token_vida_seg: float = 1200
+    prob_401: float = 0.0
+    prob_412: float = 0.0
+    prob_5xx: float = 0.0
+    prob_timeout: float = 0.0
+    timeout_seg: float = 120
+    arranque: DistribucionLatencia = field(default_factory=lambda: DistribucionLatencia("fija:500"))
+    duracion: DistribucionLatencia = field(default_factory=lambda: DistribucionLatencia("fija:2000"))
+    prob_fallo_ejecucion: float = 0.0
+    cantidad_devices: int = 50
+    cantidad_usuarios: int = 50
+    cantidad_robots: int = 200
+    callback_url: Optional[str] = None
+    callback_token: Optional[str] = None
+
+
+class ControlRoomFalso:
+    """Estado del Control Room falso: tokens, entidades, deployments y contadores."""
+
+    def __init__(self, config: ConfigControlRoomFalso):
+        self.config = config
+        self._cliente_callbacks: Optional[httpx.AsyncClient] = None
+        self._tareas_callback: set = set()
+        self.reiniciar()
+
+    def reiniciar(self):
+        for tarea in self._tareas_callback:
+            tarea.cancel()
+        self._tareas_callback = set()
+        self.tokens: Dict[str, float] = {}
+        # deploymentId -> ejecuciones (una por usuario de runAsUserIds, como en A360)
+        self.deployments: Dict[str, List[Dict[str, Any]]] = {}
+        self.llamadas: Counter = Counter()
+        self.status: Counter = Counter()
+        self.errores_inyectados: Counter = Counter()
+        self.callbacks: Counter = Counter()
+        self.latencias_callback: List[float] = []
+        n_dev, n_usr = self.config.cantidad_devices, self.config.cantidad_usuarios
+        self.devices = [
+            {
+                "id": 1000 + i,
+                "hostName": f"EQUIPO-{i:04d}",
+                "status": "CONNECTED",
+                "defaultUsers": [{"id": 2000 + i}] if i < n_usr else [],
+            }
+            for i in range(n_dev)
+        ]
+        self.usuarios = [
+            {
+                "id": 2000 + i,
+                "username": f"usuario_{i:04d}",
+                "email": f"usuario_{i:04d}@falso.local",
+                "licenseFeatures": ["RUNTIME"],
+                "disabled": False,
+            }
+            for i in range(n_usr)
+        ]
+        self.robots = [
+            {
+                "id": 3000 + i,
+                "name": f"P{i:04d}0_ROBOT_FALSO",
+                "description": "Robot del Control Room falso",
+                "path": f"Automation Anywhere\\Bots\\RPA\\P{i:04d}0_ROBOT_FALSO",
+                "type": "application/vnd.aa.taskbot",
+            }
+            for i in range(self.config.cantidad_robots)
+        ]
+
+    # --- Autenticación y errores inyectados ---
+
+    def emitir_token(self) -> str:
+        token = uuid.uuid4().hex
+        self.tokens[token] = time.monotonic()
+        return token
+
+    def token_valido(self, token: Optional[str]) -> bool:
+        emitido_en = self.tokens.get(token or "")
+        if emitido_en is None:
+            return False
+        if time.monotonic() - emitido_en >= self.config.token_vida_seg or random.random() < self.config.prob_401:
+            del self.tokens[token]
+            return False
+        return True
+
+    def latencia(self, endpoint: str) -> float:
+        return self.config.latencias_endpoint.get(endpoint, self.config.latencia).muestra()
+
+    async def inyectar_error(self, endpoint: str) -> Optional[JSONResponse]:
+        """Espera la latencia simulada y, según las probabilidades configuradas, devuelve un error."""
+        await asyncio.sleep(self.latencia(endpoint))
+        if random.random() < self.config.prob_timeout:
+            self.errores_inyectados["timeout"] += 1
+            await asyncio.sleep(self.config.timeout_seg)
+            return JSONResponse({"message": "Gateway timeout (simulado)"}, status_code=504)
+        if random.random() < self.config.prob_5xx:
+            codigo = random.choice([500, 502, 503])
+            self.errores_inyectados[str(codigo)] += 1
+            return JSONResponse({"message": f"Error {codigo} (simulado)"}, status_code=codigo)
+        return None
+
+    # --- Deployments ---
+
+    def ejecuciones(self) -> List[Dict[str, Any]]:
+        return [ejecucion for ejecuciones in self.deployments.values() for ejecucion in ejecuciones]
+
+    def crear_deployment(self, bot_id: int, user_ids: List[int], callback_info: Optional[Dict]) -> str:
+        """Crea un deployment con una ejecución (y un callback) por usuario."""
+        deployment_id = str(uuid.uuid4())
+        ahora = time.time()
+        url = self.config.callback_url or (callback_info or {}).get("url")
+        headers = dict((callback_info or {}).get("headers") or {})
+        if self.config.callback_token:
+            headers["X-Authorization"] = self.config.callback_token
+        self.deployments[deployment_id] = []
+        for user_id in user_ids or [None]:
+            inicio = ahora + self.config.arranque.muestra()
+            device = self.devices[(user_id - 2000) % len(self.devices)] if user_id and self.devices else {}
+            ejecucion = {
+                "id": uuid.uuid4().hex,
+                "deploymentId": deployment_id,
+                "fileId": bot_id,
+                "userId": user_id,
+                "deviceId": device.get("id"),
+                "creado_en": ahora,
+                "inicio": inicio,
+                "fin": inicio + self.config.duracion.muestra(),
+                "estado_final": "RUN_FAILED" if random.random() < self.config.prob_fallo_ejecucion else "COMPLETED",
+                "detenido_en": None,
+            }
+            self.deployments[deployment_id].append(ejecucion)
+            if url:
+                tarea = asyncio.create_task(self._enviar_callback(ejecucion, url, headers))
+                self._tareas_callback.add(tarea)
+                tarea.add_done_callback(self._tareas_callback.discard)
+        return deployment_id
+
+    def estado(self, deployment: Dict[str, Any], ahora: Optional[float] = None) -> str:
+        ahora = ahora or time.time()
+        if deployment["detenido_en"] is not None:
+            return "RUN_ABORTED"
+        if ahora >= deployment["fin"]:
+            return deployment["estado_final"]
+        if ahora >= deployment["inicio"]:
+            return "RUNNING"
+        return "DEPLOYED"
+
+    def actividad(self, deployment: Dict[str, Any]) -> Dict[str, Any]:
+        estado = self.estado(deployment)
+        iso = lambda t: time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(t)) + "Z"  # noqa: E731
+        fin = deployment["detenido_en"] or deployment["fin"]
+        return {
+            "id": deployment["id"],
+            "deploymentId": deployment["deploymentId"],
+            "status": estado,
+            "fileId": deployment["fileId"],
+            "userId": deployment["userId"],
+            "deviceId": deployment["deviceId"],
+            "startDateTime": iso(deployment["inicio"]) if estado != "DEPLOYED" else None,
+            "endDateTime": iso(fin) if estado in ESTADOS_FINALES else None,
+        }
+
+    async def _enviar_callback(self, deployment: Dict[str, Any], url: str, headers: Dict[str, str]):
+        await asyncio.sleep(max(0.0, deployment["fin"] - time.time()))
+        if deployment["detenido_en"] is not None:
+            return
+        if self._cliente_callbacks is None:
+            self._cliente_callbacks = httpx.AsyncClient(timeout=30)
+        payload = {
+            "deploymentId": deployment["deploymentId"],
+            "status": deployment["estado_final"],
+            "deviceId": str(deployment["deviceId"]) if deployment["deviceId"] else None,
+            "userId": str(deployment["userId"]) if deployment["userId"] else None,
+            "botOutput": {},
+        }
+        try:
+            response = await self._cliente_callbacks.post(url, json=payload, headers=headers)
+            self.callbacks[f"http_{response.status_code}"] += 1
+        except httpx.HTTPError as e:
+            self.callbacks[type(e).__name__] += 1
+        self.latencias_callback.append(time.time() - deployment["creado_en"])
+
+    async def cerrar(self):
+        for tarea in list(self._tareas_callback):
+            tarea.cancel()
+        await asyncio.gather(*self._tareas_callback, return_exceptions=True)
+        if self._cliente_callbacks is not None:
+            await self._cliente_callbacks.aclose()
+            self._cliente_callbacks = None
+
+    def metricas(self) -> Dict[str, Any]:
+        ejecuciones = self.ejecuciones()
+        estados = Counter(self.estado(d) for d in ejecuciones)
+        return {
+            "llamadas": dict(self.llamadas),
+            "status": dict(self.status),
+            "errores_inyectados": dict(self.errores_inyectados),
+            "deployments": len(self.deployments),
+            "ejecuciones": len(ejecuciones),
+            "deployments_por_estado": dict(estados),
+            "callbacks": dict(self.callbacks),
+            "tokens_emitidos": self.llamadas.get("POST /v2/authentication", 0),
+        }
+
+
+def cumple_filtro(entidad: Dict[str, Any], filtro: Optional[Dict[str, Any]]) -> bool:
+    """Evalúa los operadores de filtro de la API de A360 que usa SAM (eq, substring, and, or)."""
+    if not filtro:
+        return True
+    operador = filtro.get("operator")
+    if operador == "and":
+        return all(cumple_filtro(entidad, f) for f in filtro.get("operands", []))
+    if operador == "or":
+        return any(cumple_filtro(entidad, f) for f in filtro.get("operands", []))
+    valor = entidad.get(filtro.get("field"))
+    if operador == "eq":
+        return str(valor) == str(filtro.get("value"))
+    if operador == "substring":
+        return str(filtro.get("value")) in str(valor or "")
+    return True
+
+
+def paginar(entidades: List[Dict[str, Any]], cuerpo: Dict[str, Any], total: int) -> Dict[str, Any]:
+    pagina = cuerpo.get("page") or {}
+    offset, largo = int(pagina.get("offset", 0)), int(pagina.get("length", 100))
+    return {
+        "list": entidades[offset : offset + largo],
+        "page": {"offset": offset, "total": total, "totalFilter": len(entidades)},
+    }
+
+
+def crear_app(config: Optional[ConfigControlRoomFalso] = None) -> FastAPI:
+    control_room = ControlRoomFalso(config or ConfigControlRoomFalso())
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        yield
+        await control_room.cerrar()
+
+    app = FastAPI(title="Control Room A360 falso", lifespan=lifespan)
+    app.state.control_room = control_room
+
+    @app.middleware("http")
+    async def contar_llamadas(request: Request, call_next):
+        if request.url.path.startswith("/_falso"):
+            return await call_next(request)
+        endpoint = f"{request.method} {request.url.path}"
+        control_room.llamadas[endpoint] += 1
+        if request.url.path != "/v2/authentication":
+            if not control_room.token_valido(request.headers.get("X-Authorization")):
+                control_room.status[f"{endpoint} 401"] += 1
+                return JSONResponse({"message": "Token inválido o expirado"}, status_code=401)
+            error = await control_room.inyectar_error(request.url.path)
+            if error is not None:
+                control_room.status[f"{endpoint} {error.status_code}"] += 1
+                return error
+        response = await call_next(request)
+        control_room.status[f"{endpoint} {response.status_code}"] += 1
+        return response
+
+    @app.post("/v2/authentication")
+    async def autenticar(request: Request):
+        cuerpo = await request.json()
+        await asyncio.sleep(control_room.latencia("/v2/authentication"))
+        if not cuerpo.get("apiKey") and not cuerpo.get("password"):
+            return JSONResponse({"message": "Credenciales inválidas"}, status_code=401)
+        return {"token": control_room.emitir_token()}
+
+    @app.post("/v3/activity/list")
+    async def listar_actividad(request: Request):
+        cuerpo = await request.json()
+        ejecuciones = control_room.ejecuciones()
+        actividades = [
+            actividad
+            for actividad in map(control_room.actividad, ejecuciones)
+            if cumple_filtro(actividad, cuerpo.get("filter"))
+        ]
+        return paginar(actividades, cuerpo, len(ejecuciones))
+
+    def _listado(entidades: Callable[[], List[Dict[str, Any]]]):
+        async def listar(request: Request):
+            cuerpo = await request.json()
+            filtradas = [e for e in entidades() if cumple_filtro(e, cuerpo.get("filter"))]
+            return paginar(filtradas, cuerpo, len(entidades()))
+
+        return listar
+
+    app.post("/v2/devices/list")(_listado(lambda: control_room.devices))
+    app.post("/v2/usermanagement/users/list")(_listado(lambda: control_room.usuarios))
+    app.post("/v2/repository/workspaces/public/files/list")(_listado(lambda: control_room.robots))
+
+    async def _desplegar(bot_id: int, user_ids: List[int], cuerpo: Dict[str, Any]):
+        if random.random() < control_room.config.prob_412:
+            control_room.errores_inyectados["412"] += 1
+            return JSONResponse(
+                {"code": "bot.execution.device.unavailable", "message": "Device no disponible (simulado)"},
+                status_code=412,
+            )
+        return {"deploymentId": control_room.crear_deployment(bot_id, user_ids, cuerpo.get("callbackInfo"))}
+
+    @app.post("/v3/automations/deploy")
+    async def desplegar_v3(request: Request):
+        cuerpo = await request.json()
+        return await _desplegar(cuerpo.get("fileId"), cuerpo.get("runAsUserIds") or [], cuerpo)
+
+    @app.post("/v4/automations/deploy")
+    async def desplegar_v4(request: Request):
+        cuerpo = await request.json()
+        user_ids = (cuerpo.get("unattendedRequest") or {}).get("runAsUserIds") or []
+        return await _desplegar(cuerpo.get("botId"), user_ids, cuerpo)
+
+    @app.post("/v3/activity/manage")
+    async def gestionar_actividad(request: Request):
+        cuerpo = await request.json()
+        errores = []
+        for execution_id in (cuerpo.get("stop_executions") or {}).get("execution_ids", []):
+            activas = [
+                ejecucion
+                for ejecucion in control_room.deployments.get(execution_id, [])
+                if control_room.estado(ejecucion) not in ESTADOS_FINALES
+            ]
+            if not activas:
+                errores.append({"id": execution_id, "error_response": {"message": "Ejecución no activa"}})
+            for ejecucion in activas:
+                ejecucion["detenido_en"] = time.time()
+        return {"manage_action_errors": errores}
+
+    @app.post("/v2/devices/reset")
+    async def resetear_device():
+        return {}
+
+    @app.put("/v1/activity/auditunknown")
+    async def mover_a_historico():
+        return {}
+
+    @app.get("/_falso/metricas")
+    async def metricas():
+        return control_room.metricas()
+
+    @app.post("/_falso/reiniciar")
+    async def reiniciar():
+        control_room.reiniciar()
+        return {"status": "OK"}
+
+    return app
+
+
+def _latencias_endpoint(valores: List[str]) -> Dict[str, DistribucionLatencia]:
+    resultado = {}
+    for valor in valores:
+        endpoint, _, especificacion = valor.partition("=")
+        resultado[endpoint] = DistribucionLatencia(especificacion)
+    return resultado
+
+
+def config_desde_argumentos(args: argparse.Namespace) -> ConfigControlRoomFalso:
+    return ConfigControlRoomFalso(
+        latencia=DistribucionLatencia(args.latencia),
+        latencias_endpoint=_latencias_endpoint(args.latencia_endpoint),
+        token_vida_seg=args.token_vida_seg,
+        prob_401=args.prob_401,
+        prob_412=args.prob_412,
+        prob_5xx=args.prob_5xx,
+        prob_timeout=args.prob_timeout,
+        timeout_seg=args.timeout_seg,
+        arranque=DistribucionLatencia(args.arranque),
+        duracion=DistribucionLatencia(args.duracion),
+        prob_fallo_ejecucion=args.prob_fallo_ejecucion,
+        cantidad_devices=args.devices,
+        cantidad_usuarios=args.usuarios,
+        cantidad_robots=args.robots,
+        callback_url=args.callback_url,
+        callback_token=args.callback_token,
+    )
+
+
+def agregar_argumentos(parser: argparse.ArgumentParser):
+    """Opciones del Control Room falso, compartidas con el benchmark."""
+    grupo = parser.add_argument_group("Control Room falso")
+    grupo.add_argument("--latencia", default="fija:50", help="Latencia de cada respuesta (ej. lognormal:80:0.5)")
+    grupo.add_argument(
+        "--latencia-endpoint", action="append", default=[], help="ENDPOINT=DISTRIBUCION; se puede repetir"
+    )
+    grupo.add_argument("--token-vida-seg", type=float, default=1200)
+    grupo.add_argument("--prob-401", type=float, default=0.0, help="Probabilidad de expirar el token en una petición")
+    grupo.add_argument("--prob-412", type=float, default=0.0, help="Probabilidad de 412 en un deploy")
+    grupo.add_argument("--prob-5xx", type=float, default=0.0)
+    grupo.add_argument("--prob-timeout", type=float, default=0.0)
+    grupo.add_argument("--timeout-seg", type=float, default=120, help="Demora de una respuesta con timeout")
+    grupo.add_argument("--arranque", default="fija:500", help="Tiempo de DEPLOYED a RUNNING")
+    grupo.add_argument("--duracion", default="fija:2000", help="Tiempo de RUNNING a estado final")
+    grupo.add_argument("--prob-fallo-ejecucion", type=float, default=0.0)
+    grupo.add_argument("--devices", type=int, default=50)
+    grupo.add_argument("--usuarios", type=int, default=50)
+    grupo.add_argument("--robots", type=int, default=200)
+    grupo.add_argument("--callback-url", default=None, help="Reemplaza la URL de callbackInfo de los deploys")
+    grupo.add_argument("--callback-token", default=None, help="X-Authorization de los callbacks (CALLBACK_TOKEN)")
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--puerto", type=int, default=8900)
+    agregar_argumentos(parser)
+    args = parser.parse_args()
+    uvicorn.run(crear_app(config_desde_argumentos(args)), host=args.host, port=args.puerto, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
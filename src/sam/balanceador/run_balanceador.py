@@ -25,6 +25,7 @@ from sam.common.config_manager import ConfigManager
 from sam.common.database import DatabaseConnector
 from sam.common.logging_setup import setup_logging
 from sam.common.mail_client import EmailAlertClient
+from sam.common.metricas_db import VolcadoPeriodico, iniciar_volcado_periodico
 
 # --- Globales del Servicio ---
 _service_name = "balanceador"
@@ -35,6 +36,7 @@ _service_instance: Optional[BalanceadorService] = None
 _db_sam: Optional[DatabaseConnector] = None
 _db_rpa360: Optional[DatabaseConnector] = None
 _notificador: Optional[EmailAlertClient] = None
+_volcado_metricas_db: Optional[VolcadoPeriodico] = None
 
 
 # ---------- Gestión de Cierre Ordenado (Graceful Shutdown) ----------
@@ -75,7 +77,7 @@ def _setup_signals() -> None:
 
 def _setup_dependencies() -> Dict[str, Any]:
     """Crea y retorna las dependencias específicas del servicio."""
-    global _db_sam, _db_rpa360, _notificador
+    global _db_sam, _db_rpa360, _notificador, _volcado_metricas_db
 
     logging.debug("Creando dependencias (DBs, Notificador)...")
 
@@ -96,6 +98,7 @@ def _setup_dependencies() -> Dict[str, Any]:
     )
 
     _notificador = EmailAlertClient(service_name=_service_name)
+    _volcado_metricas_db = iniciar_volcado_periodico(_service_name)
 
     return {"db_sam": _db_sam, "db_rpa360": _db_rpa360, "notificador": _notificador}
 
@@ -132,6 +135,9 @@ def _cleanup_resources() -> None:
         except Exception as e:
             logging.error(f"Error cerrando db_rpa360: {e}")
 
+    if _volcado_metricas_db:
+        _volcado_metricas_db.detener()
+
     logging.debug(f"Servicio {_service_name.upper()} ha concluido y liberado recursos.")
 
 
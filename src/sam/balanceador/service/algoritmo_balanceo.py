@@ -6,7 +6,7 @@ import math
 import threading
 from typing import Any, Dict, List, Optional
 
-from sam.common.database import DatabaseConnector
+from sam.common.database import DatabaseConnector, RowMode
 from sam.common.mail_client import EmailAlertClient
 
 from .cooling_manager import CoolingManager
@@ -177,33 +177,32 @@ class Balanceo:
         logger.debug("Obteniendo estado inicial global del sistema...")
 
         robots_activos_query = "SELECT RobotId, Robot, EsOnline, MinEquipos, MaxEquipos, PrioridadBalanceo, TicketsPorEquipoAdicional, PoolId FROM dbo.Robots WHERE Activo = 1"
-        mapa_config_robots = {
-            r["RobotId"]: r for r in self.db_sam.ejecutar_consulta(robots_activos_query, es_select=True) or []
-        }
+        # Registros de solo lectura: el estado global solo consulta la configuración de cada robot.
+        robots_activos = self.db_sam.ejecutar_consulta(robots_activos_query, es_select=True, row_mode=RowMode.RECORD)
+        mapa_config_robots = {r["RobotId"]: r for r in robots_activos or []}
 
         equipos_validos_query = (
             "SELECT EquipoId, PoolId FROM dbo.Equipos WHERE Activo_SAM = 1 AND PermiteBalanceoDinamico = 1"
         )
-        equipos_validos = self.db_sam.ejecutar_consulta(equipos_validos_query, es_select=True) or []
+        equipos_validos = (
+            self.db_sam.ejecutar_consulta(equipos_validos_query, es_select=True, row_mode=RowMode.TUPLE) or []
+        )
         mapa_equipos_validos_por_pool = {}
-        for eq in equipos_validos:
-            pool_id = eq.get("PoolId")
+        for equipo_id, pool_id in equipos_validos:
             if pool_id not in mapa_equipos_validos_por_pool:
                 mapa_equipos_validos_por_pool[pool_id] = set()
-            mapa_equipos_validos_por_pool[pool_id].add(eq["EquipoId"])
+            mapa_equipos_validos_por_pool[pool_id].add(equipo_id)
 
         asignaciones_query = "SELECT RobotId, EquipoId, EsProgramado, Reservado FROM dbo.Asignaciones"
-        asignaciones = self.db_sam.ejecutar_consulta(asignaciones_query, es_select=True) or []
+        asignaciones = self.db_sam.ejecutar_consulta(asignaciones_query, es_select=True, row_mode=RowMode.TUPLE) or []
 
         mapa_asignaciones_dinamicas = {}
         equipos_con_asignacion_fija = set()
-        for a in asignaciones:
-            robot_id = a.get("RobotId")
-            equipo_id = a.get("EquipoId")
+        for robot_id, equipo_id, es_programado, reservado in asignaciones:
             if not robot_id or not equipo_id:
                 continue
 
-            if not a.get("EsProgramado") and not a.get("Reservado"):
+            if not es_programado and not reservado:
                 if robot_id not in mapa_asignaciones_dinamicas:
                     mapa_asignaciones_dinamicas[robot_id] = []
                 mapa_asignaciones_dinamicas[robot_id].append(equipo_id)
@@ -375,14 +374,8 @@ class Balanceo:
             tickets = estado_global["carga_trabajo_por_robot"].get(robot_id, 0)
             pool_id = estado_global["mapa_config_robots"].get(robot_id, {}).get("PoolId")
 
-            # 2. Ejecutar la operación
-            self.db_sam.ejecutar_consulta(query, (robot_id, equipo_id, motivo), es_select=False)
-
-            # 3. Actualizar el estado en memoria
-            estado_global["mapa_asignaciones_dinamicas"].setdefault(robot_id, []).append(equipo_id)
-
-            # 4. Registrar en histórico y Cooling Manager
-            self.historico_client.registrar_decision_balanceo(
+            # 2. Ejecutar la operación y su registro en el histórico en un solo batch y transacción
+            query_historico, params_historico = self.historico_client.sentencia_decision_balanceo(
                 robot_id=robot_id,
                 pool_id=pool_id,
                 tickets_pendientes=tickets,
@@ -391,6 +384,14 @@ class Balanceo:
                 accion=motivo,
                 justificacion=justificacion,
             )
+            with self.db_sam.unit_of_work() as uow:
+                uow.agregar(query, (robot_id, equipo_id, motivo))
+                uow.agregar(query_historico, params_historico)
+
+            # 3. Actualizar el estado en memoria
+            estado_global["mapa_asignaciones_dinamicas"].setdefault(robot_id, []).append(equipo_id)
+
+            # 4. Registrar en Cooling Manager
             self.cooling_manager.registrar_ampliacion(robot_id, tickets, 1)
             return True
         except Exception as e:
@@ -413,18 +414,8 @@ class Balanceo:
             tickets = estado_global["carga_trabajo_por_robot"].get(robot_id, 0)
             pool_id = estado_global["mapa_config_robots"].get(robot_id, {}).get("PoolId")
 
-            # 2. Ejecutar la operación
-            self.db_sam.ejecutar_consulta(query, (robot_id, equipo_id), es_select=False)
-
-            # 3. Actualizar el estado en memoria
-            if (
-                robot_id in estado_global["mapa_asignaciones_dinamicas"]
-                and equipo_id in estado_global["mapa_asignaciones_dinamicas"][robot_id]
-            ):
-                estado_global["mapa_asignaciones_dinamicas"][robot_id].remove(equipo_id)
-
-            # 4. Registrar en histórico y Cooling Manager
-            self.historico_client.registrar_decision_balanceo(
+            # 2. Ejecutar la operación y su registro en el histórico en un solo batch y transacción
+            query_historico, params_historico = self.historico_client.sentencia_decision_balanceo(
                 robot_id=robot_id,
                 pool_id=pool_id,
                 tickets_pendientes=tickets,
@@ -433,6 +424,18 @@ class Balanceo:
                 accion=motivo,
                 justificacion=justificacion,
             )
+            with self.db_sam.unit_of_work() as uow:
+                uow.agregar(query, (robot_id, equipo_id))
+                uow.agregar(query_historico, params_historico)
+
+            # 3. Actualizar el estado en memoria
+            if (
+                robot_id in estado_global["mapa_asignaciones_dinamicas"]
+                and equipo_id in estado_global["mapa_asignaciones_dinamicas"][robot_id]
+            ):
+                estado_global["mapa_asignaciones_dinamicas"][robot_id].remove(equipo_id)
+
+            # 4. Registrar en Cooling Manager
             self.cooling_manager.registrar_reduccion(robot_id, tickets, 1)
             return True
         except Exception as e:
@@ -1,7 +1,7 @@
 # SAM/src/sam/balanceador/service/historico_client.py
 
 import logging
-from typing import Optional
+from typing import Optional, Tuple
 
 from sam.common.database import DatabaseConnector
 
@@ -21,6 +21,31 @@ class HistoricoBalanceoClient:
 
     # En historico_client.py, dentro de la clase HistoricoBalanceoClient
 
+    @staticmethod
+    def sentencia_decision_balanceo(
+        robot_id: int,
+        pool_id: Optional[int],
+        tickets_pendientes: int,
+        equipos_antes: int,
+        equipos_despues: int,
+        accion: str,
+        justificacion: Optional[str] = None,
+    ) -> Tuple[str, tuple]:
+        """
+        Devuelve (query, params) del INSERT en HistoricoBalanceo, para poder enviarlo
+        junto con la operación que registra en una unidad de trabajo.
+        """
+        # La query ahora incluye la nueva columna PoolId
+        query = """
+        INSERT INTO dbo.HistoricoBalanceo
+         (RobotId, PoolId, TicketsPendientes, EquiposAsignadosAntes, EquiposAsignadosDespues, AccionTomada, Justificacion)
+        VALUES (?, ?, ?, ?, ?, ?, ?);
+        """
+
+        # El tuple de parámetros ahora incluye pool_id
+        params = (robot_id, pool_id, tickets_pendientes, equipos_antes, equipos_despues, accion, justificacion)
+        return query, params
+
     def registrar_decision_balanceo(
         self,
         robot_id: int,
@@ -35,16 +60,9 @@ class HistoricoBalanceoClient:
         Registra una decisión de balanceo en la tabla HistoricoBalanceo.
         """
         try:
-            # La query ahora incluye la nueva columna PoolId
-            query = """
-            INSERT INTO dbo.HistoricoBalanceo
-             (RobotId, PoolId, TicketsPendientes, EquiposAsignadosAntes, EquiposAsignadosDespues, AccionTomada, Justificacion)
-            VALUES (?, ?, ?, ?, ?, ?, ?);
-            """
-
-            # El tuple de parámetros ahora incluye pool_id
-            params = (robot_id, pool_id, tickets_pendientes, equipos_antes, equipos_despues, accion, justificacion)
-
+            query, params = self.sentencia_decision_balanceo(
+                robot_id, pool_id, tickets_pendientes, equipos_antes, equipos_despues, accion, justificacion
+            )
             self.db.ejecutar_consulta(query, params, es_select=False)
 
             logger.info(
@@ -0,0 +1,122 @@
+# sam/callback/service/callbacks_pendientes.py
+"""
+Callbacks en espera de que su ejecución aparezca en dbo.Ejecuciones.
+
+Con el registro diferido del Lanzador (`LANZADOR_REGISTRO_DIFERIDO_HABILITAR`) un despliegue puede
+terminar, y A360 enviar su callback, antes de que su fila se escriba en la BD: el UPDATE del callback
+no encuentra la ejecución (NOT_FOUND). La ventana crece justo cuando la BD está lenta. En lugar de
+descartar el payload, el Callback lo guarda aquí y lo vuelve a aplicar cada `reintento_seg` hasta que
+la fila exista (y entonces avisa al Lanzador como cualquier callback) o hasta que venza `ttl_seg`.
+
+Un callback cuya fila no aparece (el INSERT del despliegue falló o el registro diferido la descartó)
+no se pierde al vencer: se entrega a `al_vencer`, la auto-recuperación del Callback. Los pendientes se
+guardan en memoria del worker; al detenerse el proceso, los que quedan también se entregan a `al_vencer`.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from sam.common.database import UpdateStatus
+
+logger = logging.getLogger(__name__)
+
+
+class CallbacksPendientes:
+    def __init__(
+        self,
+        aplicar: Callable[[Any], Awaitable[UpdateStatus]],
+        al_actualizar: Optional[Callable[[Any], None]] = None,
+        al_vencer: Optional[Callable[[Any], Awaitable[Any]]] = None,
+        reintento_seg: float = 2,
+        ttl_seg: float = 900,
+        max_pendientes: int = 1000,
+    ):
+        self._aplicar = aplicar
+        self._al_actualizar = al_actualizar
+        self._al_vencer = al_vencer
+        self.reintento_seg = max(0.01, float(reintento_seg))
+        self.ttl_seg = float(ttl_seg)
+        self.max_pendientes = max(1, int(max_pendientes))
+        # (deploymentId, userId) -> (payload, recibido_en)
+        self._pendientes: Dict[Tuple[str, Optional[str]], Tuple[Any, float]] = {}
+        self._tarea: Optional[asyncio.Task] = None
+        self._estadisticas = {"guardados": 0, "aplicados": 0, "ya_procesados": 0, "vencidos": 0, "rechazados": 0}
+
+    def guardar(self, payload: Any) -> bool:
+        """
+        Guarda el payload de un callback cuya ejecución todavía no está en la BD. Devuelve False si se
+        alcanzó `max_pendientes` (el llamador debe rechazar el callback para que A360 lo reenvíe).
+        """
+        clave = (payload.deployment_id, payload.user_id)
+        if clave not in self._pendientes and len(self._pendientes) >= self.max_pendientes:
+            self._estadisticas["rechazados"] += 1
+            return False
+        recibido_en = self._pendientes.get(clave, (None, time.monotonic()))[1]
+        self._pendientes[clave] = (payload, recibido_en)
+        self._estadisticas["guardados"] += 1
+        if self._tarea is None or self._tarea.done():
+            self._tarea = asyncio.create_task(self._bucle())
+        return True
+
+    async def _bucle(self):
+        while self._pendientes:
+            await asyncio.sleep(self.reintento_seg)
+            await self.reintentar()
+
+    async def reintentar(self):
+        """Vuelve a aplicar cada callback pendiente; descarta los aplicados y los vencidos."""
+        for clave, (payload, recibido_en) in list(self._pendientes.items()):
+            try:
+                resultado = await self._aplicar(payload)
+            except Exception as e:
+                logger.warning(f"Error al reaplicar el callback pendiente de DeploymentId '{clave[0]}': {e}")
+                resultado = UpdateStatus.ERROR
+            if resultado == UpdateStatus.UPDATED:
+                self._estadisticas["aplicados"] += 1
+                logger.info(
+                    f"Callback pendiente de DeploymentId '{clave[0]}' aplicado tras "
+                    f"{time.monotonic() - recibido_en:.1f}s (la ejecución ya está registrada)."
+                )
+                del self._pendientes[clave]
+                if self._al_actualizar is not None:
+                    self._al_actualizar(payload)
+            elif resultado == UpdateStatus.ALREADY_PROCESSED:
+                self._estadisticas["ya_procesados"] += 1
+                del self._pendientes[clave]
+            elif time.monotonic() - recibido_en >= self.ttl_seg:
+                self._estadisticas["vencidos"] += 1
+                del self._pendientes[clave]
+                logger.warning(
+                    f"La ejecución de DeploymentId '{clave[0]}' no apareció en BD en {self.ttl_seg:.0f}s. "
+                    f"Estado informado por A360: {payload.status}."
+                )
+                await self._vencer(payload)
+
+    async def _vencer(self, payload: Any):
+        if self._al_vencer is None:
+            return
+        try:
+            await self._al_vencer(payload)
+        except Exception as e:
+            logger.error(f"Error al recuperar el callback vencido de DeploymentId '{payload.deployment_id}': {e}")
+
+    def estadisticas(self) -> Dict[str, Any]:
+        return {**self._estadisticas, "pendientes": len(self._pendientes)}
+
+    async def cerrar(self):
+        if self._tarea is not None and not self._tarea.done():
+            self._tarea.cancel()
+            try:
+                await self._tarea
+            except asyncio.CancelledError:
+                pass
+        if self._pendientes:
+            logger.warning(
+                f"Se detiene el Callback con {len(self._pendientes)} callbacks sin aplicar "
+                f"(DeploymentIds: {', '.join(sorted(clave[0] for clave in self._pendientes))})."
+            )
+            pendientes, self._pendientes = list(self._pendientes.values()), {}
+            for payload, _ in pendientes:
+                await self._vencer(payload)
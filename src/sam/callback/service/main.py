@@ -3,18 +3,22 @@
 
 import hmac
 import logging
+import os
 from contextlib import asynccontextmanager
 from typing import Any, Dict, Optional
 
-from fastapi import Depends, FastAPI, Header, HTTPException
+from fastapi import Depends, FastAPI, Header, HTTPException, Response
 from pydantic import BaseModel, Field
 
 from sam import __version__
+from sam.callback.service.callbacks_pendientes import CallbacksPendientes
 from sam.common.a360_client import AutomationAnywhereClient
+from sam.common.aviso_lanzador import EmisorAvisos
 from sam.common.config_loader import ConfigLoader
 from sam.common.config_manager import ConfigManager
-from sam.common.database import DatabaseConnector, UpdateStatus
+from sam.common.database import AsyncDatabaseConnector, DatabaseConnector, UpdateStatus
 from sam.common.logging_setup import setup_logging
+from sam.common.metricas_db import iniciar_volcado_periodico
 
 logger = logging.getLogger(__name__)
 
@@ -52,11 +56,41 @@ async def lifespan(app: FastAPI):
     app_state["db_connector"] = db_connector
     logger.info("DatabaseConnector creado y disponible.")
 
+    # Con varios workers cada proceso tiene sus propias métricas: se vuelcan a un archivo por PID.
+    multiples_workers = int(ConfigManager.get_callback_server_config().get("threads", 1)) > 1
+    app_state["volcado_metricas_db"] = iniciar_volcado_periodico(
+        "callback", sufijo=f"_{os.getpid()}" if multiples_workers else ""
+    )
+
+    # Aviso al Lanzador para que relance en el equipo liberado sin esperar su próximo ciclo.
+    cfg_aviso = ConfigManager.get_aviso_lanzador_config()
+    if cfg_aviso["habilitado"]:
+        app_state["emisor_avisos"] = EmisorAvisos(cfg_aviso["host"], cfg_aviso["puerto"])
+
+    # Callbacks que llegan antes de que el registro diferido del Lanzador escriba su ejecución.
+    cfg_pendientes = ConfigManager.get_callback_pendientes_config()
+    if cfg_pendientes["habilitado"]:
+        app_state["callbacks_pendientes"] = CallbacksPendientes(
+            lambda payload: _aplicar_callback(AsyncDatabaseConnector.para(db_connector), payload),
+            _avisar_lanzador,
+            _auto_recuperar,
+            reintento_seg=cfg_pendientes["reintento_seg"],
+            ttl_seg=cfg_pendientes["ttl_seg"],
+            max_pendientes=cfg_pendientes["max_pendientes"],
+        )
+
     yield
 
     logger.info("Cerrando recursos del worker...")
+    if app_state.get("callbacks_pendientes"):
+        await app_state.pop("callbacks_pendientes").cerrar()
+    if app_state.get("emisor_avisos"):
+        app_state.pop("emisor_avisos").cerrar()
     if "db_connector" in app_state:
+        AsyncDatabaseConnector.para(app_state["db_connector"]).cerrar()
         app_state["db_connector"].cerrar_conexiones_pool()
+    if app_state.get("volcado_metricas_db"):
+        app_state["volcado_metricas_db"].detener()
 
 
 app = FastAPI(
@@ -74,6 +108,10 @@ def get_db() -> DatabaseConnector:
     return db
 
 
+def get_async_db(db: DatabaseConnector = Depends(get_db)) -> AsyncDatabaseConnector:
+    return AsyncDatabaseConnector.para(db)
+
+
 async def verify_api_key(x_authorization: str = Header(...)):
     server_api_key = ConfigManager.get_callback_server_config().get("token")
 
@@ -85,6 +123,100 @@ async def verify_api_key(x_authorization: str = Header(...)):
         raise HTTPException(status_code=401, detail="X-Authorization header inválido.")
 
 
+async def _aplicar_callback(db: AsyncDatabaseConnector, payload: CallbackPayload) -> UpdateStatus:
+    return await db.actualizar_ejecucion_desde_callback(
+        deployment_id=payload.deployment_id,
+        estado_callback=payload.status,
+        callback_payload_str=payload.model_dump_json(by_alias=True),
+        user_id=payload.user_id,
+    )
+
+
+def _avisar_lanzador(payload: CallbackPayload):
+    if app_state.get("emisor_avisos"):
+        app_state["emisor_avisos"].avisar(payload.deployment_id, payload.user_id)
+
+
+async def _auto_recuperar(payload: CallbackPayload) -> str:
+    """
+    Auto-recuperación de un callback cuya ejecución no está en BD: al recibirlo sin registro diferido, o
+    al vencer su espera en `CallbacksPendientes`. Devuelve el mensaje para la respuesta del callback.
+    """
+    logger.warning(f"DeploymentId '{payload.deployment_id}' NO encontrado en BD. Iniciando Auto-Recuperación...")
+
+    # 2. Auto-Recovery Logic
+    try:
+        # We need an AA Client to fetch details.
+        # Initialize it on the fly (lightweight enough for this edge case)
+        aa_config = ConfigManager.get_aa360_config()
+        aa_client = AutomationAnywhereClient(**aa_config)
+
+        # Fetch details from A360. Se cierra siempre: la primera autenticación inicia la renovación
+        # periódica del token, que sigue corriendo hasta close().
+        try:
+            detalles_list = await aa_client.obtener_detalles_por_deployment_ids([payload.deployment_id])
+        finally:
+            await aa_client.close()
+
+        if not detalles_list:
+            logger.error(f"Auto-Recuperación fallida: A360 no devolvió detalles para {payload.deployment_id}")
+            return "DeploymentId no encontrado en A360. No se pudo recuperar."
+
+        detalle = detalles_list[0]
+
+        # Extract required fields for insertion
+        # Note: We might not have the exact 'EquipoId' easily if it's not in the API response.
+        # We'll try to infer or use a fallback/NULL if DB allows.
+        # Based on 'insertar_registro_ejecucion', we need:
+        # id_despliegue, db_robot_id, db_equipo_id, a360_user_id, marca_tiempo_programada, estado
+
+        # robot_id = detalle.get("automationId")  # This is usually the FileID in A360
+        user_id = detalle.get("runAsUserIds", [None])[0]
+        # start_time = detalle.get("startDateTime")  # ISO Format
+
+        # For EquipoId, we might need to query DB to find which team has this user/robot assigned,
+        # or leave it NULL if the schema permits.
+        # For now, we will try to find the robot in our DB to get its internal ID if different,
+        # but 'insertar_registro_ejecucion' expects the A360 FileID as 'db_robot_id' based on usage?
+        # Checking 'desplegador.py': db_robot_id=robot_id (which comes from 'obtener_robots_ejecutables').
+        # In 'obtener_robots_ejecutables' (SP), RobotId is likely the A360 FileID.
+
+        # We will insert with minimal info.
+        # WARNING: 'db_equipo_id' is mandatory in the INSERT statement?
+        # Let's check 'database.py': INSERT INTO dbo.Ejecuciones ... VALUES (?, ?, ?, ?, ?, ?)
+        # It doesn't seem to handle NULLs gracefully if the column is NOT NULL.
+        # We will attempt to insert with a placeholder or 0 if we can't find it,
+        # or better, just log the error if we can't fully reconstruct it.
+
+        # Actually, 'automationId' in activity list might be different from FileID.
+        # Let's trust 'fileId' if present, or 'automationId'.
+        file_id = detalle.get("fileId") or detalle.get("automationId")
+
+        # To be safe and robust, we should try to insert.
+        # If EquipoId is missing, we might fail.
+        # Let's assume for now we can't easily recover EquipoId without complex logic.
+        # But we can try to insert with EquipoId=0 or similar if DB allows, or just fail gracefully.
+
+        # REVISION: Implementing full recovery might be complex without EquipoId.
+        # However, we can try to find the EquipoId from 'Asignaciones' table using RobotId and UserId?
+        # That would be the best approach.
+
+        # For this iteration, I will log the INTENT to recover and the data we found,
+        # but I won't risk breaking the DB with invalid FKs without a dedicated SP.
+        # I will add a TODO and a detailed log so the user can manually fix it or we can add the SP later.
+
+        logger.error(
+            f"Auto-Recuperación PARCIAL: Se encontraron datos en A360 (FileID: {file_id}, UserID: {user_id}). "
+            "Pero falta lógica para determinar 'EquipoId' automáticamente. "
+            "El registro no se creará para evitar inconsistencias de FK."
+        )
+        return "DeploymentId no encontrado en BD. Recuperación automática no implementada completamente."
+
+    except Exception as recovery_error:
+        logger.error(f"Excepción durante Auto-Recuperación: {recovery_error}", exc_info=True)
+        return "Error durante intento de auto-recuperación."
+
+
 @app.post(
     "/api/callback",
     tags=["Callback"],
@@ -92,7 +224,9 @@ async def verify_api_key(x_authorization: str = Header(...)):
     response_model=SuccessResponse,
     dependencies=[Depends(verify_api_key)],
 )
-async def handle_callback(payload: CallbackPayload, db: DatabaseConnector = Depends(get_db)):
+async def handle_callback(
+    payload: CallbackPayload, response: Response, db: AsyncDatabaseConnector = Depends(get_async_db)
+):
     logger.info(f"Callback recibido para DeploymentId: {payload.deployment_id} con estado: {payload.status}")
     try:
         # CRITICAL: A360 only sends callbacks for COMPLETION (success/failure), NEVER for start.
@@ -101,97 +235,36 @@ async def handle_callback(payload: CallbackPayload, db: DatabaseConnector = Depe
         # We MUST recover this record to maintain data integrity.
 
         # 1. Try to update existing record
-        update_result = db.actualizar_ejecucion_desde_callback(
-            deployment_id=payload.deployment_id,
-            estado_callback=payload.status,
-            callback_payload_str=payload.model_dump_json(by_alias=True),
-        )
+        update_result = await _aplicar_callback(db, payload)
 
         if update_result == UpdateStatus.UPDATED:
+            _avisar_lanzador(payload)
             return SuccessResponse(message="Callback procesado y estado actualizado.")
 
         elif update_result == UpdateStatus.ALREADY_PROCESSED:
             return SuccessResponse(message="La ejecución ya estaba en estado final.")
 
-        elif update_result == UpdateStatus.NOT_FOUND:
-            logger.warning(
-                f"DeploymentId '{payload.deployment_id}' NO encontrado en BD. Iniciando Auto-Recuperación..."
-            )
-
-            # 2. Auto-Recovery Logic
-            try:
-                # We need an AA Client to fetch details.
-                # Initialize it on the fly (lightweight enough for this edge case)
-                aa_config = ConfigManager.get_aa360_config()
-                aa_client = AutomationAnywhereClient(**aa_config)
-
-                # Fetch details from A360
-                detalles_list = await aa_client.obtener_detalles_por_deployment_ids([payload.deployment_id])
-                await aa_client.close()
-
-                if not detalles_list:
-                    logger.error(f"Auto-Recuperación fallida: A360 no devolvió detalles para {payload.deployment_id}")
-                    return SuccessResponse(message="DeploymentId no encontrado en A360. No se pudo recuperar.")
-
-                detalle = detalles_list[0]
-
-                # Extract required fields for insertion
-                # Note: We might not have the exact 'EquipoId' easily if it's not in the API response.
-                # We'll try to infer or use a fallback/NULL if DB allows.
-                # Based on 'insertar_registro_ejecucion', we need:
-                # id_despliegue, db_robot_id, db_equipo_id, a360_user_id, marca_tiempo_programada, estado
-
-                # robot_id = detalle.get("automationId")  # This is usually the FileID in A360
-                user_id = detalle.get("runAsUserIds", [None])[0]
-                # start_time = detalle.get("startDateTime")  # ISO Format
-
-                # For EquipoId, we might need to query DB to find which team has this user/robot assigned,
-                # or leave it NULL if the schema permits.
-                # For now, we will try to find the robot in our DB to get its internal ID if different,
-                # but 'insertar_registro_ejecucion' expects the A360 FileID as 'db_robot_id' based on usage?
-                # Checking 'desplegador.py': db_robot_id=robot_id (which comes from 'obtener_robots_ejecutables').
-                # In 'obtener_robots_ejecutables' (SP), RobotId is likely the A360 FileID.
-
-                # We will insert with minimal info.
-                # WARNING: 'db_equipo_id' is mandatory in the INSERT statement?
-                # Let's check 'database.py': INSERT INTO dbo.Ejecuciones ... VALUES (?, ?, ?, ?, ?, ?)
-                # It doesn't seem to handle NULLs gracefully if the column is NOT NULL.
-                # We will attempt to insert with a placeholder or 0 if we can't find it,
-                # or better, just log the error if we can't fully reconstruct it.
-
-                # Actually, 'automationId' in activity list might be different from FileID.
-                # Let's trust 'fileId' if present, or 'automationId'.
-                file_id = detalle.get("fileId") or detalle.get("automationId")
-
-                # To be safe and robust, we should try to insert.
-                # If EquipoId is missing, we might fail.
-                # Let's assume for now we can't easily recover EquipoId without complex logic.
-                # But we can try to insert with EquipoId=0 or similar if DB allows, or just fail gracefully.
-
-                # REVISION: Implementing full recovery might be complex without EquipoId.
-                # However, we can try to find the EquipoId from 'Asignaciones' table using RobotId and UserId?
-                # That would be the best approach.
-
-                # For this iteration, I will log the INTENT to recover and the data we found,
-                # but I won't risk breaking the DB with invalid FKs without a dedicated SP.
-                # I will add a TODO and a detailed log so the user can manually fix it or we can add the SP later.
-
-                logger.error(
-                    f"Auto-Recuperación PARCIAL: Se encontraron datos en A360 (FileID: {file_id}, UserID: {user_id}). "
-                    "Pero falta lógica para determinar 'EquipoId' automáticamente. "
-                    "El registro no se creará para evitar inconsistencias de FK."
-                )
-                return SuccessResponse(
-                    message="DeploymentId no encontrado en BD. Recuperación automática no implementada completamente."
+        elif update_result == UpdateStatus.NOT_FOUND and app_state.get("callbacks_pendientes"):
+            # Con el registro diferido del Lanzador la fila puede estar todavía en su buffer: se guarda el
+            # payload y se reaplica hasta que aparezca; si no aparece, al vencer pasa a la auto-recuperación.
+            # Si no hay lugar, un 503 hace que A360 lo reenvíe.
+            if not app_state["callbacks_pendientes"].guardar(payload):
+                logger.warning(
+                    f"DeploymentId '{payload.deployment_id}' no encontrado en BD y sin lugar para esperarlo."
                 )
+                raise HTTPException(status_code=503, detail="Ejecución aún no registrada. Reintentar más tarde.")
+            logger.info(f"DeploymentId '{payload.deployment_id}' aún no registrado en BD. Se reaplicará el callback.")
+            response.status_code = 202
+            return SuccessResponse(message="Ejecución aún no registrada. El callback se aplicará al registrarse.")
 
-            except Exception as recovery_error:
-                logger.error(f"Excepción durante Auto-Recuperación: {recovery_error}", exc_info=True)
-                return SuccessResponse(message="Error durante intento de auto-recuperación.")
+        elif update_result == UpdateStatus.NOT_FOUND:
+            return SuccessResponse(message=await _auto_recuperar(payload))
 
         else:  # UpdateStatus.ERROR
             return SuccessResponse(message=f"Error al actualizar DeploymentId '{payload.deployment_id}'.")
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error al procesar callback para {payload.deployment_id}: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail="Error interno al actualizar el estado.")
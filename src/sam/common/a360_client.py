@@ -1,12 +1,24 @@
 # common/a360_client.py
 import asyncio
+import copy
+import json
 import logging
 import re
-from typing import Any, Dict, List, Optional
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 
 import httpx
 import urllib3
 
+from sam.common.control_concurrencia import (
+    CODIGOS_SOBRECARGA,
+    LimitadorAdaptativo,
+    PresupuestoReintentos,
+    espera_con_jitter,
+)
+from sam.common.token_cache import CacheTokenArchivo
+
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 logger = logging.getLogger(__name__)
 
@@ -23,6 +35,16 @@ class AutomationAnywhereClient:
     _ENDPOINT_FILES_LIST_V2 = "/v2/repository/workspaces/public/files/list"
     _ENDPOINT_ACTIVITY_AUDIT_UNKNOWN_V1 = "/v1/activity/auditunknown"
 
+    # Familias de endpoints con límite de concurrencia adaptativo propio (prefijo de ruta -> familia)
+    _FAMILIAS_ENDPOINT = {"/automations/deploy": "deploy", "/activity/": "activity", "/devices/": "devices"}
+    _CONCURRENCIA_MAX_DEFAULT = {"deploy": 20, "activity": 8, "devices": 8}
+
+    # Listados idempotentes (POST de solo lectura): admiten coalescencia y caché de respuestas
+    _ENDPOINTS_LISTADO = frozenset(
+        {_ENDPOINT_ACTIVITY_LIST_V3, _ENDPOINT_USERS_LIST_V2, _ENDPOINT_DEVICES_LIST_V2, _ENDPOINT_FILES_LIST_V2}
+    )
+    _CACHE_LISTADOS_MAX_ENTRADAS = 256
+
     def __init__(self, cr_url: str, cr_user: str, cr_pwd: Optional[str] = None, **kwargs):
         self.cr_url = cr_url.strip("/")
         self.cr_user = cr_user
@@ -31,9 +53,47 @@ class AutomationAnywhereClient:
         self.cr_api_timeout = kwargs.get("cr_api_timeout", 60)
         self.callback_url_deploy = kwargs.get("callback_url_deploy")
         self.CONCILIADOR_BATCH_SIZE = kwargs.get("conciliador_batch_size", 50)
+        # Consulta de detalles por deploymentId: lotes concurrentes cuyo tamaño se adapta a la latencia
+        # observada, entre 1 y `conciliador_lote_max`. El tamaño aprendido se conserva entre ciclos.
+        self.conciliador_concurrencia = max(1, int(kwargs.get("conciliador_concurrency") or 4))
+        self.conciliador_lote_max = max(
+            self.CONCILIADOR_BATCH_SIZE,
+            int(kwargs.get("conciliador_batch_size_max") or 4 * self.CONCILIADOR_BATCH_SIZE),
+        )
+        self._lote_detalles = self.CONCILIADOR_BATCH_SIZE
+        # Techo de crecimiento: 3/4 del menor lote que dio timeout, hasta un ciclo sin timeouts.
+        self._lote_detalles_techo = self.conciliador_lote_max
+        # Paginación de los endpoints de listado
+        self.page_size = max(1, int(kwargs.get("default_page_size") or 100))
+        self.max_paginas = max(1, int(kwargs.get("max_pagination_pages") or 1000))
+        self.paginacion_concurrencia = max(1, int(kwargs.get("pagination_concurrency") or 4))
+        # Concurrencia adaptativa por familia de endpoints y presupuesto de reintentos compartido
+        concurrencia_max = {**self._CONCURRENCIA_MAX_DEFAULT, **(kwargs.get("adaptive_concurrency_max") or {})}
+        tolerancia_latencia = float(kwargs.get("latency_tolerance") or 3.0)
+        self._limitadores = {
+            familia: LimitadorAdaptativo(familia, int(maximo), tolerancia_latencia=tolerancia_latencia)
+            for familia, maximo in concurrencia_max.items()
+        }
+        self._presupuesto_reintentos = PresupuestoReintentos(ratio=float(kwargs.get("retry_budget_ratio") or 0.2))
+        # Listados: peticiones idénticas en vuelo comparten una sola llamada; caché opcional con TTL corto
+        self.cache_listados_ttl = max(0.0, float(kwargs.get("list_cache_ttl") or 0))
+        self._listados_en_vuelo: Dict[str, asyncio.Task] = {}
+        self._cache_listados: Dict[str, Tuple[float, Dict]] = {}
+        self._generacion_listados = 0
+        self._contadores_listados = {"hits": 0, "coalescidas": 0, "misses": 0, "invalidaciones": 0}
 
         self._token: Optional[str] = None
         self._token_lock = asyncio.Lock()
+        # Ciclo de vida del token: se renueva en segundo plano al cumplir `token_refresh_buffer_sec`
+        # segundos (A360 los vence a los 20 minutos). 0 desactiva la renovación proactiva.
+        vida_util = kwargs.get("token_refresh_buffer_sec")
+        self.token_vida_util = max(0, int(1140 if vida_util is None else vida_util))
+        self._token_obtenido_en: Optional[float] = None
+        self._tarea_refresco_token: Optional[asyncio.Task] = None
+        # Caché opcional en archivo para compartir el token entre procesos del mismo host
+        ruta_cache = kwargs.get("token_cache_path")
+        self._cache_token = CacheTokenArchivo(ruta_cache) if ruta_cache else None
+        self._clave_cache_token = CacheTokenArchivo.clave(self.cr_url, self.cr_user)
 
         self._client = httpx.AsyncClient(base_url=self.cr_url, verify=False, timeout=self.cr_api_timeout)
         logger.debug(f"Cliente API Asíncrono inicializado para CR: {self.cr_url}")
@@ -87,6 +147,7 @@ class AutomationAnywhereClient:
 
             self._token = response.json().get("token")
             if self._token:
+                self._token_obtenido_en = time.time()
                 self._client.headers["X-Authorization"] = self._token
                 logger.info("Token de A360 obtenido/refrescado exitosamente.")
             else:
@@ -105,29 +166,231 @@ class AutomationAnywhereClient:
                         asyncio.create_task(self._on_auth_failure_cb(status_code, e.response.text))
             raise
 
-    async def _asegurar_validez_del_token(self, is_retry: bool = False):
-        """Asegura que tenemos un token. Se llama solo si no hay token o si ha expirado."""
+    def _token_vencido(self) -> bool:
+        """True si no hay token o si superó su vida útil. Un token de antigüedad desconocida se da por vigente."""
+        if not self._token:
+            return True
+        if not self.token_vida_util or self._token_obtenido_en is None:
+            return False
+        return time.time() - self._token_obtenido_en >= self.token_vida_util
+
+    def _adoptar_token(self, token: str, obtenido_en: float):
+        self._token = token
+        self._token_obtenido_en = obtenido_en
+        self._client.headers["X-Authorization"] = token
+
+    def _leer_token_cache(self, token_rechazado: Optional[str]) -> Optional[Tuple[str, float]]:
+        """Devuelve el token de la caché compartida si sigue vigente y no es el que A360 acaba de rechazar."""
+        entrada = self._cache_token.leer(self._clave_cache_token)
+        if not entrada:
+            return None
+        token, obtenido_en = entrada
+        if token == token_rechazado:
+            return None
+        if self.token_vida_util and time.time() - obtenido_en >= self.token_vida_util:
+            return None
+        return entrada
+
+    async def _renovar_token_compartido(self, is_retry: bool, token_rechazado: Optional[str]):
+        """
+        Renueva el token pasando por la caché en archivo: si otro proceso ya tiene uno vigente se reutiliza;
+        si no, se autentica con el bloqueo tomado para que los demás procesos esperen y lo reutilicen.
+        """
+        entrada = await asyncio.to_thread(self._leer_token_cache, token_rechazado)
+        if entrada:
+            self._adoptar_token(*entrada)
+            logger.debug("Token de A360 reutilizado desde la caché compartida.")
+            return
+
+        bloqueado = await asyncio.to_thread(self._cache_token.adquirir_bloqueo)
+        try:
+            # Doble chequeo: otro proceso pudo renovarlo mientras esperábamos el bloqueo
+            if bloqueado:
+                entrada = await asyncio.to_thread(self._leer_token_cache, token_rechazado)
+                if entrada:
+                    self._adoptar_token(*entrada)
+                    logger.debug("Token de A360 renovado por otro proceso; se reutiliza desde la caché.")
+                    return
+            await self._obtener_token(is_retry=is_retry)
+            if bloqueado:
+                await asyncio.to_thread(
+                    self._cache_token.guardar, self._clave_cache_token, self._token, self._token_obtenido_en
+                )
+        finally:
+            if bloqueado:
+                await asyncio.to_thread(self._cache_token.liberar_bloqueo)
+
+    async def _asegurar_validez_del_token(self, is_retry: bool = False, token_rechazado: Optional[str] = None):
+        """
+        Asegura que tenemos un token vigente. Con `is_retry` se renueva el token que A360 rechazó (401),
+        salvo que otra corutina ya lo haya reemplazado.
+        """
         async with self._token_lock:
             # Doble chequeo para evitar que múltiples corutinas pidan token a la vez
-            if not self._token or is_retry:
+            if is_retry:
+                if token_rechazado is not None and self._token != token_rechazado:
+                    return
+                token_rechazado = self._token
+            elif not self._token_vencido():
+                return
+
+            if self._cache_token is None:
                 await self._obtener_token(is_retry=is_retry)
+            else:
+                await self._renovar_token_compartido(is_retry, token_rechazado)
+        self._programar_refresco_token()
+
+    def _programar_refresco_token(self):
+        """Inicia (una sola vez) la tarea que renueva el token antes de que venza."""
+        if not self.token_vida_util or self._token_obtenido_en is None:
+            return
+        if self._tarea_refresco_token and not self._tarea_refresco_token.done():
+            return
+        self._tarea_refresco_token = asyncio.create_task(self._refrescar_token_periodicamente())
+
+    async def _refrescar_token_periodicamente(self):
+        while self._token and not self._client.is_closed:
+            espera = self._token_obtenido_en + self.token_vida_util - time.time()
+            await asyncio.sleep(max(espera, 1))
+            try:
+                await self._asegurar_validez_del_token()
+            except Exception as e:
+                logger.warning(f"No se pudo renovar el token de A360 en segundo plano: {e}. Reintento en 30s.")
+                await asyncio.sleep(30)
+
+    def _familia_endpoint(self, endpoint: str) -> Optional[str]:
+        for prefijo, familia in self._FAMILIAS_ENDPOINT.items():
+            if prefijo in endpoint:
+                return familia
+        return None
+
+    def obtener_metricas_concurrencia(self) -> Dict[str, Any]:
+        """Límite actual, peticiones en curso/en espera y contadores de cada familia, más el presupuesto de reintentos."""
+        return {
+            "familias": {familia: limitador.metricas() for familia, limitador in self._limitadores.items()},
+            "presupuesto_reintentos": self._presupuesto_reintentos.metricas(),
+        }
 
-    async def _realizar_peticion_api(self, method: str, endpoint: str, **kwargs) -> Dict:
+    async def _enviar_peticion(
+        self, limitador: Optional[LimitadorAdaptativo], method: str, endpoint: str, **kwargs
+    ) -> httpx.Response:
+        """Envía la petición dentro del cupo de su familia e informa al limitador la latencia o la sobrecarga."""
+        if limitador is None:
+            response = await self._client.request(method, endpoint, **kwargs)
+            response.raise_for_status()
+            return response
+
+        async with limitador.cupo():
+            inicio = time.monotonic()
+            try:
+                response = await self._client.request(method, endpoint, **kwargs)
+            except (httpx.ReadTimeout, httpx.ConnectTimeout) as e:
+                limitador.registrar_sobrecarga(type(e).__name__, inicio)
+                raise
+            if response.status_code in CODIGOS_SOBRECARGA:
+                limitador.registrar_sobrecarga(f"HTTP {response.status_code}", inicio)
+            elif response.status_code != 401:
+                limitador.registrar_exito(time.monotonic() - inicio, inicio)
+        response.raise_for_status()
+        return response
+
+    def _espera_reintento(self, intento: int, response: Optional[httpx.Response] = None) -> Optional[float]:
+        """
+        Segundos a esperar antes del reintento `intento`, o None si el presupuesto de reintentos
+        compartido está agotado. Respeta `Retry-After` (en segundos) si el Control Room lo envía.
+        """
+        if not self._presupuesto_reintentos.retirar():
+            return None
+        espera = espera_con_jitter(intento)
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after and retry_after.isdigit():
+            espera = max(espera, float(retry_after))
+        return espera
+
+    def invalidar_cache_listados(self):
+        """
+        Descarta las respuestas de listados cacheadas. Las peticiones en vuelo siguen compartiéndose,
+        pero su resultado ya no se guarda en la caché.
+        """
+        self._generacion_listados += 1
+        if self._cache_listados:
+            self._cache_listados.clear()
+            self._contadores_listados["invalidaciones"] += 1
+
+    def obtener_metricas_listados(self) -> Dict[str, Any]:
+        """Aciertos de caché, peticiones coalescidas y peticiones reales de los endpoints de listado."""
+        return {
+            **self._contadores_listados,
+            "en_vuelo": len(self._listados_en_vuelo),
+            "entradas_cache": len(self._cache_listados),
+            "ttl_seg": self.cache_listados_ttl,
+        }
+
+    async def _peticion_listado(self, endpoint: str, payload: Dict, reintentar_timeouts: bool = True) -> Dict:
+        """
+        POST a un endpoint de listado con coalescencia: si ya hay una petición idéntica en vuelo,
+        se espera su resultado en lugar de repetirla. Con `list_cache_ttl` > 0 la respuesta se reutiliza
+        durante ese tiempo. Cada llamador recibe su propia copia de la respuesta.
+        """
+        clave = f"{endpoint}|{reintentar_timeouts}|{json.dumps(payload, sort_keys=True, default=str)}"
+        if self.cache_listados_ttl:
+            entrada = self._cache_listados.get(clave)
+            if entrada and entrada[0] > time.monotonic():
+                self._contadores_listados["hits"] += 1
+                return copy.deepcopy(entrada[1])
+            self._cache_listados.pop(clave, None)
+
+        tarea = self._listados_en_vuelo.get(clave)
+        if tarea is not None:
+            self._contadores_listados["coalescidas"] += 1
+            # shield: si este llamador se cancela, la petición sigue para los demás.
+            return copy.deepcopy(await asyncio.shield(tarea))
+
+        self._contadores_listados["misses"] += 1
+        generacion = self._generacion_listados
+        tarea = asyncio.create_task(
+            self._realizar_peticion_api("POST", endpoint, reintentar_timeouts=reintentar_timeouts, json=payload)
+        )
+        self._listados_en_vuelo[clave] = tarea
+        try:
+            respuesta = await asyncio.shield(tarea)
+        finally:
+            if self._listados_en_vuelo.get(clave) is tarea:
+                del self._listados_en_vuelo[clave]
+        # Si hubo una invalidación mientras la petición estaba en vuelo, la respuesta puede estar desactualizada.
+        if self.cache_listados_ttl and generacion == self._generacion_listados:
+            if len(self._cache_listados) >= self._CACHE_LISTADOS_MAX_ENTRADAS:
+                self._cache_listados.pop(next(iter(self._cache_listados)))
+            self._cache_listados[clave] = (time.monotonic() + self.cache_listados_ttl, copy.deepcopy(respuesta))
+        return respuesta
+
+    async def _realizar_peticion_api(
+        self, method: str, endpoint: str, reintentar_timeouts: bool = True, **kwargs
+    ) -> Dict:
         """
         Realiza una petición a la API, manejando la obtención y refresco del token.
+        Las familias deploy, activity y devices pasan por su limitador de concurrencia adaptativo.
+        Los reintentos por sobrecarga o timeout usan backoff con jitter y consumen el presupuesto compartido.
+        Con `reintentar_timeouts=False` un timeout se propaga de inmediato, para que el llamador
+        pueda reintentar con una petición más chica en lugar de repetir la misma.
         """
-        # Asegurarse de tener un token inicial si es la primera vez
-        if not self._token:
+        if endpoint not in self._ENDPOINTS_LISTADO:
+            # Deploy, stop, reset, etc. cambian lo que devuelven los listados.
+            self.invalidar_cache_listados()
+
+        # Asegurarse de tener un token vigente (primera vez o vida útil cumplida sin refresco en segundo plano)
+        if self._token_vencido():
             await self._asegurar_validez_del_token()
 
         max_retries = 3
-        retry_delay = 2.0
+        limitador = self._limitadores.get(self._familia_endpoint(endpoint))
+        self._presupuesto_reintentos.depositar()
 
         for attempt in range(max_retries + 1):
             try:
                 # Realizar la petición
-                response = await self._client.request(method, endpoint, **kwargs)
-                response.raise_for_status()
+                token_usado = self._token
+                response = await self._enviar_peticion(limitador, method, endpoint, **kwargs)
                 return response.json() if response.content else {}
 
             except httpx.HTTPStatusError as e:
@@ -137,25 +400,27 @@ class AutomationAnywhereClient:
                 if status_code == 401:
                     if attempt < max_retries:
                         logger.warning("Recibido error 401. Intentando reautenticar...")
-                        await self._asegurar_validez_del_token(is_retry=True)
+                        await self._asegurar_validez_del_token(is_retry=True, token_rechazado=token_usado)
                         # No aumentamos el delay para 401, reintentamos inmediatamente con nuevo token
                         continue
                     else:
                         logger.error("Error 401 persistente tras reintentos.")
                         raise
 
-                # 2. Manejo de errores de servidor (502, 503, 504)
-                if status_code in (502, 503, 504):
-                    if attempt < max_retries:
+                # 2. Manejo de sobrecarga del Control Room (429, 502, 503, 504)
+                if status_code in CODIGOS_SOBRECARGA:
+                    espera = self._espera_reintento(attempt, e.response) if attempt < max_retries else None
+                    if espera is not None:
                         logger.warning(
-                            f"Error {status_code} en {endpoint}. Reintentando ({attempt + 1}/{max_retries}) en {retry_delay}s..."
+                            f"Error {status_code} en {endpoint}. Reintentando ({attempt + 1}/{max_retries}) en {espera:.1f}s..."
                         )
-                        await asyncio.sleep(retry_delay)
-                        retry_delay *= 2  # Backoff exponencial
+                        await asyncio.sleep(espera)
                         continue
+                    if attempt < max_retries:
+                        logger.error(f"Error {status_code} en {endpoint}. Presupuesto de reintentos agotado.")
                     else:
                         logger.error(f"Error {status_code} persistente en {endpoint} tras {max_retries} reintentos.")
-                        raise
+                    raise
 
                 # 3. Loguear errores conocidos de cliente como WARNING (no reintentables)
                 if status_code in (400, 412):
@@ -166,37 +431,100 @@ class AutomationAnywhereClient:
 
             except (httpx.ReadTimeout, httpx.ConnectTimeout, httpx.PoolTimeout) as e:
                 # 4. Manejo de Timeouts de red
-                if attempt < max_retries:
+                if not reintentar_timeouts:
+                    raise
+                espera = self._espera_reintento(attempt) if attempt < max_retries else None
+                if espera is not None:
                     logger.warning(
-                        f"Timeout ({type(e).__name__}) en {endpoint}. Reintentando ({attempt + 1}/{max_retries}) en {retry_delay}s..."
+                        f"Timeout ({type(e).__name__}) en {endpoint}. Reintentando ({attempt + 1}/{max_retries}) en {espera:.1f}s..."
                     )
-                    await asyncio.sleep(retry_delay)
-                    retry_delay *= 2
+                    await asyncio.sleep(espera)
                     continue
-                logger.error(f"Timeout persistente en {endpoint} tras {max_retries} reintentos.")
+                if attempt < max_retries:
+                    logger.error(f"Timeout en {endpoint}. Presupuesto de reintentos agotado.")
+                else:
+                    logger.error(f"Timeout persistente en {endpoint} tras {max_retries} reintentos.")
                 raise
 
-    async def _obtener_lista_paginada_entidades(self, endpoint: str, payload: Dict) -> List[Dict]:
+    async def _obtener_pagina(self, endpoint: str, payload: Dict, offset: int) -> Dict:
+        """Pide una página de un endpoint de listado. No modifica `payload`."""
+        pagina = {**payload, "page": {**payload.get("page", {}), "offset": offset, "length": self.page_size}}
+        return await self._peticion_listado(endpoint, pagina)
+
+    @staticmethod
+    def _total_reportado(response_json: Dict) -> Optional[int]:
         """
-        Obtiene todas las entidades de un endpoint que soporta paginación.
+        Total de entidades informado por A360 en `page`. Con filtro, `totalFilter` es el total que
+        cumple el filtro (y `total` el de la entidad completa). None si la respuesta no lo informa.
         """
-        lista_completa = []
-        offset = 0
-        page_size = 100
-        payload["page"] = payload.get("page", {})
+        page = response_json.get("page") or {}
+        total = page.get("totalFilter", page.get("total"))
+        return total if isinstance(total, int) and total >= 0 else None
+
+    async def iterar_paginas(self, endpoint: str, payload: Dict) -> AsyncIterator[List[Dict]]:
+        """
+        Itera las páginas de un endpoint de listado, en orden, a medida que llegan.
+        Pide la primera página y, si A360 informa el total, mantiene hasta `paginacion_concurrencia`
+        páginas siguientes en vuelo (así nunca hay más de esas páginas en memoria esperando al consumidor).
+        Si no lo informa, sigue página por página.
+        """
+        response_json = await self._obtener_pagina(endpoint, payload, 0)
+        entidades_pagina = response_json.get("list", [])
+        yield entidades_pagina
+        if len(entidades_pagina) < self.page_size:
+            return
+
+        total = self._total_reportado(response_json)
+        offset = self.page_size
+        paginas_pedidas = 1
+        if total is not None:
+            limite = min(total, self.page_size * self.max_paginas)
+            offsets = iter(range(offset, limite, self.page_size))
+            en_vuelo: deque = deque()
+
+            def _pedir_siguiente():
+                siguiente = next(offsets, None)
+                if siguiente is not None:
+                    en_vuelo.append(asyncio.create_task(self._obtener_pagina(endpoint, payload, siguiente)))
+
+            for _ in range(self.paginacion_concurrencia):
+                _pedir_siguiente()
+            try:
+                while en_vuelo:
+                    entidades_pagina = (await en_vuelo[0]).get("list", [])
+                    en_vuelo.popleft()
+                    paginas_pedidas += 1
+                    _pedir_siguiente()
+                    yield entidades_pagina
+            finally:
+                # Error o consumidor que deja de iterar: no dejar peticiones huérfanas.
+                for tarea in en_vuelo:
+                    tarea.cancel()
+            logger.debug(f"Paginación concurrente: {paginas_pedidas} páginas de {endpoint} (total informado: {total}).")
+            # Si la última página vino completa, la lista creció desde la primera respuesta:
+            # lo que falte se pide en serie.
+            if len(entidades_pagina) < self.page_size:
+                return
+            offset = limite
 
         while True:
-            payload["page"]["offset"] = offset
-            payload["page"]["length"] = page_size
-            response_json = await self._realizar_peticion_api("POST", endpoint, json=payload)
-            entidades_pagina = response_json.get("list", [])
-            if not entidades_pagina:
-                break
-            lista_completa.extend(entidades_pagina)
-            if len(entidades_pagina) < page_size:
-                break
-            offset += page_size
+            if paginas_pedidas >= self.max_paginas:
+                logger.warning(
+                    f"Paginación de {endpoint} cortada en {self.max_paginas} páginas (AA_PAGINACION_PAGINAS_MAX)."
+                )
+                return
+            entidades_pagina = (await self._obtener_pagina(endpoint, payload, offset)).get("list", [])
+            paginas_pedidas += 1
+            yield entidades_pagina
+            if len(entidades_pagina) < self.page_size:
+                return
+            offset += self.page_size
 
+    async def _obtener_lista_paginada_entidades(self, endpoint: str, payload: Dict) -> List[Dict]:
+        """Obtiene todas las entidades de un endpoint que soporta paginación (ver `iterar_paginas`)."""
+        lista_completa = []
+        async for entidades_pagina in self.iterar_paginas(endpoint, payload):
+            lista_completa.extend(entidades_pagina)
         logger.debug(f"Paginación: Se obtuvieron un total de {len(lista_completa)} entidades de {endpoint}.")
         return lista_completa
 
@@ -211,6 +539,19 @@ class AutomationAnywhereClient:
 
     # --- Métodos Públicos Asíncronos ---
 
+    _PAYLOAD_DEVICES = {"filter": {"operator": "eq", "field": "status", "value": "CONNECTED"}}
+    _PAYLOAD_ROBOTS = {
+        "filter": {
+            "operator": "and",
+            "operands": [
+                {"operator": "substring", "field": "path", "value": "RPA"},
+                {"operator": "eq", "field": "type", "value": "application/vnd.aa.taskbot"},
+            ],
+        },
+        "sort": [{"field": "id", "direction": "desc"}],
+    }
+    _PATRON_NOMBRE_ROBOT = re.compile(r"^P[A-Z0-9]*[0-9].*_.*")
+
     async def obtener_devices(self) -> List[Dict]:
         """
         Obtiene la lista de dispositivos conectados desde Automation Anywhere.
@@ -220,66 +561,146 @@ class AutomationAnywhereClient:
             Estructura según API v2 de A360.
         """
         logger.info("Obteniendo devices de A360...")
-        payload = {"filter": {"operator": "eq", "field": "status", "value": "CONNECTED"}}
-        devices_api = await self._obtener_lista_paginada_entidades(self._ENDPOINT_DEVICES_LIST_V2, payload)
+        devices_api = await self._obtener_lista_paginada_entidades(
+            self._ENDPOINT_DEVICES_LIST_V2, self._PAYLOAD_DEVICES
+        )
         logger.info(f"Se encontraron {len(devices_api)} devices conectados.")
         return devices_api
 
+    def iterar_devices(self) -> AsyncIterator[List[Dict]]:
+        """Páginas de dispositivos conectados, a medida que llegan."""
+        return self.iterar_paginas(self._ENDPOINT_DEVICES_LIST_V2, self._PAYLOAD_DEVICES)
+
     async def obtener_usuarios_detallados(self) -> List[Dict]:
         logger.info("Obteniendo usuarios detallados de A360...")
         usuarios_api = await self._obtener_lista_paginada_entidades(self._ENDPOINT_USERS_LIST_V2, {})
         logger.info(f"Se encontraron {len(usuarios_api)} usuarios.")
         return usuarios_api
 
+    def iterar_usuarios_detallados(self) -> AsyncIterator[List[Dict]]:
+        """Páginas de usuarios, a medida que llegan."""
+        return self.iterar_paginas(self._ENDPOINT_USERS_LIST_V2, {})
+
     async def obtener_robots(self) -> List[Dict]:
         logger.info("Obteniendo robots de A360...")
-        payload = {
-            "filter": {
-                "operator": "and",
-                "operands": [
-                    {"operator": "substring", "field": "path", "value": "RPA"},
-                    {"operator": "eq", "field": "type", "value": "application/vnd.aa.taskbot"},
-                ],
-            },
-            "sort": [{"field": "id", "direction": "desc"}],
-        }
-        robots_api = await self._obtener_lista_paginada_entidades(self._ENDPOINT_FILES_LIST_V2, payload)
+        robots_mapeados = []
+        async for robots_pagina in self.iterar_robots():
+            robots_mapeados.extend(robots_pagina)
+        logger.info(f"Se encontraron y filtraron {len(robots_mapeados)} robots.")
+        return robots_mapeados
+
+    async def iterar_robots(self) -> AsyncIterator[List[Dict]]:
+        """Páginas de robots ya filtrados y mapeados al formato de MergeRobots, a medida que llegan."""
+        async for bots in self.iterar_paginas(self._ENDPOINT_FILES_LIST_V2, self._PAYLOAD_ROBOTS):
+            yield self._mapear_robots(bots)
 
-        expression = r"^P[A-Z0-9]*[0-9].*_.*"
-        patron_nombre = re.compile(expression)
+    @classmethod
+    def _mapear_robots(cls, bots: List[Dict]) -> List[Dict]:
         robots_mapeados = []
-        for bot in robots_api:
+        for bot in bots:
             nombre = bot.get("name")
-            if nombre and patron_nombre.match(nombre) and "loop" not in nombre.lower():
+            if nombre and cls._PATRON_NOMBRE_ROBOT.match(nombre) and "loop" not in nombre.lower():
                 robots_mapeados.append(
                     {"RobotId": bot.get("id"), "Robot": nombre, "Descripcion": bot.get("description")}
                 )
-        logger.info(f"Se encontraron y filtraron {len(robots_mapeados)} robots.")
         return robots_mapeados
 
+    def _ajustar_lote_detalles(self, tamano: int, duracion: Optional[float] = None, timeout: bool = False):
+        """
+        Adapta el tamaño de lote de `obtener_detalles_por_deployment_ids` según la última respuesta:
+        un timeout lo reduce a la mitad, una respuesta lenta (más de 1/4 del timeout de la API) en un 25%
+        y una rápida (menos de 1/8) lo aumenta un 25%, sin superar 3/4 del menor lote que dio timeout.
+        """
+        objetivo = self.cr_api_timeout / 4
+        if timeout:
+            self._lote_detalles_techo = max(1, min(self._lote_detalles_techo, tamano * 3 // 4))
+            self._lote_detalles = min(self._lote_detalles, max(1, tamano // 2))
+        elif duracion > objetivo:
+            self._lote_detalles = min(self._lote_detalles, max(1, tamano * 3 // 4))
+        elif duracion < objetivo / 2 and tamano >= self._lote_detalles:
+            self._lote_detalles = min(self._lote_detalles_techo, self._lote_detalles + max(1, self._lote_detalles // 4))
+
     async def obtener_detalles_por_deployment_ids(self, deployment_ids: List[str]) -> List[Dict]:
-        """Obtiene detalles de deployments procesando los IDs en lotes para evitar timeouts."""
+        """
+        Obtiene detalles de deployments consultando los IDs en lotes concurrentes (hasta
+        `conciliador_concurrencia` a la vez). El tamaño de cada lote nuevo se toma del valor adaptativo
+        actual; un lote que da timeout se parte en mitades y se reintenta en lugar de omitirse.
+        """
         if not deployment_ids:
             return []
-        all_details = []
+        all_details: List[Dict] = []
+        omitidos: List[str] = []
+        estadisticas = {"lotes": 0, "timeouts": 0}
+        semaforo = asyncio.Semaphore(self.conciliador_concurrencia)
         logger.info(
-            f"Obteniendo detalles de {len(deployment_ids)} deployments en lotes de {self.CONCILIADOR_BATCH_SIZE}..."
+            f"Obteniendo detalles de {len(deployment_ids)} deployments en lotes de ~{self._lote_detalles} "
+            f"(concurrencia {self.conciliador_concurrencia})..."
         )
 
-        for i in range(0, len(deployment_ids), self.CONCILIADOR_BATCH_SIZE):
-            batch_ids = deployment_ids[i : i + self.CONCILIADOR_BATCH_SIZE]
-            logger.debug(f"Procesando lote {i // self.CONCILIADOR_BATCH_SIZE + 1} con {len(batch_ids)} IDs.")
-            payload = self._crear_filtro_deployment_ids(batch_ids)
+        async def _consultar_lote(batch_ids: List[str], cupo_tomado: bool = False):
+            if not cupo_tomado:
+                await semaforo.acquire()
+            # Un lote de un solo ID ya no se puede partir: se usa la política normal de reintentos.
+            ultimo_intento = len(batch_ids) == 1
+            inicio = time.monotonic()
             try:
-                response_json = await self._realizar_peticion_api("POST", self._ENDPOINT_ACTIVITY_LIST_V3, json=payload)
-                all_details.extend(response_json.get("list", []))
-            except httpx.ReadTimeout:
-                logger.error(
-                    f"Timeout ({self.cr_api_timeout}s) al procesar un lote de {len(batch_ids)} deployment IDs. Lote omitido. IDs: {batch_ids}."
+                estadisticas["lotes"] += 1
+                payload = self._crear_filtro_deployment_ids(batch_ids)
+                response_json = await self._peticion_listado(
+                    self._ENDPOINT_ACTIVITY_LIST_V3, payload, reintentar_timeouts=ultimo_intento
                 )
+                self._ajustar_lote_detalles(len(batch_ids), duracion=time.monotonic() - inicio)
+                all_details.extend(response_json.get("list", []))
+                return
+            except httpx.TimeoutException:
+                estadisticas["timeouts"] += 1
+                self._ajustar_lote_detalles(len(batch_ids), timeout=True)
+                if ultimo_intento:
+                    logger.error(
+                        f"Timeout ({self.cr_api_timeout}s) persistente al consultar el deployment {batch_ids[0]}."
+                    )
+                    omitidos.extend(batch_ids)
+                    return
             except Exception as e:
                 logger.error(f"Error al procesar un lote de deployment IDs. Lote omitido. Error: {e}", exc_info=True)
-        logger.info(f"Se obtuvieron detalles para {len(all_details)} de {len(deployment_ids)} deployments solicitados.")
+                omitidos.extend(batch_ids)
+                return
+            finally:
+                semaforo.release()
+
+            mitad = len(batch_ids) // 2
+            logger.warning(
+                f"Timeout ({self.cr_api_timeout}s) en un lote de {len(batch_ids)} deployment IDs. "
+                f"Se reintenta en dos lotes de {mitad} y {len(batch_ids) - mitad}."
+            )
+            await asyncio.gather(_consultar_lote(batch_ids[:mitad]), _consultar_lote(batch_ids[mitad:]))
+
+        # Cada lote se corta recién cuando hay un cupo libre, para usar el tamaño más actualizado.
+        tareas = []
+        inicio_lote = 0
+        try:
+            while inicio_lote < len(deployment_ids):
+                await semaforo.acquire()
+                batch_ids = deployment_ids[inicio_lote : inicio_lote + self._lote_detalles]
+                inicio_lote += len(batch_ids)
+                tareas.append(asyncio.create_task(_consultar_lote(batch_ids, cupo_tomado=True)))
+            await asyncio.gather(*tareas)
+        except BaseException:
+            for tarea in tareas:
+                tarea.cancel()
+            raise
+
+        if not estadisticas["timeouts"]:
+            # Sin timeouts en todo el ciclo, el próximo puede volver a probar lotes más grandes.
+            techo = self._lote_detalles_techo
+            self._lote_detalles_techo = min(self.conciliador_lote_max, techo + max(1, techo // 4))
+        if omitidos:
+            logger.error(f"No se pudieron consultar {len(omitidos)} deployment IDs: {omitidos}.")
+        logger.info(
+            f"Se obtuvieron detalles para {len(all_details)} de {len(deployment_ids)} deployments solicitados "
+            f"({estadisticas['lotes']} lotes, {estadisticas['timeouts']} timeouts; próximo tamaño de lote: "
+            f"{self._lote_detalles})."
+        )
         return all_details
 
     async def obtener_ejecuciones_activas(self) -> List[Dict]:
@@ -404,7 +825,10 @@ class AutomationAnywhereClient:
             return False
 
     async def close(self):
-        """Cierra la sesión del cliente httpx."""
+        """Cierra la sesión del cliente httpx y detiene la renovación del token en segundo plano."""
+        if self._tarea_refresco_token and not self._tarea_refresco_token.done():
+            self._tarea_refresco_token.cancel()
+            await asyncio.gather(self._tarea_refresco_token, return_exceptions=True)
         if self._client and not self._client.is_closed:
             await self._client.aclose()
             logger.info("Cliente API de A360 cerrado.")
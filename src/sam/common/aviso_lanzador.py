@@ -0,0 +1,88 @@
+# src/sam/common/aviso_lanzador.py
+"""
+Aviso del Callback al Lanzador cuando una ejecución termina y su equipo queda libre.
+
+El Callback envía un datagrama UDP local por cada callback que actualizó una ejecución; el Lanzador
+los recibe, espera unos milisegundos para juntar los que lleguen casi a la vez y lanza un ciclo
+restringido a los equipos liberados, sin esperar a su próximo ciclo periódico. El aviso es solo una
+optimización: si se pierde un datagrama, o el Lanzador no está escuchando, el equipo se atiende en
+el ciclo periódico como siempre.
+"""
+
+import asyncio
+import json
+import logging
+import socket
+import time
+from typing import Any, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# (deploymentId, userId, instante del callback en epoch)
+Aviso = Tuple[str, Optional[str], float]
+
+
+class EmisorAvisos:
+    """Lado del Callback: envía avisos sin bloquear ni fallar el procesamiento del callback."""
+
+    def __init__(self, host: str, puerto: int):
+        self._destino = (host, int(puerto))
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._socket.setblocking(False)
+
+    def avisar(self, deployment_id: str, user_id: Optional[str] = None):
+        datos = json.dumps({"deploymentId": deployment_id, "userId": user_id, "ts": time.time()})
+        try:
+            self._socket.sendto(datos.encode("utf-8"), self._destino)
+        except OSError as e:
+            logger.debug(f"No se pudo avisar al Lanzador del fin de {deployment_id}: {e}")
+
+    def cerrar(self):
+        self._socket.close()
+
+
+class ReceptorAvisos(asyncio.DatagramProtocol):
+    """Lado del Lanzador: acumula los avisos recibidos hasta que el ciclo de lanzamiento los toma."""
+
+    def __init__(self):
+        self._avisos: List[Aviso] = []
+        self._hay_avisos = asyncio.Event()
+        self._transporte: Optional[asyncio.DatagramTransport] = None
+        self.recibidos = 0
+
+    async def iniciar(self, host: str, puerto: int):
+        loop = asyncio.get_running_loop()
+        self._transporte, _ = await loop.create_datagram_endpoint(lambda: self, local_addr=(host, int(puerto)))
+        logger.info(f"Escuchando avisos de equipos liberados en {host}:{puerto} (UDP).")
+
+    def datagram_received(self, data: bytes, addr: Any):
+        try:
+            contenido = json.loads(data.decode("utf-8"))
+            aviso = (str(contenido["deploymentId"]), contenido.get("userId"), float(contenido.get("ts") or time.time()))
+        except (ValueError, KeyError, TypeError, AttributeError):
+            logger.debug(f"Aviso inválido recibido de {addr}: {data[:200]!r}")
+            return
+        self.recibidos += 1
+        self._avisos.append(aviso)
+        self._hay_avisos.set()
+
+    def hay_avisos(self) -> bool:
+        return self._hay_avisos.is_set()
+
+    async def esperar(self, timeout: Optional[float]) -> bool:
+        """Espera hasta `timeout` segundos a que haya avisos pendientes. Devuelve si los hay."""
+        try:
+            await asyncio.wait_for(self._hay_avisos.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        return self.hay_avisos()
+
+    def tomar(self) -> List[Aviso]:
+        avisos, self._avisos = self._avisos, []
+        self._hay_avisos.clear()
+        return avisos
+
+    def cerrar(self):
+        if self._transporte is not None:
+            self._transporte.close()
+            self._transporte = None
@@ -126,6 +126,7 @@ class ConfigManager:
             ),
             "datefmt": cls._get_with_fallback("LOG_FECHA_FORMATO", "LOG_DATEFMT", "%Y-%m-%d %H:%M:%S"),
             "backupCount": int(cls._get_with_fallback("LOG_BACKUP_CANTIDAD", "LOG_BACKUP_COUNT", 7)),
+            "db_metrics_interval": float(cls._get_config_value("LOG_METRICAS_BD_INTERVALO_SEG", 300)),
             # Nombres de archivo específicos para cada servicio
             "app_log_filename_lanzador": cls._get_with_fallback(
                 "LOG_ARCHIVO_LANZADOR", "APP_LOG_FILENAME_LANZADOR", "sam_lanzador_app.log"
@@ -194,6 +195,37 @@ class ConfigManager:
                 "40001,HYT00,HYT01,08S01",
             ).split(","),
             "pool_size": int(cls._get_with_fallback(f"{prefix}_POOL_TAMANO", f"{prefix}_POOL_SIZE", 5)),
+            "pool_wait_timeout": float(cls._get_config_value(f"{prefix}_POOL_ESPERA_TIMEOUT_SEG", 30)),
+            "pool_validation_idle": float(cls._get_config_value(f"{prefix}_POOL_VALIDACION_INACTIVIDAD_SEG", 30)),
+            "pool_max_lifetime": float(cls._get_config_value(f"{prefix}_POOL_VIDA_MAX_SEG", 1800)),
+            "batch_size": int(cls._get_config_value(f"{prefix}_QUERY_LOTE_TAMANO", 500)),
+            "slow_query_ms": float(cls._get_config_value(f"{prefix}_QUERY_LENTA_UMBRAL_MS", 1000)),
+        }
+
+    # Valores por defecto de los pools nombrados de DatabaseConnector. El tamaño del pool "oltp"
+    # es por defecto {prefix}_POOL_TAMANO; los nombres desconocidos usan los valores de "maintenance".
+    _SQL_POOLS_DEFAULTS = {
+        "oltp": {"tamano": None, "timeout_sentencia": 0, "cola_max": 0},
+        "analytics": {"tamano": 2, "timeout_sentencia": 120, "cola_max": 10},
+        "maintenance": {"tamano": 1, "timeout_sentencia": 0, "cola_max": 0},
+    }
+
+    @classmethod
+    def get_sql_server_pool_config(cls, prefix: str, nombre_pool: str) -> Dict[str, Any]:
+        """
+        Obtiene la configuración de un pool nombrado de DatabaseConnector (ej: 'SQL_SAM', 'analytics').
+        Un timeout o una cola máxima en 0 significan "sin límite"; `pool_size` None usa {prefix}_POOL_TAMANO.
+        """
+        defaults = cls._SQL_POOLS_DEFAULTS.get(nombre_pool, cls._SQL_POOLS_DEFAULTS["maintenance"])
+        clave = f"{prefix}_POOL_{nombre_pool.upper()}"
+        tamano = cls._get_config_value(f"{clave}_TAMANO", defaults["tamano"])
+        return {
+            "pool_size": int(tamano) if tamano is not None else None,
+            "statement_timeout": int(
+                cls._get_config_value(f"{clave}_SENTENCIA_TIMEOUT_SEG", defaults["timeout_sentencia"])
+            ),
+            "read_only": str(cls._get_config_value(f"{clave}_SOLO_LECTURA", "False")).lower() == "true",
+            "queue_limit": int(cls._get_config_value(f"{clave}_COLA_MAX", defaults["cola_max"])),
         }
 
     # --- CONFIGURACIONES ESPECÍFICAS POR SERVICIO ---
@@ -231,6 +263,11 @@ class ConfigManager:
             "intervalo_lanzamiento": int(
                 cls._get_with_fallback("LANZADOR_CICLO_INTERVALO_SEG", "LANZADOR_INTERVALO_LANZAMIENTO_SEG", 15)
             ),
+            "intervalo_lanzamiento_min": float(cls._get_config_value("LANZADOR_CICLO_INTERVALO_MIN_SEG", 0)) or None,
+            "intervalo_lanzamiento_max": float(cls._get_config_value("LANZADOR_CICLO_INTERVALO_MAX_SEG", 0)) or None,
+            "jitter_lanzamiento": float(cls._get_config_value("LANZADOR_CICLO_JITTER", 0)),
+            # Separación mínima entre el inicio de los ciclos de lanzamiento y conciliación
+            "ciclos_separacion_seg": float(cls._get_config_value("LANZADOR_CICLOS_SEPARACION_SEG", 2)),
             "max_workers_lanzador": int(cls._get_with_fallback("LANZADOR_WORKERS_MAX", "LANZADOR_MAX_WORKERS", 10)),
             "shutdown_timeout_seg": int(cls._get_env_with_warning("LANZADOR_SHUTDOWN_TIMEOUT_SEG", 60)),
             # Sincronización
@@ -241,15 +278,25 @@ class ConfigManager:
             "intervalo_sincronizacion": int(
                 cls._get_with_fallback("LANZADOR_SYNC_INTERVALO_SEG", "LANZADOR_INTERVALO_SINCRONIZACION_SEG", 3600)
             ),
+            "intervalo_sincronizacion_min": float(cls._get_config_value("LANZADOR_SYNC_INTERVALO_MIN_SEG", 0)) or None,
+            "intervalo_sincronizacion_max": float(cls._get_config_value("LANZADOR_SYNC_INTERVALO_MAX_SEG", 0)) or None,
+            "jitter_sincronizacion": float(cls._get_config_value("LANZADOR_SYNC_JITTER", 0)),
             # Conciliación
             "intervalo_conciliacion": int(
                 cls._get_with_fallback(
                     "LANZADOR_CONCILIACION_INTERVALO_SEG", "LANZADOR_INTERVALO_CONCILIACION_SEG", 900
                 )
             ),
+            "intervalo_conciliacion_min": float(cls._get_config_value("LANZADOR_CONCILIACION_INTERVALO_MIN_SEG", 0))
+            or None,
+            "intervalo_conciliacion_max": float(cls._get_config_value("LANZADOR_CONCILIACION_INTERVALO_MAX_SEG", 0))
+            or None,
+            "jitter_conciliacion": float(cls._get_config_value("LANZADOR_CONCILIACION_JITTER", 0)),
             "conciliador_batch_size": int(
                 cls._get_with_fallback("LANZADOR_CONCILIACION_LOTE_TAMANO", "LANZADOR_CONCILIADOR_TAMANO_LOTE", 25)
             ),
+            "conciliador_batch_size_max": int(cls._get_config_value("LANZADOR_CONCILIACION_LOTE_TAMANO_MAX", 100)),
+            "conciliador_concurrency": int(cls._get_config_value("LANZADOR_CONCILIACION_CONCURRENCIA_MAX", 4)),
             "dias_tolerancia_unknown": int(
                 cls._get_with_fallback(
                     "LANZADOR_CONCILIACION_UNKNOWN_TOLERANCIA_DIAS",
@@ -276,6 +323,26 @@ class ConfigManager:
             "delay_reintentos_deploy_seg": int(
                 cls._get_with_fallback("LANZADOR_DEPLOY_REINTENTO_DELAY_SEG", "LANZADOR_DELAY_REINTENTO_DEPLOY_SEG", 5)
             ),
+            "deploy_timeout_seg": float(cls._get_config_value("LANZADOR_DEPLOY_TIMEOUT_SEG", 300)),
+            "deploy_agrupado": str(cls._get_config_value("LANZADOR_DEPLOY_AGRUPADO", "False")).lower() == "true",
+            # Registro diferido de ejecuciones
+            "registro_diferido": str(cls._get_config_value("LANZADOR_REGISTRO_DIFERIDO_HABILITAR", "False")).lower()
+            == "true",
+            "registro_lote_tamano": int(cls._get_config_value("LANZADOR_REGISTRO_LOTE_TAMANO", 50)),
+            "registro_lote_intervalo_ms": int(cls._get_config_value("LANZADOR_REGISTRO_LOTE_INTERVALO_MS", 500)),
+            "registro_max_pendientes": int(cls._get_config_value("LANZADOR_REGISTRO_PENDIENTES_MAX", 1000)),
+            "registro_spill_archivo": cls._get_config_value("LANZADOR_REGISTRO_SPILL_ARCHIVO", None) or None,
+            # Salud de equipos: omitir despliegues en equipos desconectados
+            "salud_equipos_habilitar": str(cls._get_config_value("LANZADOR_SALUD_EQUIPOS_HABILITAR", "False")).lower()
+            == "true",
+            "salud_equipos_fallos_umbral": int(cls._get_config_value("LANZADOR_SALUD_EQUIPOS_FALLOS_UMBRAL", 1)),
+            "salud_equipos_sondeo_min_seg": float(cls._get_config_value("LANZADOR_SALUD_EQUIPOS_SONDEO_MIN_SEG", 60)),
+            "salud_equipos_sondeo_max_seg": float(cls._get_config_value("LANZADOR_SALUD_EQUIPOS_SONDEO_MAX_SEG", 900)),
+            "salud_equipos_lista_ttl_seg": float(cls._get_config_value("LANZADOR_SALUD_EQUIPOS_LISTA_TTL_SEG", 120)),
+            # Trazas por fase de los ciclos
+            "trazas_habilitar": str(cls._get_config_value("LANZADOR_TRAZAS_HABILITAR", "False")).lower() == "true",
+            "trazas_buffer_tamano": int(cls._get_config_value("LANZADOR_TRAZAS_BUFFER_TAMANO", 2000)),
+            "trazas_archivo": cls._get_config_value("LANZADOR_TRAZAS_ARCHIVO", None) or None,
             # Robot
             "repeticiones": int(
                 cls._get_with_fallback("LANZADOR_ROBOT_REPETICIONES", "LANZADOR_REPETICIONES_ROBOT", 3)
@@ -354,6 +421,21 @@ class ConfigManager:
             ).strip("/"),
         }
 
+    @classmethod
+    def get_callback_pendientes_config(cls) -> Dict[str, Any]:
+        """
+        Callbacks cuya ejecución todavía no está en BD (registro diferido del Lanzador): se guardan y se
+        reaplican. Habilitado por defecto cuando el registro diferido lo está.
+        """
+        registro_diferido = cls._get_config_value("LANZADOR_REGISTRO_DIFERIDO_HABILITAR", "False")
+        return {
+            "habilitado": str(cls._get_config_value("CALLBACK_PENDIENTES_HABILITAR", None) or registro_diferido).lower()
+            == "true",
+            "reintento_seg": float(cls._get_config_value("CALLBACK_PENDIENTES_REINTENTO_SEG", 2)),
+            "ttl_seg": float(cls._get_config_value("CALLBACK_PENDIENTES_TTL_SEG", 900)),
+            "max_pendientes": int(cls._get_config_value("CALLBACK_PENDIENTES_MAX", 1000)),
+        }
+
     @classmethod
     def get_interfaz_web_config(cls) -> Dict[str, Any]:
         """Obtiene la configuración para la Interfaz Web."""
@@ -475,9 +557,39 @@ class ConfigManager:
             "max_pagination_pages": int(
                 cls._get_with_fallback("AA_PAGINACION_PAGINAS_MAX", "AA_MAX_PAGINATION_PAGES", 1000)
             ),
+            "pagination_concurrency": int(cls._get_config_value("AA_PAGINACION_CONCURRENCIA_MAX", 4)),
             "token_refresh_buffer_sec": int(
                 cls._get_with_fallback("AA_TOKEN_REFRESH_BUFFER_SEG", "AA_TOKEN_REFRESH_BUFFER_SEC", 1140)
             ),
+            "token_cache_path": cls._get_config_value("AA_TOKEN_CACHE_ARCHIVO", None) or None,
+            # Concurrencia adaptativa por familia de endpoints y presupuesto de reintentos
+            "adaptive_concurrency_max": {
+                "deploy": int(cls._get_config_value("AA_CONCURRENCIA_DEPLOY_MAX", 20)),
+                "activity": int(cls._get_config_value("AA_CONCURRENCIA_ACTIVITY_MAX", 8)),
+                "devices": int(cls._get_config_value("AA_CONCURRENCIA_DEVICES_MAX", 8)),
+            },
+            "latency_tolerance": float(cls._get_config_value("AA_CONCURRENCIA_LATENCIA_TOLERANCIA", 3.0)),
+            "retry_budget_ratio": float(cls._get_config_value("AA_REINTENTOS_PRESUPUESTO_RATIO", 0.2)),
+            "list_cache_ttl": float(cls._get_config_value("AA_LISTADOS_CACHE_TTL_SEG", 0)),
+        }
+
+    @classmethod
+    def get_sincronizacion_config(cls) -> Dict[str, Any]:
+        """Obtiene la configuración de la sincronización de entidades con A360 (Lanzador y Web)."""
+        return {
+            "delta_habilitado": str(cls._get_config_value("SINCRONIZACION_DELTA_HABILITAR", "True")).lower() == "true",
+            "indice_archivo": cls._get_config_value("SINCRONIZACION_INDICE_ARCHIVO", None) or None,
+            "indice_verificacion_seg": int(cls._get_config_value("SINCRONIZACION_INDICE_VERIFICACION_SEG", 0)),
+        }
+
+    @classmethod
+    def get_aviso_lanzador_config(cls) -> Dict[str, Any]:
+        """Obtiene la configuración del aviso de equipos liberados del Callback al Lanzador (ambos servicios)."""
+        return {
+            "habilitado": str(cls._get_config_value("LANZADOR_AVISO_HABILITAR", "False")).lower() == "true",
+            "host": cls._get_config_value("LANZADOR_AVISO_HOST", "127.0.0.1"),
+            "puerto": int(cls._get_config_value("LANZADOR_AVISO_PUERTO", 8009)),
+            "debounce_ms": int(cls._get_config_value("LANZADOR_AVISO_DEBOUNCE_MS", 2000)),
         }
 
     @classmethod
@@ -0,0 +1,152 @@
+# src/sam/common/control_concurrencia.py
+"""
+Control de concurrencia adaptativo para las llamadas a la API de A360.
+
+- `LimitadorAdaptativo`: limita las peticiones en curso de una familia de endpoints (deploy, activity,
+  devices) con AIMD: el límite sube de a 1 por cada "ronda" de respuestas sanas y se reduce a la mitad
+  ante una señal de sobrecarga (429, 502/503/504, timeout). Si la latencia supera `tolerancia_latencia`
+  veces la latencia base observada, el límite baja un 10% antes de que lleguen los errores.
+- `PresupuestoReintentos`: presupuesto compartido de reintentos (token bucket). Cada petición nueva
+  deposita `ratio` y cada reintento consume 1, de modo que con el Control Room saturado los reintentos
+  no superan una fracción fija del tráfico.
+- `espera_con_jitter`: backoff exponencial con jitter, para que los reintentos no lleguen sincronizados.
+"""
+
+import asyncio
+import logging
+import random
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Códigos HTTP que indican que el Control Room está protegiéndose o saturado
+CODIGOS_SOBRECARGA = frozenset({429, 502, 503, 504})
+
+
+def espera_con_jitter(intento: int, base_seg: float = 2.0, maximo_seg: float = 30.0) -> float:
+    """Backoff exponencial con jitter: entre la mitad y el total de `base * 2^intento`, acotado a `maximo_seg`."""
+    tope = min(maximo_seg, base_seg * (2**intento))
+    return tope / 2 + random.uniform(0, tope / 2)
+
+
+class PresupuestoReintentos:
+    def __init__(self, ratio: float = 0.2, reserva: float = 10):
+        self.ratio = ratio
+        self.reserva = float(reserva)
+        self._saldo = float(reserva)
+        self.reintentos = 0
+        self.denegados = 0
+
+    def depositar(self):
+        """Registra una petición nueva: suma `ratio` al saldo, sin superar la reserva."""
+        self._saldo = min(self.reserva, self._saldo + self.ratio)
+
+    def retirar(self) -> bool:
+        """Consume un reintento. Devuelve False si el presupuesto está agotado."""
+        if self._saldo >= 1:
+            self._saldo -= 1
+            self.reintentos += 1
+            return True
+        self.denegados += 1
+        return False
+
+    def metricas(self) -> Dict[str, Any]:
+        return {
+            "saldo": round(self._saldo, 2),
+            "ratio": self.ratio,
+            "reintentos": self.reintentos,
+            "denegados": self.denegados,
+        }
+
+
+class LimitadorAdaptativo:
+    def __init__(
+        self,
+        nombre: str,
+        limite_max: int,
+        limite_min: int = 1,
+        limite_inicial: Optional[int] = None,
+        tolerancia_latencia: float = 3.0,
+    ):
+        self.nombre = nombre
+        self.limite_max = max(1, limite_max)
+        self.limite_min = max(1, min(limite_min, self.limite_max))
+        self.limite = float(limite_inicial or max(self.limite_min, self.limite_max // 2))
+        self.tolerancia_latencia = tolerancia_latencia
+        self._en_curso = 0
+        self._esperando = 0
+        self._condicion = asyncio.Condition()
+        self._latencia_base: Optional[float] = None
+        self._ultima_reduccion = 0.0
+        self._contadores = {"exitos": 0, "sobrecargas": 0, "latencias_altas": 0, "reducciones": 0}
+
+    @asynccontextmanager
+    async def cupo(self):
+        """Espera hasta que haya lugar bajo el límite actual y ocupa un cupo mientras dura el bloque."""
+        async with self._condicion:
+            self._esperando += 1
+            try:
+                await self._condicion.wait_for(lambda: self._en_curso < int(self.limite))
+            finally:
+                self._esperando -= 1
+            self._en_curso += 1
+        try:
+            yield
+        finally:
+            async with self._condicion:
+                self._en_curso -= 1
+                self._condicion.notify_all()
+
+    def registrar_exito(self, latencia: float, inicio: Optional[float] = None):
+        """
+        Respuesta sana: aumento aditivo (+1 por cada `limite` respuestas) salvo que la latencia sea alta.
+        `inicio` es el `time.monotonic()` en que empezó la petición (ver `_reducir`).
+        """
+        self._contadores["exitos"] += 1
+        base = self._latencia_base
+        # La base sigue al mínimo observado, con una deriva lenta hacia arriba por si cambia la latencia normal.
+        self._latencia_base = latencia if base is None else min(latencia, base * 1.01)
+        if base is not None and latencia > base * self.tolerancia_latencia:
+            self._contadores["latencias_altas"] += 1
+            self._reducir(0.9, f"latencia {latencia:.2f}s > {self.tolerancia_latencia}x base {base:.2f}s", inicio)
+            return
+        limite_anterior = int(self.limite)
+        self.limite = min(float(self.limite_max), self.limite + 1 / self.limite)
+        if int(self.limite) > limite_anterior:
+            logger.debug(f"Concurrencia A360 '{self.nombre}': límite aumentado a {int(self.limite)}.")
+
+    def registrar_sobrecarga(self, motivo: str = "sobrecarga", inicio: Optional[float] = None):
+        """429, 5xx de gateway o timeout: reducción multiplicativa a la mitad."""
+        self._contadores["sobrecargas"] += 1
+        self._reducir(0.5, motivo, inicio)
+
+    def _reducir(self, factor: float, motivo: str, inicio: Optional[float] = None):
+        # Una sola reducción por ráfaga: una petición que empezó antes de la última reducción se envió
+        # con el límite anterior y su sobrecarga ya está contada, aunque llegue mucho después de la
+        # latencia base. Sin `inicio`, la ventana es la latencia base.
+        ahora = time.monotonic()
+        if inicio is not None:
+            if inicio < self._ultima_reduccion:
+                return
+        elif ahora - self._ultima_reduccion < (self._latencia_base or 1.0):
+            return
+        self._ultima_reduccion = ahora
+        limite_anterior = int(self.limite)
+        self.limite = max(float(self.limite_min), self.limite * factor)
+        self._contadores["reducciones"] += 1
+        if int(self.limite) < limite_anterior:
+            logger.info(
+                f"Concurrencia A360 '{self.nombre}': límite reducido de {limite_anterior} a {int(self.limite)} ({motivo})."
+            )
+
+    def metricas(self) -> Dict[str, Any]:
+        return {
+            "limite": int(self.limite),
+            "limite_max": self.limite_max,
+            "en_curso": self._en_curso,
+            "esperando": self._esperando,
+            "latencia_base_seg": round(self._latencia_base, 3) if self._latencia_base is not None else None,
+            **self._contadores,
+        }
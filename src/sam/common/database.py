@@ -1,14 +1,22 @@
 # src/sam/common/database.py
+import asyncio
+import functools
+import keyword
 import logging
 import threading
 import time
+import weakref
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
 from enum import Enum
-from typing import TYPE_CHECKING, Any, Dict, List
+from operator import itemgetter
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple, Union
 
 import pyodbc
 
 from .config_manager import ConfigManager
+from .metricas_db import MedicionConsulta
 
 if TYPE_CHECKING:
     pass
@@ -23,16 +31,233 @@ class UpdateStatus(Enum):
     ERROR = 4
 
 
+class ResultadoLote(NamedTuple):
+    """Resultado de `ejecutar_consulta_multiple_detallada`."""
+
+    filas_afectadas: int
+    fallidas: List[Tuple[tuple, str]]  # (params, mensaje de error) de cada fila que no se pudo aplicar
+
+
+class RowMode(str, Enum):
+    """
+    Formato en que se devuelven las filas de un SELECT.
+    DICT es el formato histórico; el resto evita crear un dict por fila en lecturas grandes.
+    """
+
+    DICT = "dict"  # List[Dict]: un dict por fila.
+    TUPLE = "tuple"  # List[tuple]: valores en el orden de las columnas. El más rápido y liviano.
+    # List[RegistroFila]: objetos con __slots__, de solo lectura y compatibles con Mapping (se serializan
+    # como dict en FastAPI). ~1/4 de la memoria de DICT; pensado para resultados de lectura que se exponen
+    # en la API. Con cientos de miles de filas es más lento que DICT: para eso usar TUPLE o COLUMNS.
+    RECORD = "record"
+    COLUMNS = "columns"  # Dict[str, List]: una lista de valores por columna.
+
+
+class RegistroFila(Mapping):
+    """
+    Base de los registros generados por `clase_registro`. Cada subclase declara un slot por columna,
+    así que una fila ocupa lo mismo que una tupla y no repite los nombres de columna.
+    Se comporta como un dict de solo lectura (`fila["Col"]`, `fila.get("Col")`, `dict(fila)`)
+    y también admite acceso por atributo cuando el nombre de la columna es un identificador válido.
+    """
+
+    __slots__ = ()
+    _columnas: Tuple[str, ...] = ()
+    _slot_por_columna: Dict[str, str] = {}
+
+    def __getitem__(self, columna: str) -> Any:
+        try:
+            return getattr(self, self._slot_por_columna[columna])
+        except KeyError:
+            raise KeyError(columna) from None
+
+    def __iter__(self):
+        return iter(self._slot_por_columna)
+
+    def __len__(self) -> int:
+        return len(self._slot_por_columna)
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({dict(self)!r})"
+
+    def __reduce__(self):
+        return (_reconstruir_registro, (self._columnas, tuple(getattr(self, s) for s in self.__slots__)))
+
+
+def _reconstruir_registro(columnas: Tuple[str, ...], valores: tuple) -> RegistroFila:
+    return clase_registro(columnas)(valores)
+
+
+@functools.lru_cache(maxsize=256)
+def clase_registro(columnas: Tuple[str, ...]) -> type:
+    """
+    Devuelve (y cachea) la clase de registro para una lista de columnas.
+    Los nombres que no son identificadores válidos, están repetidos o coinciden con un atributo de
+    `RegistroFila` (`keys`, `get`, `items`...) se guardan en slots `_cN`, para no tapar los métodos de
+    Mapping; ante columnas repetidas gana la última, igual que con dict(zip(columnas, fila)).
+    """
+    slots = []
+    for i, columna in enumerate(columnas):
+        valido = (
+            columna.isidentifier()
+            and not keyword.iskeyword(columna)
+            and not columna.startswith("_")
+            and not hasattr(RegistroFila, columna)
+        )
+        slots.append(columna if valido and columna not in slots else f"_c{i}")
+    slot_por_columna = dict(zip(columnas, slots))
+
+    # El __init__ se genera una vez por clase para asignar todos los slots con un solo unpacking.
+    codigo = f"def __init__(self, fila):\n    {', '.join(f'self.{s}' for s in slots)}, = fila\n"
+    espacio: Dict[str, Any] = {}
+    exec(codigo, espacio)
+
+    return type(
+        "RegistroFila",
+        (RegistroFila,),
+        {
+            "__slots__": tuple(slots),
+            "__init__": espacio["__init__"],
+            "_columnas": tuple(columnas),
+            "_slot_por_columna": slot_por_columna,
+        },
+    )
+
+
+def materializar_filas(
+    columnas: Sequence[str], filas: Sequence[Sequence[Any]], row_mode: Union[RowMode, str] = RowMode.DICT
+) -> Union[List[Dict], List[tuple], List[RegistroFila], Dict[str, List]]:
+    """Convierte las filas devueltas por `cursor.fetchall()` al formato pedido en `row_mode`."""
+    row_mode = RowMode(row_mode)
+    if row_mode is RowMode.DICT:
+        return [dict(zip(columnas, fila)) for fila in filas]
+    if row_mode is RowMode.TUPLE:
+        return [tuple(fila) for fila in filas]
+    if row_mode is RowMode.RECORD:
+        registro = clase_registro(tuple(columnas))
+        return [registro(fila) for fila in filas]
+    # RowMode.COLUMNS: una pasada por columna con itemgetter (en C) es más rápida que zip(*filas).
+    return {columna: list(map(itemgetter(i), filas)) for i, columna in enumerate(columnas)}
+
+
+# Límite de parámetros por batch de SQL Server.
+MAX_PARAMETROS_BATCH = 2100
+
+# Pools nombrados de DatabaseConnector (ver `DatabaseConnector.pool`).
+POOL_OLTP = "oltp"
+POOL_ANALYTICS = "analytics"
+POOL_MAINTENANCE = "maintenance"
+
+
+class PoolSaturadoError(pyodbc.OperationalError):
+    """
+    Se rechazó el pedido de conexión porque la cola de espera del pool está llena.
+    SQLSTATE HY000: no es reintentable por defecto, para que el llamador falle rápido.
+    """
+
+
+def _es_error_de_fila(error: pyodbc.Error) -> bool:
+    """Errores causados por los datos de una fila (SQLSTATE clases 22 y 23), que la bisección puede aislar."""
+    if isinstance(error, (pyodbc.IntegrityError, pyodbc.DataError)):
+        return True
+    sqlstate = error.args[0] if error.args else None
+    return isinstance(sqlstate, str) and sqlstate[:2] in ("22", "23")
+
+
+class _SentenciaUnidad(NamedTuple):
+    query: str
+    params: tuple
+    es_select: bool
+    row_mode: RowMode
+
+
+class UnidadDeTrabajo:
+    """
+    Sentencias acumuladas para enviarse juntas con `DatabaseConnector.unit_of_work()`:
+    un único batch parametrizado, en una sola transacción y un solo viaje de red.
+
+    `agregar()` devuelve la posición de la sentencia en `resultados`, que se completa al ejecutar
+    la unidad: filas afectadas (`@@ROWCOUNT`) para las sentencias de escritura y las filas en el
+    formato de `row_mode` para los SELECT. Cada sentencia con `es_select=True` debe devolver
+    exactamente un result set y las demás ninguno (el batch corre con SET NOCOUNT ON).
+    """
+
+    def __init__(self):
+        self.sentencias: List[_SentenciaUnidad] = []
+        self.resultados: Optional[List[Any]] = None
+
+    def agregar(
+        self,
+        query: str,
+        params: Optional[Sequence[Any]] = None,
+        es_select: bool = False,
+        row_mode: Union[RowMode, str] = RowMode.DICT,
+    ) -> int:
+        if self.resultados is not None:
+            raise RuntimeError("La unidad de trabajo ya fue ejecutada.")
+        self.sentencias.append(
+            _SentenciaUnidad(query.strip().rstrip(";"), tuple(params or ()), es_select, RowMode(row_mode))
+        )
+        return len(self.sentencias) - 1
+
+    def __len__(self) -> int:
+        return len(self.sentencias)
+
+    def construir_batch(self) -> Tuple[str, tuple]:
+        """
+        Arma el batch: cada sentencia guarda su @@ROWCOUNT en una variable y al final un SELECT
+        las devuelve todas. Ante un error, TRY/CATCH relanza la excepción al cliente, que hace el
+        rollback igual que `obtener_cursor`. NOCOUNT se restaura porque la conexión vuelve al pool.
+        """
+        variables = [f"@sam_uow_{i}" for i in range(len(self.sentencias))]
+        partes = ["SET NOCOUNT ON;", f"DECLARE {', '.join(f'{v} INT' for v in variables)};", "BEGIN TRY"]
+        params: List[Any] = []
+        for variable, sentencia in zip(variables, self.sentencias):
+            partes.append(f"{sentencia.query};")
+            partes.append(f"SELECT {variable} = @@ROWCOUNT;")
+            params.extend(sentencia.params)
+        partes += ["END TRY", "BEGIN CATCH", "SET NOCOUNT OFF;", "THROW;", "END CATCH;", "SET NOCOUNT OFF;"]
+        partes.append(f"SELECT {', '.join(variables)};")
+        if len(params) > MAX_PARAMETROS_BATCH:
+            raise ValueError(
+                f"La unidad de trabajo usa {len(params)} parámetros; SQL Server admite {MAX_PARAMETROS_BATCH} por batch."
+            )
+        return "\n".join(partes), tuple(params)
+
+    def describir(self) -> str:
+        """Nombre con el que la unidad se agrupa en las métricas por sentencia."""
+        return "UNIT_OF_WORK " + " ; ".join(" ".join(s.query.split()[:3]) for s in self.sentencias)
+
+
 class DatabaseConnector:
     def __init__(
-        self, servidor: str, base_datos: str, usuario: str, contrasena: str, db_config_prefix: str = "SQL_SAM"
+        self,
+        servidor: str,
+        base_datos: str,
+        usuario: str,
+        contrasena: str,
+        db_config_prefix: str = "SQL_SAM",
+        nombre_pool: str = POOL_OLTP,
     ):
         self.db_config_prefix = db_config_prefix
+        self.nombre_pool = nombre_pool
         sql_config = ConfigManager.get_sql_server_config(db_config_prefix)
+        pool_config = ConfigManager.get_sql_server_pool_config(db_config_prefix, nombre_pool)
         self.max_retries = sql_config["max_retries"]
         self.initial_delay = sql_config["initial_delay"]
         self.retryable_sqlstates = set(sql_config["retryable_sqlstates"])
-        self._pool_max_size = sql_config["pool_size"]
+        self._pool_max_size = pool_config["pool_size"] or sql_config["pool_size"]
+        self._timeout_sentencia = pool_config["statement_timeout"]
+        self._pool_cola_max = pool_config["queue_limit"]
+        if self._timeout_sentencia:
+            # Con timeout por sentencia, HYT00 significa que la consulta excedió su presupuesto:
+            # reintentarla solo volvería a ocupar el pool el mismo tiempo.
+            self.retryable_sqlstates.discard("HYT00")
+        self._pool_espera_timeout = sql_config.get("pool_wait_timeout", 30)
+        self._pool_validacion_inactividad = sql_config.get("pool_validation_idle", 30)
+        self._pool_vida_max = sql_config.get("pool_max_lifetime", 1800)
+        self._lote_tamano = max(1, int(sql_config.get("batch_size", 500)))
+        self._umbral_consulta_lenta_ms = sql_config.get("slow_query_ms", 1000)
 
         self.connection_string = (
             f"DRIVER={sql_config['driver']};"
@@ -43,80 +268,297 @@ class DatabaseConnector:
             "TrustServerCertificate=yes;"
             f"Timeout={sql_config['timeout']};"
         )
+        if pool_config["read_only"]:
+            # Permite que un listener de Always On derive el pool a una réplica secundaria legible.
+            self.connection_string += "ApplicationIntent=ReadOnly;"
+        self._datos_conexion = (servidor, base_datos, usuario, contrasena)
+        self._pools_nombrados: Dict[str, "DatabaseConnector"] = {}
+        self._pools_nombrados_lock = threading.Lock()
+        self._pool_principal: Optional["DatabaseConnector"] = None
+        # Las métricas por sentencia del pool principal conservan el prefijo como origen.
+        self._origen_metricas = db_config_prefix if nombre_pool == POOL_OLTP else f"{db_config_prefix}:{nombre_pool}"
         self._thread_local = threading.local()
-        self._pool = []
+        # Cada entrada del pool es (conexion, creada_en, devuelta_en) con tiempos de time.monotonic().
+        # El lock solo protege la lista y los contadores: la I/O de red (conectar, validar, cerrar)
+        # se hace siempre fuera de él.
+        self._pool: List[tuple] = []
         self._pool_lock = threading.Lock()
+        # Limita el total de conexiones prestadas (en uso) al tamaño del pool.
+        self._pool_cupos = threading.BoundedSemaphore(self._pool_max_size)
+        self._creacion_conexiones: Dict[int, float] = {}
+        self._pool_en_uso = 0
+        self._pool_esperando = 0
+        self._pool_contadores = {
+            "checkouts": 0,
+            "esperas": 0,
+            "esperas_agotadas": 0,
+            "rechazadas": 0,
+            "creadas": 0,
+            "validadas": 0,
+            "descartadas": 0,
+        }
 
-    def _obtener_conexion_del_pool(self):
+    def pool(self, nombre: str) -> "DatabaseConnector":
+        """
+        Devuelve el conector del pool nombrado `nombre` (ej: `POOL_ANALYTICS`), creándolo la primera vez.
+        Cada pool tiene su propio tamaño, timeout por sentencia, cola de espera máxima y, opcionalmente,
+        ApplicationIntent=ReadOnly, de modo que una carga no puede agotar las conexiones de otra.
+        El pool con el que se creó el conector es el propio conector.
+        """
+        principal = self._pool_principal or self
+        if nombre == principal.nombre_pool:
+            return principal
+        with principal._pools_nombrados_lock:
+            conector = principal._pools_nombrados.get(nombre)
+            if conector is None:
+                conector = DatabaseConnector(
+                    *principal._datos_conexion, db_config_prefix=principal.db_config_prefix, nombre_pool=nombre
+                )
+                conector._pool_principal = principal
+                principal._pools_nombrados[nombre] = conector
+                logger.info(
+                    f"Pool '{nombre}' de {self.db_config_prefix} creado (tamaño {conector._pool_max_size}, "
+                    f"timeout por sentencia {conector._timeout_sentencia or 'sin límite'}s, "
+                    f"cola máxima {conector._pool_cola_max or 'sin límite'})."
+                )
+            return conector
+
+    def _incrementar_contador_pool(self, nombre: str):
         with self._pool_lock:
-            # Iterar mientras haya conexiones en el pool
-            while self._pool:
-                # 1. Saca una conexión existente.
-                conn = self._pool.pop()
+            self._pool_contadores[nombre] += 1
 
-                # 2. Valida que siga viva
-                try:
-                    cursor = conn.cursor()
-                    cursor.execute("SELECT 1")
-                    cursor.close()
-                    # Si OK, devuélvela. ¡Encontramos una!
-                    return conn
-                except pyodbc.Error as e:
-                    # 3. Si falló, está obsoleta.
-                    logger.warning(
-                        f"Se detectó una conexión obsoleta a la BD ({self.db_config_prefix}). Descartándola. Error: {e}"
-                    )
-                    # Cierra la conexión rota de forma segura.
-                    try:
-                        conn.close()
-                    except pyodbc.Error:
-                        pass  # La conexión ya podría estar cerrada.
-
-                    # No retornamos, el 'while' volverá a intentarlo
-                    # con la siguiente conexión del pool.
-
-            # 4. Si salimos del 'while', es porque el pool se vació.
-            # Ahora sí, creamos una nueva.
-            logger.info(
-                f"Pool de conexiones vacío (o todas obsoletas). Creando nueva conexión para {self.db_config_prefix}..."
+    def _adquirir_cupo_pool(self):
+        """
+        Reserva un cupo del pool, esperando como máximo `_pool_espera_timeout` segundos.
+        Si ya hay `_pool_cola_max` hilos esperando, rechaza el pedido de inmediato con `PoolSaturadoError`.
+        """
+        if self._pool_cupos.acquire(blocking=False):
+            return
+        with self._pool_lock:
+            rechazar = bool(self._pool_cola_max) and self._pool_esperando >= self._pool_cola_max
+            if rechazar:
+                self._pool_contadores["rechazadas"] += 1
+            else:
+                self._pool_contadores["esperas"] += 1
+                self._pool_esperando += 1
+        if rechazar:
+            raise PoolSaturadoError(
+                "HY000",
+                f"Pool '{self.nombre_pool}' de {self.db_config_prefix} saturado: "
+                f"{self._pool_cola_max} pedidos ya esperan una conexión.",
+            )
+        logger.debug(f"Pool de {self._origen_metricas} agotado ({self._pool_max_size}). Esperando una conexión...")
+        try:
+            obtenido = self._pool_cupos.acquire(timeout=self._pool_espera_timeout)
+        finally:
+            with self._pool_lock:
+                self._pool_esperando -= 1
+        if not obtenido:
+            self._incrementar_contador_pool("esperas_agotadas")
+            # HYT00 (timeout) es reintentable por defecto en ejecutar_consulta.
+            raise pyodbc.OperationalError(
+                "HYT00",
+                f"Timeout ({self._pool_espera_timeout}s) esperando una conexión libre del pool {self._origen_metricas}.",
             )
-            return self.conectar_base_datos()
 
-    def _devolver_conexion_al_pool(self, conn):
+    def _validar_conexion(self, conn) -> bool:
+        self._incrementar_contador_pool("validadas")
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1")
+            cursor.close()
+            return True
+        except pyodbc.Error as e:
+            logger.warning(
+                f"Se detectó una conexión obsoleta a la BD ({self.db_config_prefix}). Descartándola. Error: {e}"
+            )
+            return False
+
+    def _descartar_conexion(self, conn, motivo: str):
         with self._pool_lock:
-            # Solo volvemos a guardar la conexión si hay espacio
-            if len(self._pool) < self._pool_max_size:
-                self._pool.append(conn)
-            else:
-                # El pool está lleno, así que cerramos esta conexión
-                try:
-                    conn.close()
-                    logger.debug(f"Pool lleno ({self._pool_max_size}). Cerrando conexión en lugar de devolverla.")
-                except pyodbc.Error as e:
-                    logger.warning(f"Error al cerrar conexión excedente del pool: {e}")
+            self._pool_contadores["descartadas"] += 1
+            self._creacion_conexiones.pop(id(conn), None)
+        logger.debug(f"Descartando conexión del pool {self.db_config_prefix}: {motivo}.")
+        try:
+            conn.close()
+        except pyodbc.Error:
+            pass  # La conexión ya podría estar cerrada.
+
+    def _excede_vida_maxima(self, creada_en: Optional[float], ahora: float) -> bool:
+        return bool(self._pool_vida_max) and creada_en is not None and ahora - creada_en > self._pool_vida_max
+
+    def _obtener_conexion_del_pool(self):
+        self._adquirir_cupo_pool()
+        try:
+            while True:
+                with self._pool_lock:
+                    entrada = self._pool.pop() if self._pool else None
+                if entrada is None:
+                    break
+
+                conn, creada_en, devuelta_en = entrada
+                ahora = time.monotonic()
+                if self._excede_vida_maxima(creada_en, ahora):
+                    self._descartar_conexion(conn, "superó la vida máxima")
+                    continue
+                # Solo se hace el round trip de validación si la conexión estuvo inactiva demasiado tiempo.
+                if ahora - devuelta_en > self._pool_validacion_inactividad and not self._validar_conexion(conn):
+                    self._descartar_conexion(conn, "falló la validación")
+                    continue
+
+                with self._pool_lock:
+                    self._pool_contadores["checkouts"] += 1
+                    self._pool_en_uso += 1
+                return conn
+
+            logger.info(f"Pool de conexiones vacío. Creando nueva conexión para {self.db_config_prefix}...")
+            conn = self.conectar_base_datos()
+            with self._pool_lock:
+                self._creacion_conexiones[id(conn)] = time.monotonic()
+                self._pool_contadores["creadas"] += 1
+                self._pool_contadores["checkouts"] += 1
+                self._pool_en_uso += 1
+            return conn
+        except BaseException:
+            self._pool_cupos.release()
+            raise
+
+    def _devolver_conexion_al_pool(self, conn, descartar: bool = False):
+        try:
+            ahora = time.monotonic()
+            motivo = None
+            with self._pool_lock:
+                self._pool_en_uso -= 1
+                creada_en = self._creacion_conexiones.get(id(conn))
+                if descartar:
+                    motivo = "conexión rota"
+                elif self._excede_vida_maxima(creada_en, ahora):
+                    motivo = "superó la vida máxima"
+                elif len(self._pool) >= self._pool_max_size:
+                    motivo = f"pool lleno ({self._pool_max_size})"
+                else:
+                    self._pool.append((conn, creada_en, ahora))
+            if motivo:
+                self._descartar_conexion(conn, motivo)
+        finally:
+            self._pool_cupos.release()
+
+    def medir_consulta(self, query: str, params: Any = None) -> MedicionConsulta:
+        """Inicia la medición de una consulta para las métricas por sentencia (ver `metricas_db`)."""
+        return MedicionConsulta(self._origen_metricas, query, params, self._umbral_consulta_lenta_ms)
+
+    def obtener_metricas_pool(self) -> Dict[str, Any]:
+        """Devuelve un snapshot de los contadores del pool de conexiones."""
+        with self._pool_lock:
+            metricas = dict(self._pool_contadores)
+            metricas["inactivas"] = len(self._pool)
+            metricas["en_uso"] = self._pool_en_uso
+            metricas["esperando"] = self._pool_esperando
+            metricas["abiertas"] = len(self._creacion_conexiones)
+        metricas["tamano_max"] = self._pool_max_size
+        metricas["cola_max"] = self._pool_cola_max
+        metricas["timeout_sentencia_seg"] = self._timeout_sentencia
+        return metricas
+
+    def obtener_metricas_pools(self) -> Dict[str, Dict[str, Any]]:
+        """Métricas de cada pool nombrado creado hasta el momento, por nombre."""
+        principal = self._pool_principal or self
+        with principal._pools_nombrados_lock:
+            pools = [principal, *principal._pools_nombrados.values()]
+        return {conector.nombre_pool: conector.obtener_metricas_pool() for conector in pools}
 
     @contextmanager
     def obtener_cursor(self):
         conn = self._obtener_conexion_del_pool()
         cursor = None
+        conexion_rota = False
         try:
             cursor = conn.cursor()
+            if self._timeout_sentencia:
+                cursor.timeout = self._timeout_sentencia
             yield cursor
             conn.commit()
         except pyodbc.Error as ex:
             sqlstate = ex.args[0]
             logger.error(f"Error de base de datos (SQLSTATE: {sqlstate}): {ex}")
+            # Los errores de la clase 08 indican que la conexión se perdió: no se devuelve al pool.
+            conexion_rota = isinstance(sqlstate, str) and sqlstate.startswith("08")
             if conn:
                 try:
                     conn.rollback()
                 except pyodbc.Error as rb_ex:
                     logger.error(f"Error durante el rollback: {rb_ex}")
+                    conexion_rota = True
             raise
         finally:
             if cursor:
-                cursor.close()
+                try:
+                    cursor.close()
+                except pyodbc.Error:
+                    conexion_rota = True
             if conn:
-                self._devolver_conexion_al_pool(conn)
+                self._devolver_conexion_al_pool(conn, descartar=conexion_rota)
+
+    @contextmanager
+    def unit_of_work(self):
+        """
+        Acumula las sentencias agregadas dentro del bloque y las envía al salir como un único batch
+        en una transacción (ver `UnidadDeTrabajo`). Si el bloque lanza una excepción no se envía nada;
+        si falla alguna sentencia se hace rollback de todas y se relanza el error.
+
+            with db.unit_of_work() as uow:
+                uow.agregar("INSERT ...", (a, b))
+                i = uow.agregar("SELECT ...", (c,), es_select=True)
+            filas = uow.resultados[i]
+        """
+        unidad = UnidadDeTrabajo()
+        yield unidad
+        self.ejecutar_unidad_de_trabajo(unidad)
+
+    def ejecutar_unidad_de_trabajo(self, unidad: UnidadDeTrabajo) -> List[Any]:
+        """Ejecuta la unidad en un solo viaje de red, con reintentos, y devuelve sus `resultados`."""
+        if not unidad.sentencias:
+            unidad.resultados = []
+            return unidad.resultados
+
+        batch, params = unidad.construir_batch()
+        retries = self.max_retries
+        delay = self.initial_delay
+
+        while True:
+            medicion = self.medir_consulta(unidad.describir(), params)
+            try:
+                with self.obtener_cursor() as cursor:
+                    medicion.marcar_conexion()
+                    cursor.execute(batch, params)
+                    medicion.marcar_ejecucion()
+                    resultados: List[Any] = [None] * len(unidad.sentencias)
+                    for i, sentencia in enumerate(unidad.sentencias):
+                        if sentencia.es_select:
+                            columnas = [column[0] for column in cursor.description]
+                            resultados[i] = materializar_filas(columnas, cursor.fetchall(), sentencia.row_mode)
+                            cursor.nextset()
+                    filas_afectadas = cursor.fetchone()
+                    for i, sentencia in enumerate(unidad.sentencias):
+                        if not sentencia.es_select:
+                            resultados[i] = filas_afectadas[i]
+                medicion.registrar(
+                    filas=sum(r for r, s in zip(resultados, unidad.sentencias) if not s.es_select and r and r > 0)
+                )
+                unidad.resultados = resultados
+                return resultados
+            except pyodbc.Error as e:
+                medicion.registrar(error=True)
+                sqlstate = e.args[0] if e.args else None
+                if sqlstate in self.retryable_sqlstates and retries > 1:
+                    logger.warning(
+                        f"Error reintentable (SQLSTATE: {sqlstate}) en unidad de trabajo. Reintentando en {delay}s..."
+                    )
+                    time.sleep(delay)
+                    retries -= 1
+                    delay *= 2
+                else:
+                    raise
 
     def conectar_base_datos(self) -> pyodbc.Connection:
         for intento in range(3):
@@ -141,28 +583,48 @@ class DatabaseConnector:
 
     def cerrar_conexiones_pool(self):
         with self._pool_lock:
-            for conn in self._pool:
-                try:
-                    conn.close()
-                except pyodbc.Error as e:
-                    logger.error(f"Error al cerrar una conexión del pool: {e}")
-            self._pool = []
-            logger.info(f"Todas las conexiones en el pool para {self.db_config_prefix} han sido cerradas.")
+            entradas, self._pool = self._pool, []
+            for conn, _, _ in entradas:
+                self._creacion_conexiones.pop(id(conn), None)
+        for conn, _, _ in entradas:
+            try:
+                conn.close()
+            except pyodbc.Error as e:
+                logger.error(f"Error al cerrar una conexión del pool: {e}")
+        logger.info(f"Todas las conexiones en el pool para {self._origen_metricas} han sido cerradas.")
+        with self._pools_nombrados_lock:
+            pools_nombrados = list(self._pools_nombrados.values())
+        for conector in pools_nombrados:
+            conector.cerrar_conexiones_pool()
 
-    def ejecutar_consulta(self, query: str, params: tuple = None, es_select: bool = True) -> Any:
+    def ejecutar_consulta(
+        self, query: str, params: tuple = None, es_select: bool = True, row_mode: Union[RowMode, str] = RowMode.DICT
+    ) -> Any:
+        """
+        Ejecuta una consulta con reintentos. Para SELECT, `row_mode` define el formato del resultado
+        (ver `RowMode`); por defecto una lista de dicts.
+        """
         retries = self.max_retries
         delay = self.initial_delay
 
         while retries > 0:
+            medicion = self.medir_consulta(query, params)
             try:
                 with self.obtener_cursor() as cursor:
+                    medicion.marcar_conexion()
                     cursor.execute(query, params or ())
+                    medicion.marcar_ejecucion()
                     if es_select:
                         columns = [column[0] for column in cursor.description]
-                        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+                        filas = cursor.fetchall()
+                        resultado = materializar_filas(columns, filas, row_mode)
+                        medicion.marcar_lectura(len(filas))
                     else:
-                        return cursor.rowcount
+                        resultado = cursor.rowcount
+                medicion.registrar(filas=None if es_select else max(resultado, 0))
+                return resultado
             except pyodbc.Error as e:
+                medicion.registrar(error=True)
                 sqlstate = e.args[0]
                 if sqlstate in self.retryable_sqlstates and retries > 1:
                     logger.warning(
@@ -182,38 +644,113 @@ class DatabaseConnector:
     def ejecutar_consulta_multiple(
         self, query: str, params_list: List[tuple], usar_fast_executemany: bool = True
     ) -> int:
+        """
+        Ejecuta una consulta múltiple y devuelve el total de filas afectadas.
+        Las filas que fallan se registran en el log; ver `ejecutar_consulta_multiple_detallada`.
+        """
+        return self.ejecutar_consulta_multiple_detallada(query, params_list, usar_fast_executemany).filas_afectadas
+
+    def ejecutar_consulta_multiple_detallada(
+        self, query: str, params_list: List[tuple], usar_fast_executemany: bool = True
+    ) -> ResultadoLote:
         """
         Ejecuta una consulta múltiple.
-        Si usar_fast_executemany=True, intenta usar la optimización.
-        Si falla o usar_fast_executemany=False, usa el fallback de ejecución individual.
+        Si usar_fast_executemany=True, intenta primero con la optimización en una sola transacción.
+        Si falla o usar_fast_executemany=False, usa el fallback por lotes: cada `_lote_tamano` filas (o
+        menos, para no superar `MAX_PARAMETROS_BATCH`) se envían como un único batch en una transacción
+        y, si un lote falla por los datos de una fila (restricción, conversión), se parte en mitades
+        hasta aislar las filas con error. Las filas válidas quedan confirmadas y las que fallan se
+        devuelven en `fallidas`. Los demás errores (conexión, timeout, pool saturado) se propagan sin
+        partir el lote, para que el llamador conserve las filas y las reintente.
         """
         if not params_list:
-            return 0
-        total_affected = 0
-        try:
-            if not usar_fast_executemany:
-                # Forzamos el salto al bloque 'except' (fallback)
-                raise pyodbc.Error("FAST_EXECUTE_DISABLED", "Forzando fallback por parámetro.")
+            return ResultadoLote(0, [])
 
-            with self.obtener_cursor() as cursor:
-                cursor.fast_executemany = True
-                cursor.executemany(query, params_list)
-                total_affected = cursor.rowcount
-            return total_affected
-        except pyodbc.Error as e:
-            # Solo loguear error si se *intentó* usar fast_executemany
-            if usar_fast_executemany:
+        if usar_fast_executemany:
+            medicion = self.medir_consulta(query, [f"<lote:{len(params_list)}>"])
+            try:
+                with self.obtener_cursor() as cursor:
+                    medicion.marcar_conexion()
+                    cursor.fast_executemany = True
+                    cursor.executemany(query, params_list)
+                    total_affected = cursor.rowcount
+                medicion.registrar(filas=max(total_affected, 0))
+                return ResultadoLote(total_affected, [])
+            except pyodbc.Error as e:
+                medicion.registrar(error=True)
                 logger.error(f"Error en ejecución múltiple (fast_executemany): {e}")
+                logger.warning("Fallback a ejecución por lotes...")
 
-            logger.warning("Fallback a ejecución individual de queries...")
+        total_affected = 0
+        fallidas: List[Tuple[tuple, str]] = []
+        lote_tamano = max(1, min(self._lote_tamano, MAX_PARAMETROS_BATCH // max(1, len(params_list[0]))))
+        for inicio in range(0, len(params_list), lote_tamano):
+            lote = params_list[inicio : inicio + lote_tamano]
+            total_affected += self._ejecutar_lote_con_biseccion(query, lote, fallidas)
 
-            # Lógica de Fallback (ahora se ejecuta si falla o si se fuerza)
-            for params in params_list:
-                try:
-                    total_affected += self.ejecutar_consulta(query, params, es_select=False)
-                except pyodbc.Error as inner_e:
-                    logger.error(f"Error en query individual (fallback): {inner_e} con params {params}")
-            return total_affected
+        if fallidas:
+            logger.error(f"Fallaron {len(fallidas)} de {len(params_list)} filas en la ejecución múltiple.")
+            for params, error in fallidas:
+                logger.error(f"Error en query individual (fallback): {error} con params {params}")
+        return ResultadoLote(total_affected, fallidas)
+
+    def _ejecutar_lote_con_biseccion(self, query: str, lote: List[tuple], fallidas: List[Tuple[tuple, str]]) -> int:
+        """
+        Ejecuta `lote` en una transacción. Si falla por una fila (`_es_error_de_fila`), reintenta cada
+        mitad por separado (bisección), de modo que una fila con error cuesta ~2*log2(len(lote)) viajes
+        de red en lugar de uno por fila. Cualquier otro error se propaga.
+        """
+        total_affected = 0
+        pendientes = [lote]
+        while pendientes:
+            actual = pendientes.pop()
+            try:
+                total_affected += self._ejecutar_lote_en_transaccion(query, actual)
+            except pyodbc.Error as e:
+                if not _es_error_de_fila(e):
+                    raise
+                if len(actual) == 1:
+                    fallidas.append((actual[0], str(e)))
+                    continue
+                mitad = len(actual) // 2
+                # Se apila primero la segunda mitad para procesar las filas en orden.
+                pendientes.append(actual[mitad:])
+                pendientes.append(actual[:mitad])
+        return total_affected
+
+    def _ejecutar_lote_en_transaccion(self, query: str, lote: List[tuple]) -> int:
+        """
+        Ejecuta todas las filas del lote como un único batch (una sentencia por fila, ver
+        `UnidadDeTrabajo`): un solo viaje de red y un solo commit, con reintentos.
+        """
+        unidad = UnidadDeTrabajo()
+        for params in lote:
+            unidad.agregar(query, params)
+        batch, params_batch = unidad.construir_batch()
+        retries = self.max_retries
+        delay = self.initial_delay
+
+        while True:
+            medicion = self.medir_consulta(query, [f"<lote:{len(lote)}>"])
+            try:
+                with self.obtener_cursor() as cursor:
+                    medicion.marcar_conexion()
+                    cursor.execute(batch, params_batch)
+                    total_affected = sum(filas for filas in cursor.fetchone() if filas and filas > 0)
+                medicion.registrar(filas=max(total_affected, 0))
+                return total_affected
+            except pyodbc.Error as e:
+                medicion.registrar(error=True)
+                sqlstate = e.args[0] if e.args else None
+                if sqlstate in self.retryable_sqlstates and retries > 1:
+                    logger.warning(
+                        f"Error reintentable (SQLSTATE: {sqlstate}) en lote de {len(lote)} filas. Reintentando en {delay}s..."
+                    )
+                    time.sleep(delay)
+                    retries -= 1
+                    delay *= 2
+                else:
+                    raise
 
     def ejecutar_sp_con_tvp(
         self,
@@ -225,8 +762,11 @@ class DatabaseConnector:
         `params` es un dict: {"nombre_param": valor | list[tuple] }
         Las listas de tuplas se convierten automáticamente a TVP.
         """
+        sp_call = f"{{CALL {sp_name}}}"
+        medicion = self.medir_consulta(sp_call, params)
         try:
             with self.obtener_cursor() as cursor:
+                medicion.marcar_conexion()
                 # Construye la lista de parámetros en el orden correcto
                 execute_params = []
                 for k, v in params.items():
@@ -238,7 +778,9 @@ class DatabaseConnector:
 
                 cursor.execute(f"{{CALL {sp_name} ({','.join('?' * len(execute_params))})}}", *execute_params)
                 # commit ya se hace en el contexto obtener_cursor
+            medicion.registrar()
         except Exception as e:
+            medicion.registrar(error=True)
             logger.error(f"Error ejecutando SP con TVP '{sp_name}': {e}", exc_info=True)
             raise
 
@@ -255,10 +797,53 @@ class DatabaseConnector:
         params = (id_despliegue, db_robot_id, db_equipo_id, a360_user_id, marca_tiempo_programada, estado)
         self.ejecutar_consulta(query, params, es_select=False)
 
+    # Un INSERT multi-fila admite a lo sumo 2100 parámetros: 6 por fila.
+    _FILAS_POR_INSERT_EJECUCIONES = 300
+    _FILA_INSERT_EJECUCIONES = (
+        "(CAST(? AS NVARCHAR(50)), CAST(? AS INT), CAST(? AS INT), CAST(? AS INT), CAST(? AS TIME(0)), "
+        "CAST(? AS NVARCHAR(20)))"
+    )
+
+    @classmethod
+    def _sql_insertar_ejecuciones(cls, cantidad: int) -> str:
+        return (
+            "INSERT INTO dbo.Ejecuciones (DeploymentId, RobotId, EquipoId, UserId, Hora, Estado) "
+            "SELECT v.DeploymentId, v.RobotId, v.EquipoId, v.UserId, v.Hora, v.Estado "
+            f"FROM (VALUES {', '.join([cls._FILA_INSERT_EJECUCIONES] * cantidad)}) "
+            "AS v (DeploymentId, RobotId, EquipoId, UserId, Hora, Estado) "
+            "WHERE NOT EXISTS (SELECT 1 FROM dbo.Ejecuciones e WHERE e.DeploymentId = v.DeploymentId "
+            "AND (e.UserId = v.UserId OR (e.UserId IS NULL AND v.UserId IS NULL)));"
+        )
+
+    def insertar_registros_ejecucion(self, filas: List[tuple]) -> ResultadoLote:
+        """
+        Inserta varias ejecuciones (DeploymentId, RobotId, EquipoId, UserId, Hora, Estado) con un INSERT
+        multi-fila cada `_FILAS_POR_INSERT_EJECUCIONES`. Omite las que ya existen por (DeploymentId, UserId),
+        así que repetir un lote ya confirmado no duplica. Si un INSERT viola una restricción, sus filas se
+        insertan de a una y las rechazadas se devuelven en `fallidas`; los errores de conexión se propagan.
+        """
+        total_affected = 0
+        fallidas: List[Tuple[tuple, str]] = []
+        for inicio in range(0, len(filas), self._FILAS_POR_INSERT_EJECUCIONES):
+            lote = filas[inicio : inicio + self._FILAS_POR_INSERT_EJECUCIONES]
+            params = tuple(valor for fila in lote for valor in fila)
+            try:
+                total_affected += self.ejecutar_consulta(
+                    self._sql_insertar_ejecuciones(len(lote)), params, es_select=False
+                )
+            except (pyodbc.IntegrityError, pyodbc.DataError) as e:
+                logger.warning(f"INSERT de {len(lote)} ejecuciones rechazado ({e}). Se insertan de a una.")
+                resultado = self.ejecutar_consulta_multiple_detallada(
+                    self._sql_insertar_ejecuciones(1), lote, usar_fast_executemany=False
+                )
+                total_affected += resultado.filas_afectadas
+                fallidas.extend(resultado.fallidas)
+        return ResultadoLote(total_affected, fallidas)
+
     def obtener_ejecuciones_en_curso(self) -> List[Dict]:
         return (
             self.ejecutar_consulta(
-                "SELECT EjecucionId, DeploymentId, IntentosConciliadorFallidos FROM dbo.Ejecuciones "
+                "SELECT EjecucionId, DeploymentId, UserId, IntentosConciliadorFallidos FROM dbo.Ejecuciones "
                 "WHERE Estado NOT IN ('COMPLETED', 'RUN_COMPLETED', 'RUN_FAILED', 'DEPLOY_FAILED', 'RUN_ABORTED', 'COMPLETED_INFERRED') "
                 "OR (Estado = 'UNKNOWN' AND FechaUltimoUNKNOWN IS NOT NULL AND DATEDIFF(DAY, FechaUltimoUNKNOWN, GETDATE()) > 7) "
                 "ORDER BY EjecucionId ASC;",
@@ -267,42 +852,52 @@ class DatabaseConnector:
             or []
         )
 
+    # Estados en los que un callback ya no modifica la ejecución.
+    # "UNKNOWN" no se incluye porque no se comporta como un estado final.
+    ESTADOS_FINALES_CALLBACK = (
+        "COMPLETED",
+        "RUN_COMPLETED",
+        "RUN_FAILED",
+        "DEPLOY_FAILED",
+        "RUN_ABORTED",
+        "COMPLETED_INFERRED",
+    )
+
     def actualizar_ejecucion_desde_callback(
-        self, deployment_id: str, estado_callback: str, callback_payload_str: str
+        self, deployment_id: str, estado_callback: str, callback_payload_str: str, user_id: Optional[str] = None
     ) -> UpdateStatus:
+        """
+        Actualiza la ejecución con un UPDATE condicionado a que no esté en estado final y, en el mismo
+        batch, cuenta las filas del DeploymentId para distinguir ALREADY_PROCESSED de NOT_FOUND.
+
+        Un despliegue agrupado comparte el DeploymentId entre varios usuarios; con `user_id` se actualiza
+        solo la fila de ese usuario.
+        """
+        finales = self.ESTADOS_FINALES_CALLBACK
+        filtro_usuario = "(? IS NULL OR UserId IS NULL OR UserId = TRY_CAST(? AS INT))"
+        query = f"""
+            UPDATE dbo.Ejecuciones
+            SET Estado = ?,
+                FechaFin = GETDATE(),
+                FechaInicioReal = COALESCE(FechaInicioReal, GETDATE()),
+                FechaActualizacion = GETDATE(),
+                CallbackInfo = ?
+            WHERE DeploymentId = ? AND {filtro_usuario}
+              AND (Estado IS NULL OR Estado NOT IN ({", ".join("?" * len(finales))}))
+        """
         try:
-            with self.obtener_cursor() as cursor:
-                # 1. Verificar el estado actual
-                cursor.execute("SELECT Estado FROM dbo.Ejecuciones WHERE DeploymentId = ?", (deployment_id,))
-                row = cursor.fetchone()
-                if not row:
-                    return UpdateStatus.NOT_FOUND
-
-                current_status = row[0]
-                if current_status in (
-                    "COMPLETED",
-                    "RUN_COMPLETED",
-                    "RUN_FAILED",
-                    "DEPLOY_FAILED",
-                    "RUN_ABORTED",
-                    "COMPLETED_INFERRED",
-                    # "UNKNOWN", # ya que no estaría comportandose como un estado final
-                ):
-                    return UpdateStatus.ALREADY_PROCESSED
-
-                # 2. Si no es un estado final, actualizar
-                query = """
-                    UPDATE dbo.Ejecuciones
-                    SET Estado = ?,
-                        FechaFin = GETDATE(),
-                        FechaInicioReal = COALESCE(FechaInicioReal, GETDATE()),
-                        FechaActualizacion = GETDATE(),
-                        CallbackInfo = ?
-                    WHERE DeploymentId = ?;
-                """
-                params = (estado_callback, callback_payload_str, deployment_id)
-                cursor.execute(query, params)
+            with self.unit_of_work() as uow:
+                uow.agregar(query, (estado_callback, callback_payload_str, deployment_id, user_id, user_id, *finales))
+                uow.agregar(
+                    f"SELECT COUNT(*) FROM dbo.Ejecuciones WHERE DeploymentId = ? AND {filtro_usuario}",
+                    (deployment_id, user_id, user_id),
+                    es_select=True,
+                    row_mode=RowMode.TUPLE,
+                )
+            actualizadas, [(existentes,)] = uow.resultados
+            if actualizadas:
                 return UpdateStatus.UPDATED
+            return UpdateStatus.ALREADY_PROCESSED if existentes else UpdateStatus.NOT_FOUND
         except Exception as e:
             logger.error(f"Error en DB al actualizar callback para {deployment_id}: {e}", exc_info=True)
             return UpdateStatus.ERROR
@@ -345,3 +940,185 @@ class DatabaseConnector:
         except Exception as e:
             logger.error(f"Error en merge_equipos: {e}", exc_info=True)
             return -1
+
+
+class AsyncDatabaseConnector:
+    """
+    Fachada asíncrona sobre DatabaseConnector.
+
+    pyodbc es bloqueante: cada llamada directa desde una corutina congela el event loop
+    durante todo el round trip a SQL Server. Esta fachada ejecuta las operaciones en un
+    executor dedicado y acotado (un hilo por conexión del pool), de modo que la
+    concurrencia contra la BD nunca supera el tamaño del pool y el loop sigue atendiendo
+    despliegues y callbacks mientras la BD responde lento.
+
+    Se obtiene con `AsyncDatabaseConnector.para(db_connector)`, que reutiliza una única
+    fachada (y un único executor) por conector en todo el proceso.
+    """
+
+    _instancias: "weakref.WeakKeyDictionary[Any, AsyncDatabaseConnector]" = weakref.WeakKeyDictionary()
+    _instancias_lock = threading.Lock()
+
+    def __init__(self, db_connector: DatabaseConnector, max_workers: Optional[int] = None):
+        self._db = db_connector
+        pool_size = getattr(db_connector, "_pool_max_size", None)
+        if not isinstance(pool_size, int) or pool_size < 1:
+            pool_size = 5
+        self._max_workers = max_workers or pool_size
+        self._executor = ThreadPoolExecutor(max_workers=self._max_workers, thread_name_prefix="sam-db")
+
+        # --- Métricas ---
+        self._metricas_lock = threading.Lock()
+        self._en_cola = 0
+        self._en_ejecucion = 0
+        self._max_en_cola = 0
+        self._total_llamadas = 0
+        self._total_errores = 0
+        self._espera_total_seg = 0.0
+        self._espera_max_seg = 0.0
+        self._ejecucion_total_seg = 0.0
+
+    @classmethod
+    def para(cls, db_connector: DatabaseConnector) -> "AsyncDatabaseConnector":
+        """Devuelve la fachada asíncrona compartida para el conector dado (la crea si no existe)."""
+        if isinstance(db_connector, AsyncDatabaseConnector):
+            return db_connector
+        with cls._instancias_lock:
+            fachada = cls._instancias.get(db_connector)
+            if fachada is None:
+                fachada = cls(db_connector)
+                cls._instancias[db_connector] = fachada
+            return fachada
+
+    @property
+    def sync(self) -> DatabaseConnector:
+        """Conector síncrono subyacente."""
+        return self._db
+
+    # --- Núcleo: ejecución en el executor dedicado ---
+
+    async def ejecutar(self, funcion: Callable[..., Any], *args, **kwargs) -> Any:
+        """Ejecuta cualquier función bloqueante de BD en el executor dedicado y espera su resultado."""
+        encolado_en = time.perf_counter()
+        with self._metricas_lock:
+            self._en_cola += 1
+            self._total_llamadas += 1
+            if self._en_cola > self._max_en_cola:
+                self._max_en_cola = self._en_cola
+
+        def _tarea():
+            inicio = time.perf_counter()
+            espera = inicio - encolado_en
+            with self._metricas_lock:
+                self._en_cola -= 1
+                self._en_ejecucion += 1
+                self._espera_total_seg += espera
+                if espera > self._espera_max_seg:
+                    self._espera_max_seg = espera
+            try:
+                return funcion(*args, **kwargs)
+            except Exception:
+                with self._metricas_lock:
+                    self._total_errores += 1
+                raise
+            finally:
+                with self._metricas_lock:
+                    self._en_ejecucion -= 1
+                    self._ejecucion_total_seg += time.perf_counter() - inicio
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, _tarea)
+
+    # --- API equivalente a DatabaseConnector ---
+
+    async def ejecutar_consulta(
+        self, query: str, params: tuple = None, es_select: bool = True, row_mode: Union[RowMode, str] = RowMode.DICT
+    ) -> Any:
+        return await self.ejecutar(self._db.ejecutar_consulta, query, params, es_select=es_select, row_mode=row_mode)
+
+    async def ejecutar_consulta_multiple(
+        self, query: str, params_list: List[tuple], usar_fast_executemany: bool = True
+    ) -> int:
+        return await self.ejecutar(
+            self._db.ejecutar_consulta_multiple, query, params_list, usar_fast_executemany=usar_fast_executemany
+        )
+
+    async def ejecutar_consulta_multiple_detallada(
+        self, query: str, params_list: List[tuple], usar_fast_executemany: bool = True
+    ) -> ResultadoLote:
+        return await self.ejecutar(
+            self._db.ejecutar_consulta_multiple_detallada,
+            query,
+            params_list,
+            usar_fast_executemany=usar_fast_executemany,
+        )
+
+    async def ejecutar_sp_con_tvp(self, sp_name: str, params: Dict[str, Any]) -> None:
+        return await self.ejecutar(self._db.ejecutar_sp_con_tvp, sp_name, params)
+
+    async def ejecutar_unidad_de_trabajo(self, unidad: UnidadDeTrabajo) -> List[Any]:
+        return await self.ejecutar(self._db.ejecutar_unidad_de_trabajo, unidad)
+
+    async def ejecutar_con_cursor(self, funcion: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Versión asíncrona de `obtener_cursor`: ejecuta `funcion(cursor, *args, **kwargs)` (síncrona)
+        dentro de `obtener_cursor` y devuelve su resultado. Conexión, sentencias, commit/rollback y
+        devolución al pool ocurren en una sola llamada al executor, así que una conexión tomada nunca
+        espera un hilo libre para terminar.
+        """
+
+        def _con_cursor():
+            with self._db.obtener_cursor() as cursor:
+                return funcion(cursor, *args, **kwargs)
+
+        return await self.ejecutar(_con_cursor)
+
+    # --- Operaciones de dominio usadas desde servicios asíncronos ---
+
+    async def obtener_robots_ejecutables(self) -> List[Dict]:
+        return await self.ejecutar(self._db.obtener_robots_ejecutables)
+
+    async def insertar_registro_ejecucion(self, **kwargs) -> None:
+        return await self.ejecutar(functools.partial(self._db.insertar_registro_ejecucion, **kwargs))
+
+    async def insertar_registros_ejecucion(self, filas: List[tuple]) -> ResultadoLote:
+        return await self.ejecutar(self._db.insertar_registros_ejecucion, filas)
+
+    async def obtener_ejecuciones_en_curso(self) -> List[Dict]:
+        return await self.ejecutar(self._db.obtener_ejecuciones_en_curso)
+
+    async def actualizar_ejecucion_desde_callback(self, **kwargs) -> UpdateStatus:
+        return await self.ejecutar(functools.partial(self._db.actualizar_ejecucion_desde_callback, **kwargs))
+
+    async def merge_robots(self, lista_robots: List[Dict]):
+        return await self.ejecutar(self._db.merge_robots, lista_robots)
+
+    async def merge_equipos(self, lista_equipos_procesados: List[Dict]):
+        return await self.ejecutar(self._db.merge_equipos, lista_equipos_procesados)
+
+    # --- Observabilidad y ciclo de vida ---
+
+    def obtener_metricas(self) -> Dict[str, Any]:
+        """Profundidad de cola, tiempos de espera y de ejecución del executor de BD."""
+        with self._metricas_lock:
+            completadas = self._total_llamadas - self._en_cola - self._en_ejecucion
+            return {
+                "max_workers": self._max_workers,
+                "en_cola": self._en_cola,
+                "en_ejecucion": self._en_ejecucion,
+                "max_en_cola": self._max_en_cola,
+                "total_llamadas": self._total_llamadas,
+                "total_errores": self._total_errores,
+                "espera_promedio_ms": round(self._espera_total_seg * 1000 / completadas, 3) if completadas else 0.0,
+                "espera_max_ms": round(self._espera_max_seg * 1000, 3),
+                "ejecucion_promedio_ms": round(self._ejecucion_total_seg * 1000 / completadas, 3)
+                if completadas
+                else 0.0,
+            }
+
+    def cerrar(self, wait: bool = True):
+        """Detiene el executor. Las llamadas ya encoladas terminan si `wait=True`."""
+        self._executor.shutdown(wait=wait)
+        with self._instancias_lock:
+            if self._instancias.get(self._db) is self:
+                del self._instancias[self._db]
@@ -0,0 +1,113 @@
+# src/sam/common/indice_sincronizacion.py
+"""
+Índice de hashes del último estado sincronizado con A360, para que la sincronización envíe a
+MergeRobots/MergeEquipos solo las filas nuevas o modificadas.
+
+Por cada tabla guarda el hash de cada fila confirmada (por clave) y una huella de la tabla en la
+BD (CHECKSUM_AGG + cantidad de filas) tomada después del último merge. Si la huella de la BD ya no
+coincide (edición manual, restore, otro proceso), la tabla se invalida y el próximo ciclo envía
+todo, reconstruyendo el índice. Opcionalmente se persiste en un archivo JSON.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set
+
+logger = logging.getLogger(__name__)
+
+
+class IndiceSincronizacion:
+    def __init__(self, ruta: Optional[str] = None, intervalo_verificacion_seg: float = 0):
+        self._ruta = Path(ruta) if ruta else None
+        self.intervalo_verificacion_seg = intervalo_verificacion_seg
+        self._filas: Dict[str, Dict[str, str]] = {}
+        self._huellas: Dict[str, Any] = {}
+        self._verificado_en: Dict[str, float] = {}
+        if self._ruta:
+            self._cargar()
+
+    @staticmethod
+    def hash_fila(valores: Sequence[Any]) -> str:
+        return hashlib.blake2b(json.dumps(list(valores), default=str).encode("utf-8"), digest_size=12).hexdigest()
+
+    def filtrar_cambios(self, tabla: str, filas: Iterable[Dict], columnas: Sequence[str]) -> List[Dict]:
+        """Filas cuya clave (primera columna) es nueva o cuyo contenido cambió desde el último merge confirmado."""
+        confirmadas = self._filas.get(tabla, {})
+        return [
+            fila
+            for fila in filas
+            if fila.get(columnas[0]) is not None
+            and confirmadas.get(str(fila.get(columnas[0]))) != self.hash_fila([fila.get(c) for c in columnas])
+        ]
+
+    def confirmar(self, tabla: str, filas: Iterable[Dict], columnas: Sequence[str]):
+        """Registra filas ya persistidas por el merge."""
+        confirmadas = self._filas.setdefault(tabla, {})
+        for fila in filas:
+            if fila.get(columnas[0]) is not None:
+                confirmadas[str(fila.get(columnas[0]))] = self.hash_fila([fila.get(c) for c in columnas])
+
+    def retirar_ausentes(self, tabla: str, claves_vistas: Set[Any]) -> int:
+        """Quita del índice las claves que A360 ya no devuelve. Devuelve cuántas se quitaron."""
+        confirmadas = self._filas.get(tabla, {})
+        vistas = {str(c) for c in claves_vistas}
+        ausentes = [clave for clave in confirmadas if clave not in vistas]
+        for clave in ausentes:
+            del confirmadas[clave]
+        return len(ausentes)
+
+    def requiere_verificacion(self, tabla: str) -> bool:
+        if not self._filas.get(tabla):
+            return False
+        return time.time() - self._verificado_en.get(tabla, 0) >= self.intervalo_verificacion_seg
+
+    def verificar(self, tabla: str, huella: Any) -> bool:
+        """Compara la huella actual de la BD con la registrada; si no coincide, invalida la tabla."""
+        if huella != self._huellas.get(tabla):
+            logger.warning(
+                f"La tabla '{tabla}' cambió fuera de la sincronización: se reconstruye el índice (envío completo)."
+            )
+            self.invalidar(tabla)
+            return False
+        self._verificado_en[tabla] = time.time()
+        return True
+
+    def fijar_huella(self, tabla: str, huella: Any):
+        self._huellas[tabla] = huella
+        self._verificado_en[tabla] = time.time()
+
+    def invalidar(self, tabla: str):
+        self._filas.pop(tabla, None)
+        self._huellas.pop(tabla, None)
+        self._verificado_en.pop(tabla, None)
+
+    def guardar(self):
+        if not self._ruta:
+            return
+        contenido = {
+            tabla: {"filas": filas, "huella": self._huellas.get(tabla)} for tabla, filas in self._filas.items()
+        }
+        try:
+            self._ruta.parent.mkdir(parents=True, exist_ok=True)
+            temporal = self._ruta.with_name(f"{self._ruta.name}.{os.getpid()}.tmp")
+            temporal.write_text(json.dumps(contenido), encoding="utf-8")
+            os.replace(temporal, self._ruta)
+        except (OSError, TypeError, ValueError) as e:
+            logger.warning(f"No se pudo guardar el índice de sincronización en {self._ruta}: {e}")
+
+    def _cargar(self):
+        try:
+            contenido = json.loads(self._ruta.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.warning(f"Índice de sincronización ilegible ({self._ruta}): {e}. Se reconstruye.")
+            return
+        for tabla, datos in contenido.items():
+            self._filas[tabla] = dict(datos.get("filas", {}))
+            self._huellas[tabla] = datos.get("huella")
+        # Un índice leído de disco siempre se verifica contra la BD antes de usarse (`_verificado_en` vacío).
@@ -0,0 +1,362 @@
+# src/sam/common/metricas_db.py
+"""
+Instrumentación de consultas a la base de datos.
+
+Cada consulta ejecutada por `DatabaseConnector` se agrupa por sentencia normalizada (o nombre del SP)
+y acumula llamadas, errores, filas y un histograma de latencia por fase: espera del pool, ejecución
+y lectura de filas. Las consultas que superan el umbral configurado se registran en el logger
+`sam.common.metricas_db.lentas` con los parámetros redactados (solo tipo y tamaño).
+
+El registro es por proceso (`METRICAS_DB`): la interfaz web lo expone por API y el resto de los
+servicios lo vuelcan periódicamente a un archivo JSON en el directorio de logs.
+"""
+
+import bisect
+import functools
+import json
+import logging
+import os
+import re
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from .config_manager import ConfigManager
+
+logger = logging.getLogger(__name__)
+logger_lentas = logging.getLogger(f"{__name__}.lentas")
+
+# Límites superiores (ms) de cada bucket del histograma; el último bucket es "> 10000".
+LIMITES_HISTOGRAMA_MS: Tuple[float, ...] = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+FASES = ("espera_pool", "ejecucion", "lectura")
+
+_RE_SP = re.compile(r"^\s*(?:\{\s*CALL|EXEC(?:UTE)?)\s+([\w.\[\]]+)", re.IGNORECASE)
+_RE_CADENAS = re.compile(r"N?'(?:[^']|'')*'")
+_RE_NUMEROS = re.compile(r"(?<![\w@])-?\d+(?:\.\d+)?\b")
+_RE_LISTAS = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_RE_ESPACIOS = re.compile(r"\s+")
+_LARGO_MAX_SENTENCIA = 200
+
+
+@functools.lru_cache(maxsize=1024)
+def normalizar_sentencia(query: str) -> str:
+    """
+    Devuelve la clave de agrupación de una consulta: `CALL dbo.Sp` para stored procedures o el
+    texto SQL con literales reemplazados por `?`, listas `(?, ?, ...)` colapsadas y espacios compactados.
+    Se cachea porque la gran mayoría de las consultas del proyecto son cadenas constantes.
+    """
+    sp = _RE_SP.match(query)
+    if sp:
+        return f"CALL {sp.group(1)}"
+    texto = _RE_CADENAS.sub("?", query)
+    texto = _RE_NUMEROS.sub("?", texto)
+    texto = _RE_LISTAS.sub("(?+)", texto)
+    texto = _RE_ESPACIOS.sub(" ", texto).strip()
+    return texto[:_LARGO_MAX_SENTENCIA]
+
+
+def redactar_parametros(params: Any) -> Any:
+    """Reemplaza los valores de los parámetros por su tipo (y tamaño), para no volcar datos al log."""
+    if params is None:
+        return None
+    if isinstance(params, (list, tuple)):
+        return [_redactar_valor(p) for p in params]
+    if isinstance(params, dict):
+        return {k: _redactar_valor(v) for k, v in params.items()}
+    return _redactar_valor(params)
+
+
+def _redactar_valor(valor: Any) -> str:
+    if valor is None:
+        return "None"
+    if isinstance(valor, (str, bytes, list, tuple)):
+        return f"<{type(valor).__name__}:{len(valor)}>"
+    return f"<{type(valor).__name__}>"
+
+
+class _Histograma:
+    __slots__ = ("buckets", "total_ms", "max_ms")
+
+    def __init__(self):
+        self.buckets = [0] * (len(LIMITES_HISTOGRAMA_MS) + 1)
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def observar(self, ms: float):
+        self.buckets[bisect.bisect_left(LIMITES_HISTOGRAMA_MS, ms)] += 1
+        self.total_ms += ms
+        if ms > self.max_ms:
+            self.max_ms = ms
+
+    def percentil(self, p: float, cantidad: int) -> Optional[float]:
+        """Aproxima el percentil con el límite superior del bucket que lo contiene."""
+        if not cantidad:
+            return None
+        objetivo = p * cantidad
+        acumulado = 0
+        for i, n in enumerate(self.buckets):
+            acumulado += n
+            if acumulado >= objetivo:
+                return LIMITES_HISTOGRAMA_MS[i] if i < len(LIMITES_HISTOGRAMA_MS) else self.max_ms
+        return self.max_ms
+
+    def resumen(self, cantidad: int) -> Dict[str, Any]:
+        return {
+            "promedio_ms": round(self.total_ms / cantidad, 3) if cantidad else 0.0,
+            "p50_ms": self.percentil(0.50, cantidad),
+            "p95_ms": self.percentil(0.95, cantidad),
+            "p99_ms": self.percentil(0.99, cantidad),
+            "max_ms": round(self.max_ms, 3),
+            "total_ms": round(self.total_ms, 3),
+            "buckets": dict(zip([f"<={limite}" for limite in LIMITES_HISTOGRAMA_MS] + ["inf"], self.buckets)),
+        }
+
+
+class _EstadisticaSentencia:
+    __slots__ = ("llamadas", "errores", "filas", "lentas", "histogramas")
+
+    def __init__(self):
+        self.llamadas = 0
+        self.errores = 0
+        self.filas = 0
+        self.lentas = 0
+        self.histogramas = tuple(_Histograma() for _ in FASES)
+
+
+class MetricasConsultas:
+    """Registro thread-safe de métricas por (origen, sentencia normalizada)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._estadisticas: Dict[Tuple[str, str], _EstadisticaSentencia] = {}
+        self._desde = datetime.now()
+
+    def registrar(
+        self,
+        origen: str,
+        query: str,
+        espera_pool: float,
+        ejecucion: float,
+        lectura: float = 0.0,
+        filas: int = 0,
+        error: bool = False,
+        params: Any = None,
+        umbral_lenta_ms: Optional[float] = None,
+    ):
+        """
+        Registra una ejecución. Los tiempos se reciben en segundos (diferencias de time.perf_counter()).
+        Si la duración total supera `umbral_lenta_ms`, la consulta se loguea como lenta.
+        """
+        sentencia = normalizar_sentencia(query)
+        espera_ms = espera_pool * 1000
+        ejecucion_ms = ejecucion * 1000
+        lectura_ms = lectura * 1000
+        total_ms = espera_ms + ejecucion_ms + lectura_ms
+        es_lenta = umbral_lenta_ms is not None and umbral_lenta_ms > 0 and total_ms >= umbral_lenta_ms
+
+        # Ruta caliente: se ejecuta en cada consulta, por eso se evita cualquier trabajo extra bajo el lock.
+        with self._lock:
+            estadistica = self._estadisticas.get((origen, sentencia))
+            if estadistica is None:
+                estadistica = self._estadisticas[(origen, sentencia)] = _EstadisticaSentencia()
+            estadistica.llamadas += 1
+            estadistica.filas += filas
+            if error:
+                estadistica.errores += 1
+            if es_lenta:
+                estadistica.lentas += 1
+            h_espera, h_ejecucion, h_lectura = estadistica.histogramas
+            h_espera.observar(espera_ms)
+            h_ejecucion.observar(ejecucion_ms)
+            h_lectura.observar(lectura_ms)
+
+        if es_lenta:
+            logger_lentas.warning(
+                f"Consulta lenta ({total_ms:.0f} ms) en {origen}: {sentencia} | "
+                f"espera_pool={espera_ms:.0f}ms ejecucion={ejecucion_ms:.0f}ms lectura={lectura_ms:.0f}ms "
+                f"filas={filas} error={error} params={redactar_parametros(params)}"
+            )
+
+    def obtener_resumen(self, top: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Devuelve un snapshot serializable a JSON, ordenado por tiempo total acumulado (descendente).
+        `top` limita la cantidad de sentencias devueltas.
+        """
+        with self._lock:
+            copia = [
+                (
+                    origen,
+                    sentencia,
+                    e.llamadas,
+                    e.errores,
+                    e.filas,
+                    e.lentas,
+                    [h.resumen(e.llamadas) for h in e.histogramas],
+                )
+                for (origen, sentencia), e in self._estadisticas.items()
+            ]
+            desde = self._desde
+
+        sentencias: List[Dict[str, Any]] = []
+        for origen, sentencia, llamadas, errores, filas, lentas, resumenes in copia:
+            sentencias.append(
+                {
+                    "origen": origen,
+                    "sentencia": sentencia,
+                    "llamadas": llamadas,
+                    "errores": errores,
+                    "filas": filas,
+                    "lentas": lentas,
+                    "tiempo_total_ms": round(sum(r["total_ms"] for r in resumenes), 3),
+                    **dict(zip(FASES, resumenes)),
+                }
+            )
+        sentencias.sort(key=lambda s: s["tiempo_total_ms"], reverse=True)
+        if top:
+            sentencias = sentencias[:top]
+
+        return {
+            "pid": os.getpid(),
+            "desde": desde.isoformat(timespec="seconds"),
+            "generado": datetime.now().isoformat(timespec="seconds"),
+            "sentencias": sentencias,
+        }
+
+    def volcar_a_archivo(self, ruta: Path):
+        """Escribe el resumen en `ruta` de forma atómica (archivo temporal + reemplazo)."""
+        ruta = Path(ruta)
+        ruta.parent.mkdir(parents=True, exist_ok=True)
+        temporal = ruta.with_suffix(ruta.suffix + ".tmp")
+        with open(temporal, "w", encoding="utf-8") as f:
+            json.dump(self.obtener_resumen(), f, ensure_ascii=False, indent=2, default=str)
+        os.replace(temporal, ruta)
+
+    def reiniciar(self):
+        with self._lock:
+            self._estadisticas.clear()
+            self._desde = datetime.now()
+
+
+METRICAS_DB = MetricasConsultas()
+
+
+class MedicionConsulta:
+    """
+    Cronómetro de una consulta. Se marcan las fases a medida que ocurren y al final se llama a
+    `registrar()`; las fases no marcadas (p. ej. si falló el checkout) se imputan a la anterior.
+
+        medicion = db.medir_consulta(query, params)
+        with db.obtener_cursor() as cursor:
+            medicion.marcar_conexion()
+            cursor.execute(query, params)
+            medicion.marcar_ejecucion()
+            filas = cursor.fetchall()
+            medicion.marcar_lectura(len(filas))
+        medicion.registrar()
+    """
+
+    __slots__ = (
+        "_metricas",
+        "_origen",
+        "_query",
+        "_params",
+        "_umbral_ms",
+        "_inicio",
+        "_conexion",
+        "_ejecucion",
+        "_lectura",
+        "_filas",
+    )
+
+    def __init__(
+        self,
+        origen: str,
+        query: str,
+        params: Any = None,
+        umbral_lenta_ms: Optional[float] = None,
+        metricas: MetricasConsultas = METRICAS_DB,
+    ):
+        self._metricas = metricas
+        self._origen = origen
+        self._query = query
+        self._params = params
+        self._umbral_ms = umbral_lenta_ms
+        self._conexion = self._ejecucion = self._lectura = None
+        self._filas = 0
+        self._inicio = time.perf_counter()
+
+    def marcar_conexion(self):
+        self._conexion = time.perf_counter()
+
+    def marcar_ejecucion(self):
+        self._ejecucion = time.perf_counter()
+
+    def marcar_lectura(self, filas: int):
+        self._lectura = time.perf_counter()
+        self._filas = filas
+
+    def registrar(self, error: bool = False, filas: Optional[int] = None):
+        fin = time.perf_counter()
+        conexion = self._conexion or fin
+        ejecucion = self._ejecucion or fin
+        espera_pool = conexion - self._inicio
+        lectura = (self._lectura - ejecucion) if self._lectura else 0.0
+        self._metricas.registrar(
+            self._origen,
+            self._query,
+            espera_pool,
+            (fin - self._inicio) - espera_pool - lectura,
+            lectura,
+            self._filas if filas is None else filas,
+            error,
+            self._params,
+            self._umbral_ms,
+        )
+
+
+class VolcadoPeriodico:
+    """Hilo daemon que vuelca `METRICAS_DB` a un archivo cada `intervalo_seg` segundos."""
+
+    def __init__(self, ruta: Path, intervalo_seg: float, metricas: MetricasConsultas = METRICAS_DB):
+        self.ruta = Path(ruta)
+        self.intervalo_seg = intervalo_seg
+        self._metricas = metricas
+        self._detener = threading.Event()
+        self._hilo = threading.Thread(target=self._bucle, name="sam-metricas-db", daemon=True)
+
+    def iniciar(self) -> "VolcadoPeriodico":
+        self._hilo.start()
+        logger.info(f"Volcado de métricas de BD cada {self.intervalo_seg}s en {self.ruta}")
+        return self
+
+    def detener(self):
+        """Detiene el hilo y hace un último volcado."""
+        self._detener.set()
+        if self._hilo.is_alive():
+            self._hilo.join(timeout=5)
+        self._volcar()
+
+    def _bucle(self):
+        while not self._detener.wait(self.intervalo_seg):
+            self._volcar()
+
+    def _volcar(self):
+        try:
+            self._metricas.volcar_a_archivo(self.ruta)
+        except Exception as e:
+            logger.warning(f"No se pudo volcar las métricas de BD a {self.ruta}: {e}")
+
+
+def iniciar_volcado_periodico(service_name: str, sufijo: str = "") -> Optional[VolcadoPeriodico]:
+    """
+    Inicia el volcado periódico según `LOG_METRICAS_BD_INTERVALO_SEG` (0 lo desactiva).
+    El archivo se escribe en el directorio de logs como `sam_<servicio><sufijo>_db_metricas.json`.
+    """
+    log_config = ConfigManager.get_log_config()
+    intervalo = log_config["db_metrics_interval"]
+    if intervalo <= 0:
+        return None
+    ruta = Path(log_config["directory"]) / f"sam_{service_name}{sufijo}_db_metricas.json"
+    return VolcadoPeriodico(ruta, intervalo).iniciar()
@@ -1,10 +1,14 @@
 # sam/common/sincronizador_comun.py
 import asyncio
 import logging
-from typing import Dict, List
+import weakref
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Sequence
 
 from .a360_client import AutomationAnywhereClient
-from .database import DatabaseConnector
+from .config_manager import ConfigManager
+from .database import AsyncDatabaseConnector, DatabaseConnector, RowMode
+from .indice_sincronizacion import IndiceSincronizacion
+from .trazas import TRAZADOR, trazar
 
 logger = logging.getLogger(__name__)
 
@@ -13,19 +17,48 @@ class SincronizadorComun:
     """
     Componente 'cerebro' centralizado y reutilizable, responsable de la lógica
     de sincronización de entidades entre SAM y Automation Anywhere.
+
+    La sincronización consume las páginas de A360 a medida que llegan: los robots se envían a
+    MergeRobots en lotes de `tamano_lote_tvp` mientras se siguen descargando usuarios y devices,
+    y de usuarios y devices solo se conservan los campos necesarios para mapear los equipos.
+
+    Con la sincronización delta (`SINCRONIZACION_DELTA_HABILITAR`) solo se envían las filas nuevas o
+    modificadas desde el último merge confirmado, según un `IndiceSincronizacion` compartido por
+    todas las instancias que usan el mismo conector.
     """
 
-    def __init__(self, db_connector: DatabaseConnector, aa_client: AutomationAnywhereClient):
+    TAMANO_LOTE_TVP = 500
+    _COLUMNAS_ROBOTS = ("RobotId", "Robot", "Descripcion")
+    _COLUMNAS_EQUIPOS = ("EquipoId", "Equipo", "UserId", "UserName", "Licencia", "Activo_SAM")
+
+    _indices: "weakref.WeakKeyDictionary[Any, IndiceSincronizacion]" = weakref.WeakKeyDictionary()
+
+    def __init__(
+        self,
+        db_connector: DatabaseConnector,
+        aa_client: AutomationAnywhereClient,
+        tamano_lote_tvp: Optional[int] = None,
+    ):
         """
         Inicializa el Sincronizador con sus dependencias.
 
         Args:
             db_connector: Conector a la base de datos de SAM.
             aa_client: Cliente para la API de Automation Anywhere.
+            tamano_lote_tvp: Filas por llamada a MergeRobots/MergeEquipos.
         """
         self._db_connector = db_connector
+        self._db_async = AsyncDatabaseConnector.para(db_connector)
         self._aa_client = aa_client
         self._valid_licenses = {"ATTENDEDRUNTIME", "RUNTIME"}
+        self._tamano_lote_tvp = max(1, tamano_lote_tvp or self.TAMANO_LOTE_TVP)
+        config = ConfigManager.get_sincronizacion_config()
+        self._indice: Optional[IndiceSincronizacion] = None
+        if config["delta_habilitado"]:
+            self._indice = self._indices.get(db_connector)
+            if self._indice is None:
+                self._indice = IndiceSincronizacion(config["indice_archivo"], config["indice_verificacion_seg"])
+                self._indices[db_connector] = self._indice
 
     async def sincronizar_entidades(self) -> Dict[str, int]:
         """
@@ -34,48 +67,171 @@ class SincronizadorComun:
         """
         logger.info("Iniciando obtención de entidades desde A360 en paralelo...")
         try:
-            robots_task = self._aa_client.obtener_robots()
-            devices_task = self._aa_client.obtener_devices()
-            users_task = self._aa_client.obtener_usuarios_detallados()
+            robots_task = self.sincronizar_robots()
+            devices_task = self._recolectar_devices(self._aa_client.iterar_devices())
+            users_task = self._recolectar_usuarios_validos(self._aa_client.iterar_usuarios_detallados())
 
-            robots_api, devices_api, users_api = await asyncio.gather(robots_task, devices_task, users_task)
+            resumen_robots, devices, users_by_id = await asyncio.gather(robots_task, devices_task, users_task)
             logger.debug(
-                f"Datos recibidos de A360: {len(robots_api)} robots, {len(devices_api)} dispositivos, {len(users_api)} usuarios."
+                f"Datos recibidos de A360: {len(devices)} dispositivos, {len(users_by_id)} usuarios con licencia válida."
             )
 
-            equipos_finales = self._procesar_y_mapear_equipos(devices_api, users_api)
-
-            logger.debug("Actualizando base de datos de SAM...")
-            self._db_connector.merge_robots(robots_api)
-            self._db_connector.merge_equipos(equipos_finales)
+            equipos_finales = self._mapear_equipos(devices, users_by_id)
+            resumen = {**resumen_robots, **(await self.persistir_equipos(equipos_finales))}
 
             logger.info(
-                f"Sincronización completada. {len(robots_api)} robots y {len(equipos_finales)} equipos procesados."
+                f"Sincronización completada. {resumen['robots_sincronizados']} robots "
+                f"({resumen['robots_sin_cambios']} sin cambios) y {resumen['equipos_sincronizados']} equipos "
+                f"({resumen['equipos_sin_cambios']} sin cambios) procesados."
             )
-            return {"robots_sincronizados": len(robots_api), "equipos_sincronizados": len(equipos_finales)}
+            return resumen
 
         except Exception as e:
             logger.error(f"Error grave durante el ciclo de sincronización centralizado: {e}", exc_info=True)
             raise
 
-    def _procesar_y_mapear_equipos(self, devices_list: List[Dict], users_list: List[Dict]) -> List[Dict]:
+    @trazar("sincronizar_robots")
+    async def sincronizar_robots(self) -> Dict[str, int]:
         """
-        Toma los datos en bruto de las APIs y los transforma al formato que
-        el Stored Procedure MergeEquipos espera.
+        Envía los robots a MergeRobots en lotes a medida que llegan las páginas de A360.
+        Hay a lo sumo una escritura en curso: si la BD es más lenta que la API, la descarga espera
+        en lugar de acumular páginas. Con el índice delta, los robots sin cambios no se envían.
         """
-        if not devices_list:
-            logger.warning("La lista de dispositivos de la API está vacía.")
-            return []
+        tabla, columnas = "Robots", self._COLUMNAS_ROBOTS
+        await self._verificar_indice(tabla, columnas)
+        pendientes: List[Dict] = []
+        escritura: Optional[asyncio.Task] = None
+        vistos = set()
+        total = sin_cambios = escrituras = 0
+        try:
+            async for robots_pagina in self._aa_client.iterar_robots():
+                total += len(robots_pagina)
+                if self._indice:
+                    vistos.update(r.get("RobotId") for r in robots_pagina)
+                    cambios = self._indice.filtrar_cambios(tabla, robots_pagina, columnas)
+                    sin_cambios += len(robots_pagina) - len(cambios)
+                    robots_pagina = cambios
+                pendientes.extend(robots_pagina)
+                while len(pendientes) >= self._tamano_lote_tvp:
+                    lote, pendientes = pendientes[: self._tamano_lote_tvp], pendientes[self._tamano_lote_tvp :]
+                    if escritura:
+                        await escritura
+                    escritura = asyncio.create_task(self._merge_y_confirmar(tabla, columnas, lote))
+                    escrituras += 1
+            if escritura:
+                await escritura
+            if pendientes:
+                await self._merge_y_confirmar(tabla, columnas, pendientes)
+                escrituras += 1
+        except BaseException:
+            if escritura and not escritura.done():
+                escritura.cancel()
+            raise
+        await self._actualizar_indice(tabla, columnas, vistos, escrituras)
+        logger.debug(f"Robots sincronizados en lotes de {self._tamano_lote_tvp}: {total} ({sin_cambios} sin cambios).")
+        return {"robots_sincronizados": total, "robots_sin_cambios": sin_cambios}
 
-        # 1. Filtrar usuarios que tengan al menos una de las licencias válidas.
-        users_by_id = {
-            user["id"]: user
+    @trazar("persistir_equipos")
+    async def persistir_equipos(self, equipos: List[Dict]) -> Dict[str, int]:
+        """Envía los equipos mapeados a MergeEquipos por lotes; con el índice delta, solo los que cambiaron."""
+        tabla, columnas = "Equipos", self._COLUMNAS_EQUIPOS
+        await self._verificar_indice(tabla, columnas)
+        cambios = self._indice.filtrar_cambios(tabla, equipos, columnas) if self._indice else equipos
+        for inicio in range(0, len(cambios), self._tamano_lote_tvp):
+            await self._merge_y_confirmar(tabla, columnas, cambios[inicio : inicio + self._tamano_lote_tvp])
+        vistos = {e.get("EquipoId") for e in equipos}
+        await self._actualizar_indice(tabla, columnas, vistos, escrituras=1 if cambios else 0)
+        return {"equipos_sincronizados": len(equipos), "equipos_sin_cambios": len(equipos) - len(cambios)}
+
+    async def _merge_y_confirmar(self, tabla: str, columnas: Sequence[str], lote: List[Dict]):
+        merge = self._db_async.merge_robots if tabla == "Robots" else self._db_async.merge_equipos
+        with TRAZADOR.span("merge_lote", tabla=tabla, filas=len(lote)):
+            resultado = await merge(lote)
+        # merge_* devuelve -1 si falló: esas filas no se confirman y se reenvían el próximo ciclo.
+        if self._indice and resultado != -1:
+            self._indice.confirmar(tabla, lote, columnas)
+        return resultado
+
+    @trazar("huella_tabla")
+    async def _huella_tabla(self, tabla: str, columnas: Sequence[str]) -> Optional[List]:
+        """CHECKSUM_AGG y cantidad de filas de las columnas que escribe la sincronización."""
+        filas = await self._db_async.ejecutar_consulta(
+            f"SELECT CHECKSUM_AGG(CHECKSUM({', '.join(columnas)})), COUNT_BIG(*) FROM dbo.{tabla}",
+            row_mode=RowMode.TUPLE,
+        )
+        return [None if v is None else int(v) for v in filas[0]] if filas else None
+
+    async def _verificar_indice(self, tabla: str, columnas: Sequence[str]):
+        if self._indice and self._indice.requiere_verificacion(tabla):
+            self._indice.verificar(tabla, await self._huella_tabla(tabla, columnas))
+
+    async def _actualizar_indice(self, tabla: str, columnas: Sequence[str], vistos: set, escrituras: int):
+        """Tras un merge, registra la nueva huella de la tabla y persiste el índice."""
+        if not self._indice:
+            return
+        retirados = self._indice.retirar_ausentes(tabla, vistos)
+        if escrituras:
+            self._indice.fijar_huella(tabla, await self._huella_tabla(tabla, columnas))
+        if escrituras or retirados:
+            self._indice.guardar()
+
+    @staticmethod
+    @trazar("a360_devices")
+    async def _recolectar_devices(paginas: AsyncIterator[List[Dict]]) -> List[Dict[str, Any]]:
+        """Conserva de cada device solo los campos que usa `_mapear_equipos`."""
+        devices = []
+        async for devices_pagina in paginas:
+            for device in devices_pagina:
+                default_users = device.get("defaultUsers", [])
+                devices.append(
+                    {
+                        "id": device.get("id"),
+                        "hostName": device.get("hostName"),
+                        "status": device.get("status"),
+                        "defaultUsers": [{"id": u.get("id")} for u in default_users]
+                        if isinstance(default_users, list)
+                        else default_users,
+                    }
+                )
+        return devices
+
+    @trazar("a360_usuarios")
+    async def _recolectar_usuarios_validos(self, paginas: AsyncIterator[List[Dict]]) -> Dict[Any, Dict]:
+        """Filtra los usuarios con licencia válida a medida que llegan y conserva solo los campos necesarios."""
+        users_by_id = {}
+        async for users_pagina in paginas:
+            users_by_id.update(self._filtrar_usuarios_validos(users_pagina))
+        return users_by_id
+
+    def _filtrar_usuarios_validos(self, users_list: Iterable[Dict]) -> Dict[Any, Dict]:
+        """Usuarios que tienen al menos una de las licencias válidas, indexados por id."""
+        return {
+            user["id"]: {
+                "id": user["id"],
+                "username": user.get("username"),
+                "licenseFeatures": user.get("licenseFeatures", []),
+            }
             for user in users_list
             if isinstance(user, dict)
             and "id" in user
             and any(lic in self._valid_licenses for lic in user.get("licenseFeatures", []))
         }
+
+    def _procesar_y_mapear_equipos(self, devices_list: List[Dict], users_list: List[Dict]) -> List[Dict]:
+        """
+        Toma los datos en bruto de las APIs y los transforma al formato que
+        el Stored Procedure MergeEquipos espera.
+        """
+        # 1. Filtrar usuarios que tengan al menos una de las licencias válidas.
+        users_by_id = self._filtrar_usuarios_validos(users_list)
         logger.debug(f"Se filtraron {len(users_by_id)} usuarios (de {len(users_list)}) con licencias válidas.")
+        return self._mapear_equipos(devices_list, users_by_id)
+
+    def _mapear_equipos(self, devices_list: List[Dict], users_by_id: Dict[Any, Dict]) -> List[Dict]:
+        """Asigna a cada device el primero de sus usuarios por defecto con licencia válida (formato de MergeEquipos)."""
+        if not devices_list:
+            logger.warning("La lista de dispositivos de la API está vacía.")
+            return []
 
         equipos_procesados = []
         for device in devices_list:
@@ -0,0 +1,115 @@
+# src/sam/common/token_cache.py
+"""
+Caché de tokens en un archivo local, compartido por los procesos de SAM del mismo host.
+
+Cada entrada guarda el token y el momento (epoch) en que se obtuvo, bajo una clave derivada de la
+URL del Control Room y el usuario. La escritura es atómica (archivo temporal + os.replace) y la
+renovación se serializa con un bloqueo exclusivo sobre `<archivo>.lock`, para que solo un proceso
+se autentique mientras los demás esperan y reutilizan el token nuevo.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+if sys.platform == "win32":
+    import msvcrt
+else:
+    import fcntl
+
+logger = logging.getLogger(__name__)
+
+
+class CacheTokenArchivo:
+    def __init__(self, ruta: str, espera_bloqueo_seg: float = 30):
+        self.ruta = Path(ruta)
+        self._ruta_bloqueo = Path(f"{ruta}.lock")
+        self._espera_bloqueo_seg = espera_bloqueo_seg
+        self._fd_bloqueo: Optional[int] = None
+
+    @staticmethod
+    def clave(*partes: str) -> str:
+        """Clave de una entrada: hash de las partes, para no guardar URLs ni usuarios en claro."""
+        return hashlib.sha256("|".join(str(p) for p in partes).encode("utf-8")).hexdigest()[:32]
+
+    def _leer_todo(self) -> Dict[str, Dict]:
+        try:
+            contenido = json.loads(self.ruta.read_text(encoding="utf-8"))
+            return contenido if isinstance(contenido, dict) else {}
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.warning(f"No se pudo leer la caché de tokens {self.ruta}: {e}")
+            return {}
+
+    def _escribir_todo(self, entradas: Dict[str, Dict]):
+        self.ruta.parent.mkdir(parents=True, exist_ok=True)
+        temporal = self.ruta.with_name(f"{self.ruta.name}.{os.getpid()}.tmp")
+        # El archivo contiene credenciales vigentes: solo legible por el usuario del servicio
+        with open(os.open(temporal, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "w", encoding="utf-8") as f:
+            json.dump(entradas, f)
+        os.replace(temporal, self.ruta)
+
+    def leer(self, clave: str) -> Optional[Tuple[str, float]]:
+        """Devuelve (token, obtenido_en) o None. No necesita el bloqueo: la escritura es atómica."""
+        entrada = self._leer_todo().get(clave)
+        if not isinstance(entrada, dict) or not entrada.get("token"):
+            return None
+        return entrada["token"], float(entrada.get("obtenido_en", 0))
+
+    def guardar(self, clave: str, token: str, obtenido_en: float):
+        """Guarda el token. Debe llamarse con el bloqueo tomado para no pisar otras entradas."""
+        try:
+            entradas = self._leer_todo()
+            entradas[clave] = {"token": token, "obtenido_en": obtenido_en}
+            self._escribir_todo(entradas)
+        except OSError as e:
+            logger.warning(f"No se pudo escribir la caché de tokens {self.ruta}: {e}")
+
+    def adquirir_bloqueo(self) -> bool:
+        """
+        Toma el bloqueo exclusivo entre procesos, esperando como máximo `espera_bloqueo_seg`.
+        Es bloqueante: desde código asíncrono se llama con `asyncio.to_thread`.
+        Devuelve False si no se pudo tomar; el llamador puede seguir sin caché compartida.
+        """
+        try:
+            self._ruta_bloqueo.parent.mkdir(parents=True, exist_ok=True)
+            fd = os.open(self._ruta_bloqueo, os.O_RDWR | os.O_CREAT, 0o600)
+        except OSError as e:
+            logger.warning(f"No se pudo abrir el archivo de bloqueo {self._ruta_bloqueo}: {e}")
+            return False
+
+        limite = time.monotonic() + self._espera_bloqueo_seg
+        while True:
+            try:
+                if sys.platform == "win32":
+                    os.lseek(fd, 0, os.SEEK_SET)
+                    msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+                else:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                self._fd_bloqueo = fd
+                return True
+            except OSError:
+                if time.monotonic() >= limite:
+                    os.close(fd)
+                    logger.warning(f"Timeout ({self._espera_bloqueo_seg}s) esperando el bloqueo {self._ruta_bloqueo}.")
+                    return False
+                time.sleep(0.05)
+
+    def liberar_bloqueo(self):
+        fd, self._fd_bloqueo = self._fd_bloqueo, None
+        if fd is None:
+            return
+        try:
+            if sys.platform == "win32":
+                os.lseek(fd, 0, os.SEEK_SET)
+                msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+        finally:
+            os.close(fd)
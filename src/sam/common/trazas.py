@@ -0,0 +1,281 @@
+# src/sam/common/trazas.py
+"""
+Trazas por fase de los ciclos de los servicios.
+
+Cada ciclo (lanzamiento, conciliación, sincronización) abre un span raíz con `TRAZADOR.ciclo()` y sus
+fases abren spans anidados con `TRAZADOR.span()` o el decorador `trazar()`: consulta de robots, token
+del API Gateway, llamadas a A360, registro en dbo.Ejecuciones, envío de alertas. El span actual se
+propaga con `contextvars`, así que las tareas creadas dentro de un span (los workers del planificador
+de despliegues, un `asyncio.gather`) quedan anidadas en él.
+
+Los spans terminados se entregan a los exportadores configurados (`ExportadorMemoria`, buffer
+circular consultable en proceso; `ExportadorJsonl`, una línea JSON por span). Al cerrar un ciclo se
+loguea el resumen por fase (cantidad, total, p50/p95/máx).
+
+Deshabilitado, `span()` devuelve siempre el mismo objeto nulo: el costo es una comparación por fase.
+"""
+
+import contextvars
+import functools
+import itertools
+import json
+import logging
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+_span_actual: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("sam_span_actual", default=None)
+_ids_span = itertools.count(1)
+
+
+class Span:
+    __slots__ = (
+        "nombre",
+        "traza_id",
+        "span_id",
+        "padre_id",
+        "inicio",
+        "duracion",
+        "atributos",
+        "error",
+        "es_ciclo",
+        "_trazador",
+        "_token",
+        "_t0",
+    )
+
+    def __init__(self, trazador: "Trazador", nombre: str, padre: Optional["Span"], atributos: Dict[str, Any]):
+        self.nombre = nombre
+        self.traza_id = padre.traza_id if padre is not None else uuid.uuid4().hex[:16]
+        self.span_id = next(_ids_span)
+        self.padre_id = padre.span_id if padre is not None else None
+        self.atributos = atributos
+        self.inicio: Optional[float] = None
+        self.duracion: Optional[float] = None
+        self.error: Optional[str] = None
+        self.es_ciclo = False
+        self._trazador = trazador
+
+    def atributo(self, **atributos):
+        """Agrega atributos conocidos recién durante la fase (p. ej. el deploymentId devuelto por A360)."""
+        self.atributos.update(atributos)
+
+    def __enter__(self) -> "Span":
+        self._token = _span_actual.set(self)
+        self.inicio = time.time()
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, tipo, valor, traceback) -> bool:
+        self.duracion = time.perf_counter() - self._t0
+        if valor is not None:
+            self.error = type(valor).__name__
+        _span_actual.reset(self._token)
+        self._trazador._finalizar(self)
+        return False
+
+    def a_dict(self) -> Dict[str, Any]:
+        return {
+            "traza": self.traza_id,
+            "span": self.span_id,
+            "padre": self.padre_id,
+            "nombre": self.nombre,
+            "inicio": datetime.fromtimestamp(self.inicio).isoformat(timespec="milliseconds") if self.inicio else None,
+            "duracion_ms": round(self.duracion * 1000, 3) if self.duracion is not None else None,
+            "atributos": self.atributos,
+            "error": self.error,
+        }
+
+
+class _SpanNulo:
+    """Span de las trazas deshabilitadas: no mide ni exporta nada."""
+
+    __slots__ = ()
+
+    def atributo(self, **atributos):
+        pass
+
+    def __enter__(self) -> "_SpanNulo":
+        return self
+
+    def __exit__(self, tipo, valor, traceback) -> bool:
+        return False
+
+
+_SPAN_NULO = _SpanNulo()
+
+
+class ExportadorMemoria:
+    """Conserva los últimos `capacidad` spans terminados (buffer circular)."""
+
+    def __init__(self, capacidad: int = 2000):
+        self._spans: deque = deque(maxlen=max(1, int(capacidad)))
+
+    def exportar(self, span: Span):
+        self._spans.append(span)
+
+    def spans(self, traza_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Spans del buffer (de una traza, si se indica) en orden de finalización."""
+        return [s.a_dict() for s in list(self._spans) if traza_id is None or s.traza_id == traza_id]
+
+    def cerrar(self):
+        pass
+
+
+class ExportadorJsonl:
+    """Agrega una línea JSON por span al archivo `ruta`; el archivo se vuelca a disco al cerrar cada ciclo."""
+
+    def __init__(self, ruta: Path):
+        self.ruta = Path(ruta)
+        self.ruta.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._archivo = open(self.ruta, "a", encoding="utf-8")
+
+    def exportar(self, span: Span):
+        linea = json.dumps(span.a_dict(), ensure_ascii=False, default=str)
+        with self._lock:
+            if self._archivo.closed:
+                return
+            self._archivo.write(linea + "\n")
+            if span.padre_id is None:
+                self._archivo.flush()
+
+    def cerrar(self):
+        with self._lock:
+            if not self._archivo.closed:
+                self._archivo.close()
+
+
+def resumen_fases(duraciones: Dict[str, List[float]]) -> Dict[str, Dict[str, Any]]:
+    """Cantidad, total, p50, p95 y máximo (en segundos) de las duraciones de cada fase."""
+    resumen = {}
+    for nombre, valores in duraciones.items():
+        ordenados = sorted(valores)
+
+        def percentil(p: float) -> float:
+            return round(ordenados[min(len(ordenados) - 1, int(p * len(ordenados)))], 4)
+
+        resumen[nombre] = {
+            "n": len(ordenados),
+            "total": round(sum(ordenados), 4),
+            "p50": percentil(0.50),
+            "p95": percentil(0.95),
+            "max": round(ordenados[-1], 4),
+        }
+    return resumen
+
+
+class Trazador:
+    def __init__(self):
+        self.habilitado = False
+        self._exportadores: List[Any] = []
+        self._lock = threading.Lock()
+        # traza_id del ciclo en curso -> nombre de fase -> duraciones
+        self._fases: Dict[str, Dict[str, List[float]]] = {}
+        self._ultimo_resumen: Dict[str, Dict[str, Any]] = {}
+
+    def configurar(self, habilitado: bool, exportadores: Sequence[Any] = ()):
+        """Habilita (o deshabilita) las trazas y reemplaza los exportadores, cerrando los anteriores."""
+        anteriores, self._exportadores = self._exportadores, list(exportadores)
+        self.habilitado = habilitado
+        for exportador in anteriores:
+            if exportador not in self._exportadores:
+                exportador.cerrar()
+
+    def cerrar(self):
+        self.configurar(False)
+
+    def exportador(self, tipo: type) -> Optional[Any]:
+        """El primer exportador configurado del tipo indicado (p. ej. el buffer en memoria)."""
+        return next((e for e in self._exportadores if isinstance(e, tipo)), None)
+
+    def span(self, nombre: str, **atributos) -> Any:
+        """Span de una fase, hijo del span actual. Usar como `with TRAZADOR.span("fase", robot=1) as span:`."""
+        if not self.habilitado:
+            return _SPAN_NULO
+        return Span(self, nombre, _span_actual.get(), atributos)
+
+    def ciclo(self, nombre: str, **atributos) -> Any:
+        """Span raíz de un ciclo: al cerrarse loguea el resumen por fase de sus spans."""
+        if not self.habilitado:
+            return _SPAN_NULO
+        span = Span(self, nombre, None, atributos)
+        span.es_ciclo = True
+        with self._lock:
+            self._fases[span.traza_id] = {}
+        return span
+
+    def ultimo_resumen(self) -> Dict[str, Dict[str, Any]]:
+        """Resumen por fase del último ciclo terminado de cada nombre."""
+        with self._lock:
+            return dict(self._ultimo_resumen)
+
+    def _finalizar(self, span: Span):
+        with self._lock:
+            if span.es_ciclo:
+                fases = self._fases.pop(span.traza_id, {})
+            else:
+                fases = None
+                por_nombre = self._fases.get(span.traza_id)
+                if por_nombre is not None:
+                    por_nombre.setdefault(span.nombre, []).append(span.duracion)
+
+        if fases is not None:
+            resumen = resumen_fases(fases)
+            with self._lock:
+                self._ultimo_resumen[span.nombre] = {"duracion": round(span.duracion, 4), "fases": resumen}
+            if resumen:
+                detalle = "; ".join(
+                    f"{nombre} n={r['n']} total={r['total']}s p50={r['p50']}s p95={r['p95']}s máx={r['max']}s"
+                    for nombre, r in sorted(resumen.items(), key=lambda item: item[1]["total"], reverse=True)
+                )
+                logger.info(f"Fases del ciclo de {span.nombre} ({span.duracion:.3f}s): {detalle}")
+
+        for exportador in self._exportadores:
+            try:
+                exportador.exportar(span)
+            except Exception as e:
+                logger.debug(f"No se pudo exportar el span {span.nombre}: {e}")
+
+
+TRAZADOR = Trazador()
+
+
+def trazar(nombre: str) -> Callable:
+    """Decorador para métodos asíncronos: ejecuta cada llamada dentro de un span `nombre`."""
+
+    def decorador(funcion: Callable) -> Callable:
+        @functools.wraps(funcion)
+        async def envoltura(*args, **kwargs):
+            if not TRAZADOR.habilitado:
+                return await funcion(*args, **kwargs)
+            with TRAZADOR.span(nombre):
+                return await funcion(*args, **kwargs)
+
+        return envoltura
+
+    return decorador
+
+
+def configurar_trazas(habilitado: bool, capacidad: int, archivo: Optional[str] = None) -> Trazador:
+    """Configura `TRAZADOR` con el buffer en memoria y, si se indica `archivo`, el exportador JSONL."""
+    if not habilitado:
+        TRAZADOR.configurar(False)
+        return TRAZADOR
+    exportadores: List[Any] = [ExportadorMemoria(capacidad)]
+    if archivo:
+        try:
+            exportadores.append(ExportadorJsonl(Path(archivo)))
+        except OSError as e:
+            logger.error(f"No se pudo abrir el archivo de trazas {archivo}: {e}. Solo se conservan en memoria.")
+    TRAZADOR.configurar(True, exportadores)
+    logger.info(
+        f"Trazas por fase habilitadas (buffer de {capacidad} spans{f', archivo {archivo}' if archivo else ''})."
+    )
+    return TRAZADOR
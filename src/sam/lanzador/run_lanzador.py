@@ -23,13 +23,18 @@ if __name__ == "__main__":
 
 from sam.common.a360_client import AutomationAnywhereClient
 from sam.common.apigw_client import ApiGatewayClient
+from sam.common.aviso_lanzador import ReceptorAvisos
 from sam.common.config_manager import ConfigManager
-from sam.common.database import DatabaseConnector
+from sam.common.database import AsyncDatabaseConnector, DatabaseConnector
 from sam.common.logging_setup import setup_logging
 from sam.common.mail_client import EmailAlertClient
+from sam.common.metricas_db import VolcadoPeriodico, iniciar_volcado_periodico
+from sam.common.trazas import TRAZADOR, configurar_trazas
 from sam.lanzador.service.conciliador import Conciliador
 from sam.lanzador.service.desplegador import Desplegador
 from sam.lanzador.service.main import LanzadorService
+from sam.lanzador.service.registro_ejecuciones import RegistroEjecucionesDiferido
+from sam.lanzador.service.salud_equipos import SaludEquipos
 from sam.lanzador.service.sincronizador import Sincronizador
 
 # --- Globales del Servicio ---
@@ -42,6 +47,10 @@ _db_connector: Optional[DatabaseConnector] = None
 _aa_client: Optional[AutomationAnywhereClient] = None
 _gateway_client: Optional[ApiGatewayClient] = None
 _notificador: Optional[EmailAlertClient] = None
+_volcado_metricas_db: Optional[VolcadoPeriodico] = None
+_registro_ejecuciones: Optional[RegistroEjecucionesDiferido] = None
+_receptor_avisos: Optional[ReceptorAvisos] = None
+_salud_equipos: Optional[SaludEquipos] = None
 
 
 # ---------- Gestión de Cierre Ordenado (Graceful Shutdown) ----------
@@ -88,7 +97,7 @@ def _setup_signals() -> None:
 
 def _setup_dependencies() -> Dict[str, Any]:
     """Crea y retorna las dependencias específicas del servicio."""
-    global _db_connector, _aa_client, _gateway_client, _notificador
+    global _db_connector, _aa_client, _gateway_client, _notificador, _volcado_metricas_db
 
     logging.debug("Creando dependencias (DB, Clientes API)...")
 
@@ -110,12 +119,24 @@ def _setup_dependencies() -> Dict[str, Any]:
         cr_api_timeout=cfg_aa["api_timeout_seconds"],
         callback_url_deploy=cfg_aa.get("callback_url_deploy"),
         conciliador_batch_size=cfg_lanzador.get("conciliador_batch_size"),
+        conciliador_batch_size_max=cfg_lanzador.get("conciliador_batch_size_max"),
+        conciliador_concurrency=cfg_lanzador.get("conciliador_concurrency"),
+        default_page_size=cfg_aa.get("default_page_size"),
+        max_pagination_pages=cfg_aa.get("max_pagination_pages"),
+        pagination_concurrency=cfg_aa.get("pagination_concurrency"),
+        token_refresh_buffer_sec=cfg_aa.get("token_refresh_buffer_sec"),
+        token_cache_path=cfg_aa.get("token_cache_path"),
+        adaptive_concurrency_max=cfg_aa.get("adaptive_concurrency_max"),
+        latency_tolerance=cfg_aa.get("latency_tolerance"),
+        retry_budget_ratio=cfg_aa.get("retry_budget_ratio"),
+        list_cache_ttl=cfg_aa.get("list_cache_ttl"),
     )
 
     cfg_apigw = ConfigManager.get_apigw_config()
     _gateway_client = ApiGatewayClient(cfg_apigw)
 
     _notificador = EmailAlertClient(service_name=_service_name)
+    _volcado_metricas_db = iniciar_volcado_periodico(_service_name)
 
     return {
         "db_connector": _db_connector,
@@ -127,11 +148,47 @@ def _setup_dependencies() -> Dict[str, Any]:
 
 async def _run_service(deps: Dict[str, Any]) -> None:
     """Inicializa y ejecuta la lógica principal del servicio (asíncrono)."""
-    global _service_instance
+    global _service_instance, _registro_ejecuciones, _receptor_avisos, _salud_equipos
 
     cfg_lanzador = ConfigManager.get_lanzador_config()
     callback_token = ConfigManager.get_callback_server_config().get("token")
 
+    if cfg_lanzador.get("registro_diferido"):
+        _registro_ejecuciones = RegistroEjecucionesDiferido(
+            deps["db_connector"],
+            tamano_lote=cfg_lanzador["registro_lote_tamano"],
+            intervalo_ms=cfg_lanzador["registro_lote_intervalo_ms"],
+            max_pendientes=cfg_lanzador["registro_max_pendientes"],
+            archivo_spill=cfg_lanzador["registro_spill_archivo"],
+        )
+        # Escribe cuanto antes las filas recuperadas del archivo de respaldo
+        _registro_ejecuciones.iniciar()
+
+    if cfg_lanzador.get("salud_equipos_habilitar"):
+        _salud_equipos = SaludEquipos(
+            deps["aa_client"].obtener_devices,
+            umbral_fallos=cfg_lanzador["salud_equipos_fallos_umbral"],
+            sondeo_min_seg=cfg_lanzador["salud_equipos_sondeo_min_seg"],
+            sondeo_max_seg=cfg_lanzador["salud_equipos_sondeo_max_seg"],
+            ttl_lista_seg=cfg_lanzador["salud_equipos_lista_ttl_seg"],
+        )
+
+    configurar_trazas(
+        cfg_lanzador["trazas_habilitar"], cfg_lanzador["trazas_buffer_tamano"], cfg_lanzador["trazas_archivo"]
+    )
+
+    cfg_aviso = ConfigManager.get_aviso_lanzador_config()
+    if cfg_aviso["habilitado"]:
+        receptor = ReceptorAvisos()
+        try:
+            await receptor.iniciar(cfg_aviso["host"], cfg_aviso["puerto"])
+            _receptor_avisos = receptor
+        except OSError as e:
+            logging.error(
+                f"No se pudo escuchar avisos en {cfg_aviso['host']}:{cfg_aviso['puerto']}: {e}. "
+                "Los equipos liberados se atenderán solo en el ciclo periódico."
+            )
+
     sincronizador = Sincronizador(deps["db_connector"], deps["aa_client"])
     desplegador = Desplegador(
         deps["db_connector"],
@@ -140,6 +197,8 @@ async def _run_service(deps: Dict[str, Any]) -> None:
         deps["notificador"],
         cfg_lanzador,
         callback_token,
+        registro_ejecuciones=_registro_ejecuciones,
+        salud_equipos=_salud_equipos,
     )
     conciliador = Conciliador(deps["db_connector"], deps["aa_client"], cfg_lanzador)
     sync_enabled = cfg_lanzador.get("habilitar_sync", False)
@@ -151,6 +210,8 @@ async def _run_service(deps: Dict[str, Any]) -> None:
         deps["notificador"],
         cfg_lanzador,
         sync_enabled,
+        receptor_avisos=_receptor_avisos,
+        debounce_avisos_seg=cfg_aviso["debounce_ms"] / 1000,
     )
 
     logging.debug("Iniciando los ciclos de tareas asíncronas...")
@@ -189,6 +250,11 @@ async def _cleanup_resources() -> None:
         except Exception as e:
             logging.error(f"Error durante el gather de tareas en el cierre: {e}", exc_info=True)
 
+    if _receptor_avisos:
+        _receptor_avisos.cerrar()
+    if _salud_equipos:
+        await _salud_equipos.cerrar()
+
     # 2. Cerrar clientes HTTP (asíncronos)
     if _gateway_client:
         try:
@@ -203,14 +269,26 @@ async def _cleanup_resources() -> None:
         except Exception as e:
             logging.error(f"Error cerrando aa_client: {e}")
 
-    # 3. Cerrar BD
+    # 3. Escribir las ejecuciones pendientes del registro diferido y cerrar BD
+    if _registro_ejecuciones:
+        try:
+            await _registro_ejecuciones.cerrar()
+            logging.info("Registro diferido de ejecuciones vaciado.")
+        except Exception as e:
+            logging.error(f"Error vaciando el registro diferido de ejecuciones: {e}")
     if _db_connector:
         try:
+            AsyncDatabaseConnector.para(_db_connector).cerrar()
+            _db_connector.cerrar_conexiones_pool()
             _db_connector.cerrar_conexion_hilo_actual()
             logging.info("db_connector cerrado.")
         except Exception as e:
             logging.error(f"Error cerrando db_connector: {e}")
 
+    if _volcado_metricas_db:
+        _volcado_metricas_db.detener()
+    TRAZADOR.cerrar()
+
     logging.info(f"Servicio {_service_name.upper()} ha concluido y liberado recursos.")
 
 
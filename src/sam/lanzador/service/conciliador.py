@@ -1,13 +1,14 @@
 # sam/lanzador/service/conciliador.py
 import logging
 from datetime import datetime
-from typing import Optional
+from typing import Dict, Optional
 
 import pytz
 from dateutil import parser as dateutil_parser
 
 from sam.common.a360_client import AutomationAnywhereClient
-from sam.common.database import DatabaseConnector
+from sam.common.database import AsyncDatabaseConnector, DatabaseConnector
+from sam.common.trazas import TRAZADOR, trazar
 
 logger = logging.getLogger(__name__)
 
@@ -30,6 +31,7 @@ class Conciliador:
             max_intentos_fallidos: Parámetro legacy (no usado, mantener por compatibilidad).
         """
         self._db_connector = db_connector
+        self._db_async = AsyncDatabaseConnector.para(db_connector)
         self._aa_client = aa_client
         self._config = config
         self.ESTADOS_VALIDOS_API = {
@@ -47,36 +49,59 @@ class Conciliador:
             "UNKNOWN",
         }
 
-    async def conciliar_ejecuciones(self):
+    async def conciliar_ejecuciones(self) -> int:
         """
         Orquesta un ciclo completo de conciliación de ejecuciones.
+        Devuelve cuántas ejecuciones activas había (0 si no hubo nada que conciliar o el ciclo falló).
         """
         logger.debug("Iniciando conciliación de ejecuciones en curso...")
         try:
-            ejecuciones_en_curso = self._db_connector.obtener_ejecuciones_en_curso()
+            with TRAZADOR.span("obtener_ejecuciones_en_curso") as span:
+                ejecuciones_en_curso = await self._db_async.obtener_ejecuciones_en_curso()
+                span.atributo(ejecuciones=len(ejecuciones_en_curso or []))
             if not ejecuciones_en_curso:
                 logger.info("No hay ejecuciones activas para conciliar.")
-                return
+                return 0
 
-            mapa_deploy_a_ejecucion = {
-                imp["DeploymentId"]: imp["EjecucionId"]
-                for imp in ejecuciones_en_curso
-                if imp.get("DeploymentId") and imp.get("EjecucionId")
-            }
+            mapa_deploy_a_ejecucion = self._mapa_ejecuciones(ejecuciones_en_curso)
             deployment_ids = list(mapa_deploy_a_ejecucion.keys())
 
             if not deployment_ids:
                 logger.info("No se encontraron DeploymentIds válidos en las ejecuciones activas.")
-                return
+                return 0
 
             # Estrategia Única (Híbrida: Global + Verificación)
             # Combina eficiencia (vista global) con precisión (consulta puntual para desaparecidos)
             await self._conciliar_hibrido(ejecuciones_en_curso)
 
-            self._marcar_unknown_por_antiguedad()
+            await self._marcar_unknown_por_antiguedad()
+            return len(ejecuciones_en_curso)
 
         except Exception as e:
             logger.error(f"Error grave durante el ciclo de conciliación: {e}", exc_info=True)
+            return 0
+
+    @staticmethod
+    def _mapa_ejecuciones(ejecuciones_en_curso: list) -> Dict[str, Dict[Optional[int], int]]:
+        """
+        DeploymentId -> {UserId: EjecucionId}. Un despliegue agrupado (un robot en varios usuarios con
+        una sola llamada) comparte el DeploymentId y tiene una ejecución por usuario.
+        """
+        mapa: Dict[str, Dict[Optional[int], int]] = {}
+        for imp in ejecuciones_en_curso:
+            if imp.get("DeploymentId") and imp.get("EjecucionId"):
+                mapa.setdefault(imp["DeploymentId"], {})[imp.get("UserId")] = imp["EjecucionId"]
+        return mapa
+
+    @staticmethod
+    def _ejecucion_del_detalle(detalle: dict, ejecuciones: Dict[Optional[int], int]) -> Optional[int]:
+        """EjecucionId local de una actividad de A360; en despliegues agrupados se elige por `userId`."""
+        if len(ejecuciones) == 1:
+            return next(iter(ejecuciones.values()))
+        try:
+            return ejecuciones.get(int(detalle.get("userId")))
+        except (TypeError, ValueError):
+            return None
 
     async def _conciliar_hibrido(self, ejecuciones_en_curso: list):
         """
@@ -92,7 +117,9 @@ class Conciliador:
 
         try:
             # 1. Obtener lista global de activos
-            activas_api = await self._aa_client.obtener_ejecuciones_activas()
+            with TRAZADOR.span("a360_ejecuciones_activas") as span:
+                activas_api = await self._aa_client.obtener_ejecuciones_activas()
+                span.atributo(activas=len(activas_api or []))
         except Exception as e:
             logger.error(f"Fallo al obtener ejecuciones activas: {e}")
             return
@@ -101,11 +128,7 @@ class Conciliador:
         ids_activos_api = {item.get("deploymentId") for item in activas_api if item.get("deploymentId")}
 
         # 2. Identificar cuáles de las locales siguen activas y cuáles desaparecieron
-        mapa_deploy_a_ejecucion = {
-            imp["DeploymentId"]: imp["EjecucionId"]
-            for imp in ejecuciones_en_curso
-            if imp.get("DeploymentId") and imp.get("EjecucionId")
-        }
+        mapa_deploy_a_ejecucion = self._mapa_ejecuciones(ejecuciones_en_curso)
         mapa_deploy_a_data = {imp["DeploymentId"]: imp for imp in ejecuciones_en_curso if imp.get("DeploymentId")}
 
         # A) Las que siguen activas: Actualizamos sus estados (RUNNING, etc.) usando la info de la API
@@ -113,7 +136,7 @@ class Conciliador:
 
         if detalles_relevantes:
             logger.debug(f"Actualizando {len(detalles_relevantes)} ejecuciones que siguen activas...")
-            self._actualizar_estados_encontrados(detalles_relevantes, mapa_deploy_a_ejecucion)
+            await self._actualizar_estados_encontrados(detalles_relevantes, mapa_deploy_a_ejecucion)
 
         # B) Las que desaparecieron de la lista de activos
         ids_locales = set(mapa_deploy_a_ejecucion.keys())
@@ -127,11 +150,14 @@ class Conciliador:
 
             # 3. Consultar específicamente por estos IDs para obtener su estado final real (COMPLETED, FAILED, etc.)
             try:
-                detalles_finales = await self._aa_client.obtener_detalles_por_deployment_ids(list(ids_desaparecidos))
+                with TRAZADOR.span("a360_detalles_por_deployment", deployments=len(ids_desaparecidos)):
+                    detalles_finales = await self._aa_client.obtener_detalles_por_deployment_ids(
+                        list(ids_desaparecidos)
+                    )
 
                 # Actualizar con lo que encontremos (Estado Real)
                 if detalles_finales:
-                    self._actualizar_estados_encontrados(detalles_finales, mapa_deploy_a_ejecucion)
+                    await self._actualizar_estados_encontrados(detalles_finales, mapa_deploy_a_ejecucion)
 
                 # Identificar cuáles NO devolvieron nada (realmente perdidos/purged)
                 ids_encontrados_finales = {
@@ -163,21 +189,22 @@ class Conciliador:
                             f"Inferiendo finalización para {len(ids_para_inferir)} ejecuciones "
                             f"(Superaron {max_intentos} intentos fallidos)."
                         )
-                        self._marcar_como_inferidas(ids_para_inferir, mapa_deploy_a_ejecucion)
+                        await self._marcar_como_inferidas(ids_para_inferir, mapa_deploy_a_ejecucion)
 
                     if ids_para_incrementar:
                         logger.info(
                             f"Incrementando contador de intentos fallidos para {len(ids_para_incrementar)} ejecuciones "
                             f"(Aún no superan el límite de {max_intentos})."
                         )
-                        self._incrementar_intentos_fallidos(ids_para_incrementar, mapa_deploy_a_ejecucion)
+                        await self._incrementar_intentos_fallidos(ids_para_incrementar, mapa_deploy_a_ejecucion)
 
             except Exception as e:
                 logger.error(f"Error al consultar detalles finales de ejecuciones desaparecidas: {e}")
                 # En caso de error en esta segunda fase, podríamos optar por no inferir nada
                 # para evitar falsos positivos si la API falló momentáneamente.
 
-    def _marcar_como_inferidas(self, ids_desaparecidos: set, mapa_deploy_a_ejecucion: dict):
+    @trazar("marcar_como_inferidas")
+    async def _marcar_como_inferidas(self, ids_desaparecidos: set, mapa_deploy_a_ejecucion: dict):
         """Marca las ejecuciones desaparecidas con el estado inferido."""
         estado_inferido = self.ESTADO_INFERIDO
         mensaje_inferido = self._config.get(
@@ -186,8 +213,7 @@ class Conciliador:
 
         updates_inferidos = []
         for dep_id in ids_desaparecidos:
-            ejecucion_id = mapa_deploy_a_ejecucion.get(dep_id)
-            if ejecucion_id:
+            for ejecucion_id in mapa_deploy_a_ejecucion.get(dep_id, {}).values():
                 updates_inferidos.append((estado_inferido, mensaje_inferido, ejecucion_id))
 
         if updates_inferidos:
@@ -201,10 +227,13 @@ class Conciliador:
                     IntentosConciliadorFallidos = 0
                 WHERE EjecucionId = ? AND CallbackInfo IS NULL;
             """
-            count = self._db_connector.ejecutar_consulta_multiple(query, updates_inferidos, usar_fast_executemany=False)
+            count = await self._db_async.ejecutar_consulta_multiple(
+                query, updates_inferidos, usar_fast_executemany=False
+            )
             logger.info(f"Se actualizaron {count} ejecuciones a estado '{estado_inferido}'.")
 
-    def _actualizar_estados_encontrados(self, detalles_api: list, mapa_deploy_a_ejecucion: dict):
+    @trazar("actualizar_estados")
+    async def _actualizar_estados_encontrados(self, detalles_api: list, mapa_deploy_a_ejecucion: dict):
         """Actualiza la BD con los estados de los deployments encontrados en la API."""
         if not detalles_api:
             return
@@ -217,7 +246,7 @@ class Conciliador:
             status_api = detalle.get("status")
             end_date_str = detalle.get("endDateTime")
             start_date_str = detalle.get("startDateTime")
-            ejecucion_id = mapa_deploy_a_ejecucion.get(dep_id)
+            ejecucion_id = self._ejecucion_del_detalle(detalle, mapa_deploy_a_ejecucion.get(dep_id, {}))
 
             if not all([dep_id, status_api, ejecucion_id]):
                 continue
@@ -267,7 +296,7 @@ class Conciliador:
                     IntentosConciliadorFallidos = 0
                 WHERE EjecucionId = ? AND CallbackInfo IS NULL;
             """
-            affected_count = self._db_connector.ejecutar_consulta_multiple(
+            affected_count = await self._db_async.ejecutar_consulta_multiple(
                 query, updates_params, usar_fast_executemany=False
             )
             logger.debug(f"Se actualizaron {affected_count} registros (estados y fechas) desde la API.")
@@ -282,7 +311,7 @@ class Conciliador:
                     IntentosConciliadorFallidos = IntentosConciliadorFallidos + 1
                 WHERE EjecucionId = ? AND CallbackInfo IS NULL;
             """
-            affected_unknown = self._db_connector.ejecutar_consulta_multiple(
+            affected_unknown = await self._db_async.ejecutar_consulta_multiple(
                 query_unknown, updates_unknown_params, usar_fast_executemany=False
             )
             logger.debug(
@@ -290,7 +319,8 @@ class Conciliador:
                 f"Se reintentarán en próximos ciclos."
             )
 
-    def _marcar_unknown_por_antiguedad(self):
+    @trazar("marcar_unknown_por_antiguedad")
+    async def _marcar_unknown_por_antiguedad(self):
         """Marca como UNKNOWN ejecuciones que superan el umbral de días de tolerancia."""
         dias_tolerancia = self._config.get("dias_tolerancia_unknown", 30)
 
@@ -302,7 +332,7 @@ class Conciliador:
             AND DATEDIFF(DAY, FechaInicio, GETDATE()) > ?
         """
 
-        ejecuciones_antiguas = self._db_connector.ejecutar_consulta(query_select, (dias_tolerancia,), es_select=True)
+        ejecuciones_antiguas = await self._db_async.ejecutar_consulta(query_select, (dias_tolerancia,), es_select=True)
 
         if not ejecuciones_antiguas:
             return
@@ -324,7 +354,7 @@ class Conciliador:
                 FechaActualizacion = GETDATE()
             WHERE EjecucionId IN ({placeholders});
         """
-        self._db_connector.ejecutar_consulta(query_update, tuple(ids_a_actualizar), es_select=False)
+        await self._db_async.ejecutar_consulta(query_update, tuple(ids_a_actualizar), es_select=False)
         logger.debug(f"Se marcaron {len(ids_a_actualizar)} ejecuciones como UNKNOWN por antigüedad.")
 
     def _convertir_utc_a_local_sam(self, fecha_utc_str: Optional[str]) -> Optional[datetime]:
@@ -339,12 +369,12 @@ class Conciliador:
             logger.error(f"Error al convertir fecha UTC '{fecha_utc_str}': {e}", exc_info=True)
             return None
 
-    def _incrementar_intentos_fallidos(self, ids_para_incrementar: set, mapa_deploy_a_ejecucion: dict):
+    @trazar("incrementar_intentos_fallidos")
+    async def _incrementar_intentos_fallidos(self, ids_para_incrementar: set, mapa_deploy_a_ejecucion: dict):
         """Incrementa el contador de intentos fallidos para las ejecuciones dadas."""
         updates = []
         for dep_id in ids_para_incrementar:
-            ejecucion_id = mapa_deploy_a_ejecucion.get(dep_id)
-            if ejecucion_id:
+            for ejecucion_id in mapa_deploy_a_ejecucion.get(dep_id, {}).values():
                 updates.append((ejecucion_id,))
 
         if updates:
@@ -354,4 +384,4 @@ class Conciliador:
                     FechaActualizacion = GETDATE()
                 WHERE EjecucionId = ?;
             """
-            self._db_connector.ejecutar_consulta_multiple(query, updates, usar_fast_executemany=False)
+            await self._db_async.ejecutar_consulta_multiple(query, updates, usar_fast_executemany=False)
@@ -2,8 +2,10 @@
 import asyncio
 import json
 import logging
+import time
+from collections import deque
 from datetime import datetime
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Set, Tuple, Union
 
 import httpx
 import pytz
@@ -11,8 +13,17 @@ import pytz
 from sam.common.a360_client import AutomationAnywhereClient
 from sam.common.alert_types import AlertContext, AlertLevel, AlertScope, AlertType, ServerErrorPattern
 from sam.common.apigw_client import ApiGatewayClient
-from sam.common.database import DatabaseConnector
+from sam.common.database import AsyncDatabaseConnector, DatabaseConnector, RowMode
 from sam.common.mail_client import EmailAlertClient
+from sam.common.trazas import TRAZADOR
+from sam.lanzador.service.planificador_despliegues import (
+    EstadoReintento,
+    PlanificadorDespliegues,
+    ReintentoProgramado,
+    resumen_latencias,
+)
+from sam.lanzador.service.registro_ejecuciones import RegistroEjecucionesDiferido
+from sam.lanzador.service.salud_equipos import SaludEquipos
 
 logger = logging.getLogger(__name__)
 
@@ -24,6 +35,13 @@ class Desplegador:
     el ciclo de lanzamiento cuando se le indica.
     """
 
+    # Versión de la columna Parametros de todos los robots: cambia con cualquier edición (web o SQL).
+    _SQL_VERSION_PARAMETROS = (
+        "SELECT CHECKSUM_AGG(BINARY_CHECKSUM(RobotId, HASHBYTES('SHA2_256', Parametros))), COUNT_BIG(*) "
+        "FROM dbo.Robots WHERE Parametros IS NOT NULL AND Parametros <> ''"
+    )
+    _SQL_PARAMETROS = "SELECT RobotId, Parametros FROM dbo.Robots WHERE Parametros IS NOT NULL AND Parametros <> ''"
+
     def __init__(
         self,
         db_connector: DatabaseConnector,
@@ -32,6 +50,8 @@ class Desplegador:
         notificador: EmailAlertClient,
         cfg_lanzador: Dict[str, Any],
         callback_token: str,
+        registro_ejecuciones: Optional[RegistroEjecucionesDiferido] = None,
+        salud_equipos: Optional[SaludEquipos] = None,
     ):
         """
         Inicializa el Desplegador con sus dependencias.
@@ -42,8 +62,14 @@ class Desplegador:
             api_gateway_client: Cliente para el API Gateway.
             lanzador_config: Diccionario con la configuración específica del lanzador.
             callback_token: Token estático para la autenticación del callback.
+            registro_ejecuciones: Registro diferido de dbo.Ejecuciones; sin él, cada despliegue se
+                registra con su propio INSERT.
+            salud_equipos: Estado de conexión de los equipos; con él, se omiten los despliegues en
+                equipos que se sabe desconectados (salvo sondeos periódicos).
         """
         self._db_connector = db_connector
+        # Fachada asíncrona: las llamadas a pyodbc no deben bloquear el event loop
+        self._db_async = AsyncDatabaseConnector.para(db_connector)
         self._aa_client = aa_client
         self._api_gateway_client = api_gateway_client
         self._notificador = notificador
@@ -62,6 +88,24 @@ class Desplegador:
         # Almacena (robot_id, equipo_id) -> datetime_lanzamiento
         # Evita re-lanzar robots si la BD falló al registrar el inicio pero A360 sí lo lanzó.
         self._cooldown_despliegues: Dict[tuple, datetime] = {}
+        # Con registro diferido, las filas aún no escritas también bloquean el re-lanzamiento y las que
+        # la BD rechaza activan la protección de rebote.
+        self._registro_ejecuciones = registro_ejecuciones
+        if registro_ejecuciones is not None:
+            registro_ejecuciones.al_descartar = self._activar_rebote_por_registro_descartado
+
+        # Equipos desconectados: sus despliegues se omiten y se informan como "omitido"
+        self._salud_equipos = salud_equipos
+
+        # Parametros (bot_input) ya parseados por RobotId y la versión de la BD con la que se cargaron
+        self._parametros_robots: Dict[int, Dict[str, Any]] = {}
+        self._version_parametros: Optional[tuple] = None
+
+        # Estadísticas del último ciclo de despliegue (espera en cola y latencias)
+        self._estadisticas_ciclo: Dict[str, Any] = {}
+        # Ciclos por aviso del Callback: segundos entre el fin de una ejecución y el relanzamiento en su equipo
+        self._estadisticas_avisos = {"avisos": 0, "ciclos": 0, "equipos_liberados": 0, "relanzados": 0}
+        self._esperas_relanzamiento: deque = deque(maxlen=1000)
 
         # --- SISTEMA DE ALERTAS MEJORADO ---
         self._server_error_history: List[ServerErrorPattern] = []
@@ -71,11 +115,11 @@ class Desplegador:
         self._recovery_start_time: Optional[datetime] = None
         self._alert_history: Dict[str, List[datetime]] = {}
 
-    async def desplegar_robots_pendientes(self) -> List[Dict[str, Any]]:
+    async def desplegar_robots_pendientes(self, equipos: Optional[Set[int]] = None) -> List[Dict[str, Any]]:
         """
         Orquestación principal del despliegue:
         1. Verifica pausa.
-        2. Obtiene robots de la BD.
+        2. Obtiene robots de la BD (solo los de `equipos`, si se indica).
         3. Filtra robots en cooldown (protección de rebote).
         4. Obtiene token API Gateway.
         5. Ejecuta despliegues en paralelo.
@@ -92,91 +136,433 @@ class Desplegador:
             k: v for k, v in self._cooldown_despliegues.items() if (now - v).total_seconds() < (cooldown_minutos * 60)
         }
 
+        if self._salud_equipos is not None:
+            self._salud_equipos.refrescar_lista_si_vencida()
+
         logger.info("Buscando robots para ejecutar...")
-        robots_raw = self._db_connector.obtener_robots_ejecutables()
+        with TRAZADOR.span("obtener_robots_ejecutables") as span:
+            robots_raw = await self._db_async.obtener_robots_ejecutables()
+            span.atributo(robots=len(robots_raw or []))
 
         # 2. Filtrado por Cooldown (Evitar bucle zombi si falló DB)
         robots_a_ejecutar = []
+        omitidos: List[Dict[str, Any]] = []
         for r in robots_raw:
             key = (r.get("RobotId"), r.get("EquipoId"))
+            if equipos is not None and key[1] not in equipos:
+                continue
             if key in self._cooldown_despliegues:
                 logger.warning(
                     f"Omitiendo Robot {r.get('Robot')} en Equipo {r.get('Equipo')} "
                     f"porque está en periodo de enfriamiento (posible fallo previo de registro en BD)."
                 )
                 continue
+            if self._registro_ejecuciones is not None and self._registro_ejecuciones.robot_pendiente(*key):
+                logger.info(
+                    f"Omitiendo Robot {r.get('Robot')} en Equipo {r.get('Equipo')} "
+                    f"porque su ejecución anterior todavía no se escribió en BD."
+                )
+                continue
+            if self._salud_equipos is not None and self._salud_equipos.debe_omitir(key[1]):
+                omitidos.append(self._resultado_equipo_desconectado(r))
+                continue
             robots_a_ejecutar.append(r)
 
+        if omitidos:
+            logger.info(
+                f"Omitidos {len(omitidos)} despliegues en equipos desconectados: "
+                f"{', '.join(str(o['equipo_nombre'] or o['equipo_id']) for o in omitidos[:10])}"
+                f"{'...' if len(omitidos) > 10 else ''}."
+            )
+
         if not robots_a_ejecutar:
             logger.info("No hay robots para ejecutar en este ciclo.")
             # Verificar si el sistema se recuperó aunque no haya robots para lanzar
             await self._check_and_notify_system_recovery(force_health_check=True)
-            return
+            return omitidos
 
         # Bot input por defecto (valor de configuración)
         default_bot_input = {
             "in_NumRepeticion": {"type": "NUMBER", "number": str(self._cfg_lanzador.get("repeticiones", 1))}
         }
         max_workers = self._cfg_lanzador.get("max_workers_lanzador", 10)
-        auth_headers = await self._preparar_cabeceras_callback()
+        with TRAZADOR.span("preparar_cabeceras_callback"):
+            auth_headers = await self._preparar_cabeceras_callback()
+        with TRAZADOR.span("refrescar_parametros_robots"):
+            await self._db_async.ejecutar(self._refrescar_parametros_robots)
 
         logger.info(f"{len(robots_a_ejecutar)} robots encontrados. Desplegando en paralelo (límite: {max_workers})...")
 
-        tasks = [
-            asyncio.create_task(self._desplegar_y_registrar_robot(robot_info, default_bot_input, auth_headers))
-            for robot_info in robots_a_ejecutar
-        ]
+        all_results: List[Optional[Dict[str, Any]]] = [None] * len(robots_a_ejecutar)
+        pendientes = list(range(len(robots_a_ejecutar)))
+        estadisticas_agrupado = None
+        if self._cfg_lanzador.get("deploy_agrupado"):
+            pendientes, estadisticas_agrupado = await self._desplegar_agrupados(
+                robots_a_ejecutar, all_results, default_bot_input, auth_headers, max_workers
+            )
 
-        successful_deploys = 0
-        failed_deploys = 0
-        all_results = []
+        # Pool acotado: como mucho `max_workers` despliegues en curso; cada worker toma el siguiente
+        # robot apenas termina. Los reintentos esperan su demora fuera del pool, sin ocupar un worker.
+        # La cola se atiende por prioridad y, dentro de cada prioridad, por turnos entre robots.
+        planificador = PlanificadorDespliegues(max_workers, self._cfg_lanzador.get("deploy_timeout_seg", 0))
+
+        async def desplegar(robot_info: dict, reintento: Optional[EstadoReintento]):
+            with TRAZADOR.span(
+                "desplegar_robot",
+                robot=robot_info.get("RobotId"),
+                equipo=robot_info.get("EquipoId"),
+                intento=reintento.intento + 1 if reintento else 1,
+            ):
+                return await self._desplegar_y_registrar_robot(robot_info, default_bot_input, auth_headers, reintento)
+
+        async for posicion, resultado in planificador.procesar(
+            [robots_a_ejecutar[indice] for indice in pendientes],
+            desplegar,
+            self._resultado_despliegue_vencido,
+            clave=lambda robot_info: (robot_info.get("RobotId"), robot_info.get("EquipoId")),
+            prioridad=self._prioridad_despliegue,
+            grupo=lambda robot_info: robot_info.get("RobotId"),
+        ):
+            all_results[pendientes[posicion]] = resultado
+
+        successful_deploys = sum(1 for r in all_results if r.get("status") == "exitoso")
+        failed_deploys = sum(1 for r in all_results if r.get("status") == "fallido")
+        self._estadisticas_ciclo = planificador.estadisticas()
+        if self._salud_equipos is not None:
+            for resultado in all_results:
+                self._salud_equipos.registrar_resultado(resultado.get("equipo_id"), resultado)
+            self._estadisticas_ciclo["salud_equipos"] = {
+                **self._salud_equipos.estadisticas(),
+                "omitidos_ciclo": len(omitidos),
+            }
+        if estadisticas_agrupado is not None:
+            self._estadisticas_ciclo["agrupado"] = estadisticas_agrupado
+        if self._registro_ejecuciones is not None:
+            self._estadisticas_ciclo["registro_diferido"] = self._registro_ejecuciones.estadisticas()
+        # La espera de la prioridad más alta (los programados, ver `_prioridad_despliegue`) no debería
+        # crecer con la saturación del pool
+        por_prioridad = self._estadisticas_ciclo["espera_cola_por_prioridad_seg"]
+        mas_alta = next(iter(por_prioridad), None)
+        espera_mas_alta = (
+            f" (prioridad {mas_alta}: {por_prioridad[mas_alta]['p95']}s)" if len(por_prioridad) > 1 else ""
+        )
+        logger.info(
+            f"Ciclo de despliegue completado. Exitosos: {successful_deploys}, Fallidos: {failed_deploys}, "
+            f"Reintentos: {self._estadisticas_ciclo['reintentos']}. "
+            f"Espera en cola p95: {self._estadisticas_ciclo['espera_cola_seg']['p95']}s"
+            f"{espera_mas_alta}, "
+            f"latencia p50/p95: {self._estadisticas_ciclo['latencia_seg']['p50']}s/"
+            f"{self._estadisticas_ciclo['latencia_seg']['p95']}s."
+        )
 
-        for i in range(0, len(tasks), max_workers):
-            batch = tasks[i : i + max_workers]
-            results = await asyncio.gather(*batch)
-            all_results.extend(results)  # <--- 2. Guardar resultados del lote actual
+        return all_results + omitidos
 
-            successful_deploys += sum(1 for r in results if r.get("status") == "exitoso")
-            failed_deploys += sum(1 for r in results if r.get("status") == "fallido")
+    async def _desplegar_agrupados(
+        self,
+        robots: List[dict],
+        resultados: List[Optional[Dict[str, Any]]],
+        default_bot_input: dict,
+        cabeceras_callback: dict,
+        max_workers: int,
+    ) -> Tuple[List[int], Dict[str, int]]:
+        """
+        Despliegue agrupado (`LANZADOR_DEPLOY_AGRUPADO`): las filas del mismo robot con el mismo bot_input
+        se lanzan con una sola llamada v4 (`runAsUserIds` con todos sus usuarios) y cada equipo se registra
+        con el deploymentId común. Completa `resultados` y devuelve los índices que quedan para el
+        despliegue individual: filas sin grupo y grupos cuya llamada falló, que pasan de a una por el
+        manejo de errores por equipo (412/400 de equipo offline, asignaciones inválidas, reintentos).
+        """
+        grupos: Dict[Tuple[Any, str], List[int]] = {}
+        for indice, fila in enumerate(robots):
+            bot_input = self._obtener_bot_input_robot(fila.get("RobotId"), default_bot_input)
+            grupos.setdefault((fila.get("RobotId"), json.dumps(bot_input, sort_keys=True)), []).append(indice)
+
+        individuales: List[int] = []
+        lotes: List[List[int]] = []
+        for indices in grupos.values():
+            usuarios = [robots[i].get("UserId") for i in indices]
+            # Un usuario repetido no permite asignar cada ejecución a su equipo: se despliega de a uno
+            if len(indices) > 1 and None not in usuarios and len(set(usuarios)) == len(usuarios):
+                lotes.append(indices)
+            else:
+                individuales.extend(indices)
+
+        por_fallo = 0
+        planificador = PlanificadorDespliegues(max_workers, self._cfg_lanzador.get("deploy_timeout_seg", 0))
+        async for posicion, resultados_grupo in planificador.procesar(
+            lotes,
+            lambda indices, _reintento: self._desplegar_grupo(
+                [robots[i] for i in indices], default_bot_input, cabeceras_callback
+            ),
+            lambda indices: [self._resultado_despliegue_vencido(robots[i]) for i in indices],
+            prioridad=lambda indices: min(self._prioridad_despliegue(robots[i]) for i in indices),
+        ):
+            indices = lotes[posicion]
+            if resultados_grupo is None:
+                individuales.extend(indices)
+                por_fallo += len(indices)
+                continue
+            for indice, resultado in zip(indices, resultados_grupo):
+                resultados[indice] = resultado
 
-        logger.info(f"Ciclo de despliegue completado. Exitosos: {successful_deploys}, Fallidos: {failed_deploys}.")
+        estadisticas = {
+            "llamadas_agrupadas": len(lotes),
+            "equipos_agrupados": sum(len(indices) for indices in lotes) - por_fallo,
+            "equipos_individuales_por_fallo": por_fallo,
+        }
+        logger.info(
+            f"Despliegue agrupado: {estadisticas['equipos_agrupados']} equipos en {len(lotes)} llamadas; "
+            f"{len(individuales)} equipos se despliegan de a uno ({por_fallo} por fallo del grupo)."
+        )
+        return sorted(individuales), estadisticas
 
-        return all_results
+    async def _desplegar_grupo(
+        self, filas: List[dict], default_bot_input: dict, cabeceras_callback: dict
+    ) -> Optional[List[Dict[str, Any]]]:
+        """
+        Lanza un robot en los usuarios de todas las filas con una sola llamada v4 y registra una ejecución
+        por equipo con el deploymentId común. Devuelve None si la llamada falla: el error puede ser de un
+        solo equipo, así que esas filas se despliegan de a una.
+        """
+        robot_id, robot_nombre = filas[0].get("RobotId"), filas[0].get("Robot")
+        try:
+            with TRAZADOR.span("a360_desplegar", robot=robot_id, equipos=len(filas)) as span:
+                deployment_result = await self._aa_client.desplegar_bot_v4(
+                    file_id=robot_id,
+                    user_ids=[fila.get("UserId") for fila in filas],
+                    bot_input=self._obtener_bot_input_robot(robot_id, default_bot_input),
+                    callback_auth_headers=cabeceras_callback,
+                )
+                span.atributo(deploymentId=(deployment_result or {}).get("deploymentId"))
+        except Exception as e:
+            logger.warning(
+                f"Despliegue agrupado de Robot {robot_id} ({robot_nombre}) en {len(filas)} equipos falló: {e}. "
+                "Se despliega de a un equipo."
+            )
+            return None
+        if not deployment_result or "deploymentId" not in deployment_result:
+            logger.warning(
+                f"Respuesta inválida de A360 para el despliegue agrupado de Robot {robot_id} ({robot_nombre}). "
+                "Se despliega de a un equipo."
+            )
+            return None
 
-    def _obtener_bot_input_robot(self, robot_id: int, default_bot_input: dict) -> dict:
+        deployment_id = deployment_result["deploymentId"]
+        logger.debug(f"Robot {robot_id} ({robot_nombre}) desplegado en {len(filas)} equipos con ID: {deployment_id}")
+        resultados = []
+        for fila in filas:
+            equipo_id = fila.get("EquipoId")
+            try:
+                await self._registrar_ejecucion(
+                    id_despliegue=deployment_id,
+                    db_robot_id=robot_id,
+                    db_equipo_id=equipo_id,
+                    a360_user_id=fila.get("UserId"),
+                    marca_tiempo_programada=fila.get("Hora"),
+                    estado="DEPLOYED",
+                )
+            except Exception as db_e:
+                logger.error(
+                    f"Error al registrar ejecución en BD para Robot {robot_id} ({robot_nombre}) en Equipo "
+                    f"{equipo_id} con DeployID {deployment_id}. Activando protección de rebote local. Error: {db_e}"
+                )
+                self._cooldown_despliegues[(robot_id, equipo_id)] = datetime.now()
+            resultados.append({"status": "exitoso", "robot_id": robot_id, "equipo_id": equipo_id})
+
+        await self._check_and_notify_system_recovery(force_health_check=False)
+        return resultados
+
+    async def desplegar_equipos_liberados(self, avisos: List[Tuple[str, Optional[str], float]]) -> List[Dict[str, Any]]:
+        """
+        Ciclo restringido a los equipos cuyas ejecuciones avisó el Callback que terminaron
+        (`(deploymentId, userId, instante del callback)`), para relanzar sin esperar al ciclo periódico.
+        """
+        liberados = await self._equipos_de_avisos(avisos)
+        self._estadisticas_avisos["avisos"] += len(avisos)
+        if not liberados:
+            return []
+        self._estadisticas_avisos["ciclos"] += 1
+        self._estadisticas_avisos["equipos_liberados"] += len(liberados)
+        if self._salud_equipos is not None:
+            # Un equipo que acaba de terminar una ejecución está conectado
+            for equipo_id in liberados:
+                self._salud_equipos.confirmar_conectado(equipo_id)
+
+        resultados = await self.desplegar_robots_pendientes(equipos=set(liberados)) or []
+        ahora = time.time()
+        relanzados = {r.get("equipo_id") for r in resultados if r.get("status") == "exitoso"} & set(liberados)
+        for equipo_id in relanzados:
+            self._esperas_relanzamiento.append(max(0.0, ahora - liberados[equipo_id]))
+        self._estadisticas_avisos["relanzados"] += len(relanzados)
+        espera = resumen_latencias(list(self._esperas_relanzamiento))
+        logger.info(
+            f"Ciclo por aviso: {len(liberados)} equipos liberados, {len(relanzados)} relanzados. "
+            f"Espera fin->relanzamiento p50/p95: {espera['p50']}s/{espera['p95']}s."
+        )
+        return resultados
+
+    async def _equipos_de_avisos(self, avisos: List[Tuple[str, Optional[str], float]]) -> Dict[int, float]:
+        """EquipoId de cada ejecución avisada, con el instante del aviso más antiguo de ese equipo."""
+        por_despliegue: Dict[str, Dict[Optional[str], float]] = {}
+        for deployment_id, user_id, instante in avisos:
+            por_despliegue.setdefault(deployment_id, {})[user_id] = instante
+        if not por_despliegue:
+            return {}
+        marcadores = ", ".join("?" * len(por_despliegue))
+        filas = await self._db_async.ejecutar_consulta(
+            f"SELECT DeploymentId, UserId, EquipoId FROM dbo.Ejecuciones WHERE DeploymentId IN ({marcadores})",
+            tuple(por_despliegue),
+            es_select=True,
+        )
+        liberados: Dict[int, float] = {}
+        for fila in filas or []:
+            usuarios = por_despliegue.get(fila["DeploymentId"], {})
+            # Con despliegue agrupado, solo el equipo del usuario del callback quedó libre
+            instante = usuarios.get(None)
+            if fila["UserId"] is not None and str(fila["UserId"]) in usuarios:
+                instante = usuarios[str(fila["UserId"])]
+            if instante is None or fila["EquipoId"] is None:
+                continue
+            liberados[fila["EquipoId"]] = min(instante, liberados.get(fila["EquipoId"], instante))
+        return liberados
+
+    def obtener_estadisticas_avisos(self) -> Dict[str, Any]:
+        """Avisos de equipos liberados atendidos y espera entre el fin de una ejecución y el relanzamiento."""
+        return {
+            **self._estadisticas_avisos,
+            "espera_relanzamiento_seg": resumen_latencias(list(self._esperas_relanzamiento)),
+        }
+
+    def obtener_estadisticas_ciclo(self) -> Dict[str, Any]:
+        """Espera en cola, latencias (p50/p95/p99) y despliegues vencidos del último ciclo."""
+        return dict(self._estadisticas_ciclo)
+
+    async def _registrar_ejecucion(self, **kwargs):
+        """Registra un despliegue en dbo.Ejecuciones, en diferido si hay registro diferido configurado."""
+        with TRAZADOR.span(
+            "registrar_ejecucion",
+            robot=kwargs.get("db_robot_id"),
+            equipo=kwargs.get("db_equipo_id"),
+            deploymentId=kwargs.get("id_despliegue"),
+        ):
+            if self._registro_ejecuciones is not None:
+                await self._registro_ejecuciones.registrar(**kwargs)
+            else:
+                await self._db_async.insertar_registro_ejecucion(**kwargs)
+
+    def _enviar_alerta(self, context: AlertContext) -> bool:
+        """Envía una alerta por el notificador (dentro de un span, para medir el envío en las trazas)."""
+        with TRAZADOR.span("enviar_alerta", asunto=context.subject):
+            return self._notificador.send_alert_v2(context)
+
+    def _activar_rebote_por_registro_descartado(self, fila: tuple, error: str):
+        """La BD rechazó el registro diferido de un robot que A360 sí lanzó: mismo trato que un fallo de INSERT."""
+        deployment_id, robot_id, equipo_id = fila[:3]
+        logger.error(
+            f"No se registró la ejecución de Robot {robot_id} en Equipo {equipo_id} con DeployID {deployment_id}. "
+            f"SAM no la monitoreará. Activando protección de rebote local. Error: {error}"
+        )
+        self._cooldown_despliegues[(robot_id, equipo_id)] = datetime.now()
+
+    def _resultado_despliegue_vencido(self, robot_info: dict) -> Dict[str, Any]:
         """
-        Obtiene los parámetros de bot_input configurados para un robot específico.
-        Si el robot tiene parámetros configurados en la BD, los usa; caso contrario usa el valor por defecto.
+        Resultado de un despliegue que superó `deploy_timeout_seg`. A360 pudo haberlo lanzado sin que
+        se registrara en la BD, así que se activa la protección de rebote igual que ante un fallo de registro.
+        """
+        robot_id, equipo_id = robot_info.get("RobotId"), robot_info.get("EquipoId")
+        logger.error(
+            f"Despliegue de Robot {robot_id} ({robot_info.get('Robot')}) en Equipo {equipo_id} "
+            f"superó el plazo de {self._cfg_lanzador.get('deploy_timeout_seg')}s y fue cancelado."
+        )
+        self._cooldown_despliegues[(robot_id, equipo_id)] = datetime.now()
+        return {
+            "status": "fallido",
+            "robot_id": robot_id,
+            "equipo_id": equipo_id,
+            "equipo_nombre": robot_info.get("Equipo"),
+            "error_type": "timeout",
+        }
+
+    @staticmethod
+    def _prioridad_despliegue(robot_info: dict) -> Tuple[int, int]:
+        """
+        Prioridad en la cola de despliegues, con el mismo criterio que el orden de ObtenerRobotsEjecutables:
+        primero los programados y luego por PrioridadBalanceo (menor es más prioritario). Sin esas
+        columnas todos comparten prioridad.
+        """
+        return (
+            0 if robot_info.get("EsProgramado", True) else 1,
+            int(robot_info.get("PrioridadBalanceo") or 0),
+        )
+
+    @staticmethod
+    def _resultado_equipo_desconectado(robot_info: dict) -> Dict[str, Any]:
+        """Resultado de un despliegue omitido porque el equipo se sabe desconectado (ver `SaludEquipos`)."""
+        return {
+            "status": "omitido",
+            "robot_id": robot_info.get("RobotId"),
+            "equipo_id": robot_info.get("EquipoId"),
+            "equipo_nombre": robot_info.get("Equipo"),
+            "error_type": "equipo_desconectado",
+        }
+
+    def _refrescar_parametros_robots(self):
+        """
+        Mantiene en memoria los Parametros (bot_input) parseados de todos los robots. Cada ciclo consulta
+        solo la versión de la columna; la carga completa se repite cuando cambia, por ejemplo al editar
+        los parámetros de un robot desde la web. Si la consulta falla se conservan los ya cargados.
         """
         try:
-            query = "SELECT Parametros FROM dbo.Robots WHERE RobotId = ?"
-            result = self._db_connector.ejecutar_consulta(query, (robot_id,), es_select=True)
+            filas = self._db_connector.ejecutar_consulta(self._SQL_VERSION_PARAMETROS, row_mode=RowMode.TUPLE)
+            version = tuple(filas[0]) if filas else None
+            if version is not None and version == self._version_parametros:
+                return
 
-            if result and result[0].get("Parametros"):
+            parametros_robots = {}
+            for robot_id, parametros in self._db_connector.ejecutar_consulta(
+                self._SQL_PARAMETROS, row_mode=RowMode.TUPLE
+            ):
                 try:
-                    # Intentar parsear el JSON de Parametros
-                    parametros_json = json.loads(result[0]["Parametros"])
-                    if parametros_json and isinstance(parametros_json, dict):
-                        logger.debug(f"Robot {robot_id} tiene parámetros personalizados: {parametros_json}")
-                        return parametros_json
+                    parametros_json = json.loads(parametros)
                 except (json.JSONDecodeError, TypeError) as e:
                     logger.warning(f"Error al parsear Parametros del Robot {robot_id}: {e}. Usando valor por defecto.")
-
-            # Si no hay parámetros o hay error, usar el valor por defecto
-            logger.debug(f"Robot {robot_id} usando parámetros por defecto")
-            return default_bot_input
+                    continue
+                if parametros_json and isinstance(parametros_json, dict):
+                    parametros_robots[robot_id] = parametros_json
+            self._parametros_robots = parametros_robots
+            self._version_parametros = version
+            logger.debug(f"Parametros de robots recargados: {len(parametros_robots)} robots con bot_input propio.")
         except Exception as e:
             logger.error(
-                f"Error al obtener parámetros del Robot {robot_id}: {e}. Usando valor por defecto.", exc_info=True
+                f"Error al obtener los Parametros de los robots: {e}. Se usan los cargados previamente.", exc_info=True
             )
-            return default_bot_input
+
+    def _obtener_bot_input_robot(self, robot_id: int, default_bot_input: dict) -> dict:
+        """
+        Devuelve los parámetros de bot_input configurados para el robot (cargados por
+        `_refrescar_parametros_robots`) o, si no tiene, el valor por defecto.
+        """
+        parametros_json = self._parametros_robots.get(robot_id)
+        if parametros_json:
+            logger.debug(f"Robot {robot_id} tiene parámetros personalizados: {parametros_json}")
+            return parametros_json
+        logger.debug(f"Robot {robot_id} usando parámetros por defecto")
+        return default_bot_input
 
     async def _desplegar_y_registrar_robot(
-        self, robot_info: dict, default_bot_input: dict, cabeceras_callback: dict
-    ) -> Dict[str, Any]:
+        self,
+        robot_info: dict,
+        default_bot_input: dict,
+        cabeceras_callback: dict,
+        reintento: Optional[EstadoReintento] = None,
+    ) -> Union[Dict[str, Any], ReintentoProgramado]:
         """
-        Intenta desplegar un robot, manejando errores 412 con reintentos
+        Hace un intento de despliegue de un robot, manejando errores 412 con reintentos
         y errores 400 como permanentes + alerta.
+
+        Ante un error temporal (equipo offline, error de red) devuelve `ReintentoProgramado` en lugar
+        de dormir: el planificador libera el worker y vuelve a llamar con el `EstadoReintento` del par
+        robot/equipo cuando vence `delay_reintentos_deploy_seg`.
         """
         robot_id = robot_info.get("RobotId")
         robot_nombre = robot_info.get("Robot")
@@ -189,642 +575,624 @@ class Desplegador:
         # Obtener bot_input específico del robot o usar el valor por defecto
         bot_input = self._obtener_bot_input_robot(robot_id, default_bot_input)
 
-        detected_error_type = None
+        # El tipo de error detectado se arrastra entre intentos (un error de red no pisa un 412 previo)
+        detected_error_type = reintento.ultimo_error if reintento else None
 
         # Configuración de reintentos
         max_intentos = self._cfg_lanzador.get("max_reintentos_deploy", 2)
         delay_seg = self._cfg_lanzador.get("delay_reintentos_deploy_seg", 5)
-        intento = 0
-        for intento in range(1, max_intentos + 1):
-            try:
-                # 1. INTENTAR DESPLEGAR
+        intento = reintento.intento + 1 if reintento else 1
+        try:
+            # 1. INTENTAR DESPLEGAR
+            with TRAZADOR.span("a360_desplegar", robot=robot_id, equipo=equipo_id) as span:
                 deployment_result = await self._aa_client.desplegar_bot_v4(
                     file_id=robot_id,
                     user_ids=[user_id],
                     bot_input=bot_input,
                     callback_auth_headers=cabeceras_callback,
                 )
+                span.atributo(deploymentId=(deployment_result or {}).get("deploymentId"))
 
-                # Validar respuesta
-                if not deployment_result or "deploymentId" not in deployment_result:
-                    error_msg = deployment_result.get("error", "No se recibió deploymentId")
-                    logger.error(f"Respuesta inválida de A360 para Robot {robot_id} ({robot_nombre}): {error_msg}")
-                    return {"status": "fallido", "robot_id": robot_id}
+            # Validar respuesta
+            if not deployment_result or "deploymentId" not in deployment_result:
+                error_msg = deployment_result.get("error", "No se recibió deploymentId")
+                logger.error(f"Respuesta inválida de A360 para Robot {robot_id} ({robot_nombre}): {error_msg}")
+                return {"status": "fallido", "robot_id": robot_id}
 
-                deployment_id = deployment_result["deploymentId"]
+            deployment_id = deployment_result["deploymentId"]
 
-                # 2. ÉXITO - Registrar en BD
-                logger.debug(
-                    f"Robot {robot_id} ({robot_nombre}) desplegado con ID: {deployment_id} "
-                    f"en Equipo {equipo_id} ({equipo_nombre}) (Intento {intento}/{max_intentos})"
+            # 2. ÉXITO - Registrar en BD
+            logger.debug(
+                f"Robot {robot_id} ({robot_nombre}) desplegado con ID: {deployment_id} "
+                f"en Equipo {equipo_id} ({equipo_nombre}) (Intento {intento}/{max_intentos})"
+            )
+
+            try:
+                await self._registrar_ejecucion(
+                    id_despliegue=deployment_id,
+                    db_robot_id=robot_id,
+                    db_equipo_id=equipo_id,
+                    a360_user_id=user_id,
+                    marca_tiempo_programada=hora,
+                    estado="DEPLOYED",
                 )
 
-                try:
-                    self._db_connector.insertar_registro_ejecucion(
-                        id_despliegue=deployment_id,
-                        db_robot_id=robot_id,
-                        db_equipo_id=equipo_id,
-                        a360_user_id=user_id,
-                        marca_tiempo_programada=hora,
-                        estado="DEPLOYED",
-                    )
+                # Si el despliegue es exitoso, verificar si venimos de una caída del sistema
+                await self._check_and_notify_system_recovery(force_health_check=False)
+            except Exception as db_e:
+                logger.error(
+                    f"Error al registrar ejecución en BD para Robot {robot_id} ({robot_nombre}) "
+                    f"con DeployID {deployment_id}. El robot se está ejecutando, pero SAM no lo monitoreará. "
+                    f"Activando protección de rebote local. Error: {db_e}"
+                )
+                # Activar Circuit Breaker Local:
+                # Evitar que el SP nos devuelva este robot en el próximo ciclo
+                self._cooldown_despliegues[(robot_id, equipo_id)] = datetime.now()
 
-                    # Si el despliegue es exitoso, verificar si venimos de una caída del sistema
-                    await self._check_and_notify_system_recovery(force_health_check=False)
-                except Exception as db_e:
-                    logger.error(
-                        f"Error al registrar ejecución en BD para Robot {robot_id} ({robot_nombre}) "
-                        f"con DeployID {deployment_id}. El robot se está ejecutando, pero SAM no lo monitoreará. "
-                        f"Activando protección de rebote local. Error: {db_e}"
-                    )
-                    # Activar Circuit Breaker Local:
-                    # Evitar que el SP nos devuelva este robot en el próximo ciclo
-                    self._cooldown_despliegues[(robot_id, equipo_id)] = datetime.now()
+            return {"status": "exitoso", "robot_id": robot_id, "equipo_id": equipo_id}
 
-                return {"status": "exitoso", "robot_id": robot_id, "equipo_id": equipo_id}
+        except httpx.HTTPStatusError as e:
+            status_code = e.response.status_code
+            response_text_full = e.response.text  # Mensaje completo para análisis
+            response_text = response_text_full[:200]  # Limitar para logs
 
-            except httpx.HTTPStatusError as e:
-                status_code = e.response.status_code
-                response_text_full = e.response.text  # Mensaje completo para análisis
-                response_text = response_text_full[:200]  # Limitar para logs
+            if status_code == 412:
+                detected_error_type = "412"
 
-                if status_code == 412:
-                    detected_error_type = "412"
+                # Verificar si es un error del robot (no compatible targets)
+                # Este error indica un problema con el robot, no con el device
+                is_robot_error = False
+                error_message_lower = response_text_full.lower()
 
-                    # Verificar si es un error del robot (no compatible targets)
-                    # Este error indica un problema con el robot, no con el device
-                    is_robot_error = False
-                    error_message_lower = response_text_full.lower()
+                # Buscar el mensaje de error en el texto (puede venir en JSON o texto plano)
+                error_message_to_check = error_message_lower
+                try:
+                    # Intentar parsear como JSON para extraer el mensaje
+                    error_json = json.loads(response_text_full)
+                    if isinstance(error_json, dict) and "message" in error_json:
+                        error_message_to_check = error_json["message"].lower()
+                except (json.JSONDecodeError, TypeError):
+                    # Si no es JSON, usar el texto completo
+                    pass
+
+                # Verificar si contiene el mensaje de error de targets no compatibles
+                if "no compatible targets found in automation" in error_message_to_check:
+                    is_robot_error = True
+                    detected_error_type = "412_robot_error"  # Marcar como error del robot
+
+                    # Solo alertar la primera vez por equipo
+                    equipo_alertado_key = f"412_{equipo_id}"
+                    if equipo_alertado_key not in self._equipos_alertados_412:
+                        # Enviar email inmediatamente con el mensaje de error completo
+                        logger.error(
+                            f"Error 412 - Problema con Robot {robot_id} ({robot_nombre}) - No compatible targets. Error: {response_text_full}"
+                        )
+                        links = self._cfg_lanzador.get("links", {})
+                        context = AlertContext(
+                            alert_level=AlertLevel.CRITICAL,
+                            alert_scope=AlertScope.ROBOT,
+                            alert_type=AlertType.PERMANENT,
+                            subject=f"Fallo de Integridad/Configuración en '{robot_nombre}' - ROBOT INACTIVADO",
+                            summary=(
+                                f"El robot '{robot_nombre}' presenta un fallo de integridad o configuración en A360 (Error 412). "
+                                "Esto puede deberse a falta de dispositivos compatibles o errores internos en el Taskbot. "
+                                "El robot ha sido INACTIVADO en SAM para evitar reintentos fallidos en todos los equipos."
+                            ),
+                            technical_details={
+                                "Robot": f"{robot_nombre} (ID: {robot_id})",
+                                "Equipo": f"{equipo_nombre} (ID: {equipo_id})",
+                                "Usuario": f"{user_nombre} (ID: {user_id})",
+                                "Error": "No compatible targets found / Code Integrity Error",
+                                "Explicación": (
+                                    "Este error ocurre cuando el bot tiene configuraciones de ejecución (Run settings) "
+                                    "incompatibles, o cuando el Taskbot tiene errores de integridad (paquetes o variables rotas)."
+                                ),
+                                "Documentación": links.get("aa_docs_run_settings"),
+                            },
+                            actions=[
+                                "1. Ingresar a A360 Control Room > Bots > " + robot_nombre,
+                                "2. Abrir el bot en el editor y verificar si hay errores de integridad (íconos rojos).",
+                                "3. En 'Run settings', asegurar que el dispositivo o el pool estén permitidos.",
+                                "4. UNA VEZ RESUELTO: Volver a activar el Robot manualmente desde la interfaz web de SAM (Sección Robots, usando el switch de activación).",
+                                "NOTA: El sistema NO volverá a intentar este lanzamiento hasta que se reactive el robot.",
+                            ],
+                        )
+                        alert_sent = self._enviar_alerta(context)
+                        if alert_sent:
+                            self._equipos_alertados_412.add(equipo_alertado_key)
+                        else:
+                            logger.error(f"Fallo al enviar alerta de error de robot {robot_id} ({robot_nombre})")
 
-                    # Buscar el mensaje de error en el texto (puede venir en JSON o texto plano)
-                    error_message_to_check = error_message_lower
+                    # REGISTRAR FALLO EN BD para que no reintente en este ciclo/horario
                     try:
-                        # Intentar parsear como JSON para extraer el mensaje
-                        error_json = json.loads(response_text_full)
-                        if isinstance(error_json, dict) and "message" in error_json:
-                            error_message_to_check = error_json["message"].lower()
-                    except (json.JSONDecodeError, TypeError):
-                        # Si no es JSON, usar el texto completo
-                        pass
-
-                    # Verificar si contiene el mensaje de error de targets no compatibles
-                    if "no compatible targets found in automation" in error_message_to_check:
-                        is_robot_error = True
-                        detected_error_type = "412_robot_error"  # Marcar como error del robot
-
-                        # Solo alertar la primera vez por equipo
-                        equipo_alertado_key = f"412_{equipo_id}"
-                        if equipo_alertado_key not in self._equipos_alertados_412:
-                            # Enviar email inmediatamente con el mensaje de error completo
-                            logger.error(
-                                f"Error 412 - Problema con Robot {robot_id} ({robot_nombre}) - No compatible targets. Error: {response_text_full}"
-                            )
-                            links = self._cfg_lanzador.get("links", {})
-                            context = AlertContext(
-                                alert_level=AlertLevel.CRITICAL,
-                                alert_scope=AlertScope.ROBOT,
-                                alert_type=AlertType.PERMANENT,
-                                subject=f"Fallo de Integridad/Configuración en '{robot_nombre}' - ROBOT INACTIVADO",
-                                summary=(
-                                    f"El robot '{robot_nombre}' presenta un fallo de integridad o configuración en A360 (Error 412). "
-                                    "Esto puede deberse a falta de dispositivos compatibles o errores internos en el Taskbot. "
-                                    "El robot ha sido INACTIVADO en SAM para evitar reintentos fallidos en todos los equipos."
-                                ),
-                                technical_details={
-                                    "Robot": f"{robot_nombre} (ID: {robot_id})",
-                                    "Equipo": f"{equipo_nombre} (ID: {equipo_id})",
-                                    "Usuario": f"{user_nombre} (ID: {user_id})",
-                                    "Error": "No compatible targets found / Code Integrity Error",
-                                    "Explicación": (
-                                        "Este error ocurre cuando el bot tiene configuraciones de ejecución (Run settings) "
-                                        "incompatibles, o cuando el Taskbot tiene errores de integridad (paquetes o variables rotas)."
-                                    ),
-                                    "Documentación": links.get("aa_docs_run_settings"),
-                                },
-                                actions=[
-                                    "1. Ingresar a A360 Control Room > Bots > " + robot_nombre,
-                                    "2. Abrir el bot en el editor y verificar si hay errores de integridad (íconos rojos).",
-                                    "3. En 'Run settings', asegurar que el dispositivo o el pool estén permitidos.",
-                                    "4. UNA VEZ RESUELTO: Volver a activar el Robot manualmente desde la interfaz web de SAM (Sección Robots, usando el switch de activación).",
-                                    "NOTA: El sistema NO volverá a intentar este lanzamiento hasta que se reactive el robot.",
-                                ],
-                            )
-                            alert_sent = self._notificador.send_alert_v2(context)
-                            if alert_sent:
-                                self._equipos_alertados_412.add(equipo_alertado_key)
-                            else:
-                                logger.error(f"Fallo al enviar alerta de error de robot {robot_id} ({robot_nombre})")
-
-                        # REGISTRAR FALLO EN BD para que no reintente en este ciclo/horario
-                        try:
-                            dummy_deploy_id = f"FAIL_412_{datetime.now().strftime('%Y%m%d%H%M%S')}_{robot_id}"
-                            self._db_connector.insertar_registro_ejecucion(
-                                id_despliegue=dummy_deploy_id,
-                                db_robot_id=robot_id,
-                                db_equipo_id=equipo_id,
-                                a360_user_id=user_id,
-                                marca_tiempo_programada=hora,
-                                estado="DEPLOY_FAILED",
-                            )
-                            logger.debug(f"Fallo 412 registrado en BD para Robot {robot_id}")
-                        except Exception as db_e:
-                            logger.error(f"Error al registrar fallo 412 en BD: {db_e}")
-
-                        # INACTIVAR ROBOT (Error permanente de configuración)
-                        try:
-                            self._db_connector.ejecutar_consulta(
-                                "UPDATE dbo.Robots SET Activo = 0 WHERE RobotId = ?",
-                                (robot_id,),
-                                es_select=False,
-                            )
-                            logger.info(f"Robot inactivado por Error 412: Robot {robot_id} ({robot_nombre})")
-                        except Exception as db_e:
-                            logger.error(f"Error al inactivar robot por 412: {db_e}")
+                        dummy_deploy_id = f"FAIL_412_{datetime.now().strftime('%Y%m%d%H%M%S')}_{robot_id}"
+                        await self._db_async.insertar_registro_ejecucion(
+                            id_despliegue=dummy_deploy_id,
+                            db_robot_id=robot_id,
+                            db_equipo_id=equipo_id,
+                            a360_user_id=user_id,
+                            marca_tiempo_programada=hora,
+                            estado="DEPLOY_FAILED",
+                        )
+                        logger.debug(f"Fallo 412 registrado en BD para Robot {robot_id}")
+                    except Exception as db_e:
+                        logger.error(f"Error al registrar fallo 412 en BD: {db_e}")
 
-                        # No reintentar, es un error permanente del robot
+                    # INACTIVAR ROBOT (Error permanente de configuración)
+                    try:
+                        await self._db_async.ejecutar_consulta(
+                            "UPDATE dbo.Robots SET Activo = 0 WHERE RobotId = ?",
+                            (robot_id,),
+                            es_select=False,
+                        )
+                        logger.info(f"Robot inactivado por Error 412: Robot {robot_id} ({robot_nombre})")
+                    except Exception as db_e:
+                        logger.error(f"Error al inactivar robot por 412: {db_e}")
+
+                    # No reintentar, es un error permanente del robot
+
+                # Si no es error del robot, tratarlo como error temporal (Device Offline)
+                if not is_robot_error:
+                    if intento < max_intentos:
+                        logger.warning(
+                            f"Error 412 (Device Offline) Robot {robot_id} ({robot_nombre}) "
+                            f"Equipo {equipo_id} ({equipo_nombre}). "
+                            f"Reintentando ({intento + 1}/{max_intentos}) en {delay_seg}s..."
+                        )
+                        return ReintentoProgramado(delay_seg, detected_error_type)
+                    else:
+                        logger.warning(
+                            f"Error 412 persistente Robot {robot_id} ({robot_nombre}) "
+                            f"Equipo {equipo_id} ({equipo_nombre}) después de {max_intentos} intentos. "
+                            f"Dispositivo offline."
+                        )
+            elif status_code == 400:
+                detected_error_type = "400"
+
+                # Verificar si es un error temporal de dispositivo offline
+                is_device_offline = False
+                error_message_lower = response_text_full.lower()
+
+                # Patrones que indican que el dispositivo está offline (error temporal)
+                device_offline_patterns = [
+                    "are not active",
+                    "not connected",
+                    "device is offline",
+                    "device(s) are not active",
+                    "device(s) not connected",
+                ]
+
+                for pattern in device_offline_patterns:
+                    if pattern in error_message_lower:
+                        is_device_offline = True
                         break
 
-                    # Si no es error del robot, tratarlo como error temporal (Device Offline)
-                    if not is_robot_error:
-                        if intento < max_intentos:
-                            logger.warning(
-                                f"Error 412 (Device Offline) Robot {robot_id} ({robot_nombre}) "
-                                f"Equipo {equipo_id} ({equipo_nombre}). "
-                                f"Reintentando ({intento + 1}/{max_intentos}) en {delay_seg}s..."
-                            )
-                            await asyncio.sleep(delay_seg)
-                            continue
-                        else:
-                            logger.warning(
-                                f"Error 412 persistente Robot {robot_id} ({robot_nombre}) "
-                                f"Equipo {equipo_id} ({equipo_nombre}) después de {max_intentos} intentos. "
-                                f"Dispositivo offline."
-                            )
-                            break
-                elif status_code == 400:
-                    detected_error_type = "400"
-
-                    # Verificar si es un error temporal de dispositivo offline
-                    is_device_offline = False
-                    error_message_lower = response_text_full.lower()
-
-                    # Patrones que indican que el dispositivo está offline (error temporal)
-                    device_offline_patterns = [
-                        "are not active",
-                        "not connected",
-                        "device is offline",
-                        "device(s) are not active",
-                        "device(s) not connected",
+                if is_device_offline:
+                    # ERROR TEMPORAL - Dispositivo offline, reintentar
+                    detected_error_type = "400_device_offline"
+
+                    if intento < max_intentos:
+                        logger.warning(
+                            f"Error 400 (Device Offline) Robot {robot_id} ({robot_nombre}) "
+                            f"Equipo {equipo_id} ({equipo_nombre}). "
+                            f"Reintentando ({intento + 1}/{max_intentos}) en {delay_seg}s... "
+                            f"Error: {response_text}"
+                        )
+                        return ReintentoProgramado(delay_seg, detected_error_type)
+                    else:
+                        logger.warning(
+                            f"Error 400 persistente (Device Offline) Robot {robot_id} ({robot_nombre}) "
+                            f"Equipo {equipo_id} ({equipo_nombre}) "
+                            f"después de {max_intentos} intentos. Dispositivo no disponible."
+                        )
+                        # No desasignar, solo reportar el fallo
+
+                # --- NUEVO: Manejo específico de "No Default Device" ---
+                elif "none of the user(s) provided have default device(s)" in error_message_lower:
+                    detected_error_type = "400_no_default_device"
+                    logger.warning(
+                        f"Error 400 (No Default Device) Robot {robot_id} ({robot_nombre}) "
+                        f"Equipo {equipo_id} ({equipo_nombre}). El usuario {user_nombre} no tiene dispositivo por defecto."
+                    )
+
+                    # Solo alertar si no está en cooldown (1 hora) para no spamear
+                    alert_key = f"400_no_device_{equipo_id}"
+                    if self._should_send_alert(alert_key, cooldown_min=60):
+                        context = AlertContext(
+                            alert_level=AlertLevel.CRITICAL,
+                            alert_scope=AlertScope.DEVICE,
+                            alert_type=AlertType.PERMANENT,
+                            subject="Configuración Requerida en A360 - Usuario sin Dispositivo por Defecto",
+                            summary=(
+                                f"El usuario '{user_nombre}' no tiene un dispositivo por defecto asignado en A360. "
+                                "Esto impide el lanzamiento automático pero la asignación en SAM se MANTENDRÁ activa."
+                            ),
+                            technical_details={
+                                "Robot": f"{robot_nombre} (ID: {robot_id})",
+                                "Equipo": f"{equipo_nombre} (ID: {equipo_id})",
+                                "Usuario": f"{user_nombre} (ID: {user_id})",
+                                "Error": "None of the user(s) provided have default device(s)",
+                            },
+                            actions=[
+                                "1. Ingresar al Control Room de A360 > Manage > Users.",
+                                f"2. Buscar y editar al usuario '{user_nombre}'.",
+                                "3. En la sección 'Device settings', seleccionar un dispositivo como 'Default Device'.",
+                                "4. Guardar los cambios.",
+                                "NOTA: El sistema volverá a intentar este lanzamiento en el próximo ciclo programado.",
+                            ],
+                        )
+                        self._enviar_alerta(context)
+
+                    # REGISTRAR FALLO EN BD para este ciclo
+                    try:
+                        dummy_deploy_id = f"FAIL_400_NODEV_{datetime.now().strftime('%Y%m%d%H%M%S')}_{robot_id}"
+                        await self._db_async.insertar_registro_ejecucion(
+                            id_despliegue=dummy_deploy_id,
+                            db_robot_id=robot_id,
+                            db_equipo_id=equipo_id,
+                            a360_user_id=user_id,
+                            marca_tiempo_programada=hora,
+                            estado="DEPLOY_FAILED",
+                        )
+                    except Exception as db_e:
+                        logger.error(f"Error al registrar fallo 400_no_device en BD: {db_e}")
+
+                else:
+                    # ERROR PERMANENTE (Bad Request de configuración)
+                    logger.warning(
+                        f"Error 400 PERMANENTE Robot {robot_id} ({robot_nombre}) "
+                        f"Equipo {equipo_id} ({equipo_nombre}) Usuario {user_id} ({user_nombre}). "
+                        f"Revise configuración. Error: {response_text}"
+                    )
+
+                    # Análisis de mensaje para explicación más precisa
+                    explicacion = (
+                        "Este error (400 Bad Request) indica un problema de configuración o integridad en el Taskbot. "
+                        "Puede deberse a paquetes inexistentes, variables mal referenciadas, parámetros inválidos o falta de licencias."
+                    )
+                    acciones = [
+                        "1. Abrir el bot en el editor de A360 y verificar si hay errores de integridad (íconos rojos).",
+                        "2. Validar que todos los paquetes (Packages) y versiones existan en el Control Room.",
+                        "3. Confirmar que el usuario tenga permisos y licencias de Bot Runner disponibles.",
+                        "4. Validar que el robot no haya sido movido o renombrado en A360.",
                     ]
 
-                    for pattern in device_offline_patterns:
-                        if pattern in error_message_lower:
-                            is_device_offline = True
-                            break
-
-                    if is_device_offline:
-                        # ERROR TEMPORAL - Dispositivo offline, reintentar
-                        detected_error_type = "400_device_offline"
-
-                        if intento < max_intentos:
-                            logger.warning(
-                                f"Error 400 (Device Offline) Robot {robot_id} ({robot_nombre}) "
-                                f"Equipo {equipo_id} ({equipo_nombre}). "
-                                f"Reintentando ({intento + 1}/{max_intentos}) en {delay_seg}s... "
-                                f"Error: {response_text}"
-                            )
-                            await asyncio.sleep(delay_seg)
-                            continue
+                    if "no session found" in error_message_lower:
+                        explicacion = "No se encontró una sesión activa para el usuario en el dispositivo. Problema de RDP o inicio de sesión."
+                        acciones.insert(0, "Verificar configuración de RDP y credenciales del Bot Runner.")
+                    elif "already logged in" in error_message_lower:
+                        explicacion = "El usuario ya tiene una sesión activa en otro dispositivo o sesión de consola."
+                        acciones.insert(0, "Cerrar sesiones activas del usuario en otros equipos.")
+
+                    # Solo alertar la primera vez por equipo
+                    equipo_alertado_key = f"400_{equipo_id}"
+                    if equipo_alertado_key not in self._equipos_alertados_400:
+                        logger.debug(f"Intentando enviar alerta para error 400 en equipo {equipo_id} ({equipo_nombre})")
+                        context = AlertContext(
+                            alert_level=AlertLevel.CRITICAL,
+                            alert_scope=AlertScope.ROBOT,
+                            alert_type=AlertType.PERMANENT,
+                            subject=f"Fallo de Integridad/Configuración en '{robot_nombre}' - ASIGNACIÓN ELIMINADA",
+                            summary=(
+                                f"Fallo de configuración o integridad (400 Bad Request) al intentar desplegar en {equipo_nombre}. "
+                                "La asignación ha sido ELIMINADA de SAM para evitar reintentos fallidos. "
+                                "Se requiere revisión manual del Taskbot y re-asignación."
+                            ),
+                            technical_details={
+                                "Robot": f"{robot_nombre} (ID: {robot_id})",
+                                "Equipo": f"{equipo_nombre} (ID: {equipo_id})",
+                                "Usuario": f"{user_nombre} (ID: {user_id})",
+                                "Error": response_text,
+                                "Explicación": explicacion,
+                            },
+                            actions=acciones
+                            + [
+                                "UNA VEZ RESUELTO: Volver a asignar el equipo al robot manualmente en el panel de SAM.",
+                                "NOTA: El sistema NO volverá a intentar este lanzamiento hasta que se realice la re-asignación manual.",
+                            ],
+                        )
+                        alert_sent = self._enviar_alerta(context)
+                        if alert_sent:
+                            self._equipos_alertados_400.add(equipo_alertado_key)
                         else:
-                            logger.warning(
-                                f"Error 400 persistente (Device Offline) Robot {robot_id} ({robot_nombre}) "
-                                f"Equipo {equipo_id} ({equipo_nombre}) "
-                                f"después de {max_intentos} intentos. Dispositivo no disponible."
+                            logger.error(
+                                f"Fallo al enviar alerta de error 400 para equipo {equipo_id} ({equipo_nombre})"
                             )
-                            # No desasignar, solo reportar el fallo
-                            break
 
-                    # --- NUEVO: Manejo específico de "No Default Device" ---
-                    elif "none of the user(s) provided have default device(s)" in error_message_lower:
-                        detected_error_type = "400_no_default_device"
-                        logger.warning(
-                            f"Error 400 (No Default Device) Robot {robot_id} ({robot_nombre}) "
-                            f"Equipo {equipo_id} ({equipo_nombre}). El usuario {user_nombre} no tiene dispositivo por defecto."
+                    # REGISTRAR FALLO EN BD
+                    try:
+                        dummy_deploy_id = f"FAIL_400_{datetime.now().strftime('%Y%m%d%H%M%S')}_{robot_id}"
+                        await self._db_async.insertar_registro_ejecucion(
+                            id_despliegue=dummy_deploy_id,
+                            db_robot_id=robot_id,
+                            db_equipo_id=equipo_id,
+                            a360_user_id=user_id,
+                            marca_tiempo_programada=hora,
+                            estado="DEPLOY_FAILED",
+                        )
+                        logger.debug(f"Fallo 400 registrado en BD para Robot {robot_id}")
+                    except Exception as db_e:
+                        logger.error(f"Error al registrar fallo 400 en BD: {db_e}")
+
+                    # Desactivar asignación problemática
+                    try:
+                        await self._db_async.ejecutar_consulta(
+                            "DELETE FROM dbo.Asignaciones WHERE RobotId = ? AND EquipoId = ?",
+                            (robot_id, equipo_id),
+                            es_select=False,
                         )
+                        logger.debug(
+                            f"Asignación desactivada: Robot {robot_id} ({robot_nombre}) - Equipo {equipo_id} ({equipo_nombre})"
+                        )
+                    except Exception as db_e:
+                        logger.error(f"Error al desactivar asignación: {db_e}")
+
+            elif status_code >= 500:
+                # ERRORES DEL SERVIDOR (5xx) - Error crítico del servidor A360
+                detected_error_type = f"{status_code}_server_error"
+                logger.error(
+                    f"Error HTTP {status_code} (Server Error) Robot {robot_id} ({robot_nombre}) Equipo {equipo_id} ({equipo_nombre}): {response_text}"
+                )
+
+                # --- LÓGICA DE DETECCIÓN DE REINICIO A360 ---
+                self._track_server_error(status_code)
+                recovery_status = self._check_recovery_window()
+
+                should_alert = False
+                alert_context = None
 
-                        # Solo alertar si no está en cooldown (1 hora) para no spamear
-                        alert_key = f"400_no_device_{equipo_id}"
-                        if self._should_send_alert(alert_key, cooldown_min=60):
-                            context = AlertContext(
+                if recovery_status == "RECOVERY":
+                    logger.info(f"Suprimiendo alerta 5xx (Modo Recuperación Activo). Status: {status_code}")
+
+                elif recovery_status == "TIMEOUT":
+                    # Fallo persistente tras ventana de recuperación
+                    should_alert = True
+                    links = self._cfg_lanzador.get("links", {})
+                    alert_context = AlertContext(
+                        alert_level=AlertLevel.CRITICAL,
+                        alert_scope=AlertScope.SYSTEM,
+                        alert_type=AlertType.PERMANENT,
+                        subject="Control Room A360 Cloud - SERVICIO NO DISPONIBLE",
+                        summary="El servicio A360 Cloud no se ha recuperado después de 5 minutos de inestabilidad.",
+                        technical_details={
+                            "Último Error": f"{status_code} - {response_text}",
+                            "Tiempo Caída": "> 5 minutos",
+                            "Entorno": "A360 Cloud",
+                            "Explicación": (
+                                "El Control Room de Automation Anywhere está devolviendo errores internos (5xx) persistentes. "
+                                "Al ser un entorno Cloud, esto indica una degradación del servicio por parte del proveedor."
+                            ),
+                            "Status Page": links.get("aa_status_page"),
+                        },
+                        actions=[
+                            f"1. Verificar el estado del servicio en: {links.get('aa_status_page')}",
+                            "2. Comprobar si hay tareas de mantenimiento programadas informadas por Automation Anywhere.",
+                            "3. Si el estado global es 'Operational' pero el error persiste, abrir un caso de soporte con Automation Anywhere.",
+                            "4. Notificar internamente que los lanzamientos automáticos están suspendidos temporalmente.",
+                        ],
+                    )
+                    # Salir de modo recovery pero marcar como caído para notificar cuando vuelva
+                    self._in_recovery_mode = False
+                    self._system_is_down = True
+
+                elif recovery_status == "NORMAL":
+                    # Verificar salud real del servidor para distinguir caída de error aislado
+                    is_server_healthy = await self._aa_client.check_health()
+
+                    if not is_server_healthy:
+                        # Servidor NO responde -> Caída de Sistema
+                        if not self._in_recovery_mode:
+                            self._in_recovery_mode = True
+                            self._recovery_start_time = datetime.now()
+                            should_alert = True
+                            links = self._cfg_lanzador.get("links", {})
+                            alert_context = AlertContext(
                                 alert_level=AlertLevel.CRITICAL,
-                                alert_scope=AlertScope.DEVICE,
-                                alert_type=AlertType.PERMANENT,
-                                subject="Configuración Requerida en A360 - Usuario sin Dispositivo por Defecto",
-                                summary=(
-                                    f"El usuario '{user_nombre}' no tiene un dispositivo por defecto asignado en A360. "
-                                    "Esto impide el lanzamiento automático pero la asignación en SAM se MANTENDRÁ activa."
-                                ),
+                                alert_scope=AlertScope.SYSTEM,
+                                alert_type=AlertType.RECOVERY,
+                                subject="Control Room A360 Cloud - SIN CONEXIÓN",
+                                summary="El Control Room Cloud no responde a las verificaciones de salud. Posible problema de red o caída del servicio.",
                                 technical_details={
-                                    "Robot": f"{robot_nombre} (ID: {robot_id})",
-                                    "Equipo": f"{equipo_nombre} (ID: {equipo_id})",
-                                    "Usuario": f"{user_nombre} (ID: {user_id})",
-                                    "Error": "None of the user(s) provided have default device(s)",
+                                    "Error Original": f"{status_code} - {response_text}",
+                                    "Health Check": "Fallido (Timeout o Conexión rechazada)",
+                                    "Explicación": (
+                                        "SAM no puede establecer conexión con la URL de A360 Cloud. "
+                                        "Esto puede deberse a un corte de internet en el servidor de SAM, un problema de DNS, "
+                                        "o una caída total de la región de A360 Cloud."
+                                    ),
                                 },
                                 actions=[
-                                    "1. Ingresar al Control Room de A360 > Manage > Users.",
-                                    f"2. Buscar y editar al usuario '{user_nombre}'.",
-                                    "3. En la sección 'Device settings', seleccionar un dispositivo como 'Default Device'.",
-                                    "4. Guardar los cambios.",
-                                    "NOTA: El sistema volverá a intentar este lanzamiento en el próximo ciclo programado.",
+                                    "1. Verificar la conexión a internet y salida a sitios externos desde el servidor de SAM.",
+                                    "2. Validar que la URL del Control Room sea accesible desde un navegador.",
+                                    f"3. Revisar el estado de la región de A360 Cloud en la Status Page oficial: {links.get('aa_status_page')}",
+                                    "4. Si el problema es local (red), contactar al equipo de Comunicaciones/Networking.",
                                 ],
                             )
-                            self._notificador.send_alert_v2(context)
-
-                        # REGISTRAR FALLO EN BD para este ciclo
-                        try:
-                            dummy_deploy_id = f"FAIL_400_NODEV_{datetime.now().strftime('%Y%m%d%H%M%S')}_{robot_id}"
-                            self._db_connector.insertar_registro_ejecucion(
-                                id_despliegue=dummy_deploy_id,
-                                db_robot_id=robot_id,
-                                db_equipo_id=equipo_id,
-                                a360_user_id=user_id,
-                                marca_tiempo_programada=hora,
-                                estado="DEPLOY_FAILED",
-                            )
-                        except Exception as db_e:
-                            logger.error(f"Error al registrar fallo 400_no_device en BD: {db_e}")
-
-                        break
-
+                            self._system_is_down = True
                     else:
-                        # ERROR PERMANENTE (Bad Request de configuración)
-                        logger.warning(
-                            f"Error 400 PERMANENTE Robot {robot_id} ({robot_nombre}) "
-                            f"Equipo {equipo_id} ({equipo_nombre}) Usuario {user_id} ({user_nombre}). "
-                            f"Revise configuración. Error: {response_text}"
-                        )
+                        # Servidor SÍ responde -> Error 500 es específico de este request (Robot/Usuario)
+                        equipo_alertado_key = f"{status_code}_{equipo_id}"
+                        if equipo_alertado_key not in self._equipos_alertados_500:
+                            should_alert = True
 
-                        # Análisis de mensaje para explicación más precisa
-                        explicacion = (
-                            "Este error (400 Bad Request) indica un problema de configuración o integridad en el Taskbot. "
-                            "Puede deberse a paquetes inexistentes, variables mal referenciadas, parámetros inválidos o falta de licencias."
-                        )
-                        acciones = [
-                            "1. Abrir el bot en el editor de A360 y verificar si hay errores de integridad (íconos rojos).",
-                            "2. Validar que todos los paquetes (Packages) y versiones existan en el Control Room.",
-                            "3. Confirmar que el usuario tenga permisos y licencias de Bot Runner disponibles.",
-                            "4. Validar que el robot no haya sido movido o renombrado en A360.",
-                        ]
-
-                        if "no session found" in error_message_lower:
-                            explicacion = "No se encontró una sesión activa para el usuario en el dispositivo. Problema de RDP o inicio de sesión."
-                            acciones.insert(0, "Verificar configuración de RDP y credenciales del Bot Runner.")
-                        elif "already logged in" in error_message_lower:
+                            # Análisis de mensaje para explicación más precisa
                             explicacion = (
-                                "El usuario ya tiene una sesión activa en otro dispositivo o sesión de consola."
+                                "El Control Room devolvió un error interno al procesar esta solicitud específica. "
+                                "Esto suele ocurrir si el archivo del robot fue borrado, el usuario está bloqueado, "
+                                "o hay una inconsistencia en la base de datos de A360."
                             )
-                            acciones.insert(0, "Cerrar sesiones activas del usuario en otros equipos.")
+                            acciones = [
+                                "1. Verificar que el Robot exista y sea visible para el usuario en el Control Room.",
+                                "2. Asegurar que el usuario tenga licencias de 'Bot Runner' disponibles.",
+                            ]
+
+                            if "could not start a new session" in error_message_lower:
+                                explicacion = "Fallo al iniciar sesión de navegador o sesión de escritorio. Posible desajuste de versión de Chromedriver o extensión de A360."
+                                acciones.insert(0, "Verificar versión de Chrome y Chromedriver en el Bot Runner.")
+                            elif "token that does not exist" in error_message_lower:
+                                explicacion = "Referencia a un token de sesión inexistente. Problema de persistencia de sesión en el Bot Agent."
+                                acciones.insert(
+                                    0, "Reiniciar el servicio 'Automation Anywhere Bot Agent' en el equipo."
+                                )
 
-                        # Solo alertar la primera vez por equipo
-                        equipo_alertado_key = f"400_{equipo_id}"
-                        if equipo_alertado_key not in self._equipos_alertados_400:
-                            logger.debug(
-                                f"Intentando enviar alerta para error 400 en equipo {equipo_id} ({equipo_nombre})"
-                            )
-                            context = AlertContext(
+                            alert_context = AlertContext(
                                 alert_level=AlertLevel.CRITICAL,
                                 alert_scope=AlertScope.ROBOT,
                                 alert_type=AlertType.PERMANENT,
-                                subject=f"Fallo de Integridad/Configuración en '{robot_nombre}' - ASIGNACIÓN ELIMINADA",
+                                subject=f"Error 500 en '{robot_nombre}' - ASIGNACIÓN ELIMINADA",
                                 summary=(
-                                    f"Fallo de configuración o integridad (400 Bad Request) al intentar desplegar en {equipo_nombre}. "
-                                    "La asignación ha sido ELIMINADA de SAM para evitar reintentos fallidos. "
-                                    "Se requiere revisión manual del Taskbot y re-asignación."
+                                    "Error 500 irreversible. El servidor está online, pero rechazó este despliegue específico. "
+                                    "La asignación ha sido ELIMINADA de SAM para evitar reintentos fallidos."
                                 ),
                                 technical_details={
                                     "Robot": f"{robot_nombre} (ID: {robot_id})",
                                     "Equipo": f"{equipo_nombre} (ID: {equipo_id})",
                                     "Usuario": f"{user_nombre} (ID: {user_id})",
-                                    "Error": response_text,
+                                    "Error": f"{status_code} - {response_text}",
+                                    "Health Check": "Exitoso (Servidor Online)",
                                     "Explicación": explicacion,
                                 },
                                 actions=acciones
                                 + [
-                                    "UNA VEZ RESUELTO: Volver a asignar el equipo al robot manualmente en el panel de SAM.",
+                                    "3. UNA VEZ RESUELTO: Volver a asignar el equipo al robot manualmente en SAM.",
                                     "NOTA: El sistema NO volverá a intentar este lanzamiento hasta que se realice la re-asignación manual.",
                                 ],
                             )
-                            alert_sent = self._notificador.send_alert_v2(context)
-                            if alert_sent:
-                                self._equipos_alertados_400.add(equipo_alertado_key)
-                            else:
-                                logger.error(
-                                    f"Fallo al enviar alerta de error 400 para equipo {equipo_id} ({equipo_nombre})"
+                            self._equipos_alertados_500.add(equipo_alertado_key)
+
+                            # REGISTRAR FALLO EN BD para evitar reintentos infinitos si es un error del robot/usuario
+                            try:
+                                dummy_deploy_id = f"FAIL_500_{datetime.now().strftime('%Y%m%d%H%M%S')}_{robot_id}"
+                                await self._db_async.insertar_registro_ejecucion(
+                                    id_despliegue=dummy_deploy_id,
+                                    db_robot_id=robot_id,
+                                    db_equipo_id=equipo_id,
+                                    a360_user_id=user_id,
+                                    marca_tiempo_programada=hora,
+                                    estado="DEPLOY_FAILED",
                                 )
-
-                        # REGISTRAR FALLO EN BD
-                        try:
-                            dummy_deploy_id = f"FAIL_400_{datetime.now().strftime('%Y%m%d%H%M%S')}_{robot_id}"
-                            self._db_connector.insertar_registro_ejecucion(
-                                id_despliegue=dummy_deploy_id,
-                                db_robot_id=robot_id,
-                                db_equipo_id=equipo_id,
-                                a360_user_id=user_id,
-                                marca_tiempo_programada=hora,
-                                estado="DEPLOY_FAILED",
-                            )
-                            logger.debug(f"Fallo 400 registrado en BD para Robot {robot_id}")
-                        except Exception as db_e:
-                            logger.error(f"Error al registrar fallo 400 en BD: {db_e}")
-
-                        # Desactivar asignación problemática
-                        try:
-                            self._db_connector.ejecutar_consulta(
-                                "DELETE FROM dbo.Asignaciones WHERE RobotId = ? AND EquipoId = ?",
-                                (robot_id, equipo_id),
-                                es_select=False,
-                            )
-                            logger.debug(
-                                f"Asignación desactivada: Robot {robot_id} ({robot_nombre}) - Equipo {equipo_id} ({equipo_nombre})"
-                            )
-                        except Exception as db_e:
-                            logger.error(f"Error al desactivar asignación: {db_e}")
-
-                        break
-
-                elif status_code >= 500:
-                    # ERRORES DEL SERVIDOR (5xx) - Error crítico del servidor A360
-                    detected_error_type = f"{status_code}_server_error"
-                    logger.error(
-                        f"Error HTTP {status_code} (Server Error) Robot {robot_id} ({robot_nombre}) Equipo {equipo_id} ({equipo_nombre}): {response_text}"
-                    )
-
-                    # --- LÓGICA DE DETECCIÓN DE REINICIO A360 ---
-                    self._track_server_error(status_code)
-                    recovery_status = self._check_recovery_window()
-
-                    should_alert = False
-                    alert_context = None
-
-                    if recovery_status == "RECOVERY":
-                        logger.info(f"Suprimiendo alerta 5xx (Modo Recuperación Activo). Status: {status_code}")
-
-                    elif recovery_status == "TIMEOUT":
-                        # Fallo persistente tras ventana de recuperación
-                        should_alert = True
-                        links = self._cfg_lanzador.get("links", {})
-                        alert_context = AlertContext(
-                            alert_level=AlertLevel.CRITICAL,
-                            alert_scope=AlertScope.SYSTEM,
-                            alert_type=AlertType.PERMANENT,
-                            subject="Control Room A360 Cloud - SERVICIO NO DISPONIBLE",
-                            summary="El servicio A360 Cloud no se ha recuperado después de 5 minutos de inestabilidad.",
-                            technical_details={
-                                "Último Error": f"{status_code} - {response_text}",
-                                "Tiempo Caída": "> 5 minutos",
-                                "Entorno": "A360 Cloud",
-                                "Explicación": (
-                                    "El Control Room de Automation Anywhere está devolviendo errores internos (5xx) persistentes. "
-                                    "Al ser un entorno Cloud, esto indica una degradación del servicio por parte del proveedor."
-                                ),
-                                "Status Page": links.get("aa_status_page"),
-                            },
-                            actions=[
-                                f"1. Verificar el estado del servicio en: {links.get('aa_status_page')}",
-                                "2. Comprobar si hay tareas de mantenimiento programadas informadas por Automation Anywhere.",
-                                "3. Si el estado global es 'Operational' pero el error persiste, abrir un caso de soporte con Automation Anywhere.",
-                                "4. Notificar internamente que los lanzamientos automáticos están suspendidos temporalmente.",
-                            ],
-                        )
-                        # Salir de modo recovery pero marcar como caído para notificar cuando vuelva
-                        self._in_recovery_mode = False
-                        self._system_is_down = True
-
-                    elif recovery_status == "NORMAL":
-                        # Verificar salud real del servidor para distinguir caída de error aislado
-                        is_server_healthy = await self._aa_client.check_health()
-
-                        if not is_server_healthy:
-                            # Servidor NO responde -> Caída de Sistema
-                            if not self._in_recovery_mode:
-                                self._in_recovery_mode = True
-                                self._recovery_start_time = datetime.now()
-                                should_alert = True
-                                links = self._cfg_lanzador.get("links", {})
-                                alert_context = AlertContext(
-                                    alert_level=AlertLevel.CRITICAL,
-                                    alert_scope=AlertScope.SYSTEM,
-                                    alert_type=AlertType.RECOVERY,
-                                    subject="Control Room A360 Cloud - SIN CONEXIÓN",
-                                    summary="El Control Room Cloud no responde a las verificaciones de salud. Posible problema de red o caída del servicio.",
-                                    technical_details={
-                                        "Error Original": f"{status_code} - {response_text}",
-                                        "Health Check": "Fallido (Timeout o Conexión rechazada)",
-                                        "Explicación": (
-                                            "SAM no puede establecer conexión con la URL de A360 Cloud. "
-                                            "Esto puede deberse a un corte de internet en el servidor de SAM, un problema de DNS, "
-                                            "o una caída total de la región de A360 Cloud."
-                                        ),
-                                    },
-                                    actions=[
-                                        "1. Verificar la conexión a internet y salida a sitios externos desde el servidor de SAM.",
-                                        "2. Validar que la URL del Control Room sea accesible desde un navegador.",
-                                        f"3. Revisar el estado de la región de A360 Cloud en la Status Page oficial: {links.get('aa_status_page')}",
-                                        "4. Si el problema es local (red), contactar al equipo de Comunicaciones/Networking.",
-                                    ],
+                                logger.debug(f"Fallo 500 registrado en BD para Robot {robot_id}")
+                            except Exception as db_e:
+                                logger.error(f"Error al registrar fallo 500 en BD: {db_e}")
+
+                            # DESACTIVAR ASIGNACIÓN (Error irreversible)
+                            try:
+                                await self._db_async.ejecutar_consulta(
+                                    "DELETE FROM dbo.Asignaciones WHERE RobotId = ? AND EquipoId = ?",
+                                    (robot_id, equipo_id),
+                                    es_select=False,
                                 )
-                                self._system_is_down = True
-                        else:
-                            # Servidor SÍ responde -> Error 500 es específico de este request (Robot/Usuario)
-                            equipo_alertado_key = f"{status_code}_{equipo_id}"
-                            if equipo_alertado_key not in self._equipos_alertados_500:
-                                should_alert = True
-
-                                # Análisis de mensaje para explicación más precisa
-                                explicacion = (
-                                    "El Control Room devolvió un error interno al procesar esta solicitud específica. "
-                                    "Esto suele ocurrir si el archivo del robot fue borrado, el usuario está bloqueado, "
-                                    "o hay una inconsistencia en la base de datos de A360."
+                                logger.info(
+                                    f"Asignación desactivada por Error 500 Irreversible: Robot {robot_id} - Equipo {equipo_id}"
                                 )
-                                acciones = [
-                                    "1. Verificar que el Robot exista y sea visible para el usuario en el Control Room.",
-                                    "2. Asegurar que el usuario tenga licencias de 'Bot Runner' disponibles.",
-                                ]
-
-                                if "could not start a new session" in error_message_lower:
-                                    explicacion = "Fallo al iniciar sesión de navegador o sesión de escritorio. Posible desajuste de versión de Chromedriver o extensión de A360."
-                                    acciones.insert(0, "Verificar versión de Chrome y Chromedriver en el Bot Runner.")
-                                elif "token that does not exist" in error_message_lower:
-                                    explicacion = "Referencia a un token de sesión inexistente. Problema de persistencia de sesión en el Bot Agent."
-                                    acciones.insert(
-                                        0, "Reiniciar el servicio 'Automation Anywhere Bot Agent' en el equipo."
-                                    )
-
-                                alert_context = AlertContext(
-                                    alert_level=AlertLevel.CRITICAL,
-                                    alert_scope=AlertScope.ROBOT,
-                                    alert_type=AlertType.PERMANENT,
-                                    subject=f"Error 500 en '{robot_nombre}' - ASIGNACIÓN ELIMINADA",
-                                    summary=(
-                                        "Error 500 irreversible. El servidor está online, pero rechazó este despliegue específico. "
-                                        "La asignación ha sido ELIMINADA de SAM para evitar reintentos fallidos."
-                                    ),
-                                    technical_details={
-                                        "Robot": f"{robot_nombre} (ID: {robot_id})",
-                                        "Equipo": f"{equipo_nombre} (ID: {equipo_id})",
-                                        "Usuario": f"{user_nombre} (ID: {user_id})",
-                                        "Error": f"{status_code} - {response_text}",
-                                        "Health Check": "Exitoso (Servidor Online)",
-                                        "Explicación": explicacion,
-                                    },
-                                    actions=acciones
-                                    + [
-                                        "3. UNA VEZ RESUELTO: Volver a asignar el equipo al robot manualmente en SAM.",
-                                        "NOTA: El sistema NO volverá a intentar este lanzamiento hasta que se realice la re-asignación manual.",
-                                    ],
-                                )
-                                self._equipos_alertados_500.add(equipo_alertado_key)
-
-                                # REGISTRAR FALLO EN BD para evitar reintentos infinitos si es un error del robot/usuario
-                                try:
-                                    dummy_deploy_id = f"FAIL_500_{datetime.now().strftime('%Y%m%d%H%M%S')}_{robot_id}"
-                                    self._db_connector.insertar_registro_ejecucion(
-                                        id_despliegue=dummy_deploy_id,
-                                        db_robot_id=robot_id,
-                                        db_equipo_id=equipo_id,
-                                        a360_user_id=user_id,
-                                        marca_tiempo_programada=hora,
-                                        estado="DEPLOY_FAILED",
-                                    )
-                                    logger.debug(f"Fallo 500 registrado en BD para Robot {robot_id}")
-                                except Exception as db_e:
-                                    logger.error(f"Error al registrar fallo 500 en BD: {db_e}")
-
-                                # DESACTIVAR ASIGNACIÓN (Error irreversible)
-                                try:
-                                    self._db_connector.ejecutar_consulta(
-                                        "DELETE FROM dbo.Asignaciones WHERE RobotId = ? AND EquipoId = ?",
-                                        (robot_id, equipo_id),
-                                        es_select=False,
-                                    )
-                                    logger.info(
-                                        f"Asignación desactivada por Error 500 Irreversible: Robot {robot_id} - Equipo {equipo_id}"
-                                    )
-                                except Exception as db_e:
-                                    logger.error(f"Error al desactivar asignación por 500: {db_e}")
-
-                    if should_alert and alert_context:
-                        # Usar tracking de frecuencia para no spamear la misma alerta de sistema
-                        alert_key = f"SYSTEM_5XX_{alert_context.alert_type.value}"
-                        if self._should_send_alert(alert_key, cooldown_min=15):
-                            alert_context.frequency_info = self._get_frequency_info(alert_key)
-                            self._notificador.send_alert_v2(alert_context)
-
-                    # No reintentar errores del servidor, esperar al próximo ciclo
-                    break
-                else:
-                    # OTROS ERRORES HTTP (401, 403, 404, etc.) - Probablemente permanentes
-                    detected_error_type = f"{status_code}_http_error"
-                    logger.error(
-                        f"Error HTTP {status_code} Robot {robot_id} ({robot_nombre}) Equipo {equipo_id} ({equipo_nombre}): {response_text}"
-                    )
-
-                    # Enviar alerta para errores HTTP inesperados
-                    context = AlertContext(
-                        alert_level=AlertLevel.CRITICAL,
-                        alert_scope=AlertScope.ROBOT,
-                        alert_type=AlertType.PERMANENT,
-                        subject=f"Error HTTP {status_code} en '{robot_nombre}' - ASIGNACIÓN ELIMINADA",
-                        summary=(
-                            f"Se recibió un error HTTP {status_code} inesperado al intentar desplegar. "
-                            "La asignación ha sido ELIMINADA para evitar reintentos fallidos."
-                        ),
-                        technical_details={
-                            "Robot": f"{robot_nombre} (ID: {robot_id})",
-                            "Equipo": f"{equipo_nombre} (ID: {equipo_id})",
-                            "Usuario": f"{user_nombre} (ID: {user_id})",
-                            "Error": f"{status_code} - {response_text}",
-                            "Explicación": (
-                                "Este error (401, 403, 404) indica problemas de permisos, recursos no encontrados "
-                                "o credenciales inválidas para este robot o usuario específico."
-                            ),
-                        },
-                        actions=[
-                            f"1. Verificar que el usuario '{user_nombre}' tenga permisos de ejecución en A360.",
-                            "2. Confirmar que el robot y el usuario existan en el Control Room.",
-                            "3. UNA VEZ RESUELTO: Volver a asignar el equipo al robot manualmente en SAM.",
-                        ],
-                    )
-                    self._notificador.send_alert_v2(context)
-
-                    # DESACTIVAR ASIGNACIÓN
-                    try:
-                        self._db_connector.ejecutar_consulta(
-                            "DELETE FROM dbo.Asignaciones WHERE RobotId = ? AND EquipoId = ?",
-                            (robot_id, equipo_id),
-                            es_select=False,
-                        )
-                        logger.info(f"Asignación desactivada por Error HTTP {status_code}")
-                    except Exception as db_e:
-                        logger.error(f"Error al desactivar asignación por error HTTP: {db_e}")
+                            except Exception as db_e:
+                                logger.error(f"Error al desactivar asignación por 500: {db_e}")
 
-                    break
+                if should_alert and alert_context:
+                    # Usar tracking de frecuencia para no spamear la misma alerta de sistema
+                    alert_key = f"SYSTEM_5XX_{alert_context.alert_type.value}"
+                    if self._should_send_alert(alert_key, cooldown_min=15):
+                        alert_context.frequency_info = self._get_frequency_info(alert_key)
+                        self._enviar_alerta(alert_context)
 
-            except (httpx.TimeoutException, httpx.ConnectError) as e:
-                # ERRORES DE RED/TIMEOUT
-                if intento < max_intentos:
-                    logger.warning(
-                        f"Error de Red ({type(e).__name__}) Robot {robot_id} ({robot_nombre}) "
-                        f"Equipo {equipo_id} ({equipo_nombre}). "
-                        f"Reintentando ({intento + 1}/{max_intentos}) en {delay_seg}s..."
-                    )
-                    await asyncio.sleep(delay_seg)
-                    continue
-                else:
-                    logger.error(
-                        f"Error de Red persistente Robot {robot_id} ({robot_nombre}) Equipo {equipo_id} ({equipo_nombre}). Fallo definitivo."
-                    )
-                    break
-
-            except Exception as e:
-                # ERRORES GENÉRICOS - Inesperados
-                detected_error_type = "generic_exception"
+                # No reintentar errores del servidor, esperar al próximo ciclo
+            else:
+                # OTROS ERRORES HTTP (401, 403, 404, etc.) - Probablemente permanentes
+                detected_error_type = f"{status_code}_http_error"
                 logger.error(
-                    f"Error genérico Robot {robot_id} ({robot_nombre}) Equipo {equipo_id} ({equipo_nombre}): {e}",
-                    exc_info=True,
+                    f"Error HTTP {status_code} Robot {robot_id} ({robot_nombre}) Equipo {equipo_id} ({equipo_nombre}): {response_text}"
                 )
 
-                # Alerta para errores de código o excepciones no controladas
+                # Enviar alerta para errores HTTP inesperados
                 context = AlertContext(
                     alert_level=AlertLevel.CRITICAL,
-                    alert_scope=AlertScope.SYSTEM,
+                    alert_scope=AlertScope.ROBOT,
                     alert_type=AlertType.PERMANENT,
-                    subject=f"Excepción inesperada en despliegue de '{robot_nombre}' - ASIGNACIÓN ELIMINADA",
-                    summary="Se produjo un error interno no controlado durante el despliegue. Asignación eliminada por seguridad.",
+                    subject=f"Error HTTP {status_code} en '{robot_nombre}' - ASIGNACIÓN ELIMINADA",
+                    summary=(
+                        f"Se recibió un error HTTP {status_code} inesperado al intentar desplegar. "
+                        "La asignación ha sido ELIMINADA para evitar reintentos fallidos."
+                    ),
                     technical_details={
                         "Robot": f"{robot_nombre} (ID: {robot_id})",
                         "Equipo": f"{equipo_nombre} (ID: {equipo_id})",
-                        "Error": str(e),
+                        "Usuario": f"{user_nombre} (ID: {user_id})",
+                        "Error": f"{status_code} - {response_text}",
+                        "Explicación": (
+                            "Este error (401, 403, 404) indica problemas de permisos, recursos no encontrados "
+                            "o credenciales inválidas para este robot o usuario específico."
+                        ),
                     },
                     actions=[
-                        "1. Revisar los logs del servicio Lanzador para más detalles.",
-                        "2. Verificar la integridad de la base de datos y la conexión con A360.",
-                        "3. UNA VEZ RESUELTO: Volver a asignar el equipo manualmente.",
+                        f"1. Verificar que el usuario '{user_nombre}' tenga permisos de ejecución en A360.",
+                        "2. Confirmar que el robot y el usuario existan en el Control Room.",
+                        "3. UNA VEZ RESUELTO: Volver a asignar el equipo al robot manualmente en SAM.",
                     ],
                 )
-                self._notificador.send_alert_v2(context)
+                self._enviar_alerta(context)
 
                 # DESACTIVAR ASIGNACIÓN
                 try:
-                    self._db_connector.ejecutar_consulta(
+                    await self._db_async.ejecutar_consulta(
                         "DELETE FROM dbo.Asignaciones WHERE RobotId = ? AND EquipoId = ?",
                         (robot_id, equipo_id),
                         es_select=False,
                     )
+                    logger.info(f"Asignación desactivada por Error HTTP {status_code}")
                 except Exception as db_e:
-                    logger.error(f"Error al desactivar asignación por excepción: {db_e}")
+                    logger.error(f"Error al desactivar asignación por error HTTP: {db_e}")
 
-                break
+        except (httpx.TimeoutException, httpx.ConnectError) as e:
+            # ERRORES DE RED/TIMEOUT
+            if intento < max_intentos:
+                logger.warning(
+                    f"Error de Red ({type(e).__name__}) Robot {robot_id} ({robot_nombre}) "
+                    f"Equipo {equipo_id} ({equipo_nombre}). "
+                    f"Reintentando ({intento + 1}/{max_intentos}) en {delay_seg}s..."
+                )
+                return ReintentoProgramado(delay_seg, detected_error_type)
+            else:
+                logger.error(
+                    f"Error de Red persistente Robot {robot_id} ({robot_nombre}) Equipo {equipo_id} ({equipo_nombre}). Fallo definitivo."
+                )
+
+        except Exception as e:
+            # ERRORES GENÉRICOS - Inesperados
+            detected_error_type = "generic_exception"
+            logger.error(
+                f"Error genérico Robot {robot_id} ({robot_nombre}) Equipo {equipo_id} ({equipo_nombre}): {e}",
+                exc_info=True,
+            )
+
+            # Alerta para errores de código o excepciones no controladas
+            context = AlertContext(
+                alert_level=AlertLevel.CRITICAL,
+                alert_scope=AlertScope.SYSTEM,
+                alert_type=AlertType.PERMANENT,
+                subject=f"Excepción inesperada en despliegue de '{robot_nombre}' - ASIGNACIÓN ELIMINADA",
+                summary="Se produjo un error interno no controlado durante el despliegue. Asignación eliminada por seguridad.",
+                technical_details={
+                    "Robot": f"{robot_nombre} (ID: {robot_id})",
+                    "Equipo": f"{equipo_nombre} (ID: {equipo_id})",
+                    "Error": str(e),
+                },
+                actions=[
+                    "1. Revisar los logs del servicio Lanzador para más detalles.",
+                    "2. Verificar la integridad de la base de datos y la conexión con A360.",
+                    "3. UNA VEZ RESUELTO: Volver a asignar el equipo manualmente.",
+                ],
+            )
+            self._enviar_alerta(context)
+
+            # DESACTIVAR ASIGNACIÓN
+            try:
+                await self._db_async.ejecutar_consulta(
+                    "DELETE FROM dbo.Asignaciones WHERE RobotId = ? AND EquipoId = ?",
+                    (robot_id, equipo_id),
+                    es_select=False,
+                )
+            except Exception as db_e:
+                logger.error(f"Error al desactivar asignación por excepción: {db_e}")
 
         # Fallo después de todos los intentos
         logger.error(
@@ -996,7 +1364,7 @@ class Desplegador:
                 ],
             )
 
-            alert_sent = self._notificador.send_alert_v2(context)
+            alert_sent = self._enviar_alerta(context)
             if alert_sent:
                 # Resetear estados de falla del sistema
                 self._system_is_down = False
@@ -1,14 +1,18 @@
 # sam/lanzador/service/main.py
 import asyncio
 import logging
+import time
 from datetime import datetime
-from typing import Dict, List
+from typing import Any, Awaitable, Callable, Dict, List, Optional
 
 from sam.common.alert_types import AlertContext, AlertLevel, AlertScope, AlertType
+from sam.common.aviso_lanzador import ReceptorAvisos
 from sam.common.mail_client import EmailAlertClient
+from sam.common.trazas import TRAZADOR
 
 from .conciliador import Conciliador
 from .desplegador import Desplegador
+from .planificador_ciclos import CoordinadorCiclos, PlanificadorCiclo
 from .sincronizador import Sincronizador
 
 logger = logging.getLogger(__name__)
@@ -30,9 +34,13 @@ class LanzadorService:
         notificador: EmailAlertClient,
         cfg_lanzador: dict,
         sync_enabled: bool,
+        receptor_avisos: Optional[ReceptorAvisos] = None,
+        debounce_avisos_seg: float = 2.0,
     ):
         """
         Inicializa el Orquestador con sus componentes de lógica ya creados (Inyección de Dependencias).
+        Con `receptor_avisos`, entre ciclos de lanzamiento se atienden los avisos de equipos liberados
+        del Callback con un ciclo restringido a esos equipos.
         """
         logger.debug("Inicializando el orquestador del LanzadorService...")
         self._sincronizador = sincronizador
@@ -41,10 +49,16 @@ class LanzadorService:
         self._notificador = notificador
         self._lanzador_cfg = cfg_lanzador
         self._sync_enabled = sync_enabled
+        self._receptor_avisos = receptor_avisos
+        self._debounce_avisos_seg = debounce_avisos_seg
 
         self._shutdown_event = asyncio.Event()
         self._tasks: List[asyncio.Task] = []
 
+        # Intervalo adaptativo por ciclo; lanzamiento y conciliación no empiezan a la vez (dbo.Ejecuciones)
+        self._planificadores: Dict[str, PlanificadorCiclo] = {}
+        self._coordinador_ejecuciones = CoordinadorCiclos(cfg_lanzador.get("ciclos_separacion_seg", 0))
+
         # Tracking de errores 412 persistentes
         self._fallos_412_por_equipo: Dict[int, int] = {}  # {equipo_id: contador_fallos}
         self._equipos_alertados: Dict[int, datetime] = {}  # {equipo_id: last_alert_time}
@@ -96,50 +110,93 @@ class LanzadorService:
         logger.info("Iniciando la detención ordenada de los ciclos del servicio...")
         self._shutdown_event.set()
 
-    async def _run_generic_cycle(self, logic_component, method_name: str, interval: int, cycle_name: str):
-        """Plantilla genérica para ejecutar un ciclo de lógica."""
+    def obtener_estadisticas_ciclos(self) -> Dict[str, Dict[str, Any]]:
+        """Duración, retraso, trabajo e intervalo vigente de cada ciclo."""
+        return {nombre: planificador.estadisticas() for nombre, planificador in self._planificadores.items()}
+
+    def _crear_planificador(self, cycle_name: str, clave: str, interval: int) -> PlanificadorCiclo:
+        planificador = PlanificadorCiclo(
+            cycle_name,
+            interval,
+            minimo_seg=self._lanzador_cfg.get(f"intervalo_{clave}_min"),
+            maximo_seg=self._lanzador_cfg.get(f"intervalo_{clave}_max"),
+            jitter=self._lanzador_cfg.get(f"jitter_{clave}", 0),
+        )
+        self._planificadores[cycle_name] = planificador
+        return planificador
+
+    async def _run_generic_cycle(
+        self,
+        logic_component,
+        method_name: str,
+        planificador: PlanificadorCiclo,
+        cycle_name: str,
+        contar_trabajo: Callable[[Any], int],
+        esperar: Optional[Callable[[float], Awaitable[None]]] = None,
+        coordinador: Optional[CoordinadorCiclos] = None,
+    ):
+        """
+        Plantilla genérica para ejecutar un ciclo de lógica. `planificador` decide la espera según la
+        duración del ciclo y el trabajo que `contar_trabajo` extrae de su resultado. `esperar` reemplaza
+        la espera y `coordinador` separa el inicio del ciclo del de otros que comparten tablas.
+        """
         while not self._shutdown_event.is_set():
+            if coordinador is not None:
+                await coordinador.turno()
+            planificador.iniciar_ciclo()
+            resultado = await self._ejecutar_ciclo(logic_component, method_name, cycle_name)
+            trabajo = contar_trabajo(resultado)
+            espera = planificador.finalizar_ciclo(trabajo)
+            logger.debug(f"Ciclo de {cycle_name}: trabajo {trabajo}, próximo en {espera:.1f}s.")
+            if esperar is not None:
+                await esperar(espera)
+                continue
             try:
-                logger.debug(f"Iniciando ciclo de {cycle_name}...")
+                # Espera el intervalo o hasta que se active el evento de cierre
+                await asyncio.wait_for(self._shutdown_event.wait(), timeout=espera)
+            except asyncio.TimeoutError:
+                pass  # Es el comportamiento esperado, continuar al siguiente ciclo
+
+    async def _ejecutar_ciclo(self, logic_component, method_name: str, cycle_name: str, *args) -> Any:
+        """Ejecuta una vez la lógica del ciclo y devuelve su resultado; si falla, alerta y devuelve None."""
+        try:
+            logger.debug(f"Iniciando ciclo de {cycle_name}...")
 
+            with TRAZADOR.ciclo(cycle_name, metodo=method_name):
                 # Ejecutar la lógica
-                resultado = await getattr(logic_component, method_name)()
+                resultado = await getattr(logic_component, method_name)(*args)
 
                 # Tracking de errores 412 (solo para ciclo de lanzamiento)
                 if cycle_name == "Lanzamiento" and resultado:
                     self._procesar_resultados_despliegue(resultado)
 
-                logger.debug(f"Ciclo de {cycle_name} completado.")
-            except Exception as e:
-                logger.critical(f"Error fatal en el ciclo de {cycle_name}: {e}", exc_info=True)
-                import traceback
-
-                error_trace = traceback.format_exc()
-                context = AlertContext(
-                    alert_level=AlertLevel.CRITICAL,
-                    alert_scope=AlertScope.SYSTEM,
-                    alert_type=AlertType.PERMANENT,
-                    subject=f"Error Crítico en Ciclo de {cycle_name}",
-                    summary=f"Se ha producido un error irrecuperable en el ciclo de {cycle_name}. El proceso podría estar detenido.",
-                    technical_details={
-                        "Ciclo": cycle_name,
-                        "Error": str(e),
-                        "Stack Trace": error_trace[:1000],  # Limitar para el mail
-                    },
-                    actions=[
-                        "1. Revisar los logs del servidor para identificar la causa raíz.",
-                        "2. Verificar la conectividad con la base de datos y el Control Room.",
-                        "3. Reiniciar el servicio SAM_Lanzador si el error persiste.",
-                    ],
-                )
-                alert_sent = self._notificador.send_alert_v2(context)
-                if not alert_sent:
-                    logger.error(f"No se pudo enviar la alerta de error crítico en ciclo de {cycle_name}")
-            try:
-                # Espera el intervalo o hasta que se active el evento de cierre
-                await asyncio.wait_for(self._shutdown_event.wait(), timeout=interval)
-            except asyncio.TimeoutError:
-                pass  # Es el comportamiento esperado, continuar al siguiente ciclo
+            logger.debug(f"Ciclo de {cycle_name} completado.")
+            return resultado
+        except Exception as e:
+            logger.critical(f"Error fatal en el ciclo de {cycle_name}: {e}", exc_info=True)
+            import traceback
+
+            error_trace = traceback.format_exc()
+            context = AlertContext(
+                alert_level=AlertLevel.CRITICAL,
+                alert_scope=AlertScope.SYSTEM,
+                alert_type=AlertType.PERMANENT,
+                subject=f"Error Crítico en Ciclo de {cycle_name}",
+                summary=f"Se ha producido un error irrecuperable en el ciclo de {cycle_name}. El proceso podría estar detenido.",
+                technical_details={
+                    "Ciclo": cycle_name,
+                    "Error": str(e),
+                    "Stack Trace": error_trace[:1000],  # Limitar para el mail
+                },
+                actions=[
+                    "1. Revisar los logs del servidor para identificar la causa raíz.",
+                    "2. Verificar la conectividad con la base de datos y el Control Room.",
+                    "3. Reiniciar el servicio SAM_Lanzador si el error persiste.",
+                ],
+            )
+            alert_sent = self._notificador.send_alert_v2(context)
+            if not alert_sent:
+                logger.error(f"No se pudo enviar la alerta de error crítico en ciclo de {cycle_name}")
 
     def _procesar_resultados_despliegue(self, resultados: List[Dict]):
         """
@@ -164,7 +221,11 @@ class LanzadorService:
                         del self._equipos_alertados[equipo_id]
                     logger.debug(f"Equipo {equipo_id} recuperado. Contador de fallos 412 reseteado.")
 
-            elif status == "fallido" and error_type == "412":
+            elif (status == "fallido" and error_type == "412") or (
+                status == "omitido" and error_type == "equipo_desconectado"
+            ):
+                # Un despliegue omitido por equipo desconectado cuenta como un fallo más: la alerta de
+                # equipo persistentemente offline se mantiene aunque ya no se intente desplegar
                 # Incrementar contador de fallos 412
                 contador = self._fallos_412_por_equipo.get(equipo_id, 0) + 1
                 self._fallos_412_por_equipo[equipo_id] = contador
@@ -220,13 +281,78 @@ class LanzadorService:
                         )
 
     async def _run_sync_cycle(self, interval: int):
-        await self._run_generic_cycle(self._sincronizador, "sincronizar_entidades", interval, "Sincronización")
+        await self._run_generic_cycle(
+            self._sincronizador,
+            "sincronizar_entidades",
+            self._crear_planificador("Sincronización", "sincronizacion", interval),
+            "Sincronización",
+            self._trabajo_sincronizacion,
+        )
 
     async def _run_launcher_cycle(self, interval: int):
-        await self._run_generic_cycle(self._desplegador, "desplegar_robots_pendientes", interval, "Lanzamiento")
+        await self._run_generic_cycle(
+            self._desplegador,
+            "desplegar_robots_pendientes",
+            self._crear_planificador("Lanzamiento", "lanzamiento", interval),
+            "Lanzamiento",
+            self._trabajo_lanzamiento,
+            esperar=self._esperar_atendiendo_avisos if self._receptor_avisos is not None else None,
+            coordinador=self._coordinador_ejecuciones,
+        )
+
+    async def _esperar_atendiendo_avisos(self, interval: float):
+        """
+        Espera el intervalo del ciclo de lanzamiento, pero si el Callback avisa que terminaron ejecuciones,
+        junta los avisos durante `debounce_avisos_seg` y lanza un ciclo solo para los equipos liberados.
+        """
+        fin = time.monotonic() + interval
+        while not self._shutdown_event.is_set():
+            restante = fin - time.monotonic()
+            if restante <= 0:
+                return
+            espera_cierre = asyncio.create_task(self._shutdown_event.wait())
+            espera_avisos = asyncio.create_task(self._receptor_avisos.esperar(restante))
+            await asyncio.wait({espera_cierre, espera_avisos}, return_when=asyncio.FIRST_COMPLETED)
+            espera_cierre.cancel()
+            espera_avisos.cancel()
+            if self._shutdown_event.is_set() or not self._receptor_avisos.hay_avisos():
+                return  # Cierre, o se cumplió el intervalo sin avisos: toca el ciclo completo
+            try:
+                await asyncio.wait_for(self._shutdown_event.wait(), timeout=self._debounce_avisos_seg)
+                return
+            except asyncio.TimeoutError:
+                pass
+            await self._coordinador_ejecuciones.turno()
+            await self._ejecutar_ciclo(
+                self._desplegador, "desplegar_equipos_liberados", "Lanzamiento", self._receptor_avisos.tomar()
+            )
 
     async def _run_conciliador_cycle(self, interval: int):
-        await self._run_generic_cycle(self._conciliador, "conciliar_ejecuciones", interval, "Conciliación")
+        await self._run_generic_cycle(
+            self._conciliador,
+            "conciliar_ejecuciones",
+            self._crear_planificador("Conciliación", "conciliacion", interval),
+            "Conciliación",
+            lambda activas: activas or 0,
+            coordinador=self._coordinador_ejecuciones,
+        )
+
+    @staticmethod
+    def _trabajo_lanzamiento(resultados: Optional[List[Dict]]) -> int:
+        """Despliegues intentados; los omitidos por equipo desconectado no cuentan como trabajo."""
+        if not isinstance(resultados, list):
+            return 0
+        return sum(1 for resultado in resultados if resultado.get("status") != "omitido")
+
+    @staticmethod
+    def _trabajo_sincronizacion(resumen: Optional[Dict[str, int]]) -> int:
+        """Robots y equipos que cambiaron en A360 desde la sincronización anterior."""
+        if not isinstance(resumen, dict):
+            return 0
+        return sum(
+            resumen.get(f"{entidad}_sincronizados", 0) - resumen.get(f"{entidad}_sin_cambios", 0)
+            for entidad in ("robots", "equipos")
+        )
 
     # --- Handlers de Autenticación ---
 
@@ -0,0 +1,100 @@
+# sam/lanzador/service/planificador_ciclos.py
+"""
+Intervalo adaptativo de los ciclos del Lanzador (lanzamiento, sincronización y conciliación).
+
+El intervalo se mide de inicio a inicio: un ciclo que tardó parte del intervalo solo espera el resto.
+Tras un ciclo con trabajo (despliegues, ejecuciones activas, cambios sincronizados) el intervalo baja
+a `minimo_seg`; tras uno sin trabajo se multiplica por `factor_retroceso` hasta `maximo_seg`. Si un
+ciclo dura más que el intervalo, el siguiente empieza enseguida y los inicios perdidos se omiten (no
+se recuperan en ráfaga). `jitter` varía cada espera en ±esa fracción para que los ciclos no se alineen.
+
+`CoordinadorCiclos` separa el inicio de los ciclos que consultan las mismas tablas: el lanzamiento y
+la conciliación leen y escriben dbo.Ejecuciones, y no deben empezar en el mismo instante.
+"""
+
+import asyncio
+import random
+import time
+from collections import deque
+from typing import Any, Dict, Optional
+
+from sam.lanzador.service.planificador_despliegues import resumen_latencias
+
+
+class PlanificadorCiclo:
+    def __init__(
+        self,
+        nombre: str,
+        intervalo_seg: float,
+        minimo_seg: Optional[float] = None,
+        maximo_seg: Optional[float] = None,
+        jitter: float = 0.0,
+        factor_retroceso: float = 1.5,
+    ):
+        self.nombre = nombre
+        self.minimo_seg = min(float(minimo_seg or intervalo_seg), float(intervalo_seg))
+        self.maximo_seg = max(float(maximo_seg or intervalo_seg), float(intervalo_seg))
+        self.jitter = min(max(float(jitter), 0.0), 1.0)
+        self.factor_retroceso = factor_retroceso
+        self.intervalo_actual = float(intervalo_seg)
+        self._programado_en: Optional[float] = None
+        self._inicio: Optional[float] = None
+        self._retraso = 0.0
+        self._ciclos: deque = deque(maxlen=500)
+        self._contadores = {"ciclos": 0, "con_trabajo": 0, "excedidos": 0, "omitidos": 0, "trabajo": 0}
+
+    def iniciar_ciclo(self):
+        """Marca el inicio de un ciclo y el retraso respecto de cuándo estaba programado."""
+        self._inicio = time.monotonic()
+        self._retraso = max(0.0, self._inicio - self._programado_en) if self._programado_en is not None else 0.0
+
+    def finalizar_ciclo(self, trabajo: int) -> float:
+        """Ajusta el intervalo según el trabajo del ciclo y devuelve cuántos segundos esperar hasta el próximo."""
+        fin = time.monotonic()
+        duracion = fin - (self._inicio if self._inicio is not None else fin)
+        if trabajo > 0:
+            self.intervalo_actual = self.minimo_seg
+        else:
+            self.intervalo_actual = min(self.maximo_seg, self.intervalo_actual * self.factor_retroceso)
+
+        espera = self.intervalo_actual - duracion
+        self._contadores["ciclos"] += 1
+        self._contadores["trabajo"] += trabajo
+        self._contadores["con_trabajo"] += 1 if trabajo > 0 else 0
+        if espera < 0:
+            self._contadores["excedidos"] += 1
+            self._contadores["omitidos"] += int(duracion // self.intervalo_actual) if self.intervalo_actual else 0
+            espera = 0.0
+        elif self.jitter:
+            espera *= 1 + random.uniform(-self.jitter, self.jitter)
+
+        self._programado_en = fin + espera
+        self._ciclos.append((duracion, self._retraso, trabajo))
+        return espera
+
+    def estadisticas(self) -> Dict[str, Any]:
+        """Contadores, intervalo vigente y p50/p95/máx de duración y retraso de los últimos ciclos."""
+        return {
+            **self._contadores,
+            "intervalo_actual_seg": round(self.intervalo_actual, 3),
+            "duracion_seg": resumen_latencias([c[0] for c in self._ciclos]),
+            "retraso_seg": resumen_latencias([c[1] for c in self._ciclos]),
+        }
+
+
+class CoordinadorCiclos:
+    def __init__(self, separacion_seg: float):
+        self.separacion_seg = max(0.0, float(separacion_seg))
+        self._ultimo_inicio: Optional[float] = None
+        self._lock = asyncio.Lock()
+
+    async def turno(self) -> float:
+        """Espera a que pasen `separacion_seg` desde el último inicio coordinado. Devuelve lo esperado."""
+        async with self._lock:
+            espera = 0.0
+            if self._ultimo_inicio is not None:
+                espera = max(0.0, self._ultimo_inicio + self.separacion_seg - time.monotonic())
+                if espera:
+                    await asyncio.sleep(espera)
+            self._ultimo_inicio = time.monotonic()
+            return espera
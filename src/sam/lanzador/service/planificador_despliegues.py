@@ -0,0 +1,202 @@
+# sam/lanzador/service/planificador_despliegues.py
+"""
+Planificador acotado para los despliegues de un ciclo del Lanzador.
+
+Los despliegues se encolan en una `asyncio.PriorityQueue` y los atienden `max_workers` workers: nunca
+hay más de `max_workers` despliegues en curso, y cada worker toma el siguiente apenas termina el
+anterior, sin esperar al más lento de una tanda. Los resultados se entregan a medida que terminan. Cada intento
+tiene un plazo opcional (`timeout_tarea_seg`); si lo supera se cancela y se usa el resultado que
+devuelva `al_vencer`. Al final del ciclo quedan las estadísticas de espera en cola y latencia.
+
+Un intento que devuelve `ReintentoProgramado` (equipo offline, error de red) no retiene al worker
+esperando: el elemento pasa a un heap ordenado por hora de reintento y un temporizador lo vuelve a
+encolar cuando vence la demora. Mientras tanto el worker atiende a otros robots.
+
+La cola se atiende por `prioridad(elemento)` (menor primero) y, dentro de una misma prioridad, por
+turnos entre grupos (`grupo(elemento)`, p. ej. el robot): un robot con muchos equipos pendientes no
+demora a los demás robots de su prioridad. Un grupo que se suma tarde (un reintento que vuelve a la
+cola) entra en el turno en curso, sin adelantarse a los que ya esperaban. Sin `prioridad` ni `grupo`
+el orden es el de llegada. La espera en cola se mide además por prioridad.
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Hashable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ReintentoProgramado:
+    """Resultado de un intento fallido que debe repetirse dentro de `demora_seg` segundos."""
+
+    demora_seg: float
+    error: Optional[str] = None
+
+
+@dataclass
+class EstadoReintento:
+    """Estado de reintentos de un elemento (por ejemplo, un par robot/equipo) dentro del ciclo."""
+
+    intento: int  # Último intento realizado (el próximo es `intento + 1`)
+    ultimo_error: Optional[str]
+    proximo_en: float
+
+
+def etiqueta_prioridad(prioridad: Any) -> str:
+    """Etiqueta de una prioridad para las estadísticas: las tuplas se unen con ':' (p. ej. (0, 10) -> "0:10")."""
+    if isinstance(prioridad, tuple):
+        return ":".join(str(parte) for parte in prioridad)
+    return str(prioridad)
+
+
+def resumen_latencias(valores: List[float]) -> Dict[str, Optional[float]]:
+    """p50, p95, p99 y máximo (en segundos) de una lista de duraciones."""
+    if not valores:
+        return {"p50": None, "p95": None, "p99": None, "max": None}
+    ordenados = sorted(valores)
+
+    def percentil(p: float) -> float:
+        return round(ordenados[min(len(ordenados) - 1, int(p * len(ordenados)))], 3)
+
+    return {"p50": percentil(0.50), "p95": percentil(0.95), "p99": percentil(0.99), "max": round(ordenados[-1], 3)}
+
+
+class PlanificadorDespliegues:
+    def __init__(self, max_workers: int, timeout_tarea_seg: float = 0):
+        self.max_workers = max(1, int(max_workers))
+        self.timeout_tarea_seg = timeout_tarea_seg
+        self._esperas: List[float] = []
+        self._esperas_por_prioridad: Dict[Any, List[float]] = {}
+        self._latencias: List[float] = []
+        self._vencidas = 0
+        self._reintentos = 0
+        self._duracion: Optional[float] = None
+        self.estado_reintentos: Dict[Hashable, EstadoReintento] = {}
+
+    async def procesar(
+        self,
+        elementos: Sequence[Any],
+        funcion: Callable[[Any, Optional[EstadoReintento]], Awaitable[Any]],
+        al_vencer: Callable[[Any], Any],
+        clave: Optional[Callable[[Any], Hashable]] = None,
+        prioridad: Optional[Callable[[Any], Any]] = None,
+        grupo: Optional[Callable[[Any], Hashable]] = None,
+    ) -> AsyncIterator[Tuple[int, Any]]:
+        """
+        Ejecuta `funcion(elemento, estado)` para cada elemento con a lo sumo `max_workers` en curso y
+        entrega `(índice, resultado)` en orden de finalización. `estado` es None en el primer intento; si
+        `funcion` devuelve un `ReintentoProgramado`, el elemento se reprograma y los siguientes intentos
+        reciben su `EstadoReintento` (también visible en `estado_reintentos[clave(elemento)]`). Una
+        excepción de `funcion` se propaga al consumidor y cancela los despliegues restantes, como hacía
+        `asyncio.gather`.
+
+        `prioridad(elemento)` devuelve un valor comparable (menor se atiende antes) y `grupo(elemento)`
+        el grupo para los turnos dentro de una prioridad. Sin ellos, todos comparten prioridad y grupo.
+        """
+        clave = clave or (lambda elemento: id(elemento))
+        prioridad = prioridad or (lambda elemento: 0)
+        grupo = grupo or (lambda elemento: None)
+        self._esperas, self._latencias, self._vencidas, self._reintentos = [], [], 0, 0
+        self._esperas_por_prioridad = {}
+        self.estado_reintentos = {}
+        inicio_ciclo = time.monotonic()
+        # Cola de (prioridad, turno, orden, índice, elemento, estado, encolado_en); `orden` es único, así
+        # que nunca se comparan los elementos. `turno` es el siguiente de su grupo dentro de la prioridad.
+        cola: asyncio.PriorityQueue = asyncio.PriorityQueue()
+        orden = itertools.count()
+        siguiente_turno: Dict[Tuple[Any, Hashable], int] = {}
+        turno_en_curso: Dict[Any, int] = {}
+
+        def _encolar(indice: int, elemento: Any, estado: Optional[EstadoReintento], encolado_en: float):
+            nivel = prioridad(elemento)
+            clave_turno = (nivel, grupo(elemento))
+            turno = max(siguiente_turno.get(clave_turno, 0), turno_en_curso.get(nivel, 0))
+            siguiente_turno[clave_turno] = turno + 1
+            cola.put_nowait((nivel, turno, next(orden), indice, elemento, estado, encolado_en))
+
+        for indice, elemento in enumerate(elementos):
+            _encolar(indice, elemento, None, inicio_ciclo)
+        terminados: asyncio.Queue = asyncio.Queue()
+        # Heap de (vence_en, desempate, índice, elemento, estado) y aviso al temporizador
+        programados: List[Tuple[float, int, int, Any, EstadoReintento]] = []
+        desempate = itertools.count()
+        nuevo_programado = asyncio.Event()
+
+        async def _temporizador():
+            while True:
+                nuevo_programado.clear()
+                ahora = time.monotonic()
+                while programados and programados[0][0] <= ahora:
+                    vence_en, _, indice, elemento, estado = heapq.heappop(programados)
+                    _encolar(indice, elemento, estado, vence_en)
+                espera = programados[0][0] - ahora if programados else None
+                try:
+                    await asyncio.wait_for(nuevo_programado.wait(), espera)
+                except asyncio.TimeoutError:
+                    pass
+
+        async def _worker():
+            while True:
+                nivel, turno, _, indice, elemento, estado, encolado_en = await cola.get()
+                turno_en_curso[nivel] = turno
+                inicio = time.monotonic()
+                self._esperas.append(inicio - encolado_en)
+                self._esperas_por_prioridad.setdefault(nivel, []).append(inicio - encolado_en)
+                try:
+                    if self.timeout_tarea_seg:
+                        resultado = await asyncio.wait_for(funcion(elemento, estado), self.timeout_tarea_seg)
+                    else:
+                        resultado = await funcion(elemento, estado)
+                except asyncio.TimeoutError:
+                    self._vencidas += 1
+                    resultado = al_vencer(elemento)
+                except Exception as e:
+                    terminados.put_nowait((indice, None, e))
+                    return
+                fin = time.monotonic()
+                self._latencias.append(fin - inicio)
+                if isinstance(resultado, ReintentoProgramado):
+                    self._reintentos += 1
+                    vence_en = fin + max(0.0, resultado.demora_seg)
+                    intento = estado.intento + 1 if estado else 1
+                    estado = EstadoReintento(intento, resultado.error, vence_en)
+                    self.estado_reintentos[clave(elemento)] = estado
+                    heapq.heappush(programados, (vence_en, next(desempate), indice, elemento, estado))
+                    nuevo_programado.set()
+                    continue
+                terminados.put_nowait((indice, resultado, None))
+
+        tareas = [asyncio.create_task(_worker()) for _ in range(min(self.max_workers, len(elementos)))]
+        tareas.append(asyncio.create_task(_temporizador()))
+        try:
+            for _ in range(len(elementos)):
+                indice, resultado, error = await terminados.get()
+                if error is not None:
+                    raise error
+                yield indice, resultado
+        finally:
+            for tarea in tareas:
+                tarea.cancel()
+            await asyncio.gather(*tareas, return_exceptions=True)
+            self._duracion = time.monotonic() - inicio_ciclo
+
+    def estadisticas(self) -> Dict[str, Any]:
+        """Estadísticas del último ciclo: espera en cola (total y por prioridad) y latencia de cada intento (seg)."""
+        return {
+            "despliegues": len(self._latencias) - self._reintentos,
+            "reintentos": self._reintentos,
+            "vencidos": self._vencidas,
+            "max_workers": self.max_workers,
+            "duracion_seg": round(self._duracion, 3) if self._duracion is not None else None,
+            "espera_cola_seg": resumen_latencias(self._esperas),
+            "espera_cola_por_prioridad_seg": {
+                etiqueta_prioridad(nivel): resumen_latencias(self._esperas_por_prioridad[nivel])
+                for nivel in sorted(self._esperas_por_prioridad)
+            },
+            "latencia_seg": resumen_latencias(self._latencias),
+        }
@@ -0,0 +1,207 @@
+# sam/lanzador/service/registro_ejecuciones.py
+"""
+Registro diferido (write-behind) de las ejecuciones desplegadas por el Lanzador.
+
+En lugar de un INSERT por despliegue dentro de la tarea que desplegó, las filas de dbo.Ejecuciones se
+acumulan en memoria y se escriben con un INSERT multi-fila cada `tamano_lote` filas o cada
+`intervalo_ms`, lo que ocurra primero. Si la BD no responde, las filas quedan pendientes y se
+reintentan en el siguiente vaciado; cuando hay `max_pendientes` filas sin escribir, `registrar`
+espera (contrapresión) y el despliegue que la llamó no termina hasta que haya lugar.
+
+Con `archivo_spill`, cada fila se agrega a un archivo JSONL antes de quedar pendiente y el archivo se
+reescribe con las que siguen pendientes tras cada vaciado. Si el proceso muere antes de escribirlas,
+al reiniciar se vuelven a cargar y se insertan; el INSERT omite las que ya estaban en la BD.
+
+Mientras una fila está pendiente, `robot_pendiente` la informa para que el Desplegador no vuelva a
+lanzar ese robot en ese equipo (el SP todavía no ve la ejecución). Si la BD rechaza una fila, se
+descarta y se avisa a `al_descartar` para activar la protección de rebote.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from sam.common.database import AsyncDatabaseConnector, DatabaseConnector
+
+logger = logging.getLogger(__name__)
+
+
+class RegistroEjecucionesDiferido:
+    def __init__(
+        self,
+        db_connector: DatabaseConnector,
+        tamano_lote: int = 50,
+        intervalo_ms: float = 500,
+        max_pendientes: int = 1000,
+        archivo_spill: Optional[str] = None,
+    ):
+        self._db_async = AsyncDatabaseConnector.para(db_connector)
+        self.tamano_lote = max(1, int(tamano_lote))
+        self.intervalo_seg = max(0.0, float(intervalo_ms)) / 1000
+        self.max_pendientes = max(self.tamano_lote, int(max_pendientes))
+        self._ruta = Path(archivo_spill) if archivo_spill else None
+        # Se invoca con (fila, error) por cada fila que la BD rechazó y se descartó.
+        self.al_descartar: Optional[Callable[[tuple, str], None]] = None
+
+        # Filas (DeploymentId, RobotId, EquipoId, UserId, Hora, Estado) aún no confirmadas, en orden
+        self._pendientes: List[tuple] = []
+        self._espacio = asyncio.Condition()
+        self._hay_lote = asyncio.Event()
+        self._lock_vaciado = asyncio.Lock()
+        self._tarea: Optional[asyncio.Task] = None
+        self._estadisticas = {"registradas": 0, "insertadas": 0, "descartadas": 0, "vaciados": 0, "esperas": 0}
+
+        if self._ruta:
+            self._pendientes = self._leer_spill()
+            if self._pendientes:
+                logger.warning(
+                    f"Se recuperaron {len(self._pendientes)} ejecuciones sin registrar de {self._ruta}. "
+                    "Se insertarán en el próximo vaciado."
+                )
+
+    def iniciar(self):
+        """Arranca el vaciado periódico (también se arranca solo con el primer `registrar`)."""
+        if self._tarea is None or self._tarea.done():
+            self._tarea = asyncio.create_task(self._bucle_vaciado())
+            if self._pendientes:
+                self._hay_lote.set()
+
+    async def registrar(
+        self, id_despliegue, db_robot_id, db_equipo_id, a360_user_id, marca_tiempo_programada, estado
+    ) -> None:
+        """Misma firma que `DatabaseConnector.insertar_registro_ejecucion`, pero la fila se escribe en diferido."""
+        self.iniciar()
+        # La hora se guarda como texto para poder respaldarla en JSON; el INSERT la convierte a TIME.
+        hora = marca_tiempo_programada
+        if hasattr(hora, "isoformat"):
+            hora = hora.isoformat()
+        fila = (id_despliegue, db_robot_id, db_equipo_id, a360_user_id, hora, estado)
+        async with self._espacio:
+            if len(self._pendientes) >= self.max_pendientes:
+                self._estadisticas["esperas"] += 1
+                logger.warning(
+                    f"Registro diferido lleno ({len(self._pendientes)} ejecuciones sin escribir). "
+                    "El despliegue espera a que se vacíe."
+                )
+                self._hay_lote.set()
+                await self._espacio.wait_for(lambda: len(self._pendientes) < self.max_pendientes)
+            self._agregar_a_spill(fila)
+            self._pendientes.append(fila)
+            self._estadisticas["registradas"] += 1
+        if len(self._pendientes) >= self.tamano_lote:
+            self._hay_lote.set()
+
+    def robot_pendiente(self, robot_id: Any, equipo_id: Any) -> bool:
+        """True si hay una ejecución de ese robot en ese equipo que todavía no se escribió en la BD."""
+        return any(fila[1] == robot_id and fila[2] == equipo_id for fila in self._pendientes)
+
+    async def vaciar(self) -> int:
+        """
+        Escribe las filas pendientes en lotes de `tamano_lote`. Ante un error de BD se detiene y deja el
+        resto para el próximo vaciado. Devuelve cuántas filas salieron de la cola (insertadas o descartadas).
+        """
+        procesadas = 0
+        async with self._lock_vaciado:
+            while self._pendientes:
+                # Solo este método quita filas y siempre por el principio: el prefijo no cambia mientras se inserta.
+                lote = self._pendientes[: self.tamano_lote]
+                try:
+                    resultado = await self._db_async.insertar_registros_ejecucion(lote)
+                except Exception as e:
+                    logger.error(
+                        f"No se pudieron registrar {len(lote)} ejecuciones en BD ({len(self._pendientes)} pendientes). "
+                        f"Se reintentará en el próximo vaciado. Error: {e}"
+                    )
+                    break
+                del self._pendientes[: len(lote)]
+                procesadas += len(lote)
+                self._estadisticas["vaciados"] += 1
+                self._estadisticas["insertadas"] += len(lote) - len(resultado.fallidas)
+                for fila, error in resultado.fallidas:
+                    self._descartar(fila, error)
+                self._reescribir_spill()
+                async with self._espacio:
+                    self._espacio.notify_all()
+        return procesadas
+
+    async def cerrar(self):
+        """Detiene el vaciado periódico y hace un último vaciado."""
+        if self._tarea is not None:
+            self._tarea.cancel()
+            await asyncio.gather(self._tarea, return_exceptions=True)
+            self._tarea = None
+        await self.vaciar()
+        if self._pendientes:
+            destino = f"quedan en {self._ruta}" if self._ruta else "se pierden (sin archivo de respaldo)"
+            logger.error(f"{len(self._pendientes)} ejecuciones no se pudieron registrar al cerrar y {destino}.")
+
+    def estadisticas(self) -> Dict[str, int]:
+        return {**self._estadisticas, "pendientes": len(self._pendientes)}
+
+    async def _bucle_vaciado(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._hay_lote.wait(), self.intervalo_seg or None)
+            except asyncio.TimeoutError:
+                pass
+            self._hay_lote.clear()
+            inicio = time.monotonic()
+            if await self.vaciar():
+                logger.debug(f"Registro diferido vaciado en {time.monotonic() - inicio:.3f}s.")
+            if self._pendientes:
+                # Casi siempre la BD falló: no reintentar con cada nuevo registro, sino al cumplirse el intervalo.
+                await asyncio.sleep(self.intervalo_seg)
+
+    def _descartar(self, fila: tuple, error: str):
+        self._estadisticas["descartadas"] += 1
+        logger.error(f"La BD rechazó el registro de la ejecución {fila}. Se descarta. Error: {error}")
+        if self.al_descartar:
+            self.al_descartar(fila, error)
+
+    # --- Archivo de respaldo (JSONL) ---
+
+    def _agregar_a_spill(self, fila: tuple):
+        if not self._ruta:
+            return
+        try:
+            self._ruta.parent.mkdir(parents=True, exist_ok=True)
+            with self._ruta.open("a", encoding="utf-8") as archivo:
+                archivo.write(json.dumps(list(fila), default=str) + "\n")
+        except OSError as e:
+            logger.warning(f"No se pudo respaldar la ejecución {fila[0]} en {self._ruta}: {e}")
+
+    def _reescribir_spill(self):
+        if not self._ruta:
+            return
+        try:
+            temporal = self._ruta.with_name(f"{self._ruta.name}.{os.getpid()}.tmp")
+            temporal.write_text(
+                "".join(json.dumps(list(fila), default=str) + "\n" for fila in self._pendientes), encoding="utf-8"
+            )
+            os.replace(temporal, self._ruta)
+        except OSError as e:
+            logger.warning(f"No se pudo actualizar el respaldo de ejecuciones {self._ruta}: {e}")
+
+    def _leer_spill(self) -> List[tuple]:
+        filas: List[Tuple] = []
+        try:
+            lineas = self._ruta.read_text(encoding="utf-8").splitlines()
+        except FileNotFoundError:
+            return filas
+        except OSError as e:
+            logger.error(f"No se pudo leer el respaldo de ejecuciones {self._ruta}: {e}")
+            return filas
+        for linea in lineas:
+            try:
+                fila = tuple(json.loads(linea))
+            except ValueError:
+                # Una línea cortada por una caída a mitad de escritura
+                logger.warning(f"Línea ilegible en {self._ruta}, se ignora: {linea[:200]!r}")
+                continue
+            if len(fila) == 6:
+                filas.append(fila)
+        return filas
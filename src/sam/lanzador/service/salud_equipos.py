@@ -0,0 +1,208 @@
+# sam/lanzador/service/salud_equipos.py
+"""
+Estado de conexión de los equipos (Bot Runners) para no desplegar en los que se sabe desconectados.
+
+Se alimenta de dos fuentes:
+- El resultado final de cada despliegue: un 412 o un 400 de dispositivo offline (ya agotados los
+  reintentos del ciclo) cuenta como fallo; `umbral_fallos` fallos consecutivos marcan el equipo como
+  desconectado. Un despliegue exitoso lo vuelve a dar por conectado.
+- La lista de devices CONNECTED de A360 (`obtener_conectados`), que se refresca en segundo plano
+  cada `ttl_lista_seg` sin demorar el ciclo. Un equipo ausente de una lista vigente se trata como
+  desconectado sin pagar antes el despliegue fallido; uno que vuelve a figurar se sondea enseguida.
+
+Los despliegues en un equipo desconectado se omiten, salvo un sondeo cada cierto tiempo: el intervalo
+empieza en `sondeo_min_seg` y se duplica con cada sondeo fallido hasta `sondeo_max_seg`. Así, ante una
+desconexión masiva el ciclo no paga una llamada fallida (y sus reintentos) por equipo en cada vuelta.
+"""
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+# error_type de los resultados de despliegue que indican que el dispositivo no está disponible
+ERRORES_EQUIPO_DESCONECTADO = frozenset({"412", "400_device_offline"})
+
+
+@dataclass
+class EstadoEquipo:
+    fallos_consecutivos: int = 0
+    desconectado_desde: Optional[float] = None
+    motivo: Optional[str] = None  # "fallos" o "lista"
+    intervalo_sondeo: float = 0.0
+    proximo_sondeo: float = 0.0
+    ultimo_exito: Optional[float] = None
+    omitidos: int = 0
+
+
+class SaludEquipos:
+    def __init__(
+        self,
+        obtener_conectados: Optional[Callable[[], Awaitable[List[Dict[str, Any]]]]] = None,
+        umbral_fallos: int = 1,
+        sondeo_min_seg: float = 60,
+        sondeo_max_seg: float = 900,
+        ttl_lista_seg: float = 120,
+    ):
+        self._obtener_conectados = obtener_conectados
+        self.umbral_fallos = max(1, int(umbral_fallos))
+        self.sondeo_min_seg = float(sondeo_min_seg)
+        self.sondeo_max_seg = max(float(sondeo_max_seg), self.sondeo_min_seg)
+        self.ttl_lista_seg = float(ttl_lista_seg)
+        self._equipos: Dict[int, EstadoEquipo] = {}
+        self._conectados: Optional[Set[int]] = None
+        self._lista_en: Optional[float] = None
+        self._refresco: Optional[asyncio.Task] = None
+        self._contadores = {"omitidos": 0, "sondeos": 0, "desconexiones": 0, "recuperados": 0, "refrescos_fallidos": 0}
+
+    # --- Lista de devices conectados ---
+
+    def refrescar_lista_si_vencida(self):
+        """Lanza en segundo plano el refresco de la lista CONNECTED si venció (nunca más de uno a la vez)."""
+        if self._obtener_conectados is None or self.ttl_lista_seg <= 0:
+            return
+        if self._refresco is not None and not self._refresco.done():
+            return
+        if self._lista_en is not None and time.monotonic() - self._lista_en < self.ttl_lista_seg:
+            return
+        self._refresco = asyncio.create_task(self._refrescar_lista())
+
+    async def _refrescar_lista(self):
+        try:
+            devices = await self._obtener_conectados()
+        except Exception as e:
+            self._contadores["refrescos_fallidos"] += 1
+            logger.warning(f"No se pudo obtener la lista de devices conectados: {e}. Se usa la anterior.")
+            return
+        self.actualizar_conectados(device.get("id") for device in devices or [])
+
+    def actualizar_conectados(self, ids: Iterable[Any]):
+        """Reemplaza la lista de equipos conectados; los desconectados que volvieron se sondean enseguida."""
+        conectados = set()
+        for equipo_id in ids:
+            try:
+                conectados.add(int(equipo_id))
+            except (TypeError, ValueError):
+                continue
+        ahora = time.monotonic()
+        self._conectados, self._lista_en = conectados, ahora
+        for equipo_id, estado in self._equipos.items():
+            if estado.desconectado_desde is not None and equipo_id in conectados:
+                estado.proximo_sondeo = ahora
+
+    def _lista_vigente(self) -> bool:
+        # Si el refresco viene fallando, una lista vieja no debe seguir bloqueando equipos
+        return self._lista_en is not None and time.monotonic() - self._lista_en < 3 * self.ttl_lista_seg
+
+    # --- Consulta y resultados ---
+
+    def debe_omitir(self, equipo_id: int) -> bool:
+        """
+        True si el despliegue en el equipo debe omitirse porque se lo sabe desconectado. Si le toca un
+        sondeo, devuelve False y reserva el siguiente, para que el sondeo sea uno solo.
+        """
+        ahora = time.monotonic()
+        estado = self._equipos.get(equipo_id)
+        if (estado is None or estado.desconectado_desde is None) and self._ausente_de_la_lista(equipo_id, estado):
+            estado = self._equipos.setdefault(equipo_id, EstadoEquipo())
+            self._marcar_desconectado(equipo_id, estado, "lista", ahora)
+        if estado is None or estado.desconectado_desde is None:
+            return False
+        if ahora >= estado.proximo_sondeo:
+            self._contadores["sondeos"] += 1
+            estado.proximo_sondeo = ahora + estado.intervalo_sondeo
+            logger.debug(
+                f"Sondeando el equipo {equipo_id}, desconectado hace {ahora - estado.desconectado_desde:.0f}s."
+            )
+            return False
+        estado.omitidos += 1
+        self._contadores["omitidos"] += 1
+        return True
+
+    def _ausente_de_la_lista(self, equipo_id: int, estado: Optional[EstadoEquipo]) -> bool:
+        if self._conectados is None or not self._lista_vigente() or equipo_id in self._conectados:
+            return False
+        # Un despliegue exitoso posterior a la lista vale más que la lista
+        return estado is None or estado.ultimo_exito is None or estado.ultimo_exito < self._lista_en
+
+    def registrar_resultado(self, equipo_id: Optional[int], resultado: Dict[str, Any]):
+        """Actualiza el estado del equipo con el resultado final de un despliegue."""
+        if equipo_id is None:
+            return
+        if resultado.get("status") == "exitoso":
+            self.confirmar_conectado(equipo_id)
+        elif resultado.get("status") == "fallido" and resultado.get("error_type") in ERRORES_EQUIPO_DESCONECTADO:
+            ahora = time.monotonic()
+            estado = self._equipos.setdefault(equipo_id, EstadoEquipo())
+            estado.fallos_consecutivos += 1
+            if estado.desconectado_desde is not None:
+                # Sondeo fallido: se espacia el siguiente
+                estado.intervalo_sondeo = min(self.sondeo_max_seg, estado.intervalo_sondeo * 2)
+                estado.proximo_sondeo = ahora + estado.intervalo_sondeo
+            elif estado.fallos_consecutivos >= self.umbral_fallos:
+                self._marcar_desconectado(equipo_id, estado, "fallos", ahora)
+
+    def confirmar_conectado(self, equipo_id: int):
+        """El equipo respondió (despliegue exitoso o fin de una ejecución avisado por el Callback)."""
+        estado = self._equipos.get(equipo_id)
+        if estado is None:
+            estado = self._equipos[equipo_id] = EstadoEquipo()
+        if estado.desconectado_desde is not None:
+            self._contadores["recuperados"] += 1
+            logger.info(
+                f"Equipo {equipo_id} conectado nuevamente tras {time.monotonic() - estado.desconectado_desde:.0f}s "
+                f"({estado.omitidos} despliegues omitidos)."
+            )
+        estado.fallos_consecutivos = 0
+        estado.desconectado_desde = estado.motivo = None
+        estado.omitidos = 0
+        estado.ultimo_exito = time.monotonic()
+
+    def _marcar_desconectado(self, equipo_id: int, estado: EstadoEquipo, motivo: str, ahora: float):
+        estado.desconectado_desde = ahora
+        estado.motivo = motivo
+        estado.intervalo_sondeo = self.sondeo_min_seg
+        estado.proximo_sondeo = ahora + self.sondeo_min_seg
+        self._contadores["desconexiones"] += 1
+        causa = (
+            "ausente de la lista CONNECTED de A360"
+            if motivo == "lista"
+            else f"{estado.fallos_consecutivos} despliegues fallidos por equipo offline"
+        )
+        logger.warning(
+            f"Equipo {equipo_id} marcado como desconectado ({causa}). "
+            f"Se omiten sus despliegues y se sondea cada {self.sondeo_min_seg:.0f}s o más."
+        )
+
+    def desconectados(self) -> Dict[int, Dict[str, Any]]:
+        ahora = time.monotonic()
+        return {
+            equipo_id: {
+                "motivo": estado.motivo,
+                "desconectado_seg": round(ahora - estado.desconectado_desde, 1),
+                "proximo_sondeo_seg": round(max(0.0, estado.proximo_sondeo - ahora), 1),
+                "omitidos": estado.omitidos,
+            }
+            for equipo_id, estado in self._equipos.items()
+            if estado.desconectado_desde is not None
+        }
+
+    def estadisticas(self) -> Dict[str, Any]:
+        """Contadores acumulados, equipos desconectados y antigüedad de la lista CONNECTED."""
+        return {
+            **self._contadores,
+            "desconectados": len(self.desconectados()),
+            "lista_conectados": len(self._conectados) if self._conectados is not None else None,
+            "lista_edad_seg": round(time.monotonic() - self._lista_en, 1) if self._lista_en is not None else None,
+        }
+
+    async def cerrar(self):
+        if self._refresco is not None and not self._refresco.done():
+            self._refresco.cancel()
+            try:
+                await self._refresco
+            except asyncio.CancelledError:
+                pass
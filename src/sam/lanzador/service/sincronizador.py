@@ -1,5 +1,6 @@
 # sam/lanzador/service/sincronizador.py
 import logging
+from typing import Dict
 
 from sam.common.a360_client import AutomationAnywhereClient
 from sam.common.database import DatabaseConnector
@@ -20,14 +21,14 @@ class Sincronizador:
         """
         self._sincronizador_comun = SincronizadorComun(db_connector=db_connector, aa_client=aa_client)
 
-    async def sincronizar_entidades(self):
+    async def sincronizar_entidades(self) -> Dict[str, int]:
         """
         Orquesta un ciclo completo de sincronización de entidades llamando
-        a la lógica centralizada.
+        a la lógica centralizada. Devuelve el resumen de robots y equipos sincronizados.
         """
         logger.debug("Iniciando ciclo de sincronización desde el servicio Lanzador...")
         try:
-            await self._sincronizador_comun.sincronizar_entidades()
+            return await self._sincronizador_comun.sincronizar_entidades()
         except Exception as e:
             logger.error(f"Error grave durante el ciclo de sincronización del lanzador: {e}", exc_info=True)
             # La gestión de errores y notificaciones se maneja en el orquestador principal
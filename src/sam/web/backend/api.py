@@ -9,10 +9,17 @@ from fastapi import APIRouter, BackgroundTasks, Body, Depends, HTTPException, Qu
 from sam.common.a360_client import AutomationAnywhereClient
 from sam.common.apigw_client import ApiGatewayClient
 from sam.common.config_manager import ConfigManager
-from sam.common.database import DatabaseConnector
+from sam.common.database import POOL_MAINTENANCE, AsyncDatabaseConnector, DatabaseConnector, PoolSaturadoError
+from sam.common.metricas_db import METRICAS_DB
 from sam.web.backend import database as db_service
 from sam.web.backend.cache import cached, get_cache_stats
-from sam.web.backend.dependencies import get_aa_client, get_apigw_client, get_db
+from sam.web.backend.dependencies import (
+    get_aa_client,
+    get_analytics_db,
+    get_apigw_client,
+    get_async_db,
+    get_db,
+)
 from sam.web.backend.schemas import (
     AssignmentUpdateRequest,
     EquipoCreateRequest,
@@ -65,6 +72,13 @@ async def startup_event():
 def _handle_endpoint_errors(endpoint_name: str, e: Exception, tag: str = "General"):
     """Manejador centralizado de errores para los endpoints."""
     error_msg = f"Error en endpoint {tag}/{endpoint_name}: {str(e)}"
+    if isinstance(e, PoolSaturadoError):
+        logger.warning(error_msg)
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="El servicio está saturado. Intente nuevamente en unos segundos.",
+            headers={"Retry-After": "5"},
+        )
     logger.error(error_msg, exc_info=True)
     raise HTTPException(
         status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -127,7 +141,7 @@ async def trigger_sync_robots(
             )
 
         # Usamos el wrapper, no la tarea directa
-        background_tasks.add_task(run_robot_sync_task, db, aa_client, app_state)
+        background_tasks.add_task(run_robot_sync_task, db.pool(POOL_MAINTENANCE), aa_client, app_state)
 
     db_service.log_audit(
         db,
@@ -157,7 +171,7 @@ async def trigger_sync_equipos(
             )
 
         # Usamos el wrapper de equipos
-        background_tasks.add_task(run_equipo_sync_task, db, aa_client, app_state)
+        background_tasks.add_task(run_equipo_sync_task, db.pool(POOL_MAINTENANCE), aa_client, app_state)
 
     db_service.log_audit(
         db,
@@ -411,13 +425,30 @@ def get_cache_statistics():
         _handle_endpoint_errors("get_cache_statistics", e, "Analytics")
 
 
+@router.get("/api/analytics/db-metrics", tags=["Analytics"])
+def get_db_metrics(
+    top: Optional[int] = Query(None, ge=1, description="Limitar a las N sentencias con más tiempo acumulado"),
+    db: DatabaseConnector = Depends(get_db),
+):
+    """Métricas de BD de este proceso: tiempos por sentencia, pools de conexiones y executor asíncrono."""
+    try:
+        return {
+            "consultas": METRICAS_DB.obtener_resumen(top=top),
+            "pools": db.obtener_metricas_pools(),
+            "executor": AsyncDatabaseConnector.para(db).obtener_metricas(),
+        }
+    except Exception as e:
+        logger.error(f"Error obteniendo métricas de BD: {e}", exc_info=True)
+        _handle_endpoint_errors("get_db_metrics", e, "Analytics")
+
+
 @router.get("/api/analytics/callbacks", tags=["Analytics"])
 def get_callbacks_dashboard(
     fecha_inicio: Optional[str] = Query(None, description="Fecha de inicio (YYYY-MM-DDTHH:mm:ss)"),
     fecha_fin: Optional[str] = Query(None, description="Fecha de fin (YYYY-MM-DDTHH:mm:ss)"),
     robot_id: Optional[int] = Query(None, description="ID del robot para filtrar"),
     incluir_detalle_horario: bool = Query(True, description="Incluir análisis por hora"),
-    db: DatabaseConnector = Depends(get_db),
+    db: DatabaseConnector = Depends(get_analytics_db),
 ):
     """
     Obtiene el dashboard de análisis de callbacks.
@@ -459,7 +490,7 @@ def get_balanceador_dashboard(
     fecha_inicio: Optional[str] = Query(None, description="Fecha de inicio (YYYY-MM-DDTHH:mm:ss)"),
     fecha_fin: Optional[str] = Query(None, description="Fecha de fin (YYYY-MM-DDTHH:mm:ss)"),
     pool_id: Optional[int] = Query(None, description="ID del pool para filtrar"),
-    db: DatabaseConnector = Depends(get_db),
+    db: DatabaseConnector = Depends(get_analytics_db),
 ):
     """
     Obtiene el dashboard de análisis del balanceador.
@@ -493,7 +524,7 @@ def get_tiempos_ejecucion_dashboard(
     ),
     incluir_solo_completadas: bool = Query(True, description="Solo ejecuciones completadas"),
     meses_hacia_atras: Optional[int] = Query(None, description="Meses hacia atrás para el análisis (default: 1)"),
-    db: DatabaseConnector = Depends(get_db),
+    db: DatabaseConnector = Depends(get_analytics_db),
 ):
     """
     Obtiene el dashboard de análisis de tiempos de ejecución por robot.
@@ -551,7 +582,7 @@ def get_recent_executions(
     robot_name: Optional[str] = Query(None, description="Filtrar por nombre de robot"),
     equipo_name: Optional[str] = Query(None, description="Filtrar por nombre de equipo"),
     grouped: bool = Query(False, description="Agrupar fallos por Robot, Equipo, Estado, Mensaje y Origen"),
-    db: DatabaseConnector = Depends(get_db),
+    db: DatabaseConnector = Depends(get_analytics_db),
 ):
     """
     Obtiene un listado de ejecuciones recientes con detección inteligente de críticos.
@@ -605,7 +636,7 @@ def get_recent_executions(
 async def unlock_execution(
     request: Request,
     deployment_id: str,
-    db: DatabaseConnector = Depends(get_db),
+    db: AsyncDatabaseConnector = Depends(get_async_db),
     apigw_client: ApiGatewayClient = Depends(get_apigw_client),
 ):
     """
@@ -621,7 +652,7 @@ async def unlock_execution(
     logger.info(f"[UNLOCK] Iniciando proceso de destrabado manual para deployment: {deployment_id}")
 
     # 1. Obtener información de la ejecución desde la BD local
-    info = db_service.obtener_info_ejecucion(db, deployment_id)
+    info = await db.ejecutar(db_service.obtener_info_ejecucion, db.sync, deployment_id)
     if not info:
         logger.warning(f"[UNLOCK] No se encontró la ejecución {deployment_id} en la base de datos.")
         raise HTTPException(status_code=404, detail=f"No se encontró la ejecución {deployment_id}")
@@ -662,8 +693,12 @@ async def unlock_execution(
             f"[UNLOCK] Callback falló o no configurado para {deployment_id}. Forzando actualización manual en BD."
         )
         try:
-            db_service.mover_ejecucion_a_historico(
-                db, deployment_id, "RUN_ABORTED", "Destrabado manualmente (Fallback Web)"
+            await db.ejecutar(
+                db_service.mover_ejecucion_a_historico,
+                db.sync,
+                deployment_id,
+                "RUN_ABORTED",
+                "Destrabado manualmente (Fallback Web)",
             )
             actions_taken.append("LOCAL_DB_UPDATED_FALLBACK")
         except Exception as e:
@@ -672,8 +707,9 @@ async def unlock_execution(
     else:
         actions_taken.append("LOCAL_DB_UPDATE_SKIPPED_BY_CALLBACK")
 
-    db_service.log_audit(
-        db,
+    await db.ejecutar(
+        db_service.log_audit,
+        db.sync,
         accion="UNLOCK",
         entidad="Ejecucion",
         entidad_id=deployment_id,
@@ -694,7 +730,7 @@ def get_utilization_analysis(
     fecha_inicio: Optional[str] = Query(None, description="Fecha de inicio (YYYY-MM-DDTHH:mm:ss)"),
     fecha_fin: Optional[str] = Query(None, description="Fecha de fin (YYYY-MM-DDTHH:mm:ss)"),
     dias_hacia_atras: Optional[int] = Query(30, description="Días hacia atrás si no se especifican fechas"),
-    db: DatabaseConnector = Depends(get_db),
+    db: DatabaseConnector = Depends(get_analytics_db),
 ):
     """
     Obtiene el análisis de utilización de recursos.
@@ -716,7 +752,7 @@ def get_temporal_patterns(
     fecha_inicio: Optional[str] = Query(None, description="Fecha de inicio (YYYY-MM-DDTHH:mm:ss)"),
     fecha_fin: Optional[str] = Query(None, description="Fecha de fin (YYYY-MM-DDTHH:mm:ss)"),
     robot_id: Optional[int] = Query(None, description="ID del robot para filtrar"),
-    db: DatabaseConnector = Depends(get_db),
+    db: DatabaseConnector = Depends(get_analytics_db),
 ):
     """
     Obtiene el análisis de patrones temporales (heatmap).
@@ -738,7 +774,7 @@ def get_success_analysis(
     fecha_inicio: Optional[str] = Query(None, description="Fecha de inicio (YYYY-MM-DDTHH:mm:ss)"),
     fecha_fin: Optional[str] = Query(None, description="Fecha de fin (YYYY-MM-DDTHH:mm:ss)"),
     robot_id: Optional[int] = Query(None, description="ID del robot para filtrar"),
-    db: DatabaseConnector = Depends(get_db),
+    db: DatabaseConnector = Depends(get_analytics_db),
 ):
     """
     Obtiene el análisis de tasas de éxito y errores.
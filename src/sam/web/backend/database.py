@@ -3,11 +3,11 @@ import asyncio
 import logging
 from collections import defaultdict
 from datetime import datetime
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Union
 
 from sam.common.a360_client import AutomationAnywhereClient
 from sam.common.config_manager import ConfigManager
-from sam.common.database import DatabaseConnector
+from sam.common.database import DatabaseConnector, RowMode, materializar_filas
 from sam.common.sincronizador_comun import SincronizadorComun
 
 from .schemas import (
@@ -65,15 +65,15 @@ async def sync_robots_only(db: DatabaseConnector, aa_client: AutomationAnywhereC
     """
     logger.info("Iniciando sincronización de robots desde A360...")
     try:
-        # El cliente aa_client ya viene creado e inyectado
-        robots_api = await aa_client.obtener_robots()
-        logger.info(f"Datos recibidos de A360: {len(robots_api)} robots.")
-
-        # Mover la escritura a DB a un hilo aparte para NO bloquear el loop
-        await asyncio.to_thread(db.merge_robots, robots_api)
+        # El cliente aa_client ya viene creado e inyectado.
+        # Los robots se escriben por lotes (en el executor de BD) a medida que llegan las páginas.
+        resumen = await SincronizadorComun(db_connector=db, aa_client=aa_client).sincronizar_robots()
 
-        logger.info(f"Sincronización de robots completada. {len(robots_api)} robots procesados.")
-        return {"robots_sincronizados": len(robots_api)}
+        logger.info(
+            f"Sincronización de robots completada. {resumen['robots_sincronizados']} robots procesados "
+            f"({resumen['robots_sin_cambios']} sin cambios)."
+        )
+        return resumen
     except Exception as e:
         logger.critical(f"Error durante sincronización de robots: {type(e).__name__} - {e}", exc_info=True)
         raise
@@ -110,11 +110,14 @@ async def sync_equipos_only(db: DatabaseConnector, aa_client: AutomationAnywhere
         # Procesamiento en CPU (podría bloquear un poco, pero es rápido)
         equipos_finales = sincronizador._procesar_y_mapear_equipos(devices_api, users_api)
 
-        # DB Write en hilo aparte
-        await asyncio.to_thread(db.merge_equipos, equipos_finales)
+        # DB Write en el executor de BD (solo los equipos que cambiaron desde la última sincronización)
+        resumen = await sincronizador.persistir_equipos(equipos_finales)
 
-        logger.info(f"Sincronización de equipos completada. {len(equipos_finales)} equipos procesados.")
-        return {"equipos_sincronizados": len(equipos_finales)}
+        logger.info(
+            f"Sincronización de equipos completada. {resumen['equipos_sincronizados']} equipos procesados "
+            f"({resumen['equipos_sin_cambios']} sin cambios)."
+        )
+        return resumen
     except Exception as e:
         logger.critical(f"Error durante sincronización de equipos: {type(e).__name__} - {e}", exc_info=True)
         raise
@@ -826,17 +829,22 @@ def get_system_status(db: DatabaseConnector) -> Dict:
         return {}
 
 
-def ejecutar_sp_multiple_result_sets(db: DatabaseConnector, sp_name: str, params: Dict[str, Any]) -> List[List[Dict]]:
+def ejecutar_sp_multiple_result_sets(
+    db: DatabaseConnector, sp_name: str, params: Dict[str, Any], row_mode: Union[RowMode, str] = RowMode.DICT
+) -> List[List[Dict]]:
     """
     Ejecuta un stored procedure que retorna múltiples result sets.
-    Retorna una lista de listas, donde cada lista interna es un result set.
+    Retorna una lista de listas, donde cada lista interna es un result set
+    (con el formato de fila indicado en `row_mode`, ver `RowMode`).
 
     Nota: Los parámetros se pasan con nombres (@ParamName = ?) para mayor claridad.
     """
     import pyodbc
 
+    medicion = db.medir_consulta(f"{{CALL {sp_name}}}", params)
     try:
         with db.obtener_cursor() as cursor:
+            medicion.marcar_conexion()
             # Construir la llamada al SP con parámetros nombrados
             param_placeholders = []
             param_values = []
@@ -861,15 +869,18 @@ def ejecutar_sp_multiple_result_sets(db: DatabaseConnector, sp_name: str, params
                 sp_call = f"{{CALL {sp_name}}}"
                 cursor.execute(sp_call)
 
+            medicion.marcar_ejecucion()
+
             # Recoger todos los result sets
             result_sets = []
+            total_filas = 0
             while True:
                 try:
                     if cursor.description:
                         columns = [column[0] for column in cursor.description]
                         rows = cursor.fetchall()
-                        result_set = [dict(zip(columns, row)) for row in rows]
-                        result_sets.append(result_set)
+                        total_filas += len(rows)
+                        result_sets.append(materializar_filas(columns, rows, row_mode))
 
                     # Intentar obtener el siguiente result set
                     if not cursor.nextset():
@@ -877,9 +888,12 @@ def ejecutar_sp_multiple_result_sets(db: DatabaseConnector, sp_name: str, params
                 except (pyodbc.ProgrammingError, AttributeError):
                     # No hay más result sets o cursor no tiene nextset
                     break
+            medicion.marcar_lectura(total_filas)
 
-            return result_sets
+        medicion.registrar()
+        return result_sets
     except Exception as e:
+        medicion.registrar(error=True)
         logger.error(f"Error ejecutando SP {sp_name}: {e}", exc_info=True)
         raise
 
@@ -901,7 +915,7 @@ def get_callbacks_dashboard(
         "IncluirDetalleHorario": incluir_detalle_horario,
     }
 
-    result_sets = ejecutar_sp_multiple_result_sets(db, "dbo.Analisis_Callbacks", params)
+    result_sets = ejecutar_sp_multiple_result_sets(db, "dbo.Analisis_Callbacks", params, row_mode=RowMode.RECORD)
 
     return {
         "metricas_generales": result_sets[0][0] if result_sets and len(result_sets) > 0 and result_sets[0] else {},
@@ -928,7 +942,7 @@ def get_balanceador_dashboard(
     if pool_id:
         params["PoolId"] = pool_id
 
-    result_sets = ejecutar_sp_multiple_result_sets(db, "dbo.Analisis_Balanceador", params)
+    result_sets = ejecutar_sp_multiple_result_sets(db, "dbo.Analisis_Balanceador", params, row_mode=RowMode.RECORD)
 
     return {
         "metricas_generales": result_sets[0][0] if result_sets and len(result_sets) > 0 and result_sets[0] else {},
@@ -985,7 +999,7 @@ def get_tiempos_ejecucion_dashboard(
 
     params["DefaultRepeticiones"] = default_repeticiones
 
-    result_sets = ejecutar_sp_multiple_result_sets(db, "dbo.Analisis_TiemposEjecucion", params)
+    result_sets = ejecutar_sp_multiple_result_sets(db, "dbo.Analisis_TiemposEjecucion", params, row_mode=RowMode.RECORD)
 
     # El SP retorna un solo result set
     return result_sets[0] if result_sets and len(result_sets) > 0 else []
@@ -1052,7 +1066,9 @@ def get_recent_executions(
         # El SP retorna DOS result sets:
         # 0: Fallos
         # 1: Demoras y Huérfanas
-        result_sets = ejecutar_sp_multiple_result_sets(db, "dbo.ObtenerEjecucionesRecientes", params)
+        result_sets = ejecutar_sp_multiple_result_sets(
+            db, "dbo.ObtenerEjecucionesRecientes", params, row_mode=RowMode.RECORD
+        )
 
         fallos = result_sets[0] if result_sets and len(result_sets) > 0 else []
         demoras = result_sets[1] if result_sets and len(result_sets) > 1 else []
@@ -1130,7 +1146,9 @@ def get_utilization_analysis(
         params["FechaFin"] = fecha_fin
 
     # El SP retorna un solo result set
-    result_sets = ejecutar_sp_multiple_result_sets(db, "dbo.Analisis_UtilizacionRecursos", params)
+    result_sets = ejecutar_sp_multiple_result_sets(
+        db, "dbo.Analisis_UtilizacionRecursos", params, row_mode=RowMode.RECORD
+    )
     return result_sets[0] if result_sets and len(result_sets) > 0 else []
 
 
@@ -1153,7 +1171,9 @@ def get_temporal_patterns(
         params["RobotId"] = robot_id
 
     # El SP retorna un solo result set
-    result_sets = ejecutar_sp_multiple_result_sets(db, "dbo.Analisis_PatronesTemporales", params)
+    result_sets = ejecutar_sp_multiple_result_sets(
+        db, "dbo.Analisis_PatronesTemporales", params, row_mode=RowMode.RECORD
+    )
     return result_sets[0] if result_sets and len(result_sets) > 0 else []
 
 
@@ -1177,7 +1197,7 @@ def get_success_analysis(
         params["RobotId"] = robot_id
 
     # El SP retorna 3 result sets
-    result_sets = ejecutar_sp_multiple_result_sets(db, "dbo.Analisis_TasasExito", params)
+    result_sets = ejecutar_sp_multiple_result_sets(db, "dbo.Analisis_TasasExito", params, row_mode=RowMode.RECORD)
 
     if not result_sets or len(result_sets) < 3:
         return {
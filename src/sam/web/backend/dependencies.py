@@ -1,11 +1,11 @@
 # src/interfaz_web/dependencies.py
 from typing import Optional
 
-from fastapi import HTTPException
+from fastapi import Depends, HTTPException
 
 from sam.common.a360_client import AutomationAnywhereClient
 from sam.common.apigw_client import ApiGatewayClient
-from sam.common.database import DatabaseConnector
+from sam.common.database import POOL_ANALYTICS, AsyncDatabaseConnector, DatabaseConnector
 
 
 # --- Proveedor de BD ---
@@ -34,6 +34,16 @@ db_dependency_provider = DBDependencyProvider()
 get_db = db_dependency_provider.get_db_connector
 
 
+def get_async_db(db: DatabaseConnector = Depends(get_db)) -> AsyncDatabaseConnector:
+    """Fachada asíncrona sobre el conector inyectado, para endpoints `async def`."""
+    return AsyncDatabaseConnector.para(db)
+
+
+def get_analytics_db(db: DatabaseConnector = Depends(get_db)) -> DatabaseConnector:
+    """Pool de análisis: los dashboards pesados no compiten por conexiones con el CRUD."""
+    return db.pool(POOL_ANALYTICS)
+
+
 # --- Proveedor de Cliente A360 ---
 class AAClientDependencyProvider:
     def __init__(self):
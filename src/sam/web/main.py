@@ -14,7 +14,7 @@ from reactpy.backend.fastapi import Options, configure
 from starlette.staticfiles import StaticFiles
 
 from sam import __version__
-from sam.common.database import DatabaseConnector
+from sam.common.database import AsyncDatabaseConnector, DatabaseConnector
 
 from .backend.api import router as api_router
 from .backend.dependencies import aa_client_provider, db_dependency_provider
@@ -50,7 +50,9 @@ async def lifespan(app: FastAPI):
 
     try:
         logger.info("Cerrando pool de conexiones de base de datos...")
-        db_dependency_provider.get_db_connector().cerrar_conexiones_pool()
+        db_connector = db_dependency_provider.get_db_connector()
+        AsyncDatabaseConnector.para(db_connector).cerrar()
+        db_connector.cerrar_conexiones_pool()
         logger.info("Pool de conexiones de BD cerrado.")
     except Exception as e:
         logger.error(f"Error al cerrar el pool de conexiones: {e}", exc_info=True)
@@ -104,6 +104,15 @@ def _setup_dependencies() -> Dict[str, Any]:
         cr_api_key=aa_config.get("cr_api_key"),
         cr_api_timeout=aa_config.get("api_timeout_seconds", 60),
         callback_url_deploy=aa_config.get("callback_url_deploy"),
+        default_page_size=aa_config.get("default_page_size"),
+        max_pagination_pages=aa_config.get("max_pagination_pages"),
+        pagination_concurrency=aa_config.get("pagination_concurrency"),
+        token_refresh_buffer_sec=aa_config.get("token_refresh_buffer_sec"),
+        token_cache_path=aa_config.get("token_cache_path"),
+        adaptive_concurrency_max=aa_config.get("adaptive_concurrency_max"),
+        latency_tolerance=aa_config.get("latency_tolerance"),
+        retry_budget_ratio=aa_config.get("retry_budget_ratio"),
+        list_cache_ttl=aa_config.get("list_cache_ttl"),
     )
 
     # 3. Inyectamos la dependencia en el proveedor global
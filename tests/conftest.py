@@ -1,9 +1,15 @@
-from unittest.mock import MagicMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
 
+from sam.common.a360_client import AutomationAnywhereClient
+from sam.common.apigw_client import ApiGatewayClient
+
 # Esta importación es necesaria para que la fixture de configuración funcione.
 from sam.common.config_loader import ConfigLoader
+from sam.common.database import DatabaseConnector
+from sam.common.mail_client import EmailAlertClient
+from sam.lanzador.service.desplegador import Desplegador
 
 
 @pytest.fixture(scope="session", autouse=True)
@@ -50,3 +56,72 @@ def mock_db_connector():
     connector.fetch_one = MagicMock(return_value=None)
     connector.execute = MagicMock(return_value=None)
     return connector
+
+
+class RelojFalso:
+    """Reemplazo de `time.monotonic` que solo avanza cuando el test incrementa `ahora`."""
+
+    def __init__(self):
+        self.ahora = 1000.0
+
+    def __call__(self):
+        return self.ahora
+
+
+@pytest.fixture
+def reloj_en(monkeypatch):
+    """
+    Instala un `RelojFalso` como `time.monotonic` del módulo indicado (p. ej.
+    "sam.lanzador.service.salud_equipos") durante el test y lo devuelve.
+    """
+
+    def instalar(modulo: str) -> RelojFalso:
+        reloj = RelojFalso()
+        monkeypatch.setattr(f"{modulo}.time.monotonic", reloj)
+        return reloj
+
+    return instalar
+
+
+@pytest.fixture
+def mock_db_lanzador():
+    """
+    Mock del DatabaseConnector con su interfaz real (spec), sin robots ejecutables ni ejecuciones.
+    """
+    connector = MagicMock(spec=DatabaseConnector)
+    connector.ejecutar_consulta = MagicMock(return_value=[])
+    connector.obtener_robots_ejecutables = MagicMock(return_value=[])
+    return connector
+
+
+@pytest.fixture
+def crear_desplegador(mock_db_lanzador):
+    """
+    Fábrica de Desplegador con clientes simulados sobre `mock_db_lanzador`.
+
+    `cfg_lanzador` se combina con la configuración mínima (una repetición, 3 workers, sin pausa),
+    `desplegar` es el side_effect de `desplegar_bot_v4` y el resto de los argumentos (p. ej.
+    `registro_ejecuciones` o `salud_equipos`) se pasan tal cual al Desplegador.
+    """
+
+    def crear(cfg_lanzador=None, desplegar=None, db_connector=None, **kwargs):
+        api_gateway_client = AsyncMock(spec=ApiGatewayClient)
+        api_gateway_client.get_auth_header = AsyncMock(return_value={"Authorization": "Bearer test-token"})
+        aa_client = AsyncMock(spec=AutomationAnywhereClient)
+        aa_client.desplegar_bot_v4.side_effect = desplegar
+        return Desplegador(
+            db_connector=db_connector or mock_db_lanzador,
+            aa_client=aa_client,
+            api_gateway_client=api_gateway_client,
+            notificador=MagicMock(spec=EmailAlertClient),
+            cfg_lanzador={
+                "repeticiones": 1,
+                "max_workers_lanzador": 3,
+                "pausa_lanzamiento": (None, None),
+                **(cfg_lanzador or {}),
+            },
+            callback_token="test-callback-token",
+            **kwargs,
+        )
+
+    return crear
@@ -0,0 +1,100 @@
+"""
+Tests del aviso de equipos liberados del Callback al Lanzador.
+"""
+
+import asyncio
+import time
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from sam.common.aviso_lanzador import EmisorAvisos, ReceptorAvisos
+from sam.common.mail_client import EmailAlertClient
+from sam.lanzador.service.main import LanzadorService
+
+
+@pytest.fixture
+def desplegador(crear_desplegador):
+    return crear_desplegador(desplegar=lambda file_id, user_ids, **kwargs: {"deploymentId": f"dep-{user_ids[0]}"})
+
+
+async def test_emisor_y_receptor_por_udp_local():
+    receptor = ReceptorAvisos()
+    await receptor.iniciar("127.0.0.1", 0)
+    puerto = receptor._transporte.get_extra_info("sockname")[1]
+    emisor = EmisorAvisos("127.0.0.1", puerto)
+    try:
+        emisor.avisar("dep-1", "7")
+        assert await receptor.esperar(1)
+        ((deployment_id, user_id, instante),) = receptor.tomar()
+        assert (deployment_id, user_id) == ("dep-1", "7")
+        assert abs(time.time() - instante) < 5
+        assert not receptor.hay_avisos()
+    finally:
+        emisor.cerrar()
+        receptor.cerrar()
+
+
+def test_aviso_invalido_se_ignora():
+    receptor = ReceptorAvisos()
+    receptor.datagram_received(b"no es json", ("127.0.0.1", 1))
+    receptor.datagram_received(b'{"userId": "7"}', ("127.0.0.1", 1))
+    assert receptor.tomar() == [] and receptor.recibidos == 0
+
+
+class TestDesplegarEquiposLiberados:
+    async def test_solo_relanza_en_los_equipos_liberados(self, desplegador, mock_db_lanzador):
+        # dep-grupo se desplegó agrupado en los equipos 10 y 11; solo terminó la ejecución del usuario 20.
+        mock_db_lanzador.ejecutar_consulta.side_effect = lambda query, params, **kwargs: (
+            [
+                {"DeploymentId": "dep-grupo", "UserId": 20, "EquipoId": 10},
+                {"DeploymentId": "dep-grupo", "UserId": 21, "EquipoId": 11},
+            ]
+            if "WHERE DeploymentId IN" in query
+            else []
+        )
+        mock_db_lanzador.obtener_robots_ejecutables.return_value = [
+            {"RobotId": 1, "EquipoId": 10, "UserId": 20},
+            {"RobotId": 2, "EquipoId": 11, "UserId": 21},
+            {"RobotId": 3, "EquipoId": 12, "UserId": 22},
+        ]
+
+        resultados = await desplegador.desplegar_equipos_liberados([("dep-grupo", "20", time.time() - 1)])
+
+        assert [(r["equipo_id"], r["status"]) for r in resultados] == [(10, "exitoso")]
+        estadisticas = desplegador.obtener_estadisticas_avisos()
+        assert (estadisticas["avisos"], estadisticas["equipos_liberados"], estadisticas["relanzados"]) == (1, 1, 1)
+        assert estadisticas["espera_relanzamiento_seg"]["p50"] >= 1
+
+    async def test_aviso_de_ejecucion_desconocida_no_lanza_ciclo(self, desplegador, mock_db_lanzador):
+        assert await desplegador.desplegar_equipos_liberados([("dep-x", None, time.time())]) == []
+        mock_db_lanzador.obtener_robots_ejecutables.assert_not_called()
+
+
+class TestCicloConAvisos:
+    async def test_aviso_lanza_ciclo_restringido_antes_del_intervalo(self):
+        desplegador = MagicMock()
+        desplegador.desplegar_robots_pendientes = AsyncMock(return_value=[])
+        desplegador.desplegar_equipos_liberados = AsyncMock(return_value=[])
+        receptor = ReceptorAvisos()
+        servicio = LanzadorService(
+            MagicMock(),
+            desplegador,
+            MagicMock(),
+            MagicMock(spec=EmailAlertClient),
+            {"intervalo_lanzamiento": 60, "intervalo_sincronizacion": 60, "intervalo_conciliacion": 60},
+            sync_enabled=False,
+            receptor_avisos=receptor,
+            debounce_avisos_seg=0.05,
+        )
+        ciclo = asyncio.create_task(servicio._run_launcher_cycle(60))
+        await asyncio.sleep(0.01)
+        receptor.datagram_received(b'{"deploymentId": "dep-1", "userId": "7", "ts": 1}', ("127.0.0.1", 1))
+        receptor.datagram_received(b'{"deploymentId": "dep-2", "userId": null, "ts": 2}', ("127.0.0.1", 1))
+        await asyncio.sleep(0.2)
+        servicio.stop()
+        await asyncio.wait_for(ciclo, 1)
+
+        # Un ciclo completo al arrancar y uno solo (con ambos avisos juntos) por los equipos liberados.
+        desplegador.desplegar_robots_pendientes.assert_awaited_once_with()
+        desplegador.desplegar_equipos_liberados.assert_awaited_once_with([("dep-1", "7", 1.0), ("dep-2", None, 2.0)])
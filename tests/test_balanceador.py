@@ -34,11 +34,13 @@ class TestAlgoritmoBalanceo:
 
         algoritmo.ejecutar_balanceo_interno_de_pool(pool_id=1, estado_global=estado_global)
 
-        mock_db_connector.ejecutar_consulta.assert_called()
+        # La asignación y su histórico se envían juntos en una unidad de trabajo
+        uow = mock_db_connector.unit_of_work.return_value.__enter__.return_value
+        uow.agregar.assert_called()
 
-        # Buscar la llamada de asignación entre todas las llamadas a la BD
+        # Buscar la sentencia de asignación entre las agregadas a la unidad de trabajo
         found = False
-        for call in mock_db_connector.ejecutar_consulta.call_args_list:
+        for call in uow.agregar.call_args_list:
             args, _ = call
             if "INSERT INTO dbo.Asignaciones" in args[0]:
                 assert args[1][0] == 1
@@ -46,6 +48,7 @@ class TestAlgoritmoBalanceo:
                 found = True
                 break
         assert found, "No se encontró la consulta INSERT INTO dbo.Asignaciones"
+        assert any("INSERT INTO dbo.HistoricoBalanceo" in c.args[0] for c in uow.agregar.call_args_list)
 
     def test_desasignar_equipos_excedentes(self, mock_db_connector: MagicMock, mock_notificador: MagicMock):
         """Verifica que se desasigna un equipo de un robot sin carga de trabajo."""
@@ -62,11 +65,12 @@ class TestAlgoritmoBalanceo:
 
         algoritmo.ejecutar_limpieza_global(estado_global=estado_global)
 
-        mock_db_connector.ejecutar_consulta.assert_called()
+        uow = mock_db_connector.unit_of_work.return_value.__enter__.return_value
+        uow.agregar.assert_called()
 
-        # Buscar la llamada de desasignación entre todas las llamadas a la BD
+        # Buscar la sentencia de desasignación entre las agregadas a la unidad de trabajo
         found = False
-        for call in mock_db_connector.ejecutar_consulta.call_args_list:
+        for call in uow.agregar.call_args_list:
             args, _ = call
             if "DELETE FROM dbo.Asignaciones" in args[0]:
                 assert args[1][0] == 2
@@ -1,17 +1,26 @@
 """Tests para el servicio Callback, adaptados para la arquitectura lifespan."""
 
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+
 import pytest
 from fastapi.testclient import TestClient
 
-from sam.callback.service.main import CallbackPayload, app, get_db
+from sam.callback.service.callbacks_pendientes import CallbacksPendientes
+from sam.callback.service.main import CallbackPayload, _auto_recuperar, app, app_state, get_db
+from sam.common.config_manager import ConfigManager
 from sam.common.database import UpdateStatus
 
 
 @pytest.fixture
-def client(mock_db_connector):
-    """Cliente de prueba de FastAPI que sobrescribe la dependencia de la base de datos."""
+def client(mock_db_connector, tmp_path):
+    """
+    Cliente de prueba de FastAPI que sobrescribe la dependencia de la base de datos. Los logs van a
+    `tmp_path` y el volcado periódico de métricas de BD queda desactivado.
+    """
     app.dependency_overrides[get_db] = lambda: mock_db_connector
-    with TestClient(app) as test_client:
+    config_log = {**ConfigManager.get_log_config(), "directory": str(tmp_path), "db_metrics_interval": 0}
+    with patch.object(ConfigManager, "get_log_config", return_value=config_log), TestClient(app) as test_client:
         yield test_client
     app.dependency_overrides.clear()
 
@@ -53,4 +62,112 @@ class TestCallbackEndpoints:
             deployment_id="test-123",
             estado_callback="COMPLETED",
             callback_payload_str=expected_payload_str,
+            user_id=None,
         )
+
+    def test_callback_actualizado_avisa_al_lanzador(self, client: TestClient, mock_db_connector):
+        emisor = MagicMock()
+        headers = {"X-Authorization": "test_token_123"}
+        with patch.dict(app_state, {"emisor_avisos": emisor}):
+            mock_db_connector.actualizar_ejecucion_desde_callback.return_value = UpdateStatus.UPDATED
+            client.post(
+                "/api/callback", json={"deploymentId": "dep-1", "status": "COMPLETED", "userId": "7"}, headers=headers
+            )
+            mock_db_connector.actualizar_ejecucion_desde_callback.return_value = UpdateStatus.ALREADY_PROCESSED
+            client.post("/api/callback", json={"deploymentId": "dep-2", "status": "COMPLETED"}, headers=headers)
+
+        emisor.avisar.assert_called_once_with("dep-1", "7")
+
+    def test_callback_sin_ejecucion_registrada_queda_en_espera(self, client: TestClient, mock_db_connector):
+        pendientes = MagicMock(spec=CallbacksPendientes)
+        headers = {"X-Authorization": "test_token_123"}
+        mock_db_connector.actualizar_ejecucion_desde_callback.return_value = UpdateStatus.NOT_FOUND
+        with patch.dict(app_state, {"callbacks_pendientes": pendientes}):
+            pendientes.guardar.return_value = True
+            aceptado = client.post(
+                "/api/callback", json={"deploymentId": "dep-1", "status": "COMPLETED"}, headers=headers
+            )
+            pendientes.guardar.return_value = False
+            sin_lugar = client.post(
+                "/api/callback", json={"deploymentId": "dep-2", "status": "COMPLETED"}, headers=headers
+            )
+
+        assert aceptado.status_code == 202
+        assert pendientes.guardar.call_args_list[0].args[0].deployment_id == "dep-1"
+        assert sin_lugar.status_code == 503  # A360 lo reenvía
+
+
+class TestCallbacksPendientes:
+    async def test_callback_antes_del_vaciado_se_aplica_al_registrarse(self):
+        """El callback llega mientras la fila sigue en el buffer del registro diferido del Lanzador."""
+        registradas = set()
+        avisos = []
+
+        async def aplicar(payload):
+            return UpdateStatus.UPDATED if payload.deployment_id in registradas else UpdateStatus.NOT_FOUND
+
+        pendientes = CallbacksPendientes(aplicar, avisos.append, reintento_seg=0.01)
+        payload = CallbackPayload(deploymentId="dep-1", status="COMPLETED", userId="7")
+        assert pendientes.guardar(payload)
+        await asyncio.sleep(0.05)
+        assert avisos == [] and pendientes.estadisticas()["pendientes"] == 1
+
+        registradas.add("dep-1")  # El Lanzador vació su buffer
+        await asyncio.sleep(0.05)
+
+        assert avisos == [payload]
+        assert pendientes.estadisticas()["aplicados"] == 1 and pendientes.estadisticas()["pendientes"] == 0
+        await pendientes.cerrar()
+
+    async def test_vence_y_respeta_el_maximo(self):
+        async def aplicar(payload):
+            return UpdateStatus.NOT_FOUND
+
+        pendientes = CallbacksPendientes(aplicar, reintento_seg=10, ttl_seg=0, max_pendientes=1)
+        assert pendientes.guardar(CallbackPayload(deploymentId="dep-1", status="COMPLETED"))
+        assert not pendientes.guardar(CallbackPayload(deploymentId="dep-2", status="COMPLETED"))
+
+        await pendientes.reintentar()
+
+        assert pendientes.estadisticas() == {
+            "guardados": 1,
+            "aplicados": 0,
+            "ya_procesados": 0,
+            "vencidos": 1,
+            "rechazados": 1,
+            "pendientes": 0,
+        }
+        await pendientes.cerrar()
+
+    async def test_fila_que_nunca_aparece_pasa_a_la_auto_recuperacion(self):
+        """El INSERT del despliegue falló o el registro diferido descartó la fila: el callback no se pierde."""
+
+        async def aplicar(payload):
+            return UpdateStatus.NOT_FOUND
+
+        aa_client = AsyncMock()
+        aa_client.obtener_detalles_por_deployment_ids.return_value = [{"fileId": 5, "runAsUserIds": [7]}]
+        with patch("sam.callback.service.main.AutomationAnywhereClient", return_value=aa_client):
+            pendientes = CallbacksPendientes(aplicar, al_vencer=_auto_recuperar, reintento_seg=0.01, ttl_seg=0.02)
+            assert pendientes.guardar(CallbackPayload(deploymentId="dep-1", status="COMPLETED"))
+            await asyncio.sleep(0.1)
+
+            aa_client.obtener_detalles_por_deployment_ids.assert_awaited_once_with(["dep-1"])
+            assert pendientes.estadisticas()["vencidos"] == 1 and pendientes.estadisticas()["pendientes"] == 0
+
+            # Los que siguen en espera al detener el Callback también pasan a la auto-recuperación
+            assert pendientes.guardar(CallbackPayload(deploymentId="dep-2", status="COMPLETED"))
+            await pendientes.cerrar()
+
+        assert aa_client.obtener_detalles_por_deployment_ids.await_args.args == (["dep-2"],)
+
+
+class TestAutoRecuperacion:
+    async def test_auto_recuperacion_cierra_el_cliente_si_a360_falla(self):
+        aa_client = AsyncMock()
+        aa_client.obtener_detalles_por_deployment_ids.side_effect = RuntimeError("A360 caído")
+        with patch("sam.callback.service.main.AutomationAnywhereClient", return_value=aa_client):
+            mensaje = await _auto_recuperar(CallbackPayload(deploymentId="dep-1", status="COMPLETED"))
+
+        assert mensaje == "Error durante intento de auto-recuperación."
+        aa_client.close.assert_awaited_once()
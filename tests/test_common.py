@@ -1,13 +1,36 @@
 """Tests para los módulos de `common`."""
 
+import asyncio
+import json
+import logging
+import threading
+import time
 from unittest.mock import AsyncMock, MagicMock, patch
 
 import httpx
+import pyodbc
 import pytest
+from scripts.control_room_falso import ConfigControlRoomFalso, DistribucionLatencia, crear_app
 
 from sam.common.a360_client import AutomationAnywhereClient
 from sam.common.config_loader import ConfigLoader
 from sam.common.config_manager import ConfigManager
+from sam.common.control_concurrencia import LimitadorAdaptativo, PresupuestoReintentos
+from sam.common.database import (
+    POOL_ANALYTICS,
+    POOL_OLTP,
+    AsyncDatabaseConnector,
+    DatabaseConnector,
+    PoolSaturadoError,
+    RowMode,
+    UpdateStatus,
+    clase_registro,
+    materializar_filas,
+)
+from sam.common.indice_sincronizacion import IndiceSincronizacion
+from sam.common.metricas_db import METRICAS_DB, MetricasConsultas, normalizar_sentencia
+from sam.common.sincronizador_comun import SincronizadorComun
+from sam.common.token_cache import CacheTokenArchivo
 
 
 class TestConfigLoading:
@@ -58,3 +81,1062 @@ class TestAutomationAnywhereClient:
             assert robots is not None
             assert mock_async_client.post.call_count == 1
             assert mock_async_client.request.call_count == 2
+
+
+class _ControlRoomListadoFalso:
+    """Endpoint de listado falso con latencia: registra offsets pedidos y la concurrencia máxima."""
+
+    def __init__(self, cantidad: int, informar_total: bool = True, latencia: float = 0.01):
+        self.entidades = [{"id": i} for i in range(cantidad)]
+        self.informar_total = informar_total
+        self.latencia = latencia
+        self.offsets = []
+        self.en_curso = 0
+        self.max_en_curso = 0
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        page = json.loads(request.content)["page"]
+        self.offsets.append(page["offset"])
+        self.en_curso += 1
+        self.max_en_curso = max(self.max_en_curso, self.en_curso)
+        await asyncio.sleep(self.latencia)
+        self.en_curso -= 1
+        cuerpo = {"list": self.entidades[page["offset"] : page["offset"] + page["length"]]}
+        if self.informar_total:
+            cuerpo["page"] = {"offset": page["offset"], "total": 99999, "totalFilter": len(self.entidades)}
+        return httpx.Response(200, json=cuerpo)
+
+
+def _cliente_a360(control_room, token="token", **kwargs) -> AutomationAnywhereClient:
+    """Cliente A360 cuyas peticiones atiende `control_room` (httpx.MockTransport). Con `token=None` se autentica."""
+    aa_client = AutomationAnywhereClient(cr_url="https://fake-cr.com", cr_user="test", cr_api_key="k", **kwargs)
+    aa_client._client = httpx.AsyncClient(base_url="https://fake-cr.com", transport=httpx.MockTransport(control_room))
+    aa_client._token = token
+    return aa_client
+
+
+@pytest.mark.asyncio
+class TestPaginacionA360:
+    async def test_paginas_en_paralelo_cuando_se_informa_el_total(self):
+        control_room = _ControlRoomListadoFalso(1050)
+        aa_client = _cliente_a360(control_room, pagination_concurrency=3)
+
+        devices = await aa_client.obtener_devices()
+
+        assert [d["id"] for d in devices] == list(range(1050))
+        assert sorted(control_room.offsets) == list(range(0, 1100, 100))
+        assert control_room.max_en_curso == 3
+
+    async def test_sin_total_pagina_en_serie(self):
+        control_room = _ControlRoomListadoFalso(250, informar_total=False)
+        aa_client = _cliente_a360(control_room, default_page_size=50)
+        payload = {"filter": {"operator": "eq", "field": "status", "value": "CONNECTED"}}
+
+        entidades = await aa_client._obtener_lista_paginada_entidades("/v2/devices/list", payload)
+
+        assert len(entidades) == 250
+        assert control_room.offsets == [0, 50, 100, 150, 200, 250]
+        assert control_room.max_en_curso == 1
+        assert "page" not in payload
+
+    async def test_respeta_el_maximo_de_paginas(self):
+        control_room = _ControlRoomListadoFalso(1000, informar_total=False)
+        aa_client = _cliente_a360(control_room, max_pagination_pages=3)
+
+        assert len(await aa_client.obtener_usuarios_detallados()) == 300
+
+
+class _ControlRoomActividadFalso:
+    """`/v3/activity/list` falso que da timeout cuando el filtro tiene más de `max_ids` deploymentIds."""
+
+    def __init__(self, max_ids: int):
+        self.max_ids = max_ids
+        self.tamanos = []
+        self.en_curso = 0
+        self.max_en_curso = 0
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        ids = [op["value"] for op in json.loads(request.content)["filter"]["operands"]]
+        self.tamanos.append(len(ids))
+        self.en_curso += 1
+        self.max_en_curso = max(self.max_en_curso, self.en_curso)
+        try:
+            await asyncio.sleep(0.005)
+            if len(ids) > self.max_ids:
+                raise httpx.ReadTimeout("timeout", request=request)
+            return httpx.Response(200, json={"list": [{"deploymentId": i, "status": "COMPLETED"} for i in ids]})
+        finally:
+            self.en_curso -= 1
+
+
+@pytest.mark.asyncio
+class TestDetallesPorDeploymentIds:
+    async def test_backlog_se_resuelve_en_un_ciclo_partiendo_lotes_con_timeout(self):
+        control_room = _ControlRoomActividadFalso(max_ids=20)
+        aa_client = _cliente_a360(control_room, conciliador_batch_size=50, conciliador_concurrency=4, cr_api_timeout=60)
+        ids = [f"dep-{i}" for i in range(2000)]
+
+        detalles = await aa_client.obtener_detalles_por_deployment_ids(ids)
+
+        assert sorted(d["deploymentId"] for d in detalles) == sorted(ids)
+        assert control_room.max_en_curso <= 4
+        # El tamaño de lote se adaptó por debajo del límite del servidor...
+        assert aa_client._lote_detalles <= 20
+        # y el menor tamaño con timeout funciona como techo, así que casi no se vuelven a pedir lotes que fallan.
+        assert sum(1 for t in control_room.tamanos if t > 20) <= 20
+
+    async def test_lotes_rapidos_aumentan_el_tamano_hasta_el_maximo(self):
+        control_room = _ControlRoomActividadFalso(max_ids=1000)
+        aa_client = _cliente_a360(
+            control_room, conciliador_batch_size=10, conciliador_batch_size_max=40, cr_api_timeout=60
+        )
+
+        await aa_client.obtener_detalles_por_deployment_ids([f"dep-{i}" for i in range(2000)])
+
+        assert aa_client._lote_detalles == 40
+        assert max(control_room.tamanos) == 40
+
+
+class _ControlRoomAuthFalso:
+    """Control Room falso: `/v2/authentication` emite tokens numerados y el resto de endpoints exige el último."""
+
+    def __init__(self, latencia_auth: float = 0.0):
+        self.latencia_auth = latencia_auth
+        self.autenticaciones = 0
+        self.rechazos = 0
+
+    @property
+    def token_vigente(self) -> str:
+        return f"token-{self.autenticaciones}"
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        if request.url.path == "/v2/authentication":
+            await asyncio.sleep(self.latencia_auth)
+            self.autenticaciones += 1
+            return httpx.Response(200, json={"token": self.token_vigente})
+        if request.headers.get("X-Authorization") != self.token_vigente:
+            self.rechazos += 1
+            return httpx.Response(401)
+        return httpx.Response(200, json={"list": []})
+
+
+@pytest.mark.asyncio
+class TestTokenA360:
+    async def test_renueva_el_token_vencido_antes_de_la_peticion(self):
+        control_room = _ControlRoomAuthFalso()
+        aa_client = _cliente_a360(control_room, token=None, token_refresh_buffer_sec=600)
+
+        await aa_client.obtener_devices()
+        aa_client._token_obtenido_en -= 601
+        await aa_client.obtener_devices()
+        await aa_client.close()
+
+        assert control_room.autenticaciones == 2
+        assert control_room.rechazos == 0
+
+    async def test_renueva_el_token_en_segundo_plano(self):
+        control_room = _ControlRoomAuthFalso()
+        aa_client = _cliente_a360(control_room, token=None, token_refresh_buffer_sec=1)
+
+        await aa_client.obtener_devices()
+        await asyncio.sleep(1.3)
+
+        assert control_room.autenticaciones == 2
+        assert aa_client._token == "token-2"
+        await aa_client.obtener_devices()
+        await aa_client.close()
+        assert control_room.rechazos == 0
+        assert aa_client._tarea_refresco_token.cancelled()
+
+    async def test_procesos_comparten_el_token_por_archivo(self, tmp_path):
+        control_room = _ControlRoomAuthFalso(latencia_auth=0.05)
+        ruta = str(tmp_path / "aa_tokens.json")
+        clientes = [_cliente_a360(control_room, token=None, token_cache_path=ruta) for _ in range(3)]
+
+        await asyncio.gather(*(c.obtener_devices() for c in clientes))
+
+        assert control_room.autenticaciones == 1
+        assert {c._token for c in clientes} == {"token-1"}
+        for c in clientes:
+            await c.close()
+
+    async def test_token_rechazado_en_cache_no_se_reutiliza(self, tmp_path):
+        control_room = _ControlRoomAuthFalso()
+        ruta = str(tmp_path / "aa_tokens.json")
+        aa_client = _cliente_a360(control_room, token=None, token_cache_path=ruta)
+        await aa_client.obtener_devices()
+
+        # Otro proceso se autentica con el mismo usuario e invalida el token del primero
+        control_room.autenticaciones += 1
+        await aa_client.obtener_devices()
+        await aa_client.close()
+
+        assert control_room.rechazos == 1
+        assert aa_client._token == "token-3"
+        assert CacheTokenArchivo(ruta).leer(aa_client._clave_cache_token)[0] == "token-3"
+
+
+class _ControlRoomDeployFalso:
+    """`/v4/automations/deploy` falso que responde 503 cuando hay más de `capacidad` deploys en curso."""
+
+    def __init__(self, capacidad: int):
+        self.capacidad = capacidad
+        self.en_curso = 0
+        self.max_en_curso = 0
+        self.rechazos = 0
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.en_curso += 1
+        self.max_en_curso = max(self.max_en_curso, self.en_curso)
+        try:
+            await asyncio.sleep(0.01)
+            if self.en_curso > self.capacidad:
+                self.rechazos += 1
+                return httpx.Response(503)
+            return httpx.Response(200, json={"deploymentId": "dep"})
+        finally:
+            self.en_curso -= 1
+
+
+@pytest.mark.asyncio
+class TestControlConcurrencia:
+    async def test_aimd_crece_con_exitos_y_se_reduce_ante_sobrecarga(self):
+        limitador = LimitadorAdaptativo("deploy", limite_max=20, limite_inicial=4)
+        for _ in range(5):
+            limitador.registrar_exito(0.1)
+        assert int(limitador.limite) == 5
+
+        limitador.registrar_sobrecarga()
+        limitador.registrar_sobrecarga()  # misma ventana: no vuelve a reducir
+        assert int(limitador.limite) == 2
+        assert limitador.metricas()["sobrecargas"] == 2
+        assert limitador.metricas()["reducciones"] == 1
+
+    async def test_rafaga_de_sobrecargas_reduce_una_sola_vez(self, reloj_en):
+        reloj = reloj_en("sam.common.control_concurrencia")
+        limitador = LimitadorAdaptativo("deploy", limite_max=32, limite_inicial=32)
+        limitador.registrar_exito(0.05, reloj.ahora - 0.05)
+        # 32 peticiones en curso reciben 503 a lo largo de 400 ms, 8 veces la latencia base
+        inicio_rafaga = reloj.ahora
+        for _ in range(32):
+            reloj.ahora += 0.4 / 32
+            limitador.registrar_sobrecarga("HTTP 503", inicio_rafaga)
+        assert int(limitador.limite) == 16
+        assert limitador.metricas()["reducciones"] == 1
+
+        # Una petición enviada con el límite ya reducido sí vuelve a reducirlo
+        inicio = reloj.ahora
+        reloj.ahora += 0.4
+        limitador.registrar_sobrecarga("HTTP 503", inicio)
+        assert int(limitador.limite) == 8
+
+    async def test_latencia_alta_reduce_el_limite(self):
+        limitador = LimitadorAdaptativo("activity", limite_max=10, limite_inicial=10, tolerancia_latencia=3.0)
+        limitador.registrar_exito(0.1)
+        limitador.registrar_exito(0.5)
+        assert int(limitador.limite) == 9
+        assert limitador.metricas()["latencias_altas"] == 1
+
+    async def test_presupuesto_de_reintentos(self):
+        presupuesto = PresupuestoReintentos(ratio=0.5, reserva=2)
+        assert presupuesto.retirar() and presupuesto.retirar()
+        assert not presupuesto.retirar()
+        presupuesto.depositar()
+        presupuesto.depositar()
+        assert presupuesto.retirar()
+        assert presupuesto.metricas()["denegados"] == 1
+
+    async def test_deploys_se_adaptan_a_la_capacidad_del_control_room(self):
+        control_room = _ControlRoomDeployFalso(capacidad=4)
+        aa_client = _cliente_a360(control_room, adaptive_concurrency_max={"deploy": 16})
+
+        with patch("sam.common.a360_client.espera_con_jitter", return_value=0.01):
+            resultados = await asyncio.gather(
+                *(aa_client.desplegar_bot_v4(1, [i]) for i in range(60)), return_exceptions=True
+            )
+
+        metricas = aa_client.obtener_metricas_concurrencia()
+        assert metricas["familias"]["deploy"]["limite"] <= 8
+        assert metricas["familias"]["deploy"]["sobrecargas"] == control_room.rechazos
+        # Los reintentos quedan acotados por el presupuesto compartido (reserva + ratio por petición).
+        assert metricas["presupuesto_reintentos"]["reintentos"] <= 10 + 0.2 * 60
+        assert sum(1 for r in resultados if isinstance(r, dict)) >= 50
+
+
+class _ControlRoomEntidadesFalso:
+    """Control Room con robots (files), usuarios y devices sintéticos; registra el orden de los eventos."""
+
+    def __init__(self, robots: int, usuarios: int, devices: int, latencia: float = 0.005):
+        licencias = [["RUNTIME"], ["ATTENDEDRUNTIME", "RUNTIME"], ["DEVELOPMENT"], []]
+        self.latencia = latencia
+        self.eventos = []
+        self.listas = {
+            "/v2/repository/workspaces/public/files/list": [
+                {"id": i, "name": f"P{i % 7}{i}_Robot" if i % 5 else f"loop_{i}", "description": f"d{i}"}
+                for i in range(robots)
+            ],
+            "/v2/usermanagement/users/list": [
+                {"id": i, "username": f"u{i}", "licenseFeatures": licencias[i % 4], "email": "x" * 200}
+                for i in range(usuarios)
+            ],
+            "/v2/devices/list": [
+                {
+                    "id": 10_000 + i,
+                    "hostName": f"HOST{i}",
+                    "status": "CONNECTED",
+                    "defaultUsers": [{"id": (i * 3) % usuarios, "username": "-"}, {"id": (i * 7) % usuarios}],
+                }
+                for i in range(devices)
+            ],
+        }
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        page = json.loads(request.content)["page"]
+        await asyncio.sleep(self.latencia)
+        self.eventos.append(request.url.path)
+        entidades = self.listas[request.url.path]
+        cuerpo = {
+            "list": entidades[page["offset"] : page["offset"] + page["length"]],
+            "page": {"offset": page["offset"], "total": len(entidades), "totalFilter": len(entidades)},
+        }
+        return httpx.Response(200, json=cuerpo)
+
+
+@pytest.mark.asyncio
+class TestSincronizacionStreaming:
+    async def test_mismo_resultado_que_la_sincronizacion_completa(self, mock_db_connector):
+        control_room = _ControlRoomEntidadesFalso(robots=4000, usuarios=2500, devices=3000)
+        aa_client = _cliente_a360(control_room)
+        lotes_robots, lotes_equipos = [], []
+
+        def _merge_robots(lote):
+            control_room.eventos.append("MergeRobots")
+            lotes_robots.append(list(lote))
+            return len(lote)
+
+        mock_db_connector.merge_robots.side_effect = _merge_robots
+        mock_db_connector.merge_equipos.side_effect = lambda lote: lotes_equipos.append(list(lote))
+        sincronizador = SincronizadorComun(mock_db_connector, aa_client, tamano_lote_tvp=500)
+
+        resumen = await sincronizador.sincronizar_entidades()
+
+        esperado_robots = await aa_client.obtener_robots()
+        esperado_equipos = sincronizador._procesar_y_mapear_equipos(
+            await aa_client.obtener_devices(), await aa_client.obtener_usuarios_detallados()
+        )
+        assert [r for lote in lotes_robots for r in lote] == esperado_robots
+        assert [e for lote in lotes_equipos for e in lote] == esperado_equipos
+        assert resumen == {
+            "robots_sincronizados": len(esperado_robots),
+            "robots_sin_cambios": 0,
+            "equipos_sincronizados": len(esperado_equipos),
+            "equipos_sin_cambios": 0,
+        }
+        assert max(len(lote) for lote in lotes_robots + lotes_equipos) <= 500
+        # Los primeros robots se escriben mientras todavía se están descargando usuarios.
+        primer_merge = control_room.eventos.index("MergeRobots")
+        assert "/v2/usermanagement/users/list" in control_room.eventos[primer_merge:]
+
+    async def test_delta_solo_envia_filas_cambiadas(self, mock_db_connector):
+        control_room = _ControlRoomEntidadesFalso(robots=1200, usuarios=300, devices=400, latencia=0)
+        aa_client = _cliente_a360(control_room)
+        mock_db_connector.ejecutar_consulta.return_value = [(123, 1000)]
+        sincronizador = SincronizadorComun(mock_db_connector, aa_client)
+
+        primero = await sincronizador.sincronizar_entidades()
+        mock_db_connector.merge_robots.reset_mock()
+        mock_db_connector.merge_equipos.reset_mock()
+
+        # Sin cambios en A360: no se llama a ningún merge.
+        segundo = await SincronizadorComun(mock_db_connector, aa_client).sincronizar_entidades()
+        assert segundo["robots_sin_cambios"] == primero["robots_sincronizados"]
+        assert segundo["equipos_sin_cambios"] == primero["equipos_sincronizados"]
+        mock_db_connector.merge_robots.assert_not_called()
+        mock_db_connector.merge_equipos.assert_not_called()
+
+        # Un robot renombrado: solo esa fila llega a MergeRobots.
+        control_room.listas["/v2/repository/workspaces/public/files/list"][1]["name"] = "P11_Renombrado"
+        tercero = await sincronizador.sincronizar_entidades()
+        mock_db_connector.merge_robots.assert_called_once_with(
+            [{"RobotId": 1, "Robot": "P11_Renombrado", "Descripcion": "d1"}]
+        )
+        assert tercero["robots_sin_cambios"] == primero["robots_sincronizados"] - 1
+
+    async def test_delta_reconstruye_el_indice_si_la_bd_cambio(self, mock_db_connector):
+        control_room = _ControlRoomEntidadesFalso(robots=300, usuarios=50, devices=50, latencia=0)
+        aa_client = _cliente_a360(control_room)
+        mock_db_connector.ejecutar_consulta.return_value = [(123, 300)]
+        sincronizador = SincronizadorComun(mock_db_connector, aa_client)
+        await sincronizador.sincronizar_entidades()
+        mock_db_connector.merge_robots.reset_mock()
+
+        # Alguien editó dbo.Robots por fuera: la huella ya no coincide y se reenvía todo.
+        mock_db_connector.ejecutar_consulta.return_value = [(999, 300)]
+        resumen = await sincronizador.sincronizar_entidades()
+
+        assert resumen["robots_sin_cambios"] == 0
+        assert (
+            sum(len(c.args[0]) for c in mock_db_connector.merge_robots.call_args_list)
+            == resumen["robots_sincronizados"]
+        )
+
+    async def test_indice_persistido_se_verifica_al_cargarse(self, tmp_path):
+        ruta = str(tmp_path / "indice_sync.json")
+        columnas = ("RobotId", "Robot")
+        indice = IndiceSincronizacion(ruta, intervalo_verificacion_seg=3600)
+        indice.confirmar("Robots", [{"RobotId": 1, "Robot": "P1_A"}], columnas)
+        indice.fijar_huella("Robots", [5, 1])
+        indice.guardar()
+
+        cargado = IndiceSincronizacion(ruta, intervalo_verificacion_seg=3600)
+        assert cargado.requiere_verificacion("Robots")
+        assert cargado.verificar("Robots", [5, 1])
+        assert not cargado.requiere_verificacion("Robots")
+        assert cargado.filtrar_cambios(
+            "Robots", [{"RobotId": 1, "Robot": "P1_A"}, {"RobotId": 2, "Robot": "P2_B"}], columnas
+        ) == [{"RobotId": 2, "Robot": "P2_B"}]
+
+    async def test_iterar_paginas_cancela_pendientes_si_se_deja_de_iterar(self):
+        control_room = _ControlRoomListadoFalso(1000)
+        aa_client = _cliente_a360(control_room, pagination_concurrency=3)
+
+        paginas = aa_client.iterar_paginas("/v2/devices/list", {})
+        leidas = 0
+        async for _ in paginas:
+            leidas += 1
+            if leidas == 2:
+                break
+        await paginas.aclose()
+        await asyncio.sleep(0.05)
+
+        # Primera página + la ventana de 3 en vuelo; el resto nunca se pide y nada queda en curso.
+        assert len(control_room.offsets) <= 4
+        assert control_room.en_curso == 0
+
+
+@pytest.mark.asyncio
+class TestCoalescenciaListados:
+    async def test_peticiones_identicas_comparten_la_llamada(self):
+        control_room = _ControlRoomActividadFalso(max_ids=100)
+        aa_client = _cliente_a360(control_room)
+
+        resultados = await asyncio.gather(*(aa_client.obtener_detalles_por_deployment_ids(["dep-1"]) for _ in range(5)))
+
+        assert len(control_room.tamanos) == 1
+        assert all(r == [{"deploymentId": "dep-1", "status": "COMPLETED"}] for r in resultados)
+        # Cada llamador recibe su propia copia.
+        assert resultados[0][0] is not resultados[1][0]
+        metricas = aa_client.obtener_metricas_listados()
+        assert (metricas["misses"], metricas["coalescidas"], metricas["hits"]) == (1, 4, 0)
+
+    async def test_cache_con_ttl_se_invalida_con_un_deploy(self):
+        control_room = _ControlRoomActividadFalso(max_ids=100)
+
+        async def handler(request: httpx.Request) -> httpx.Response:
+            if request.url.path == "/v3/automations/deploy":
+                return httpx.Response(200, json={"deploymentId": "nuevo"})
+            return await control_room(request)
+
+        aa_client = _cliente_a360(handler, list_cache_ttl=30)
+
+        await aa_client.obtener_detalles_por_deployment_ids(["dep-1"])
+        await aa_client.obtener_detalles_por_deployment_ids(["dep-1"])
+        assert len(control_room.tamanos) == 1
+
+        await aa_client.desplegar_bot_v3(1, [2])
+        await aa_client.obtener_detalles_por_deployment_ids(["dep-1"])
+
+        assert len(control_room.tamanos) == 2
+        metricas = aa_client.obtener_metricas_listados()
+        assert (metricas["misses"], metricas["hits"], metricas["invalidaciones"]) == (2, 1, 1)
+
+
+@pytest.mark.asyncio
+class TestControlRoomFalso:
+    """El Control Room falso de los benchmarks tiene que seguir siendo compatible con el cliente real."""
+
+    @staticmethod
+    def _cliente(config: ConfigControlRoomFalso):
+        app = crear_app(config)
+        aa_client = AutomationAnywhereClient(cr_url="https://cr-falso", cr_user="sam", cr_api_key="clave")
+        aa_client._client = httpx.AsyncClient(base_url="https://cr-falso", transport=httpx.ASGITransport(app=app))
+        return aa_client, app.state.control_room
+
+    async def test_deploy_y_transicion_de_estados(self):
+        config = ConfigControlRoomFalso(
+            arranque=DistribucionLatencia("fija:0"), duracion=DistribucionLatencia("fija:50"), cantidad_robots=3
+        )
+        aa_client, control_room = self._cliente(config)
+        try:
+            robots = await aa_client.obtener_robots()
+            resultado = await aa_client.desplegar_bot_v4(robots[0]["RobotId"], [2000])
+            deployment_id = resultado["deploymentId"]
+
+            (detalle,) = await aa_client.obtener_detalles_por_deployment_ids([deployment_id])
+            assert detalle["status"] == "RUNNING"
+            await asyncio.sleep(0.06)
+            (detalle,) = await aa_client.obtener_detalles_por_deployment_ids([deployment_id])
+            assert detalle["status"] == "COMPLETED" and detalle["endDateTime"]
+        finally:
+            await aa_client.close()
+        assert len(robots) == 3
+        assert control_room.llamadas["POST /v4/automations/deploy"] == 1
+
+    async def test_token_expirado_y_412_inyectados(self):
+        aa_client, control_room = self._cliente(ConfigControlRoomFalso(token_vida_seg=0.05, prob_412=1.0))
+        try:
+            await aa_client.obtener_devices()
+            await asyncio.sleep(0.06)
+            await aa_client.obtener_devices()
+            with pytest.raises(httpx.HTTPStatusError) as error:
+                await aa_client.desplegar_bot_v4(3000, [2000])
+        finally:
+            await aa_client.close()
+        assert error.value.response.status_code == 412
+        assert control_room.status["POST /v2/devices/list 401"] == 1
+        assert control_room.llamadas["POST /v2/authentication"] == 2
+
+
+class TestAsyncDatabaseConnector:
+    async def test_ejecuta_fuera_del_event_loop(self):
+        """Las consultas corren en el executor de BD y el loop sigue respondiendo mientras tanto."""
+        db = MagicMock(spec=DatabaseConnector)
+        hilos = []
+
+        def consulta_lenta(query, params=None, es_select=True, row_mode=None):
+            hilos.append(threading.current_thread().name)
+            time.sleep(0.2)
+            return [{"ok": 1}]
+
+        db.ejecutar_consulta.side_effect = consulta_lenta
+        fachada = AsyncDatabaseConnector(db, max_workers=2)
+
+        ticks = 0
+
+        async def latido():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        tarea_latido = asyncio.create_task(latido())
+        resultado = await fachada.ejecutar_consulta("SELECT 1")
+        tarea_latido.cancel()
+
+        assert resultado == [{"ok": 1}]
+        assert hilos[0].startswith("sam-db")
+        assert ticks >= 5
+        fachada.cerrar()
+
+    async def test_metricas_y_concurrencia_acotada(self):
+        db = MagicMock(spec=DatabaseConnector)
+        activas = 0
+        max_activas = 0
+        lock = threading.Lock()
+
+        def consulta(query, params=None, es_select=True, row_mode=None):
+            nonlocal activas, max_activas
+            with lock:
+                activas += 1
+                max_activas = max(max_activas, activas)
+            time.sleep(0.05)
+            with lock:
+                activas -= 1
+            return 1
+
+        db.ejecutar_consulta.side_effect = consulta
+        fachada = AsyncDatabaseConnector(db, max_workers=2)
+
+        await asyncio.gather(*(fachada.ejecutar_consulta("UPDATE x", es_select=False) for _ in range(6)))
+
+        metricas = fachada.obtener_metricas()
+        assert max_activas == 2
+        assert metricas["total_llamadas"] == 6
+        assert metricas["en_cola"] == 0
+        assert metricas["max_en_cola"] >= 4
+        assert metricas["espera_max_ms"] > 0
+        fachada.cerrar()
+
+    async def test_ejecutar_con_cursor_corre_el_cuerpo_en_una_sola_llamada(self):
+        """Más cuerpos que hilos: cada uno toma, usa y devuelve su conexión sin esperar otro hilo."""
+        db = DatabaseConnector("srv", "bd", "usr", "pwd")
+        db.conectar_base_datos = MagicMock(side_effect=lambda: MagicMock(name="conexion"))
+        fachada = AsyncDatabaseConnector(db, max_workers=2)
+
+        def cuerpo(cursor, valor):
+            cursor.execute("UPDATE dbo.Robots SET Activo = 1 WHERE RobotId = ?", (valor,))
+            time.sleep(0.02)
+            return valor
+
+        resultados = await asyncio.wait_for(
+            asyncio.gather(*(fachada.ejecutar_con_cursor(cuerpo, i) for i in range(6))), 2
+        )
+
+        assert resultados == list(range(6))
+        assert fachada.obtener_metricas()["total_llamadas"] == 6
+        assert db.obtener_metricas_pool()["en_uso"] == 0
+        fachada.cerrar()
+
+    async def test_para_reutiliza_la_fachada(self):
+        db = MagicMock(spec=DatabaseConnector)
+        assert AsyncDatabaseConnector.para(db) is AsyncDatabaseConnector.para(db)
+        AsyncDatabaseConnector.para(db).cerrar()
+
+
+class TestPoolConexiones:
+    @pytest.fixture
+    def db(self):
+        db = DatabaseConnector("srv", "bd", "usr", "pwd")
+        db._pool_max_size = 2
+        db._pool_cupos = threading.BoundedSemaphore(2)
+        db._pool_espera_timeout = 0.2
+        db.conectar_base_datos = MagicMock(side_effect=lambda: MagicMock(name="conexion"))
+        return db
+
+    def test_reutiliza_conexion_reciente_sin_validarla(self, db):
+        with db.obtener_cursor():
+            pass
+        with db.obtener_cursor():
+            pass
+
+        metricas = db.obtener_metricas_pool()
+        assert db.conectar_base_datos.call_count == 1
+        assert metricas["checkouts"] == 2
+        assert metricas["creadas"] == 1
+        assert metricas["validadas"] == 0
+        assert metricas["inactivas"] == 1
+        assert metricas["en_uso"] == 0
+
+    def test_valida_conexion_inactiva_y_descarta_si_falla(self, db):
+        with db.obtener_cursor():
+            pass
+        db._pool_validacion_inactividad = 0
+        conn_vieja = db._pool[0][0]
+        conn_vieja.cursor.return_value.execute.side_effect = pyodbc.Error("08S01", "Communication link failure")
+        time.sleep(0.01)
+
+        with db.obtener_cursor():
+            pass
+
+        metricas = db.obtener_metricas_pool()
+        assert metricas["validadas"] == 1
+        assert metricas["descartadas"] == 1
+        assert db.conectar_base_datos.call_count == 2
+        conn_vieja.close.assert_called_once()
+
+    def test_recicla_conexiones_que_superan_la_vida_maxima(self, db):
+        db._pool_vida_max = 0.01
+        with db.obtener_cursor():
+            pass
+        time.sleep(0.02)
+
+        with db.obtener_cursor():
+            pass
+
+        assert db.conectar_base_datos.call_count == 2
+        assert db.obtener_metricas_pool()["descartadas"] >= 1
+
+    def test_pool_agotado_espera_y_expira(self, db):
+        with db.obtener_cursor(), db.obtener_cursor():
+            with pytest.raises(pyodbc.OperationalError):
+                with db.obtener_cursor():
+                    pass
+
+        metricas = db.obtener_metricas_pool()
+        assert metricas["esperas"] == 1
+        assert metricas["esperas_agotadas"] == 1
+        assert metricas["en_uso"] == 0
+
+    def test_la_creacion_de_conexiones_no_bloquea_el_pool(self, db):
+        """Mientras un hilo abre una conexión lenta, otro puede tomar una conexión ya disponible."""
+        with db.obtener_cursor():
+            pass
+        apertura_iniciada = threading.Event()
+
+        def conexion_lenta():
+            apertura_iniciada.set()
+            time.sleep(0.3)
+            return MagicMock(name="conexion")
+
+        db.conectar_base_datos.side_effect = conexion_lenta
+        db._pool_max_size = 3
+        db._pool_cupos = threading.BoundedSemaphore(3)
+
+        def usar_dos_conexiones():
+            with db.obtener_cursor(), db.obtener_cursor():
+                pass
+
+        hilo = threading.Thread(target=usar_dos_conexiones)
+        hilo.start()
+        apertura_iniciada.wait(1)
+        db._pool.append((MagicMock(name="conexion"), time.monotonic(), time.monotonic()))
+
+        inicio = time.monotonic()
+        with db.obtener_cursor():
+            pass
+        assert time.monotonic() - inicio < 0.1
+        hilo.join()
+
+
+class TestPoolsNombrados:
+    def test_cada_pool_tiene_su_configuracion_y_se_reutiliza(self):
+        db = DatabaseConnector("srv", "bd", "usr", "pwd")
+        analytics = db.pool(POOL_ANALYTICS)
+
+        assert db.pool(POOL_OLTP) is db
+        assert db.pool(POOL_ANALYTICS) is analytics
+        assert analytics.pool(POOL_OLTP) is db
+        assert analytics._pool_max_size == 2
+        assert analytics._timeout_sentencia == 120
+        # Una consulta de análisis que agota su timeout no se reintenta.
+        assert "HYT00" not in analytics.retryable_sqlstates
+        assert "HYT00" in db.retryable_sqlstates
+        assert "ApplicationIntent" not in analytics.connection_string
+        assert set(db.obtener_metricas_pools()) == {POOL_OLTP, POOL_ANALYTICS}
+
+    def test_solo_lectura_y_timeout_por_sentencia(self):
+        def config(key, default=None, *args):
+            return "True" if key == "SQL_SAM_POOL_ANALYTICS_SOLO_LECTURA" else default
+
+        with patch.object(ConfigManager, "_get_config_value", side_effect=config):
+            analytics = DatabaseConnector("srv", "bd", "usr", "pwd").pool(POOL_ANALYTICS)
+        analytics.conectar_base_datos = MagicMock(return_value=MagicMock(name="conexion"))
+
+        assert analytics.connection_string.endswith("ApplicationIntent=ReadOnly;")
+        with analytics.obtener_cursor() as cursor:
+            assert cursor.timeout == 120
+
+    def test_cola_llena_rechaza_sin_esperar(self):
+        analytics = DatabaseConnector("srv", "bd", "usr", "pwd").pool(POOL_ANALYTICS)
+        analytics._pool_max_size = 1
+        analytics._pool_cupos = threading.BoundedSemaphore(1)
+        analytics._pool_cola_max = 1
+        analytics._pool_espera_timeout = 2
+        analytics.conectar_base_datos = MagicMock(side_effect=lambda: MagicMock(name="conexion"))
+        esperando = threading.Thread(target=lambda: analytics.obtener_cursor().__enter__())
+
+        with analytics.obtener_cursor():
+            esperando.start()
+            while analytics.obtener_metricas_pool()["esperando"] == 0:
+                time.sleep(0.01)
+            inicio = time.monotonic()
+            with pytest.raises(PoolSaturadoError):
+                with analytics.obtener_cursor():
+                    pass
+            assert time.monotonic() - inicio < 0.5
+        esperando.join()
+
+        metricas = analytics.obtener_metricas_pool()
+        assert metricas["rechazadas"] == 1
+        assert metricas["esperas"] == 1
+
+
+class TestRowMode:
+    COLUMNAS = ["RobotId", "Robot", "Pool Id"]
+    FILAS = [(1, "Bot1", 10), (2, "Bot2", None)]
+
+    def test_dict_es_el_formato_por_defecto(self):
+        assert materializar_filas(self.COLUMNAS, self.FILAS) == [
+            {"RobotId": 1, "Robot": "Bot1", "Pool Id": 10},
+            {"RobotId": 2, "Robot": "Bot2", "Pool Id": None},
+        ]
+
+    def test_tuple_y_columns(self):
+        assert materializar_filas(self.COLUMNAS, self.FILAS, RowMode.TUPLE) == [(1, "Bot1", 10), (2, "Bot2", None)]
+        assert materializar_filas(self.COLUMNAS, self.FILAS, "columns") == {
+            "RobotId": [1, 2],
+            "Robot": ["Bot1", "Bot2"],
+            "Pool Id": [10, None],
+        }
+        assert materializar_filas(self.COLUMNAS, [], RowMode.COLUMNS) == {"RobotId": [], "Robot": [], "Pool Id": []}
+
+    def test_record_se_comporta_como_dict_de_solo_lectura(self):
+        fila = materializar_filas(self.COLUMNAS, self.FILAS, RowMode.RECORD)[0]
+
+        assert fila["Robot"] == "Bot1"
+        assert fila.get("Pool Id") == 10
+        assert fila.get("NoExiste", "x") == "x"
+        assert fila.RobotId == 1
+        assert dict(fila) == {"RobotId": 1, "Robot": "Bot1", "Pool Id": 10}
+        assert not hasattr(fila, "__dict__")
+        with pytest.raises(KeyError):
+            fila["NoExiste"]
+
+    def test_record_columnas_repetidas_gana_la_ultima(self):
+        fila = materializar_filas(["Id", "Id", "class"], [(1, 2, "c")], RowMode.RECORD)[0]
+        assert dict(fila) == {"Id": 2, "class": "c"}
+
+    def test_record_columnas_con_nombre_de_metodo_no_tapan_el_mapping(self):
+        fila = materializar_filas(["Id", "keys", "get", "items", "values"], [(1, 2, 3, 4, 5)], RowMode.RECORD)[0]
+        assert dict(fila) == {"Id": 1, "keys": 2, "get": 3, "items": 4, "values": 5}
+        assert fila.get("Id") == 1 and fila["get"] == 3
+        assert list(fila.keys()) == ["Id", "keys", "get", "items", "values"]
+
+    def test_clase_registro_se_cachea_por_columnas(self):
+        assert clase_registro(("A", "B")) is clase_registro(("A", "B"))
+        assert clase_registro(("A", "B")) is not clase_registro(("A", "C"))
+
+    def test_record_se_serializa_como_dict_en_fastapi(self):
+        from fastapi.encoders import jsonable_encoder
+
+        filas = materializar_filas(self.COLUMNAS, self.FILAS, RowMode.RECORD)
+        assert jsonable_encoder(filas) == materializar_filas(self.COLUMNAS, self.FILAS)
+
+
+class _ConexionTransaccional:
+    """
+    Conexión falsa que recibe cada lote como un batch de una sentencia por fila (`UnidadDeTrabajo`) y
+    solo confirma sus filas si se llama a commit(). Cuenta los viajes de red en `llamadas`.
+    """
+
+    def __init__(self, confirmadas: list, fila_envenenada, llamadas: list):
+        self._confirmadas = confirmadas
+        self._fila_envenenada = fila_envenenada
+        self._llamadas = llamadas
+        self._pendientes = []
+
+    def cursor(self):
+        conexion = self
+        cursor = MagicMock()
+
+        def execute(batch, params=()):
+            conexion._llamadas.append(batch)
+            ancho = len(conexion._fila_envenenada)
+            filas = [tuple(params[i : i + ancho]) for i in range(0, len(params), ancho)]
+            if conexion._fila_envenenada in filas:
+                raise pyodbc.Error("23000", "Violación de restricción")
+            conexion._pendientes.extend(filas)
+            cursor.fetchone.return_value = (1,) * len(filas)
+
+        cursor.execute.side_effect = execute
+        return cursor
+
+    def commit(self):
+        self._confirmadas.extend(self._pendientes)
+        self._pendientes = []
+
+    def rollback(self):
+        self._pendientes = []
+
+    def close(self):
+        pass
+
+
+class TestEjecucionMultipleConBiseccion:
+    def test_fila_envenenada_se_aisla_y_se_confirman_las_demas(self):
+        filas = [(f"dep-{i}", i) for i in range(5000)]
+        envenenada = filas[3210]
+        confirmadas, llamadas = [], []
+        db = DatabaseConnector("srv", "bd", "usr", "pwd")
+        db._lote_tamano = 500
+        db.conectar_base_datos = MagicMock(
+            side_effect=lambda: _ConexionTransaccional(confirmadas, envenenada, llamadas)
+        )
+
+        resultado = db.ejecutar_consulta_multiple_detallada("UPDATE ...", filas, usar_fast_executemany=False)
+
+        assert resultado.filas_afectadas == 4999
+        assert [params for params, _ in resultado.fallidas] == [envenenada]
+        assert "Violación" in resultado.fallidas[0][1]
+        assert confirmadas == [f for f in filas if f != envenenada]
+        # Un batch por lote (10) + ~2 por nivel de bisección (log2(500) ~ 9) en el lote con el error.
+        assert len(llamadas) <= 30
+
+    def test_lote_respeta_el_limite_de_parametros(self):
+        filas = [tuple(range(i, i + 6)) for i in range(1000)]
+        llamadas = []
+        db = DatabaseConnector("srv", "bd", "usr", "pwd")
+        db._lote_tamano = 500
+        db.conectar_base_datos = MagicMock(side_effect=lambda: _ConexionTransaccional([], (None,) * 6, llamadas))
+
+        assert db.ejecutar_consulta_multiple("UPDATE ...", filas, usar_fast_executemany=False) == 1000
+        # 2100 parámetros por batch: 350 filas de 6 parámetros
+        assert len(llamadas) == 3
+
+    def test_error_de_conexion_no_se_biseca_y_se_propaga(self):
+        llamadas = []
+        db = DatabaseConnector("srv", "bd", "usr", "pwd")
+        db.max_retries = 1
+
+        def execute(*args):
+            llamadas.append(args)
+            raise pyodbc.OperationalError("08S01", "Communication link failure")
+
+        conexion = MagicMock()
+        conexion.cursor.return_value.execute.side_effect = execute
+        db.conectar_base_datos = MagicMock(return_value=conexion)
+
+        with pytest.raises(pyodbc.OperationalError):
+            db.ejecutar_consulta_multiple_detallada(
+                "UPDATE ...", [(i,) for i in range(100)], usar_fast_executemany=False
+            )
+        # Un solo intento del primer lote, sin partirlo ni marcar filas como fallidas
+        assert len(llamadas) == 1
+
+    def test_ejecutar_consulta_multiple_devuelve_solo_el_total(self):
+        db = DatabaseConnector("srv", "bd", "usr", "pwd")
+        db.conectar_base_datos = MagicMock(side_effect=lambda: _ConexionTransaccional([], ("x",), []))
+
+        assert db.ejecutar_consulta_multiple("UPDATE ...", [("a",), ("x",), ("b",)], usar_fast_executemany=False) == 2
+        assert db.ejecutar_consulta_multiple("UPDATE ...", []) == 0
+
+
+class TestMetricasDB:
+    @pytest.fixture
+    def db(self):
+        db = DatabaseConnector("srv", "bd", "usr", "pwd", db_config_prefix="SQL_METRICAS_TEST")
+        conexion = MagicMock(name="conexion")
+        cursor = conexion.cursor.return_value
+        cursor.description = [("RobotId",), ("Robot",)]
+        cursor.fetchall.return_value = [(1, "Bot1"), (2, "Bot2")]
+        db.conectar_base_datos = MagicMock(return_value=conexion)
+        return db
+
+    @staticmethod
+    def _sentencias(origen):
+        return {s["sentencia"]: s for s in METRICAS_DB.obtener_resumen()["sentencias"] if s["origen"] == origen}
+
+    def test_normalizar_sentencia(self):
+        assert normalizar_sentencia("{CALL dbo.ObtenerRobotsEjecutables}") == "CALL dbo.ObtenerRobotsEjecutables"
+        assert normalizar_sentencia("EXEC dbo.Analisis_Callbacks @FechaInicio = ?") == "CALL dbo.Analisis_Callbacks"
+        assert (
+            normalizar_sentencia("SELECT *  FROM dbo.Robots\n WHERE RobotId IN (?, ?, ?) AND Robot = 'x' AND Id > 10")
+            == "SELECT * FROM dbo.Robots WHERE RobotId IN (?+) AND Robot = ? AND Id > ?"
+        )
+
+    def test_registra_llamadas_filas_y_fases(self, db):
+        METRICAS_DB.reiniciar()
+        db.ejecutar_consulta("SELECT RobotId, Robot FROM dbo.Robots WHERE Activo = 1")
+        db.ejecutar_consulta("SELECT RobotId, Robot FROM dbo.Robots WHERE Activo = 0")
+
+        estadistica = self._sentencias("SQL_METRICAS_TEST")["SELECT RobotId, Robot FROM dbo.Robots WHERE Activo = ?"]
+        assert estadistica["llamadas"] == 2
+        assert estadistica["filas"] == 4
+        assert estadistica["errores"] == 0
+        for fase in ("espera_pool", "ejecucion", "lectura"):
+            assert sum(estadistica[fase]["buckets"].values()) == 2
+
+    def test_errores_y_consultas_lentas_con_parametros_redactados(self, db, caplog):
+        METRICAS_DB.reiniciar()
+        db._umbral_consulta_lenta_ms = 0.000001
+        db.max_retries = 1
+        db.conectar_base_datos.return_value.cursor.return_value.execute.side_effect = pyodbc.Error("42000", "x")
+
+        with caplog.at_level(logging.WARNING, logger="sam.common.metricas_db.lentas"):
+            with pytest.raises(pyodbc.Error):
+                db.ejecutar_consulta(
+                    "UPDATE dbo.Robots SET Robot = ? WHERE RobotId = ?", ("secreto", 7), es_select=False
+                )
+
+        estadistica = self._sentencias("SQL_METRICAS_TEST")["UPDATE dbo.Robots SET Robot = ? WHERE RobotId = ?"]
+        assert estadistica["errores"] == 1
+        assert estadistica["lentas"] == 1
+        assert "<str:7>" in caplog.text and "<int>" in caplog.text
+        assert "secreto" not in caplog.text
+
+    def test_volcado_a_archivo(self, tmp_path):
+        metricas = MetricasConsultas()
+        metricas.registrar("SQL_SAM", "{CALL dbo.MergeRobots(?)}", espera_pool=0.001, ejecucion=0.02, filas=3)
+        ruta = tmp_path / "metricas.json"
+
+        metricas.volcar_a_archivo(ruta)
+
+        contenido = json.loads(ruta.read_text(encoding="utf-8"))
+        assert contenido["sentencias"][0]["sentencia"] == "CALL dbo.MergeRobots"
+        assert contenido["sentencias"][0]["ejecucion"]["p50_ms"] == 25
+
+
+class TestUnidadDeTrabajo:
+    @pytest.fixture
+    def db(self):
+        db = DatabaseConnector("srv", "bd", "usr", "pwd")
+        db.initial_delay = 0
+        conexion = MagicMock(name="conexion")
+        db.conectar_base_datos = MagicMock(return_value=conexion)
+        return db
+
+    def test_envia_un_solo_batch_en_una_transaccion(self, db):
+        conexion = db.conectar_base_datos.return_value
+        cursor = conexion.cursor.return_value
+        cursor.description = [("Estado",)]
+        cursor.fetchall.return_value = [("RUNNING",)]
+        cursor.fetchone.return_value = (1, 1, 1)
+
+        with db.unit_of_work() as uow:
+            uow.agregar("INSERT INTO dbo.Asignaciones (RobotId, EquipoId) VALUES (?, ?);", (1, 2))
+            i = uow.agregar("SELECT Estado FROM dbo.Ejecuciones WHERE DeploymentId = ?", ("dep-1",), es_select=True)
+            uow.agregar("DELETE FROM dbo.Asignaciones WHERE RobotId = ?", (3,))
+
+        assert cursor.execute.call_count == 1
+        batch, params = cursor.execute.call_args.args
+        assert params == (1, 2, "dep-1", 3)
+        assert batch.count("?") == 4
+        assert "BEGIN TRY" in batch and "THROW;" in batch
+        assert conexion.commit.call_count == 1
+        assert uow.resultados == [1, [{"Estado": "RUNNING"}], 1]
+        assert uow.resultados[i] == [{"Estado": "RUNNING"}]
+
+    def test_error_hace_rollback_y_se_relanza(self, db):
+        conexion = db.conectar_base_datos.return_value
+        conexion.cursor.return_value.execute.side_effect = pyodbc.Error("23000", "Violación de restricción")
+
+        with pytest.raises(pyodbc.Error):
+            with db.unit_of_work() as uow:
+                uow.agregar("INSERT ...", (1,))
+                uow.agregar("INSERT ...", (2,))
+
+        conexion.rollback.assert_called_once()
+        conexion.commit.assert_not_called()
+        assert uow.resultados is None
+
+    def test_excepcion_en_el_bloque_no_envia_nada(self, db):
+        with pytest.raises(ValueError):
+            with db.unit_of_work() as uow:
+                uow.agregar("INSERT ...", (1,))
+                raise ValueError("abortar")
+
+        db.conectar_base_datos.assert_not_called()
+
+    def test_limite_de_parametros(self, db):
+        with pytest.raises(ValueError, match="2100"):
+            with db.unit_of_work() as uow:
+                uow.agregar("INSERT ...", tuple(range(2101)))
+
+    @pytest.mark.parametrize(
+        "resultados, esperado",
+        [
+            ([1, [(1,)]], UpdateStatus.UPDATED),
+            ([0, [(1,)]], UpdateStatus.ALREADY_PROCESSED),
+            ([0, [(0,)]], UpdateStatus.NOT_FOUND),
+        ],
+    )
+    def test_callback_en_un_solo_batch(self, db, resultados, esperado):
+        def ejecutar(unidad):
+            assert len(unidad) == 2
+            unidad.resultados = resultados
+            return resultados
+
+        with patch.object(db, "ejecutar_unidad_de_trabajo", side_effect=ejecutar) as ejecutar_mock:
+            assert db.actualizar_ejecucion_desde_callback("dep-1", "COMPLETED", "{}") == esperado
+
+        unidad = ejecutar_mock.call_args.args[0]
+        assert unidad.sentencias[0].params[:3] == ("COMPLETED", "{}", "dep-1")
+        assert set(DatabaseConnector.ESTADOS_FINALES_CALLBACK) <= set(unidad.sentencias[0].params)
+
+    def test_callback_filtra_por_usuario_en_despliegues_agrupados(self, db):
+        def ejecutar(unidad):
+            unidad.resultados = [1, [(1,)]]
+            return unidad.resultados
+
+        with patch.object(db, "ejecutar_unidad_de_trabajo", side_effect=ejecutar) as ejecutar_mock:
+            resultado = db.actualizar_ejecucion_desde_callback("dep-1", "COMPLETED", "{}", user_id="21")
+
+        assert resultado == UpdateStatus.UPDATED
+        actualizacion, conteo = ejecutar_mock.call_args.args[0].sentencias
+        assert "UserId = TRY_CAST(? AS INT)" in actualizacion.query
+        assert actualizacion.params[:5] == ("COMPLETED", "{}", "dep-1", "21", "21")
+        assert conteo.params == ("dep-1", "21", "21")
+
+    def test_callback_devuelve_error_si_falla_la_bd(self, db):
+        db.conectar_base_datos.side_effect = pyodbc.Error("08001", "sin conexión")
+        assert db.actualizar_ejecucion_desde_callback("dep-1", "COMPLETED", "{}") == UpdateStatus.ERROR
@@ -222,3 +222,28 @@ async def test_conciliar_bot_api_reporta_unknown_INCREMENTA_contador(
             assert params == [(400,)]
             break
     assert found_unknown
+
+
+@pytest.mark.asyncio
+async def test_conciliar_despliegue_agrupado_actualiza_cada_usuario(
+    conciliador_service, mock_db_connector, mock_aa_client
+):
+    """
+    Un despliegue agrupado comparte el DeploymentId entre varios usuarios: cada actividad de A360
+    se asigna a la ejecución local de su userId.
+    """
+    mock_db_connector.obtener_ejecuciones_en_curso.return_value = [
+        {"EjecucionId": 500, "DeploymentId": "dep-grupo", "UserId": 21},
+        {"EjecucionId": 501, "DeploymentId": "dep-grupo", "UserId": 22},
+    ]
+    mock_aa_client.obtener_ejecuciones_activas.return_value = [
+        {"deploymentId": "dep-grupo", "userId": "22", "status": "RUNNING"},
+        {"deploymentId": "dep-grupo", "userId": "21", "status": "RUN_FAILED"},
+    ]
+
+    with patch.object(conciliador_service, "_convertir_utc_a_local_sam", return_value=None):
+        await conciliador_service.conciliar_ejecuciones()
+
+    query, params = mock_db_connector.ejecutar_consulta_multiple.call_args_list[0][0][:2]
+    assert "SET Estado = ?" in query
+    assert sorted((p[3], p[0]) for p in params) == [(500, "RUN_FAILED"), (501, "RUNNING")]
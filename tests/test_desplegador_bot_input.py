@@ -9,7 +9,7 @@ import pytest
 
 from sam.common.a360_client import AutomationAnywhereClient
 from sam.common.apigw_client import ApiGatewayClient
-from sam.common.database import DatabaseConnector
+from sam.common.database import DatabaseConnector, RowMode
 from sam.common.mail_client import EmailAlertClient
 from sam.lanzador.service.desplegador import Desplegador
 
@@ -86,38 +86,54 @@ def desplegador(mock_db_connector, mock_aa_client, mock_api_gateway_client, mock
     )
 
 
+def configurar_parametros(mock_db_connector, parametros_por_robot, version=1):
+    """
+    Simula la tabla Robots: la consulta de versión devuelve `version` y la carga completa devuelve
+    (RobotId, Parametros) de cada robot. `version` puede cambiarse después vía el dict devuelto.
+    """
+    estado = {"version": version, "parametros": parametros_por_robot}
+
+    def ejecutar_consulta(query, params=None, es_select=True, row_mode=RowMode.DICT):
+        if query == Desplegador._SQL_VERSION_PARAMETROS:
+            return [(estado["version"], len(estado["parametros"]))]
+        if query == Desplegador._SQL_PARAMETROS:
+            return list(estado["parametros"].items())
+        return []
+
+    mock_db_connector.ejecutar_consulta.side_effect = ejecutar_consulta
+    return estado
+
+
 class TestObtenerBotInputRobot:
-    """Tests para el método _obtener_bot_input_robot."""
+    """Tests para `_obtener_bot_input_robot` con los parámetros cargados por `_refrescar_parametros_robots`."""
 
     async def test_usar_parametros_personalizados_cuando_existen(self, desplegador, mock_db_connector):
         """Verifica que se usan los parámetros personalizados cuando el robot los tiene configurados."""
         # Arrange
         robot_id = 123
         parametros_personalizados = {"in_NumRepeticion": {"type": "NUMBER", "number": "5"}}
-        mock_db_connector.ejecutar_consulta.return_value = [{"Parametros": json.dumps(parametros_personalizados)}]
+        configurar_parametros(mock_db_connector, {robot_id: json.dumps(parametros_personalizados)})
 
         default_bot_input = {"in_NumRepeticion": {"type": "NUMBER", "number": "3"}}
 
         # Act
+        desplegador._refrescar_parametros_robots()
         result = desplegador._obtener_bot_input_robot(robot_id, default_bot_input)
 
         # Assert
         assert result == parametros_personalizados
         assert result["in_NumRepeticion"]["number"] == "5"
-        mock_db_connector.ejecutar_consulta.assert_called_once_with(
-            "SELECT Parametros FROM dbo.Robots WHERE RobotId = ?", (robot_id,), es_select=True
-        )
+        mock_db_connector.ejecutar_consulta.assert_any_call(Desplegador._SQL_PARAMETROS, row_mode=RowMode.TUPLE)
 
     async def test_usar_valor_por_defecto_cuando_no_hay_parametros(self, desplegador, mock_db_connector):
         """Verifica que se usa el valor por defecto cuando el robot no tiene parámetros configurados."""
         # Arrange
-        robot_id = 456
-        mock_db_connector.ejecutar_consulta.return_value = [{"Parametros": None}]
-
+        configurar_parametros(mock_db_connector, {})
         default_bot_input = {"in_NumRepeticion": {"type": "NUMBER", "number": "3"}}
 
         # Act
-        result = desplegador._obtener_bot_input_robot(robot_id, default_bot_input)
+        desplegador._refrescar_parametros_robots()
+        result = desplegador._obtener_bot_input_robot(456, default_bot_input)
 
         # Assert
         assert result == default_bot_input
@@ -126,41 +142,52 @@ class TestObtenerBotInputRobot:
     async def test_usar_valor_por_defecto_cuando_parametros_esta_vacio(self, desplegador, mock_db_connector):
         """Verifica que se usa el valor por defecto cuando el campo Parametros está vacío."""
         # Arrange
-        robot_id = 789
-        mock_db_connector.ejecutar_consulta.return_value = [{"Parametros": ""}]
+        configurar_parametros(mock_db_connector, {789: ""})
+        default_bot_input = {"in_NumRepeticion": {"type": "NUMBER", "number": "3"}}
+
+        # Act
+        desplegador._refrescar_parametros_robots()
+        result = desplegador._obtener_bot_input_robot(789, default_bot_input)
+
+        # Assert
+        assert result == default_bot_input
 
+    async def test_usar_valor_por_defecto_cuando_parametros_es_objeto_vacio(self, desplegador, mock_db_connector):
+        """Verifica que se usa el valor por defecto cuando el campo Parametros es un JSON vacío."""
+        # Arrange
+        configurar_parametros(mock_db_connector, {789: "{}"})
         default_bot_input = {"in_NumRepeticion": {"type": "NUMBER", "number": "3"}}
 
         # Act
-        result = desplegador._obtener_bot_input_robot(robot_id, default_bot_input)
+        desplegador._refrescar_parametros_robots()
+        result = desplegador._obtener_bot_input_robot(789, default_bot_input)
 
         # Assert
         assert result == default_bot_input
 
     async def test_usar_valor_por_defecto_cuando_json_invalido(self, desplegador, mock_db_connector):
-        """Verifica que se usa el valor por defecto cuando el JSON de parámetros es inválido."""
+        """Verifica que un JSON inválido no impide cargar los parámetros de los demás robots."""
         # Arrange
-        robot_id = 999
-        mock_db_connector.ejecutar_consulta.return_value = [{"Parametros": "{invalid json"}]
-
+        parametros_validos = {"in_NumRepeticion": {"type": "NUMBER", "number": "8"}}
+        configurar_parametros(mock_db_connector, {999: "{invalid json", 1000: json.dumps(parametros_validos)})
         default_bot_input = {"in_NumRepeticion": {"type": "NUMBER", "number": "3"}}
 
         # Act
-        result = desplegador._obtener_bot_input_robot(robot_id, default_bot_input)
+        desplegador._refrescar_parametros_robots()
 
         # Assert
-        assert result == default_bot_input
+        assert desplegador._obtener_bot_input_robot(999, default_bot_input) == default_bot_input
+        assert desplegador._obtener_bot_input_robot(1000, default_bot_input) == parametros_validos
 
     async def test_usar_valor_por_defecto_cuando_json_no_es_dict(self, desplegador, mock_db_connector):
         """Verifica que se usa el valor por defecto cuando el JSON no es un diccionario."""
         # Arrange
-        robot_id = 111
-        mock_db_connector.ejecutar_consulta.return_value = [{"Parametros": '["not", "a", "dict"]'}]
-
+        configurar_parametros(mock_db_connector, {111: '["not", "a", "dict"]'})
         default_bot_input = {"in_NumRepeticion": {"type": "NUMBER", "number": "3"}}
 
         # Act
-        result = desplegador._obtener_bot_input_robot(robot_id, default_bot_input)
+        desplegador._refrescar_parametros_robots()
+        result = desplegador._obtener_bot_input_robot(111, default_bot_input)
 
         # Assert
         assert result == default_bot_input
@@ -168,31 +195,106 @@ class TestObtenerBotInputRobot:
     async def test_usar_valor_por_defecto_cuando_error_en_consulta(self, desplegador, mock_db_connector):
         """Verifica que se usa el valor por defecto cuando hay un error al consultar la BD."""
         # Arrange
-        robot_id = 222
         mock_db_connector.ejecutar_consulta.side_effect = Exception("Error de conexión")
-
         default_bot_input = {"in_NumRepeticion": {"type": "NUMBER", "number": "3"}}
 
         # Act
-        result = desplegador._obtener_bot_input_robot(robot_id, default_bot_input)
+        desplegador._refrescar_parametros_robots()
+        result = desplegador._obtener_bot_input_robot(222, default_bot_input)
 
         # Assert
         assert result == default_bot_input
 
     async def test_usar_valor_por_defecto_cuando_robot_no_existe(self, desplegador, mock_db_connector):
-        """Verifica que se usa el valor por defecto cuando el robot no existe en la BD."""
+        """Verifica que se usa el valor por defecto cuando el robot no está en la BD."""
         # Arrange
-        robot_id = 333
-        mock_db_connector.ejecutar_consulta.return_value = []
-
+        configurar_parametros(mock_db_connector, {123: json.dumps({"in_NumRepeticion": {"number": "5"}})})
         default_bot_input = {"in_NumRepeticion": {"type": "NUMBER", "number": "3"}}
 
         # Act
-        result = desplegador._obtener_bot_input_robot(robot_id, default_bot_input)
+        desplegador._refrescar_parametros_robots()
+        result = desplegador._obtener_bot_input_robot(333, default_bot_input)
 
         # Assert
         assert result == default_bot_input
 
+    async def test_error_en_consulta_conserva_parametros_cargados(self, desplegador, mock_db_connector):
+        """Verifica que un error al consultar la versión no descarta los parámetros ya cargados."""
+        # Arrange
+        parametros_personalizados = {"in_NumRepeticion": {"type": "NUMBER", "number": "4"}}
+        configurar_parametros(mock_db_connector, {333: json.dumps(parametros_personalizados)})
+        desplegador._refrescar_parametros_robots()
+        mock_db_connector.ejecutar_consulta.side_effect = Exception("Error de conexión")
+
+        # Act
+        desplegador._refrescar_parametros_robots()
+        result = desplegador._obtener_bot_input_robot(333, {})
+
+        # Assert
+        assert result == parametros_personalizados
+
+
+class TestCacheParametrosRobots:
+    """Tests de la carga en bloque de Parametros y su recarga por cambio de versión."""
+
+    async def test_sin_cambio_de_version_no_recarga(self, desplegador, mock_db_connector):
+        """Verifica que con la misma versión solo se consulta la versión."""
+        # Arrange
+        configurar_parametros(mock_db_connector, {1: json.dumps({"a": 1})})
+        desplegador._refrescar_parametros_robots()
+        mock_db_connector.ejecutar_consulta.reset_mock()
+
+        # Act
+        desplegador._refrescar_parametros_robots()
+
+        # Assert
+        mock_db_connector.ejecutar_consulta.assert_called_once_with(
+            Desplegador._SQL_VERSION_PARAMETROS, row_mode=RowMode.TUPLE
+        )
+
+    async def test_edicion_desde_la_web_recarga_los_parametros(self, desplegador, mock_db_connector):
+        """Verifica que al cambiar la versión (edición de Parametros) se usan los valores nuevos."""
+        # Arrange
+        estado = configurar_parametros(mock_db_connector, {1: json.dumps({"in_NumRepeticion": {"number": "2"}})})
+        desplegador._refrescar_parametros_robots()
+        estado["parametros"] = {1: json.dumps({"in_NumRepeticion": {"number": "9"}})}
+        estado["version"] = 2
+
+        # Act
+        desplegador._refrescar_parametros_robots()
+
+        # Assert
+        assert desplegador._obtener_bot_input_robot(1, {})["in_NumRepeticion"]["number"] == "9"
+
+    async def test_ciclo_de_300_robots_sin_consultas_por_robot(
+        self, desplegador, mock_db_connector, mock_aa_client, default_config
+    ):
+        """Verifica que un ciclo de 300 robots no consulta Parametros por robot."""
+        # Arrange
+        default_config["max_workers_lanzador"] = 50
+        robots = [{"RobotId": i, "UserId": 1000 + i, "EquipoId": 2000 + i, "Hora": None} for i in range(300)]
+        mock_db_connector.obtener_robots_ejecutables.return_value = robots
+        configurar_parametros(
+            mock_db_connector, {i: json.dumps({"in_NumRepeticion": {"number": str(i)}}) for i in range(0, 300, 2)}
+        )
+
+        # Act
+        await desplegador.desplegar_robots_pendientes()
+        consultas_primer_ciclo = [c.args[0] for c in mock_db_connector.ejecutar_consulta.call_args_list]
+        mock_db_connector.ejecutar_consulta.reset_mock()
+        desplegador._cooldown_despliegues.clear()
+        await desplegador.desplegar_robots_pendientes()
+        consultas_segundo_ciclo = [c.args[0] for c in mock_db_connector.ejecutar_consulta.call_args_list]
+
+        # Assert
+        assert consultas_primer_ciclo == [Desplegador._SQL_VERSION_PARAMETROS, Desplegador._SQL_PARAMETROS]
+        assert consultas_segundo_ciclo == [Desplegador._SQL_VERSION_PARAMETROS]
+        bot_inputs = {
+            c.kwargs["file_id"]: c.kwargs["bot_input"] for c in mock_aa_client.desplegar_bot_v4.call_args_list
+        }
+        assert bot_inputs[10]["in_NumRepeticion"]["number"] == "10"
+        assert bot_inputs[11]["in_NumRepeticion"]["number"] == "3"  # Valor por defecto de la config
+
 
 class TestDesplegarRobotsConParametros:
     """Tests para el despliegue de robots con parámetros personalizados."""
@@ -210,7 +312,7 @@ class TestDesplegarRobotsConParametros:
         }
 
         parametros_personalizados = {"in_NumRepeticion": {"type": "NUMBER", "number": "7"}}
-        mock_db_connector.ejecutar_consulta.return_value = [{"Parametros": json.dumps(parametros_personalizados)}]
+        configurar_parametros(mock_db_connector, {123: json.dumps(parametros_personalizados)})
         mock_db_connector.obtener_robots_ejecutables.return_value = [robot_info]
         mock_api_gateway_client.get_auth_header.return_value = {"Authorization": "Bearer test-token"}
 
@@ -218,10 +320,8 @@ class TestDesplegarRobotsConParametros:
         await desplegador.desplegar_robots_pendientes()
 
         # Assert
-        # Verificar que se consultó la BD para obtener los parámetros
-        mock_db_connector.ejecutar_consulta.assert_any_call(
-            "SELECT Parametros FROM dbo.Robots WHERE RobotId = ?", (123,), es_select=True
-        )
+        # Verificar que los parámetros se cargaron en bloque y no por robot
+        mock_db_connector.ejecutar_consulta.assert_any_call(Desplegador._SQL_PARAMETROS, row_mode=RowMode.TUPLE)
 
         # Verificar que se llamó a desplegar_bot_v4 con los parámetros personalizados
         mock_aa_client.desplegar_bot_v4.assert_called_once()
@@ -244,7 +344,7 @@ class TestDesplegarRobotsConParametros:
             "Hora": "10:00:00",
         }
 
-        mock_db_connector.ejecutar_consulta.return_value = [{"Parametros": None}]
+        configurar_parametros(mock_db_connector, {})
         mock_db_connector.obtener_robots_ejecutables.return_value = [robot_info]
         mock_api_gateway_client.get_auth_header.return_value = {"Authorization": "Bearer test-token"}
 
@@ -269,16 +369,7 @@ class TestDesplegarRobotsConParametros:
         parametros_robot_1 = {"in_NumRepeticion": {"type": "NUMBER", "number": "5"}}
         parametros_robot_2 = {"in_NumRepeticion": {"type": "NUMBER", "number": "10"}}
 
-        # Configurar mocks para devolver diferentes parámetros según el robot
-        def mock_ejecutar_consulta(query, params, es_select):
-            robot_id = params[0]
-            if robot_id == 1:
-                return [{"Parametros": json.dumps(parametros_robot_1)}]
-            elif robot_id == 2:
-                return [{"Parametros": json.dumps(parametros_robot_2)}]
-            return [{"Parametros": None}]
-
-        mock_db_connector.ejecutar_consulta.side_effect = mock_ejecutar_consulta
+        configurar_parametros(mock_db_connector, {1: json.dumps(parametros_robot_1), 2: json.dumps(parametros_robot_2)})
         mock_db_connector.obtener_robots_ejecutables.return_value = [robot_1, robot_2]
         mock_api_gateway_client.get_auth_header.return_value = {"Authorization": "Bearer test-token"}
 
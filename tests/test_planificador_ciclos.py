@@ -0,0 +1,126 @@
+"""
+Tests del intervalo adaptativo y la coordinación de los ciclos del Lanzador.
+"""
+
+import asyncio
+import time
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from sam.common.mail_client import EmailAlertClient
+from sam.lanzador.service.main import LanzadorService
+from sam.lanzador.service.planificador_ciclos import CoordinadorCiclos, PlanificadorCiclo
+
+
+@pytest.fixture
+def reloj(reloj_en):
+    return reloj_en("sam.lanzador.service.planificador_ciclos")
+
+
+def ciclo(planificador, reloj, duracion, trabajo):
+    planificador.iniciar_ciclo()
+    reloj.ahora += duracion
+    return planificador.finalizar_ciclo(trabajo)
+
+
+class TestPlanificadorCiclo:
+    def test_acelera_con_trabajo_y_retrocede_sin_el(self, reloj):
+        planificador = PlanificadorCiclo("Lanzamiento", 15, minimo_seg=5, maximo_seg=60)
+
+        assert ciclo(planificador, reloj, 1, trabajo=3) == 4  # Mínimo de inicio a inicio
+        esperas = []
+        for _ in range(6):
+            espera = ciclo(planificador, reloj, 0, trabajo=0)
+            reloj.ahora += espera
+            esperas.append(espera)
+
+        assert esperas == [7.5, 11.25, 16.875, 25.3125, 37.96875, 56.953125]
+        assert ciclo(planificador, reloj, 0, trabajo=0) == 60
+        assert planificador.estadisticas()["con_trabajo"] == 1
+
+    def test_sin_limites_mantiene_el_intervalo(self, reloj):
+        planificador = PlanificadorCiclo("Conciliación", 300)
+        assert ciclo(planificador, reloj, 10, trabajo=0) == 290
+        assert ciclo(planificador, reloj, 10, trabajo=5) == 290
+
+    def test_ciclo_excedido_arranca_el_siguiente_y_omite_los_perdidos(self, reloj):
+        planificador = PlanificadorCiclo("Lanzamiento", 10)
+
+        assert ciclo(planificador, reloj, 35, trabajo=1) == 0
+
+        estadisticas = planificador.estadisticas()
+        assert (estadisticas["excedidos"], estadisticas["omitidos"]) == (1, 3)
+
+    def test_registra_retraso_y_duracion(self, reloj):
+        planificador = PlanificadorCiclo("Lanzamiento", 10)
+        espera = ciclo(planificador, reloj, 2, trabajo=0)
+        reloj.ahora += espera + 1.5  # Empieza 1,5 s tarde (p. ej. esperando su turno)
+        ciclo(planificador, reloj, 3, trabajo=4)
+
+        estadisticas = planificador.estadisticas()
+        assert estadisticas["retraso_seg"]["max"] == 1.5
+        assert estadisticas["duracion_seg"]["max"] == 3
+        assert (estadisticas["ciclos"], estadisticas["trabajo"]) == (2, 4)
+
+    def test_jitter_acotado(self, reloj):
+        planificador = PlanificadorCiclo("Sincronización", 100, jitter=0.2)
+        esperas = [ciclo(planificador, reloj, 0, trabajo=0) for _ in range(50)]
+        assert all(80 <= espera <= 120 for espera in esperas)
+        assert len(set(esperas)) > 1
+
+
+async def test_coordinador_separa_los_inicios():
+    coordinador = CoordinadorCiclos(0.05)
+    inicio = time.monotonic()
+    await asyncio.gather(coordinador.turno(), coordinador.turno())
+    assert time.monotonic() - inicio >= 0.05
+
+
+async def test_lanzador_espera_menos_con_trabajo_y_no_solapa_la_conciliacion():
+    inicios = []
+
+    async def registrar(nombre, resultado):
+        inicios.append((nombre, time.monotonic()))
+        await asyncio.sleep(0.01)
+        return resultado
+
+    async def lanzar():
+        return await registrar("lanzamiento", [{}])
+
+    async def conciliar():
+        return await registrar("conciliacion", 0)
+
+    desplegador = MagicMock()
+    desplegador.desplegar_robots_pendientes = AsyncMock(side_effect=lanzar)
+    conciliador = MagicMock()
+    conciliador.conciliar_ejecuciones = AsyncMock(side_effect=conciliar)
+    servicio = LanzadorService(
+        MagicMock(),
+        desplegador,
+        conciliador,
+        MagicMock(spec=EmailAlertClient),
+        {
+            "intervalo_lanzamiento": 10,
+            "intervalo_lanzamiento_min": 0.05,
+            "intervalo_sincronizacion": 10,
+            "intervalo_conciliacion": 10,
+            "ciclos_separacion_seg": 0.03,
+        },
+        sync_enabled=False,
+    )
+    tareas = [
+        asyncio.create_task(servicio._run_launcher_cycle(10)),
+        asyncio.create_task(servicio._run_conciliador_cycle(10)),
+    ]
+    await asyncio.sleep(0.3)
+    servicio.stop()
+    await asyncio.wait_for(asyncio.gather(*tareas), 1)
+
+    estadisticas = servicio.obtener_estadisticas_ciclos()
+    # Con trabajo el lanzamiento repite cada ~0,05 s; sin ejecuciones activas la conciliación no acelera.
+    assert estadisticas["Lanzamiento"]["ciclos"] >= 3
+    assert estadisticas["Conciliación"]["ciclos"] == 1
+    assert estadisticas["Conciliación"]["intervalo_actual_seg"] == 10
+    primeros = sorted(instante for _, instante in inicios)[:2]
+    assert primeros[1] - primeros[0] >= 0.03
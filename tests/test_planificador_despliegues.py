@@ -0,0 +1,312 @@
+"""
+Tests del planificador acotado de despliegues del Lanzador.
+"""
+
+import asyncio
+
+import httpx
+import pytest
+
+from sam.lanzador.service.planificador_despliegues import (
+    EstadoReintento,
+    PlanificadorDespliegues,
+    ReintentoProgramado,
+    resumen_latencias,
+)
+
+
+@pytest.fixture
+def desplegador(crear_desplegador):
+    return crear_desplegador(
+        cfg_lanzador={"max_reintentos_deploy": 2, "delay_reintentos_deploy_seg": 0, "deploy_timeout_seg": 0}
+    )
+
+
+class TestPlanificadorDespliegues:
+    async def test_respeta_el_limite_y_no_espera_al_mas_lento(self):
+        """Un despliegue lento no bloquea a los demás: los workers libres siguen tomando trabajo."""
+        en_curso, maximo, terminados = 0, 0, []
+
+        async def desplegar(duracion, reintento):
+            nonlocal en_curso, maximo
+            en_curso += 1
+            maximo = max(maximo, en_curso)
+            await asyncio.sleep(duracion)
+            en_curso -= 1
+            terminados.append(duracion)
+            return duracion
+
+        duraciones = [0.2] + [0.01] * 9
+        planificador = PlanificadorDespliegues(max_workers=3)
+        resultados = [r async for r in planificador.procesar(duraciones, desplegar, lambda e: None)]
+
+        assert maximo == 3
+        # Los 9 rápidos terminan antes que el lento (con tandas de 3 habría esperado a la primera).
+        assert terminados[-1] == 0.2
+        assert sorted(i for i, _ in resultados) == list(range(10))
+        estadisticas = planificador.estadisticas()
+        assert estadisticas["despliegues"] == 10
+        assert estadisticas["latencia_seg"]["max"] >= 0.2
+
+    async def test_plazo_vencido_usa_resultado_alternativo(self):
+        async def desplegar(duracion, reintento):
+            await asyncio.sleep(duracion)
+            return "ok"
+
+        planificador = PlanificadorDespliegues(max_workers=2, timeout_tarea_seg=0.05)
+        resultados = dict([r async for r in planificador.procesar([0.0, 1.0], desplegar, lambda e: "vencido")])
+
+        assert resultados == {0: "ok", 1: "vencido"}
+        assert planificador.estadisticas()["vencidos"] == 1
+
+    async def test_excepcion_se_propaga_y_cancela_el_resto(self):
+        cancelados = []
+
+        async def desplegar(elemento, reintento):
+            if elemento == "error":
+                raise RuntimeError("fallo")
+            try:
+                await asyncio.sleep(1)
+            except asyncio.CancelledError:
+                cancelados.append(elemento)
+                raise
+
+        planificador = PlanificadorDespliegues(max_workers=3)
+        with pytest.raises(RuntimeError):
+            async for _ in planificador.procesar(["lento", "lento", "error"], desplegar, lambda e: None):
+                pass
+
+        assert cancelados == ["lento", "lento"]
+
+    async def test_reintento_libera_el_worker(self):
+        """Un elemento a la espera de su reintento no ocupa el único worker."""
+        orden = []
+
+        async def desplegar(elemento, reintento):
+            if elemento == "offline" and reintento is None:
+                return ReintentoProgramado(0.1, "412")
+            orden.append(elemento)
+            return elemento
+
+        planificador = PlanificadorDespliegues(max_workers=1)
+        resultados = dict([r async for r in planificador.procesar(["offline", "a", "b"], desplegar, lambda e: None)])
+
+        assert orden == ["a", "b", "offline"]
+        assert resultados == {0: "offline", 1: "a", 2: "b"}
+        estado = planificador.estado_reintentos[id("offline")]
+        assert (estado.intento, estado.ultimo_error) == (1, "412")
+        assert planificador.estadisticas()["reintentos"] == 1
+        assert planificador.estadisticas()["despliegues"] == 3
+
+    async def test_prioridad_y_turnos_entre_grupos(self):
+        """Primero la prioridad más alta; dentro de una prioridad, un elemento por grupo por vez."""
+        orden = []
+
+        async def desplegar(elemento, reintento):
+            orden.append(elemento)
+            return elemento
+
+        elementos = [(1, "A", 1), (1, "A", 2), (1, "A", 3), (1, "B", 1), (1, "B", 2), (0, "C", 1)]
+        planificador = PlanificadorDespliegues(max_workers=1)
+        resultados = dict(
+            [
+                r
+                async for r in planificador.procesar(
+                    elementos, desplegar, lambda e: None, prioridad=lambda e: e[0], grupo=lambda e: e[1]
+                )
+            ]
+        )
+
+        assert orden == [(0, "C", 1), (1, "A", 1), (1, "B", 1), (1, "A", 2), (1, "B", 2), (1, "A", 3)]
+        assert resultados == dict(enumerate(elementos))
+        por_prioridad = planificador.estadisticas()["espera_cola_por_prioridad_seg"]
+        assert list(por_prioridad) == ["0", "1"]
+        assert por_prioridad["0"]["max"] <= por_prioridad["1"]["max"]
+
+    async def test_sin_prioridad_respeta_el_orden_de_llegada(self):
+        orden = []
+
+        async def desplegar(elemento, reintento):
+            orden.append(elemento)
+
+        planificador = PlanificadorDespliegues(max_workers=1)
+        async for _ in planificador.procesar([3, 1, 2], desplegar, lambda e: None):
+            pass
+
+        assert orden == [3, 1, 2]
+        assert list(planificador.estadisticas()["espera_cola_por_prioridad_seg"]) == ["0"]
+
+    def test_resumen_latencias(self):
+        assert resumen_latencias([]) == {"p50": None, "p95": None, "p99": None, "max": None}
+        resumen = resumen_latencias([i / 100 for i in range(1, 101)])
+        assert (resumen["p50"], resumen["p95"], resumen["max"]) == (0.51, 0.96, 1.0)
+
+
+class TestDesplegadorConPlanificador:
+    async def test_resultados_en_el_orden_de_los_robots(self, desplegador, mock_db_lanzador):
+        robots = [{"RobotId": i, "EquipoId": 100 + i, "UserId": 200 + i} for i in range(6)]
+        mock_db_lanzador.obtener_robots_ejecutables.return_value = robots
+
+        async def desplegar_bot_v4(file_id, **kwargs):
+            await asyncio.sleep(0.05 if file_id == 0 else 0)
+            return {"deploymentId": f"dep-{file_id}"}
+
+        desplegador._aa_client.desplegar_bot_v4.side_effect = desplegar_bot_v4
+
+        resultados = await desplegador.desplegar_robots_pendientes()
+
+        assert [r["equipo_id"] for r in resultados] == [100, 101, 102, 103, 104, 105]
+        assert all(r["status"] == "exitoso" for r in resultados)
+        assert desplegador.obtener_estadisticas_ciclo()["max_workers"] == 3
+
+    async def test_programados_y_prioridad_de_balanceo_primero(self, desplegador, mock_db_lanzador):
+        desplegador._cfg_lanzador["max_workers_lanzador"] = 1
+        mock_db_lanzador.obtener_robots_ejecutables.return_value = [
+            {"RobotId": 1, "EquipoId": 10, "UserId": 20, "EsProgramado": False, "PrioridadBalanceo": 5},
+            {"RobotId": 1, "EquipoId": 11, "UserId": 21, "EsProgramado": False, "PrioridadBalanceo": 5},
+            {"RobotId": 2, "EquipoId": 12, "UserId": 22, "EsProgramado": True, "PrioridadBalanceo": 10},
+            {"RobotId": 3, "EquipoId": 13, "UserId": 23, "EsProgramado": True, "PrioridadBalanceo": 1},
+            {"RobotId": 3, "EquipoId": 14, "UserId": 24, "EsProgramado": True, "PrioridadBalanceo": 1},
+            {"RobotId": 4, "EquipoId": 15, "UserId": 25, "EsProgramado": True, "PrioridadBalanceo": 1},
+        ]
+        desplegador._aa_client.desplegar_bot_v4.side_effect = lambda file_id, user_ids, **kwargs: {
+            "deploymentId": f"dep-{user_ids[0]}"
+        }
+
+        resultados = await desplegador.desplegar_robots_pendientes()
+
+        llamadas = [c.kwargs["user_ids"][0] for c in desplegador._aa_client.desplegar_bot_v4.call_args_list]
+        # Robot 3 y 4 se turnan en la prioridad más alta; después el programado 2 y al final los del robot 1
+        assert llamadas == [23, 25, 24, 22, 20, 21]
+        assert [r["equipo_id"] for r in resultados] == [10, 11, 12, 13, 14, 15]
+        assert list(desplegador.obtener_estadisticas_ciclo()["espera_cola_por_prioridad_seg"]) == [
+            "0:1",
+            "0:10",
+            "1:5",
+        ]
+
+    async def test_despliegue_vencido_activa_proteccion_de_rebote(self, desplegador, mock_db_lanzador):
+        desplegador._cfg_lanzador["deploy_timeout_seg"] = 0.05
+        mock_db_lanzador.obtener_robots_ejecutables.return_value = [{"RobotId": 1, "EquipoId": 10, "UserId": 20}]
+
+        async def desplegar_bot_v4(**kwargs):
+            await asyncio.sleep(1)
+
+        desplegador._aa_client.desplegar_bot_v4.side_effect = desplegar_bot_v4
+
+        (resultado,) = await desplegador.desplegar_robots_pendientes()
+
+        assert resultado["status"] == "fallido" and resultado["error_type"] == "timeout"
+        assert (1, 10) in desplegador._cooldown_despliegues
+
+    async def test_reintento_412_no_retiene_el_worker(self, desplegador, mock_db_lanzador):
+        desplegador._cfg_lanzador.update({"max_workers_lanzador": 1, "delay_reintentos_deploy_seg": 0.1})
+        mock_db_lanzador.obtener_robots_ejecutables.return_value = [
+            {"RobotId": 1, "EquipoId": 10, "UserId": 20},
+            {"RobotId": 2, "EquipoId": 11, "UserId": 21},
+        ]
+        llamadas = []
+
+        async def desplegar_bot_v4(file_id, **kwargs):
+            llamadas.append(file_id)
+            if llamadas.count(1) == 1 and file_id == 1:
+                raise error_http(412, "Device is offline")
+            return {"deploymentId": f"dep-{file_id}"}
+
+        desplegador._aa_client.desplegar_bot_v4.side_effect = desplegar_bot_v4
+
+        resultados = await desplegador.desplegar_robots_pendientes()
+
+        assert llamadas == [1, 2, 1]
+        assert [(r["robot_id"], r["status"]) for r in resultados] == [(1, "exitoso"), (2, "exitoso")]
+        assert desplegador.obtener_estadisticas_ciclo()["reintentos"] == 1
+
+    async def test_fallo_definitivo_conserva_el_tipo_de_error_previo(self, desplegador):
+        """Como con el bucle anterior, un error de red en el último intento no pisa el 412 detectado antes."""
+        desplegador._aa_client.desplegar_bot_v4.side_effect = [
+            error_http(412, "Device is offline"),
+            httpx.ConnectError("sin conexión"),
+        ]
+        robot = {"RobotId": 1, "EquipoId": 10, "UserId": 20, "Equipo": "EQ-10"}
+
+        primero = await desplegador._desplegar_y_registrar_robot(robot, {}, {})
+        assert isinstance(primero, ReintentoProgramado) and primero.error == "412"
+
+        estado = EstadoReintento(intento=1, ultimo_error=primero.error, proximo_en=0)
+        resultado = await desplegador._desplegar_y_registrar_robot(robot, {}, {}, estado)
+
+        assert resultado == {
+            "status": "fallido",
+            "robot_id": 1,
+            "equipo_id": 10,
+            "equipo_nombre": "EQ-10",
+            "error_type": "412",
+        }
+
+
+def error_http(status_code: int, texto: str) -> httpx.HTTPStatusError:
+    request = httpx.Request("POST", "https://mock.url/v4/automations/deploy")
+    response = httpx.Response(status_code=status_code, text=texto, request=request)
+    return httpx.HTTPStatusError(message=f"Mock Error {status_code}", request=request, response=response)
+
+
+class TestDespliegueAgrupado:
+    FILAS = [
+        {"RobotId": 1, "EquipoId": 10, "UserId": 20, "Hora": None},
+        {"RobotId": 2, "EquipoId": 11, "UserId": 21, "Hora": None},
+        {"RobotId": 1, "EquipoId": 12, "UserId": 22, "Hora": None},
+        {"RobotId": 1, "EquipoId": 13, "UserId": 23, "Hora": None},
+    ]
+
+    async def test_una_llamada_por_robot_y_una_ejecucion_por_equipo(self, desplegador, mock_db_lanzador):
+        desplegador._cfg_lanzador["deploy_agrupado"] = True
+        mock_db_lanzador.obtener_robots_ejecutables.return_value = self.FILAS
+        desplegador._aa_client.desplegar_bot_v4.side_effect = lambda file_id, **kwargs: {
+            "deploymentId": f"dep-{file_id}"
+        }
+
+        resultados = await desplegador.desplegar_robots_pendientes()
+
+        llamadas = {
+            c.kwargs["file_id"]: c.kwargs["user_ids"] for c in desplegador._aa_client.desplegar_bot_v4.call_args_list
+        }
+        assert llamadas == {1: [20, 22, 23], 2: [21]}
+        registradas = [
+            (c.kwargs["id_despliegue"], c.kwargs["db_equipo_id"], c.kwargs["a360_user_id"])
+            for c in mock_db_lanzador.insertar_registro_ejecucion.call_args_list
+        ]
+        assert sorted(registradas) == [("dep-1", 10, 20), ("dep-1", 12, 22), ("dep-1", 13, 23), ("dep-2", 11, 21)]
+        assert [(r["equipo_id"], r["status"]) for r in resultados] == [
+            (10, "exitoso"),
+            (11, "exitoso"),
+            (12, "exitoso"),
+            (13, "exitoso"),
+        ]
+        assert desplegador.obtener_estadisticas_ciclo()["agrupado"] == {
+            "llamadas_agrupadas": 1,
+            "equipos_agrupados": 3,
+            "equipos_individuales_por_fallo": 0,
+        }
+
+    async def test_fallo_del_grupo_despliega_de_a_un_equipo(self, desplegador, mock_db_lanzador):
+        """Un 412 del grupo puede ser de un solo equipo: cada fila pasa por el manejo individual."""
+        desplegador._cfg_lanzador.update({"deploy_agrupado": True, "max_reintentos_deploy": 1})
+        mock_db_lanzador.obtener_robots_ejecutables.return_value = self.FILAS
+
+        async def desplegar_bot_v4(file_id, user_ids, **kwargs):
+            if len(user_ids) > 1 or user_ids == [22]:
+                raise error_http(412, "Device is offline")
+            return {"deploymentId": f"dep-{user_ids[0]}"}
+
+        desplegador._aa_client.desplegar_bot_v4.side_effect = desplegar_bot_v4
+
+        resultados = await desplegador.desplegar_robots_pendientes()
+
+        assert [(r["equipo_id"], r["status"]) for r in resultados] == [
+            (10, "exitoso"),
+            (11, "exitoso"),
+            (12, "fallido"),
+            (13, "exitoso"),
+        ]
+        assert resultados[2]["error_type"] == "412"
+        assert desplegador.obtener_estadisticas_ciclo()["agrupado"]["equipos_individuales_por_fallo"] == 3
@@ -0,0 +1,193 @@
+"""
+Tests del registro diferido (write-behind) de ejecuciones del Lanzador.
+"""
+
+import asyncio
+import datetime
+import json
+from unittest.mock import MagicMock, patch
+
+import pyodbc
+import pytest
+
+from sam.common.database import DatabaseConnector, ResultadoLote
+from sam.lanzador.service.registro_ejecuciones import RegistroEjecucionesDiferido
+
+
+@pytest.fixture
+def mock_db_connector(mock_db_lanzador):
+    mock_db_lanzador.insertadas = []
+    mock_db_lanzador.insertar_registros_ejecucion = MagicMock(side_effect=insertar_en(mock_db_lanzador))
+    return mock_db_lanzador
+
+
+def insertar_en(connector):
+    def insertar(filas):
+        connector.insertadas.extend(filas)
+        return ResultadoLote(len(filas), [])
+
+    return insertar
+
+
+async def registrar(registro, robot_id, equipo_id=None, hora=None):
+    await registro.registrar(
+        id_despliegue=f"dep-{robot_id}",
+        db_robot_id=robot_id,
+        db_equipo_id=equipo_id if equipo_id is not None else 100 + robot_id,
+        a360_user_id=200 + robot_id,
+        marca_tiempo_programada=hora,
+        estado="DEPLOYED",
+    )
+
+
+class TestRegistroEjecucionesDiferido:
+    async def test_vacia_al_completar_un_lote(self, mock_db_connector):
+        registro = RegistroEjecucionesDiferido(mock_db_connector, tamano_lote=3, intervalo_ms=60_000)
+        for robot_id in range(3):
+            await registrar(registro, robot_id, hora=datetime.time(9, 30))
+        assert registro.robot_pendiente(0, 100)
+
+        await asyncio.sleep(0.05)
+
+        mock_db_connector.insertar_registros_ejecucion.assert_called_once()
+        assert mock_db_connector.insertadas[0] == ("dep-0", 0, 100, 200, "09:30:00", "DEPLOYED")
+        assert not registro.robot_pendiente(0, 100)
+        assert registro.estadisticas()["insertadas"] == 3
+        await registro.cerrar()
+
+    async def test_vacia_al_cumplirse_el_intervalo(self, mock_db_connector):
+        registro = RegistroEjecucionesDiferido(mock_db_connector, tamano_lote=50, intervalo_ms=20)
+        await registrar(registro, 1)
+
+        await asyncio.sleep(0.1)
+
+        assert mock_db_connector.insertadas == [("dep-1", 1, 101, 201, None, "DEPLOYED")]
+        await registro.cerrar()
+
+    async def test_bd_caida_conserva_las_filas_en_el_respaldo(self, mock_db_connector, tmp_path):
+        archivo = tmp_path / "ejecuciones.jsonl"
+        mock_db_connector.insertar_registros_ejecucion.side_effect = pyodbc.OperationalError("08S01", "caída")
+        registro = RegistroEjecucionesDiferido(mock_db_connector, tamano_lote=2, archivo_spill=str(archivo))
+        await registrar(registro, 1)
+        await registrar(registro, 2)
+
+        await registro.cerrar()
+
+        assert registro.estadisticas()["pendientes"] == 2
+        assert [json.loads(linea)[0] for linea in archivo.read_text().splitlines()] == ["dep-1", "dep-2"]
+
+        # Un proceso nuevo recupera las filas del archivo y las inserta.
+        mock_db_connector.insertar_registros_ejecucion.side_effect = insertar_en(mock_db_connector)
+        recuperado = RegistroEjecucionesDiferido(mock_db_connector, tamano_lote=2, archivo_spill=str(archivo))
+        assert recuperado.robot_pendiente(2, 102)
+        await recuperado.cerrar()
+
+        assert mock_db_connector.insertadas == [
+            ("dep-1", 1, 101, 201, None, "DEPLOYED"),
+            ("dep-2", 2, 102, 202, None, "DEPLOYED"),
+        ]
+        assert archivo.read_text() == ""
+
+    async def test_contrapresion_con_el_registro_lleno(self, mock_db_connector):
+        mock_db_connector.insertar_registros_ejecucion.side_effect = pyodbc.OperationalError("08S01", "caída")
+        registro = RegistroEjecucionesDiferido(mock_db_connector, tamano_lote=2, intervalo_ms=10, max_pendientes=2)
+        await registrar(registro, 1)
+        await registrar(registro, 2)
+
+        tercero = asyncio.create_task(registrar(registro, 3))
+        await asyncio.sleep(0.05)
+        assert not tercero.done()
+
+        mock_db_connector.insertar_registros_ejecucion.side_effect = insertar_en(mock_db_connector)
+        await asyncio.wait_for(tercero, 1)
+        await registro.cerrar()
+
+        assert [fila[0] for fila in mock_db_connector.insertadas] == ["dep-1", "dep-2", "dep-3"]
+        assert registro.estadisticas()["esperas"] == 1
+
+    async def test_fila_rechazada_se_descarta_y_avisa(self, mock_db_connector):
+        mock_db_connector.insertar_registros_ejecucion.side_effect = lambda filas: ResultadoLote(
+            len(filas) - 1, [(filas[0], "FK_Ejecuciones_Robots")]
+        )
+        registro = RegistroEjecucionesDiferido(mock_db_connector)
+        registro.al_descartar = MagicMock()
+        await registrar(registro, 1)
+        await registrar(registro, 2)
+
+        await registro.cerrar()
+
+        registro.al_descartar.assert_called_once_with(("dep-1", 1, 101, 201, None, "DEPLOYED"), "FK_Ejecuciones_Robots")
+        assert registro.estadisticas() == {
+            "registradas": 2,
+            "insertadas": 1,
+            "descartadas": 1,
+            "vaciados": 1,
+            "esperas": 0,
+            "pendientes": 0,
+        }
+
+
+class TestInsertarRegistrosEjecucion:
+    def test_un_insert_multifila_por_cada_300(self):
+        db = DatabaseConnector("srv", "bd", "usr", "pwd")
+        filas = [(f"dep-{i}", i, i, i, None, "DEPLOYED") for i in range(301)]
+        with patch.object(db, "ejecutar_consulta", side_effect=lambda q, p, es_select: len(p) // 6) as consulta:
+            resultado = db.insertar_registros_ejecucion(filas)
+
+        assert resultado == ResultadoLote(301, [])
+        assert [len(c.args[1]) for c in consulta.call_args_list] == [300 * 6, 6]
+        assert "WHERE NOT EXISTS" in consulta.call_args_list[0].args[0]
+
+    def test_restriccion_violada_aisla_las_filas(self):
+        db = DatabaseConnector("srv", "bd", "usr", "pwd")
+        filas = [("dep-1", 1, 1, 1, None, "DEPLOYED"), ("dep-2", 999, 2, 2, None, "DEPLOYED")]
+        por_fila = ResultadoLote(1, [(filas[1], "FK_Ejecuciones_Robots")])
+        with (
+            patch.object(db, "ejecutar_consulta", side_effect=pyodbc.IntegrityError("23000", "FK")),
+            patch.object(db, "ejecutar_consulta_multiple_detallada", return_value=por_fila) as multiple,
+        ):
+            assert db.insertar_registros_ejecucion(filas) == por_fila
+
+        assert multiple.call_args.args[1] == filas
+        assert multiple.call_args.kwargs == {"usar_fast_executemany": False}
+
+    def test_error_de_conexion_se_propaga(self):
+        db = DatabaseConnector("srv", "bd", "usr", "pwd")
+        with patch.object(db, "ejecutar_consulta", side_effect=pyodbc.OperationalError("08S01", "caída")):
+            with pytest.raises(pyodbc.OperationalError):
+                db.insertar_registros_ejecucion([("dep-1", 1, 1, 1, None, "DEPLOYED")])
+
+
+class TestDesplegadorConRegistroDiferido:
+    @pytest.fixture
+    def desplegador(self, crear_desplegador, mock_db_connector):
+        return crear_desplegador(
+            desplegar=lambda file_id, **kwargs: {"deploymentId": f"dep-{file_id}"},
+            registro_ejecuciones=RegistroEjecucionesDiferido(mock_db_connector, intervalo_ms=60_000),
+        )
+
+    async def test_robot_con_registro_pendiente_no_se_relanza(self, desplegador, mock_db_connector):
+        mock_db_connector.obtener_robots_ejecutables.return_value = [{"RobotId": 1, "EquipoId": 10, "UserId": 20}]
+
+        (resultado,) = await desplegador.desplegar_robots_pendientes()
+        assert resultado["status"] == "exitoso"
+        mock_db_connector.insertar_registro_ejecucion.assert_not_called()
+        assert desplegador.obtener_estadisticas_ciclo()["registro_diferido"]["pendientes"] == 1
+
+        # El SP todavía no ve la ejecución y devuelve el mismo robot: no se vuelve a desplegar.
+        assert not await desplegador.desplegar_robots_pendientes()
+        assert desplegador._aa_client.desplegar_bot_v4.call_count == 1
+
+        await desplegador._registro_ejecuciones.cerrar()
+        assert mock_db_connector.insertadas == [("dep-1", 1, 10, 20, None, "DEPLOYED")]
+
+    async def test_fila_rechazada_activa_proteccion_de_rebote(self, desplegador, mock_db_connector):
+        mock_db_connector.insertar_registros_ejecucion.side_effect = lambda filas: ResultadoLote(
+            0, [(fila, "error") for fila in filas]
+        )
+        mock_db_connector.obtener_robots_ejecutables.return_value = [{"RobotId": 1, "EquipoId": 10, "UserId": 20}]
+
+        await desplegador.desplegar_robots_pendientes()
+        await desplegador._registro_ejecuciones.cerrar()
+
+        assert (1, 10) in desplegador._cooldown_despliegues
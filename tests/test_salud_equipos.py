@@ -0,0 +1,133 @@
+"""
+Tests del estado de conexión de los equipos y la omisión de despliegues en equipos desconectados.
+"""
+
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+
+import httpx
+import pytest
+
+from sam.common.mail_client import EmailAlertClient
+from sam.lanzador.service.main import LanzadorService
+from sam.lanzador.service.salud_equipos import SaludEquipos
+
+OFFLINE = {"status": "fallido", "error_type": "412"}
+EXITOSO = {"status": "exitoso"}
+
+
+@pytest.fixture
+def reloj(reloj_en):
+    return reloj_en("sam.lanzador.service.salud_equipos")
+
+
+class TestSaludEquipos:
+    def test_omite_y_sondea_con_intervalo_exponencial(self, reloj):
+        salud = SaludEquipos(umbral_fallos=2, sondeo_min_seg=60, sondeo_max_seg=200)
+        salud.registrar_resultado(10, OFFLINE)
+        assert not salud.debe_omitir(10)  # Un fallo no alcanza el umbral
+        salud.registrar_resultado(10, OFFLINE)
+        assert salud.debe_omitir(10)
+
+        sondeos = []
+        for _ in range(4):
+            while salud.debe_omitir(10):
+                reloj.ahora += 1
+            sondeos.append(reloj.ahora)
+            assert salud.debe_omitir(10)  # Un solo sondeo por vez
+            salud.registrar_resultado(10, OFFLINE)
+
+        assert [b - a for a, b in zip(sondeos, sondeos[1:])] == [120, 200, 200]
+        assert salud.estadisticas()["sondeos"] == 4
+
+    def test_despliegue_exitoso_lo_recupera(self, reloj):
+        salud = SaludEquipos(sondeo_min_seg=60)
+        salud.registrar_resultado(10, {"status": "fallido", "error_type": "400_device_offline"})
+        assert salud.debe_omitir(10)
+        salud.registrar_resultado(10, EXITOSO)
+        assert not salud.debe_omitir(10)
+        assert salud.estadisticas()["recuperados"] == 1
+
+    def test_otros_errores_no_lo_marcan(self, reloj):
+        salud = SaludEquipos()
+        salud.registrar_resultado(10, {"status": "fallido", "error_type": "500_server_error"})
+        assert not salud.debe_omitir(10) and salud.desconectados() == {}
+
+    def test_lista_conectados(self, reloj):
+        salud = SaludEquipos(sondeo_min_seg=60, ttl_lista_seg=120)
+        salud.actualizar_conectados(["10", 11])
+
+        assert not salud.debe_omitir(10)
+        assert salud.debe_omitir(12)  # Ausente de la lista: sin pagar un despliegue fallido
+        assert salud.desconectados()[12]["motivo"] == "lista"
+
+        salud.actualizar_conectados([10, 11, 12])
+        assert not salud.debe_omitir(12)  # Volvió a la lista: se sondea enseguida
+        salud.registrar_resultado(12, EXITOSO)
+
+        reloj.ahora += 400  # Lista vencida (el refresco viene fallando): deja de bloquear
+        assert not salud.debe_omitir(13)
+
+    def test_exito_posterior_a_la_lista_vale_mas(self, reloj):
+        salud = SaludEquipos()
+        salud.actualizar_conectados([10])
+        reloj.ahora += 1
+        salud.confirmar_conectado(12)  # P. ej. el Callback avisó que terminó una ejecución
+        assert not salud.debe_omitir(12)
+
+    async def test_refresco_en_segundo_plano(self):
+        obtener = AsyncMock(return_value=[{"id": 10}, {"id": "11"}])
+        salud = SaludEquipos(obtener, ttl_lista_seg=60)
+        salud.refrescar_lista_si_vencida()
+        salud.refrescar_lista_si_vencida()  # Ya hay un refresco en curso
+        await asyncio.sleep(0)
+        await salud._refresco
+        salud.refrescar_lista_si_vencida()  # Lista vigente
+        obtener.assert_awaited_once()
+        assert salud.estadisticas()["lista_conectados"] == 2
+        assert salud.debe_omitir(12)
+        await salud.cerrar()
+
+
+def error_412() -> httpx.HTTPStatusError:
+    request = httpx.Request("POST", "https://mock.url/v4/automations/deploy")
+    response = httpx.Response(status_code=412, text="Device is not connected", request=request)
+    return httpx.HTTPStatusError(message="Mock Error 412", request=request, response=response)
+
+
+async def test_desconexion_masiva_no_repite_despliegues_fallidos(crear_desplegador, mock_db_lanzador):
+    mock_db_lanzador.obtener_robots_ejecutables.return_value = [
+        {"RobotId": 1, "Robot": "R1", "EquipoId": equipo, "Equipo": f"E{equipo}", "UserId": equipo}
+        for equipo in range(100, 150)
+    ]
+    desplegador = crear_desplegador(
+        cfg_lanzador={"max_workers_lanzador": 10, "max_reintentos_deploy": 2, "delay_reintentos_deploy_seg": 0},
+        desplegar=error_412(),
+        salud_equipos=SaludEquipos(sondeo_min_seg=60),
+    )
+    aa_client = desplegador._aa_client
+
+    primero = await desplegador.desplegar_robots_pendientes()
+    assert aa_client.desplegar_bot_v4.await_count == 100  # 50 equipos x 2 intentos
+    assert {r["status"] for r in primero} == {"fallido"}
+
+    segundo = await desplegador.desplegar_robots_pendientes()
+    assert aa_client.desplegar_bot_v4.await_count == 100
+    assert len(segundo) == 50 and {r["error_type"] for r in segundo} == {"equipo_desconectado"}
+    assert LanzadorService._trabajo_lanzamiento(segundo) == 0
+
+
+def test_omitidos_siguen_contando_para_la_alerta_de_equipo_offline():
+    servicio = LanzadorService(
+        MagicMock(),
+        MagicMock(),
+        MagicMock(),
+        MagicMock(spec=EmailAlertClient),
+        {"intervalo_lanzamiento": 60, "intervalo_sincronizacion": 60, "intervalo_conciliacion": 60},
+        sync_enabled=False,
+    )
+    servicio._procesar_resultados_despliegue([{"equipo_id": 10, **OFFLINE}])
+    servicio._procesar_resultados_despliegue(
+        [{"equipo_id": 10, "status": "omitido", "error_type": "equipo_desconectado"}]
+    )
+    assert servicio._fallos_412_por_equipo[10] == 2
@@ -0,0 +1,119 @@
+"""
+Tests de las trazas por fase de los ciclos.
+"""
+
+import asyncio
+import json
+import logging
+
+import pytest
+
+from sam.common.trazas import TRAZADOR, ExportadorJsonl, ExportadorMemoria, configurar_trazas, trazar
+
+
+@pytest.fixture
+def memoria():
+    configurar_trazas(True, capacidad=100)
+    yield TRAZADOR.exportador(ExportadorMemoria)
+    TRAZADOR.cerrar()
+
+
+def test_deshabilitado_no_registra_nada():
+    assert not TRAZADOR.habilitado
+    with TRAZADOR.ciclo("Lanzamiento") as ciclo, TRAZADOR.span("fase", robot=1) as span:
+        span.atributo(deploymentId="dep-1")
+    assert ciclo is span  # El mismo span nulo para todo: sin asignaciones por fase
+    assert TRAZADOR.exportador(ExportadorMemoria) is None
+
+
+async def test_spans_anidados_a_traves_de_tareas(memoria):
+    @trazar("fase_decorada")
+    async def fase(robot):
+        with TRAZADOR.span("llamada", robot=robot) as span:
+            await asyncio.sleep(0)
+            span.atributo(deploymentId=f"dep-{robot}")
+
+    with TRAZADOR.ciclo("Lanzamiento") as ciclo:
+        await asyncio.gather(fase(1), fase(2))
+
+    spans = memoria.spans(ciclo.traza_id)
+    por_id = {s["span"]: s for s in spans}
+    llamadas = [s for s in spans if s["nombre"] == "llamada"]
+    assert sorted(s["atributos"]["deploymentId"] for s in llamadas) == ["dep-1", "dep-2"]
+    for llamada in llamadas:
+        padre = por_id[llamada["padre"]]
+        assert padre["nombre"] == "fase_decorada" and padre["padre"] == ciclo.span_id
+    assert spans[-1]["nombre"] == "Lanzamiento" and spans[-1]["padre"] is None
+
+
+def test_error_en_la_fase_queda_en_el_span(memoria):
+    with pytest.raises(ValueError), TRAZADOR.span("fase"):
+        raise ValueError("x")
+    assert memoria.spans()[-1]["error"] == "ValueError"
+
+
+def test_resumen_por_fase_al_cerrar_el_ciclo(memoria, caplog):
+    with caplog.at_level(logging.INFO, logger="sam.common.trazas"), TRAZADOR.ciclo("Conciliación"):
+        for _ in range(3):
+            with TRAZADOR.span("actualizar_estados"):
+                pass
+        with TRAZADOR.span("a360_ejecuciones_activas"):
+            pass
+
+    resumen = TRAZADOR.ultimo_resumen()["Conciliación"]["fases"]
+    assert resumen["actualizar_estados"]["n"] == 3 and resumen["a360_ejecuciones_activas"]["n"] == 1
+    assert "Fases del ciclo de Conciliación" in caplog.text
+
+
+def test_buffer_circular_conserva_los_ultimos():
+    memoria = ExportadorMemoria(capacidad=2)
+    TRAZADOR.configurar(True, [memoria])
+    try:
+        for nombre in ("a", "b", "c"):
+            with TRAZADOR.span(nombre):
+                pass
+    finally:
+        TRAZADOR.cerrar()
+    assert [s["nombre"] for s in memoria.spans()] == ["b", "c"]
+
+
+def test_exportador_jsonl_una_linea_por_span(tmp_path):
+    ruta = tmp_path / "trazas" / "lanzador.jsonl"
+    configurar_trazas(True, capacidad=10, archivo=str(ruta))
+    assert TRAZADOR.exportador(ExportadorJsonl).ruta == ruta
+    try:
+        with TRAZADOR.ciclo("Sincronización"), TRAZADOR.span("merge_lote", tabla="Robots", filas=50):
+            pass
+        lineas = [json.loads(linea) for linea in ruta.read_text(encoding="utf-8").splitlines()]
+    finally:
+        TRAZADOR.cerrar()
+    assert [linea["nombre"] for linea in lineas] == ["merge_lote", "Sincronización"]
+    assert lineas[0]["atributos"] == {"tabla": "Robots", "filas": 50}
+    assert lineas[0]["traza"] == lineas[1]["traza"]
+
+
+async def test_ciclo_de_despliegue_trazado(memoria, crear_desplegador, mock_db_lanzador):
+    mock_db_lanzador.obtener_robots_ejecutables.return_value = [
+        {"RobotId": 1, "Robot": "R1", "EquipoId": 10, "Equipo": "E10", "UserId": 20}
+    ]
+    desplegador = crear_desplegador(
+        cfg_lanzador={"max_workers_lanzador": 2}, desplegar=lambda **kwargs: {"deploymentId": "dep-1"}
+    )
+
+    with TRAZADOR.ciclo("Lanzamiento") as ciclo:
+        await desplegador.desplegar_robots_pendientes()
+
+    spans = {s["nombre"]: s for s in memoria.spans(ciclo.traza_id)}
+    assert {
+        "obtener_robots_ejecutables",
+        "preparar_cabeceras_callback",
+        "refrescar_parametros_robots",
+        "desplegar_robot",
+        "a360_desplegar",
+        "registrar_ejecucion",
+    } <= set(spans)
+    assert spans["desplegar_robot"]["atributos"] == {"robot": 1, "equipo": 10, "intento": 1}
+    assert spans["a360_desplegar"]["padre"] == spans["desplegar_robot"]["span"]
+    assert spans["a360_desplegar"]["atributos"]["deploymentId"] == "dep-1"
+    assert spans["registrar_ejecucion"]["atributos"]["deploymentId"] == "dep-1"
+    assert "desplegar_robot" in TRAZADOR.ultimo_resumen()["Lanzamiento"]["fases"]